@@ -14,6 +14,7 @@
 
 import collections
 import re
+import time
 
 from neutron.agent.linux import external_process
 from neutron.agent.linux import ip_lib
@@ -42,6 +43,8 @@ METADATA_DEFAULT_IP = '169.254.169.254'
 METADATA_DEFAULT_CIDR = '%s/%d' % (METADATA_DEFAULT_IP,
                                    METADATA_DEFAULT_PREFIX)
 METADATA_PORT = 80
+# Seconds between two checks that a Port_Binding condition change is acked
+CONDITION_WAIT_INTERVAL = 0.1
 MAC_PATTERN = re.compile(r'([0-9A-F]{2}[:-]){5}([0-9A-F]{2})', re.I)
 
 MetadataPortInfo = collections.namedtuple('MetadataPortInfo', ['mac',
@@ -70,7 +73,10 @@ class PortBindingChassisEvent(row_event.RowEvent):
     def __init__(self, metadata_agent):
         self.agent = metadata_agent
         table = 'Port_Binding'
-        events = (self.ROW_UPDATE)
+        # Only the Port_Bindings of our chassis and of the datapaths we
+        # serve metadata for are monitored: a port bound to our chassis
+        # shows up as a new row and one unbound from it may go away.
+        events = (self.ROW_CREATE, self.ROW_UPDATE, self.ROW_DELETE)
         super(PortBindingChassisEvent, self).__init__(
             events, table, None)
         self.event_name = 'PortBindingChassisEvent'
@@ -84,6 +90,8 @@ class PortBindingChassisEvent(row_event.RowEvent):
             return
         new_chassis = getattr(row, 'chassis', [])
         old_chassis = getattr(old, 'chassis', [])
+        if event == self.ROW_DELETE:
+            new_chassis, old_chassis = [], new_chassis
         if new_chassis and new_chassis[0].name == self.agent.chassis:
             LOG.info("Port %s in datapath %s bound to our chassis",
                      row.logical_port, str(row.datapath.uuid))
@@ -94,6 +102,31 @@ class PortBindingChassisEvent(row_event.RowEvent):
             self.agent.update_datapath(str(row.datapath.uuid))
 
 
+class PortBindingMetadataPortCreateEvent(row_event.RowEvent):
+    """Row create event - Port_Binding type == 'localport'.
+
+    The metadata port of a datapath shows up once the datapath is added
+    to the monitor condition (or when it is created), the datapath can
+    then be provisioned.
+    """
+
+    def __init__(self, metadata_agent):
+        self.agent = metadata_agent
+        table = 'Port_Binding'
+        events = (self.ROW_CREATE)
+        super(PortBindingMetadataPortCreateEvent, self).__init__(
+            events, table, (('type', '=', 'localport'),))
+        self.event_name = 'PortBindingMetadataPortCreateEvent'
+
+    @_wait_if_syncing
+    def run(self, event, row, old):
+        datapath = str(row.datapath.uuid)
+        if datapath in self.agent.monitored_datapaths:
+            LOG.info("Metadata port %s in datapath %s found",
+                     row.logical_port, datapath)
+            self.agent.update_datapath(datapath)
+
+
 class ChassisCreateEvent(row_event.RowEvent):
     """Row create event - Chassis name == our_chassis.
 
@@ -128,6 +161,13 @@ class MetadataAgent(object):
         self._process_monitor = external_process.ProcessMonitor(
             config=self.conf,
             resource_type='metadata')
+        # Datapaths with ports bound to our chassis, whose Port_Bindings are
+        # monitored on top of the ones of our chassis.
+        self.monitored_datapaths = set()
+        self._condition_datapaths = None
+        # The IDL condition sequence number at which the ovsdb-server has
+        # sent the Port_Bindings of the condition
+        self._condition_seqno = None
 
     def start(self):
 
@@ -139,9 +179,13 @@ class MetadataAgent(object):
         self.ovs_idl = ovsdb.MetadataAgentOvsIdl().start()
         self.chassis = self._get_own_chassis_name()
 
-        # Open the connection to OVN SB database.
+        # Open the connection to OVN SB database. No Port_Binding is
+        # monitored until the initial sync sets the condition.
         self.sb_idl = ovsdb.MetadataAgentOvnSbIdl(
-            [PortBindingChassisEvent(self), ChassisCreateEvent(self)]).start()
+            [PortBindingChassisEvent(self),
+             PortBindingMetadataPortCreateEvent(self),
+             ChassisCreateEvent(self)],
+            conditions={'Port_Binding': []}).start()
 
         # Do the initial sync.
         self.sync()
@@ -166,7 +210,18 @@ class MetadataAgent(object):
         chassis are serving metadata. Also, it will tear down those namespaces
         which were serving metadata but are no longer needed.
         """
+        # Our chassis may have been (re)created, always set the condition.
+        # Our Port_Bindings must have been received before looking for the
+        # datapaths to serve, or all the namespaces would look unneeded.
+        synced = self.update_port_binding_condition(force=True, wait=True)
         metadata_namespaces = self.ensure_all_networks_provisioned()
+        # The datapaths known are provisioned in any case, the unneeded
+        # namespaces are only known once the condition is acked.
+        if not synced or not self.update_port_binding_condition(wait=True):
+            LOG.warning('The Port_Bindings of chassis %s may not all be '
+                        'received yet, not tearing down the unneeded '
+                        'metadata namespaces', self.chassis)
+            return
         system_namespaces = ip_lib.IPWrapper().get_namespaces()
         unused_namespaces = [ns for ns in system_namespaces if
                              ns.startswith(NS_PREFIX) and
@@ -229,11 +284,15 @@ class MetadataAgent(object):
         datapath_ports = [p for p in ports if p.type == '' and
                           str(p.datapath.uuid) == datapath]
         if datapath_ports:
+            self.monitored_datapaths.add(datapath)
+            self.update_port_binding_condition()
             self.provision_datapath(datapath)
         else:
             self.teardown_datapath(datapath)
+            self.monitored_datapaths.discard(datapath)
+            self.update_port_binding_condition()
 
-    def provision_datapath(self, datapath):
+    def provision_datapath(self, datapath, teardown=True):
         """Provision the datapath so that it can serve metadata.
 
         This function will create the namespace and VETH pair if needed
@@ -241,10 +300,16 @@ class MetadataAgent(object):
         metadata port of the network. It will also remove existing IP
         addresses that are no longer needed.
 
+        :param teardown: Whether to tear the namespace down if the metadata
+        port isn't found, False if it may not be received yet
         :return: The metadata namespace name of this datapath
         """
         LOG.debug("Provisioning datapath %s", datapath)
         port = self.sb_idl.get_metadata_port_network(datapath)
+        if not port and not teardown:
+            LOG.debug("The metadata port for datapath %s may not be received "
+                      "yet, it is provisioned once it is", datapath)
+            return
         # If there's no metadata port or it doesn't have a MAC or IP
         # addresses, then tear the namespace down if needed. This might happen
         # when there are no subnets yet created so metadata port doesn't have
@@ -344,15 +409,57 @@ class MetadataAgent(object):
         # Retrieve all ports in our Chassis with type == ''
         ports = self.sb_idl.get_ports_on_chassis(self.chassis)
         datapaths = {str(p.datapath.uuid) for p in ports if p.type == ''}
+        self.monitored_datapaths = set(datapaths)
+        # Until the condition is acked, a datapath whose metadata port isn't
+        # received yet is left as is instead of torn down. It is provisioned
+        # once its metadata port is received.
+        synced = self.update_port_binding_condition(wait=True)
         namespaces = []
         # Make sure that all those datapaths are serving metadata
         for datapath in datapaths:
-            netns = self.provision_datapath(datapath)
+            netns = self.provision_datapath(datapath, teardown=synced)
             if netns:
                 namespaces.append(netns)
 
         return namespaces
 
+    def update_port_binding_condition(self, force=False, wait=False):
+        """Update the Port_Bindings monitored from the OVN SB database.
+
+        Only the ports bound to our chassis plus the ports (among which the
+        metadata port) of the datapaths in monitored_datapaths are needed.
+
+        :param wait: Wait for the ovsdb-server to send the Port_Bindings
+        matching the condition
+        :return: Whether the Port_Bindings matching the condition are known
+        to be received, only checked if wait is True
+        """
+        datapaths = frozenset(self.monitored_datapaths)
+        if not force and datapaths == self._condition_datapaths:
+            return not wait or self._wait_for_condition(
+                self._condition_seqno)
+        self._condition_seqno = self.sb_idl.set_port_binding_condition(
+            self.chassis, datapaths).execute(check_error=True)
+        self._condition_datapaths = datapaths
+        return not wait or self._wait_for_condition(self._condition_seqno)
+
+    def _wait_for_condition(self, seqno):
+        """Wait for the ovsdb-server to ack a condition change.
+
+        The ovsdb-server sends the rows matching a new condition before
+        acking it. Older python-ovs versions don't track the acks, the rows
+        can't be known to be received with them.
+        """
+        idl = self.sb_idl.idl
+        if seqno is None or not hasattr(idl, 'cond_seqno'):
+            return False
+        deadline = time.time() + config.get_ovn_ovsdb_timeout()
+        while idl.cond_seqno < seqno:
+            if time.time() > deadline:
+                return False
+            time.sleep(CONDITION_WAIT_INTERVAL)
+        return True
+
     def update_chassis_metadata_networks(self, datapath, remove=False):
         """Update metadata networks hosted in this chassis.
 
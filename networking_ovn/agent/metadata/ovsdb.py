@@ -27,7 +27,7 @@ class MetadataAgentOvnSbIdl(ovsdb_monitor.OvnIdl):
 
     SCHEMA = 'OVN_Southbound'
 
-    def __init__(self, events=None):
+    def __init__(self, events=None, conditions=None):
         connection_string = config.get_ovn_sb_connection()
         helper = self._get_ovsdb_helper(connection_string)
         tables = ('Chassis', 'Encap', 'Port_Binding', 'Datapath_Binding')
@@ -35,6 +35,10 @@ class MetadataAgentOvnSbIdl(ovsdb_monitor.OvnIdl):
             helper.register_table(table)
         super(MetadataAgentOvnSbIdl, self).__init__(
             None, connection_string, helper)
+        # Only the rows matching the condition of their table are sent by
+        # the ovsdb-server (monitor_cond), an empty condition matches none.
+        for table, condition in (conditions or {}).items():
+            self.cond_change(table, condition)
         if events:
             self.notify_handler.watch_events(events)
 
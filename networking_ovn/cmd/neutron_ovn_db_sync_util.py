@@ -12,7 +12,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import subprocess
+import sys
+
 from neutron_lib.agent import topics
+from neutron_lib import context
 from neutron_lib.plugins import directory
 from oslo_config import cfg
 from oslo_db import options as db_options
@@ -23,6 +27,7 @@ from neutron import manager
 from neutron import opts as neutron_options
 from neutron.plugins.ml2 import plugin as ml2_plugin
 
+from networking_ovn._i18n import _
 from networking_ovn.common import config as ovn_config
 from networking_ovn.common import ovn_client
 from networking_ovn.ml2 import mech_driver
@@ -31,6 +36,45 @@ from networking_ovn.ovsdb import impl_idl_ovn
 
 LOG = logging.getLogger(__name__)
 
+sync_util_opts = [
+    cfg.IntOpt('shards',
+               min=1,
+               default=1,
+               help=_('The number of shards the networks are spread over. '
+                      'Each shard syncs the logical switches, ports, DHCP '
+                      'options, DNS records and ACLs of its networks, with '
+                      'its own OVN connections. The objects shared by the '
+                      'shards are synced by a coordinator in two stages, '
+                      'see --shard-coordinator. Unless --shard-index or '
+                      '--shard-coordinator is given, the security groups '
+                      'stage is run first, then all the shards are synced '
+                      'by new processes of the utility, then the routers '
+                      'stage is run.')),
+    cfg.IntOpt('shard-index',
+               min=0,
+               help=_('Only sync the shard with this index, from 0 to '
+                      '--shards minus one.')),
+    cfg.StrOpt('shard-coordinator',
+               choices=[ovn_db_sync.SHARD_STAGE_SECURITY_GROUPS,
+                        ovn_db_sync.SHARD_STAGE_ROUTERS],
+               help=_('Only run a stage of the coordinator of a sharded '
+                      'sync. The security-groups stage syncs the address '
+                      'sets and port groups the ports of the shards are '
+                      'added to, run it before any shard. The routers '
+                      'stage syncs the routers and the OVN_Southbound DB, '
+                      'run it once all the shards are synced.')),
+    cfg.StrOpt('report-file',
+               help=_('Write a JSON report of the differences found between '
+                      'the Neutron and OVN DBs to this file, with the IDs '
+                      'of the resources to add, delete or update and the '
+                      'time each phase of the sync took, instead of logging '
+                      'the differences one by one. When the shards are '
+                      'synced by new processes, each of them writes its '
+                      'own report, suffixed with .shard-<index>, and the '
+                      'security groups stage of the coordinator writes its '
+                      'report suffixed with .security-groups.')),
+]
+
 
 class Ml2Plugin(ml2_plugin.Ml2Plugin):
 
@@ -133,9 +177,121 @@ def setup_conf():
     cfg.CONF.register_cli_opts(ovn_opts, group=ovn_group)
     db_group, neutron_db_opts = db_options.list_opts()[0]
     cfg.CONF.register_cli_opts(neutron_db_opts, db_group)
+    cfg.CONF.register_cli_opts(sync_util_opts)
     return conf
 
 
+def sync(mode, shard=None, report_file=None):
+    """Sync the OVN DBs with the Neutron DB.
+
+    @param shard: The part of the networks to sync, all of them if None
+    @type  shard: ovn_db_sync.SyncShard
+    @param report_file: The file to write the sync report to, the
+                        differences are logged if None
+    @return: False if the OVN DBs could not be connected to
+    """
+    try:
+        conn = impl_idl_ovn.get_connection(impl_idl_ovn.OvsdbNbOvnIdl)
+        ovn_api = impl_idl_ovn.OvsdbNbOvnIdl(conn)
+    except RuntimeError:
+        LOG.error('Invalid --ovn-ovn_nb_connection parameter provided.')
+        return False
+
+    try:
+        sb_conn = impl_idl_ovn.get_connection(impl_idl_ovn.OvsdbSbOvnIdl)
+        ovn_sb_api = impl_idl_ovn.OvsdbSbOvnIdl(sb_conn)
+    except RuntimeError:
+        LOG.error('Invalid --ovn-ovn_sb_connection parameter provided.')
+        return False
+
+    manager.init()
+    core_plugin = directory.get_plugin()
+    ovn_driver = core_plugin.mechanism_manager.mech_drivers['ovn-sync'].obj
+    ovn_driver._nb_ovn = ovn_api
+    ovn_driver._sb_ovn = ovn_sb_api
+
+    report = None
+    if report_file:
+        report = ovn_db_sync.SyncReport(
+            mode=mode, shard=str(shard) if shard is not None else None)
+    try:
+        _sync(mode, core_plugin, ovn_api, ovn_sb_api, ovn_driver, shard,
+              report)
+    finally:
+        if report is not None:
+            report.write(report_file)
+            LOG.info('Sync report written to %s', report_file)
+    return True
+
+
+def _sync(mode, core_plugin, ovn_api, ovn_sb_api, ovn_driver, shard,
+          report):
+    #北向库同步
+    synchronizer = ovn_db_sync.OvnNbSynchronizer(
+        core_plugin, ovn_api, ovn_sb_api, mode, ovn_driver, shard=shard,
+        report=report)
+
+    # The Neutron resources are loaded once and shared by all the phases
+    # of the sync
+    snapshot = ovn_db_sync.SyncSnapshot(core_plugin,
+                                        context.get_admin_context(),
+                                        shard=shard)
+
+    LOG.info('Sync for Northbound db started with mode : %s', mode)
+    synchronizer.do_sync(snapshot=snapshot)
+    LOG.info('Sync completed for Northbound db, Neutron resources loaded '
+             'with %d queries', snapshot.queries)
+
+    if shard is not None and not shard.runs_stage(
+            ovn_db_sync.SHARD_STAGE_ROUTERS):
+        # The Southbound db is synced by the routers stage of the
+        # coordinator
+        return
+
+    sb_synchronizer = ovn_db_sync.OvnSbSynchronizer(
+        core_plugin, ovn_sb_api, ovn_driver, report=report)
+
+    LOG.info('Sync for Southbound db started with mode : %s', mode)
+    sb_synchronizer.do_sync()
+    LOG.info('Sync completed for Southbound db')
+
+
+def _shard_command(mode, shard_index, report_file):
+    """Return the command line syncing a shard in a new process.
+
+    The utility is run again with the same configuration, the new process
+    doesn't inherit the OVSDB connections nor the plugins of this one.
+    """
+    command = [sys.executable, '-m',
+               'networking_ovn.cmd.neutron_ovn_db_sync_util']
+    command += sys.argv[1:]
+    command += ['--ovn-neutron_sync_mode', mode,
+                '--shard-index', str(shard_index)]
+    if report_file:
+        command += ['--report-file', '%s.shard-%d' % (report_file,
+                                                      shard_index)]
+    return command
+
+
+def sync_shards(mode, shards, report_file=None):
+    """Sync all the shards in new processes and wait for them.
+
+    @param report_file: The file each shard writes its sync report to,
+                        suffixed with its index
+    @return: False if the sync of a shard failed
+    """
+    processes = [subprocess.Popen(_shard_command(mode, i, report_file))
+                 for i in range(shards)]
+    failed = []
+    for index, process in enumerate(processes):
+        if process.wait() != 0:
+            failed.append(index)
+    if failed:
+        LOG.error('Sync failed for the shards %s.', failed)
+        return False
+    return True
+
+
 def main():
     """Main method for syncing neutron networks and ports with ovn nb db.
 
@@ -178,37 +334,37 @@ def main():
         LOG.error('Invalid core plugin : ["%s"].', cfg.CONF.core_plugin)
         return
 
-    try:
-        conn = impl_idl_ovn.get_connection(impl_idl_ovn.OvsdbNbOvnIdl)
-        ovn_api = impl_idl_ovn.OvsdbNbOvnIdl(conn)
-    except RuntimeError:
-        LOG.error('Invalid --ovn-ovn_nb_connection parameter provided.')
-        return
-
-    try:
-        sb_conn = impl_idl_ovn.get_connection(impl_idl_ovn.OvsdbSbOvnIdl)
-        ovn_sb_api = impl_idl_ovn.OvsdbSbOvnIdl(sb_conn)
-    except RuntimeError:
-        LOG.error('Invalid --ovn-ovn_sb_connection parameter provided.')
+    shards = cfg.CONF.shards
+    shard_index = cfg.CONF.shard_index
+    if shard_index is not None and shard_index >= shards:
+        LOG.error('Invalid shard index : %(index)d. Should be lower than '
+                  'the number of shards : %(shards)d.',
+                  {'index': shard_index, 'shards': shards})
         return
 
-    manager.init()
-    core_plugin = directory.get_plugin()
-    ovn_driver = core_plugin.mechanism_manager.mech_drivers['ovn-sync'].obj
-    ovn_driver._nb_ovn = ovn_api
-    ovn_driver._sb_ovn = ovn_sb_api
-
-    #北向库同步
-    synchronizer = ovn_db_sync.OvnNbSynchronizer(
-        core_plugin, ovn_api, ovn_sb_api, mode, ovn_driver)
-
-    LOG.info('Sync for Northbound db started with mode : %s', mode)
-    synchronizer.do_sync()
-    LOG.info('Sync completed for Northbound db')
+    report_file = cfg.CONF.report_file
+    shard_coordinator = cfg.CONF.shard_coordinator
+    shard = None
+    if shard_index is not None:
+        shard = ovn_db_sync.SyncShard(shards, shard_index)
+    elif shard_coordinator:
+        shard = ovn_db_sync.SyncShard(shards, stage=shard_coordinator)
+    elif shards > 1:
+        # The ports of the shards are added to the address sets and port
+        # groups, which are synced first, and the routers connect the
+        # networks of the shards, which are synced last
+        stage = ovn_db_sync.SHARD_STAGE_SECURITY_GROUPS
+        if not sync(mode, ovn_db_sync.SyncShard(shards, stage=stage),
+                    '%s.%s' % (report_file, stage) if report_file else None):
+            return
+        if not sync_shards(mode, shards, report_file):
+            return
+        shard = ovn_db_sync.SyncShard(
+            shards, stage=ovn_db_sync.SHARD_STAGE_ROUTERS)
+    if not sync(mode, shard, report_file) and shard_index is not None:
+        # The process syncing a shard for sync_shards() must fail
+        sys.exit(1)
 
-    sb_synchronizer = ovn_db_sync.OvnSbSynchronizer(
-        core_plugin, ovn_sb_api, ovn_driver)
 
-    LOG.info('Sync for Southbound db started with mode : %s', mode)
-    sb_synchronizer.do_sync()
-    LOG.info('Sync completed for Southbound db')
+if __name__ == '__main__':
+    main()
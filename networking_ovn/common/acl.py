@@ -19,6 +19,7 @@ from neutron_lib import exceptions as n_exceptions
 from oslo_config import cfg
 
 from networking_ovn._i18n import _
+from networking_ovn.common import config
 from networking_ovn.common import constants as ovn_const
 from networking_ovn.common import utils
 
@@ -57,6 +58,13 @@ def is_sg_enabled():
     return cfg.CONF.SECURITYGROUP.enable_security_group
 
 
+def is_port_groups_enabled(nb_idl):
+    # Security groups are modelled as Port_Groups only when it is enabled
+    # and the Northbound schema is recent enough to have the table.
+    return (config.is_sg_port_groups_enabled() and
+            nb_idl.is_port_groups_supported())
+
+
 def acl_direction(r, port):
     if r['direction'] == 'ingress':
         portdir = 'outport'
@@ -66,6 +74,14 @@ def acl_direction(r, port):
     return '%s == "%s"' % (portdir, port['id'])
 
 
+def acl_port_group_direction(r, port_group):
+    if r['direction'] == 'ingress':
+        portdir = 'outport'
+    else:
+        portdir = 'inport'
+    return '%s == @%s' % (portdir, port_group)
+
+
 def acl_ethertype(r):
     match = ''
     ip_version = None
@@ -158,6 +174,23 @@ def drop_all_ip_traffic_for_port(port):
     return acl_list
 
 
+def drop_all_ip_traffic_for_port_group(
+        port_group=ovn_const.OVN_DROP_PORT_GROUP_NAME):
+    acl_list = []
+    for direction, p in (('from-lport', 'inport'),
+                         ('to-lport', 'outport')):
+        acl = {"port_group": port_group,
+               "priority": ovn_const.ACL_PRIORITY_DROP,
+               "action": ovn_const.ACL_ACTION_DROP,
+               "log": False,
+               "name": [],
+               "severity": [],
+               "direction": direction,
+               "match": '%s == @%s && ip' % (p, port_group)}
+        acl_list.append(acl)
+    return acl_list
+
+
 def add_sg_rule_acl_for_port(port, r, match):
     dir_map = {
         'ingress': 'to-lport',
@@ -174,10 +207,31 @@ def add_sg_rule_acl_for_port(port, r, match):
            "direction": dir_map[r['direction']],
            "match": match,
            "external_ids": {'neutron:lport': port['id'],
+                            ovn_const.OVN_SG_EXT_ID_KEY:
+                                r['security_group_id'],
                             ovn_const.OVN_SG_RULE_EXT_ID_KEY: r['id']}}
     return acl
 
 
+def add_sg_rule_acl_for_port_group(port_group, r, match):
+    dir_map = {
+        'ingress': 'to-lport',
+        'egress': 'from-lport',
+    }
+    acl = {"port_group": port_group,
+           "priority": ovn_const.ACL_PRIORITY_ALLOW,
+           "action": ovn_const.ACL_ACTION_ALLOW_RELATED,
+           "log": False,
+           "name": [],
+           "severity": [],
+           "direction": dir_map[r['direction']],
+           "match": match,
+           "external_ids": {
+               ovn_const.OVN_SG_EXT_ID_KEY: r['security_group_id'],
+               ovn_const.OVN_SG_RULE_EXT_ID_KEY: r['id']}}
+    return acl
+
+
 def add_acl_dhcp(port, subnet, ovn_dhcp=True):
     # Allow DHCP requests for OVN native DHCP service, while responses are
     # allowed in ovn-northd.
@@ -257,11 +311,7 @@ def acl_remote_group_id(r, ip_version):
     return ' && %s.%s == $%s' % (ip_version, src_or_dst, addrset_name)
 
 
-def _add_sg_rule_acl_for_port(port, r):
-    # Update the match based on which direction this rule is for (ingress
-    # or egress).
-    match = acl_direction(r, port)
-
+def _sg_rule_acl_match(r, match):
     # Update the match for IPv4 vs IPv6.
     ip_match, ip_version, icmp = acl_ethertype(r)
     match += ip_match
@@ -275,11 +325,23 @@ def _add_sg_rule_acl_for_port(port, r):
     # Update the match for the protocol (tcp, udp, icmp) and port/type
     # range if specified.
     match += acl_protocol_and_ports(r, icmp)
+    return match
+
+
+def _add_sg_rule_acl_for_port(port, r):
+    # Update the match based on which direction this rule is for (ingress
+    # or egress).
+    match = _sg_rule_acl_match(r, acl_direction(r, port))
 
     # Finally, create the ACL entry for the direction specified.
     return add_sg_rule_acl_for_port(port, r, match)
 
 
+def _add_sg_rule_acl_for_port_group(port_group, r):
+    match = _sg_rule_acl_match(r, acl_port_group_direction(r, port_group))
+    return add_sg_rule_acl_for_port_group(port_group, r, match)
+
+
 def _acl_columns_name_severity_supported(nb_idl):
     columns = list(nb_idl._tables['ACL'].columns)
     return ('name' in columns) and ('severity' in columns)
@@ -296,6 +358,26 @@ def update_acls_for_security_group(plugin,
     if not is_sg_enabled():
         return
 
+    # Check if ACL log name and severity supported or not
+    keep_name_severity = _acl_columns_name_severity_supported(ovn)
+
+    # With Port_Groups the rule is a single ACL on the security group's
+    # port group, no matter how many ports are in the group.
+    if is_port_groups_enabled(ovn):
+        acl = _add_sg_rule_acl_for_port_group(
+            utils.ovn_port_group_name(security_group_id),
+            security_group_rule)
+        if is_add_acl:
+            if not keep_name_severity:
+                acl.pop('name')
+                acl.pop('severity')
+            ovn.add_port_group_acl(**acl).execute(check_error=True)
+        else:
+            ovn.delete_port_group_acl(
+                acl['port_group'], acl['direction'], acl['priority'],
+                acl['match']).execute(check_error=True)
+        return
+
     # Get the security group ports.
     sg_ports_cache = sg_ports_cache or {}
     sg_ports = _get_sg_ports_from_cache(plugin,
@@ -314,8 +396,6 @@ def update_acls_for_security_group(plugin,
     acl_new_values_dict = {}
     update_port_list = []
 
-    # Check if ACL log name and severity supported or not
-    keep_name_severity = _acl_columns_name_severity_supported(ovn)
     # NOTE(lizk): We can directly locate the affected acl records,
     # so no need to compare new acl values with existing acl objects.
     for port in port_list:
@@ -357,8 +437,14 @@ def add_acls(plugin, admin_context, port, sg_cache, subnet_cache, ovn):
     if not sec_groups:
         return acl_list
 
+    # With Port_Groups the default drop and the security group rules are
+    # ACLs of the port groups the port is a member of, only the DHCP ACLs
+    # below are still specific to the port.
+    port_groups_enabled = is_port_groups_enabled(ovn)
+
     # Drop all IP traffic to and from the logical port by default.
-    acl_list += drop_all_ip_traffic_for_port(port)
+    if not port_groups_enabled:
+        acl_list += drop_all_ip_traffic_for_port(port)
 
     # Add DHCP ACLs.
     port_subnet_ids = set()
@@ -376,7 +462,7 @@ def add_acls(plugin, admin_context, port, sg_cache, subnet_cache, ovn):
 
     # We create an ACL entry for each rule on each security group applied
     # to this port.
-    for sg_id in sec_groups:
+    for sg_id in ([] if port_groups_enabled else sec_groups):
         sg = _get_sg_from_cache(plugin,
                                 admin_context,
                                 sg_cache,
@@ -394,6 +480,21 @@ def add_acls(plugin, admin_context, port, sg_cache, subnet_cache, ovn):
     return acl_list
 
 
+def add_acls_for_sg_port_group(ovn, security_group):
+    """Return the ACLs of a security group modelled as a Port_Group."""
+    pg_name = utils.ovn_port_group_name(security_group['id'])
+    acl_list = [_add_sg_rule_acl_for_port_group(pg_name, r)
+                for r in security_group.get('security_group_rules', [])]
+
+    # Remove ACL log name and severity if not supported,
+    if not _acl_columns_name_severity_supported(ovn):
+        for acl in acl_list:
+            acl.pop('name')
+            acl.pop('severity')
+
+    return acl_list
+
+
 def acl_port_ips(port):
     # Skip ACLs if security groups aren't enabled
     if not is_sg_enabled():
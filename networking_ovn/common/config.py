@@ -82,6 +82,50 @@ ovn_opts = [
                       'connection keepalive feature. If non-zero the value '
                       'will be forced to at least 1000 milliseconds. Probing '
                       'is disabled by default.')),
+    cfg.IntOpt('ovsdb_txn_coalesce_window',
+               min=0,
+               default=0,
+               help=_('Time in milliseconds a Northbound OVSDB transaction '
+                      'waits for the transactions of concurrent requests, '
+                      'so that they are all committed as a single OVSDB '
+                      'transaction. A batch that fails is split and retried '
+                      'so a failing transaction does not affect the others. '
+                      'If this is zero, transactions are not coalesced. '
+                      'Coalescing is disabled by default.')),
+    cfg.IntOpt('ovsdb_txn_coalesce_max_batch',
+               min=1,
+               default=50,
+               help=_('The maximum number of Northbound OVSDB transactions '
+                      'coalesced into a single one. A batch is committed '
+                      'as soon as it is full, without waiting for the end '
+                      'of ovsdb_txn_coalesce_window.')),
+    cfg.IntOpt('ovsdb_event_pool_size',
+               min=1,
+               default=1,
+               help=_('The number of threads running the handlers of the '
+                      'OVSDB row events, like the port status updates done '
+                      'when OVN reports a port up or down. The events of a '
+                      'given row are always handled in order, by the same '
+                      'thread. If this is one, the events are handled one '
+                      'at a time, in the order they were received.')),
+    cfg.IntOpt('ovsdb_event_debounce_window',
+               min=0,
+               default=0,
+               help=_('Time in milliseconds the port status and router '
+                      'gateway binding events of a port or router must '
+                      'settle before they are handled. The events received '
+                      'for it within this window are collapsed into the '
+                      'last one, so a flapping port is only set up or down '
+                      'once. If this is zero, the events are handled right '
+                      'away.')),
+    cfg.IntOpt('maintenance_repair_pool_size',
+               min=1,
+               default=1,
+               help=_('The number of threads the maintenance task uses to '
+                      'fix the inconsistent resources of a given type. The '
+                      'resource types are always fixed one after the '
+                      'other, in dependency order. If this is one, the '
+                      'resources are fixed one at a time.')),
     cfg.StrOpt('neutron_sync_mode',
                default='log',
                choices=('off', 'log', 'repair'),
@@ -97,6 +141,27 @@ ovn_opts = [
                       ' create resources found in Neutron but not in OVN.'
                       ' Also remove resources from OVN'
                       ' that are no longer in Neutron.')),
+    cfg.IntOpt('neutron_sync_txn_max_ops',
+               min=0,
+               default=1000,
+               help=_('The maximum number of operations the '
+                      'synchronization of OVN_Northbound OVSDB with Neutron '
+                      'DB puts in a single transaction when it repairs '
+                      'OVN. The repairs of a phase are committed in '
+                      'several transactions of at most this size, so a '
+                      'badly diverged OVN_Northbound OVSDB is not fixed by '
+                      'a single huge transaction. If this is zero, each '
+                      'phase is committed in a single transaction.')),
+    cfg.IntOpt('neutron_sync_pool_size',
+               min=1,
+               default=1,
+               help=_('The number of threads the synchronization of '
+                      'OVN_Northbound OVSDB with Neutron DB uses to run '
+                      'its independent phases concurrently, like the '
+                      'address sets and the networks. A phase always '
+                      'starts after the phases it depends on, e.g. the '
+                      'ACLs after the ports. If this is one, the phases '
+                      'run one after the other.')),
     cfg.BoolOpt('ovn_l3_mode',
                 default=True,
                 deprecated_for_removal=True,
@@ -147,7 +212,17 @@ ovn_opts = [
                help=_("The log level used for OVSDB")),
     cfg.BoolOpt('ovn_metadata_enabled',
                 default=False,
-                help=_('Whether to use metadata service.'))
+                help=_('Whether to use metadata service.')),
+    cfg.BoolOpt('enable_sg_port_groups',
+                default=False,
+                help=_('Model each security group as an OVN Port_Group '
+                       'and write its ACLs once per rule against the '
+                       'group instead of once per rule and port. Port '
+                       'create, update and delete then only change the '
+                       'group membership. This requires an OVN Northbound '
+                       'schema with the Port_Group table; it is ignored '
+                       'otherwise. Existing per-port ACLs are migrated by '
+                       'the maintenance worker.')),
 ]
 
 cfg.CONF.register_opts(ovn_opts, group='ovn')
@@ -199,10 +274,38 @@ def get_ovn_ovsdb_probe_interval():
     return cfg.CONF.ovn.ovsdb_probe_interval
 
 
+def get_ovn_ovsdb_txn_coalesce_window():
+    return cfg.CONF.ovn.ovsdb_txn_coalesce_window
+
+
+def get_ovn_ovsdb_txn_coalesce_max_batch():
+    return cfg.CONF.ovn.ovsdb_txn_coalesce_max_batch
+
+
+def get_ovn_ovsdb_event_pool_size():
+    return cfg.CONF.ovn.ovsdb_event_pool_size
+
+
+def get_ovn_ovsdb_event_debounce_window():
+    return cfg.CONF.ovn.ovsdb_event_debounce_window
+
+
+def get_ovn_maintenance_repair_pool_size():
+    return cfg.CONF.ovn.maintenance_repair_pool_size
+
+
 def get_ovn_neutron_sync_mode():
     return cfg.CONF.ovn.neutron_sync_mode
 
 
+def get_ovn_neutron_sync_txn_max_ops():
+    return cfg.CONF.ovn.neutron_sync_txn_max_ops
+
+
+def get_ovn_neutron_sync_pool_size():
+    return cfg.CONF.ovn.neutron_sync_pool_size
+
+
 def is_ovn_l3():
     return cfg.CONF.ovn.ovn_l3_mode
 
@@ -232,6 +335,10 @@ def is_ovn_metadata_enabled():
     return cfg.CONF.ovn.ovn_metadata_enabled
 
 
+def is_sg_port_groups_enabled():
+    return cfg.CONF.ovn.enable_sg_port_groups
+
+
 def setup_logging():
     """Sets up the logging options for a log with supplied name."""
     product_name = "networking-ovn"
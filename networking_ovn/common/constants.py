@@ -63,6 +63,11 @@ ACL_ACTION_DROP = 'drop'
 ACL_ACTION_ALLOW_RELATED = 'allow-related'
 ACL_ACTION_ALLOW = 'allow'
 
+# When security groups are modelled as OVN Port Groups, every port with
+# security groups enabled is also a member of this group, which carries the
+# two ACLs dropping all IP traffic by default.
+OVN_DROP_PORT_GROUP_NAME = 'neutron_pg_drop'
+
 # When a OVN L3 gateway is created, it needs to be bound to a chassis. In
 # case a chassis is not found OVN_GATEWAY_INVALID_CHASSIS will be set in
 # the options column of the Logical Router. This value is used to detect
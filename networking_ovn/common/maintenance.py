@@ -13,10 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import inspect
+import itertools
 import threading
+import time
 
+import futurist
 from futurist import periodics
+from futurist import waiters
 from neutron.common import config as n_conf
 from neutron_lib import context as n_context
 from neutron_lib import exceptions as n_exc
@@ -24,13 +29,23 @@ from neutron_lib import worker
 from oslo_log import log
 from oslo_utils import timeutils
 
+from networking_ovn.common import acl as ovn_acl
+from networking_ovn.common import config as ovn_conf
 from networking_ovn.common import constants as ovn_const
+from networking_ovn.common import utils
 from networking_ovn.db import maintenance as db_maint
 from networking_ovn.db import revision as db_rev
+from networking_ovn import ovn_db_sync
 
 LOG = log.getLogger(__name__)
 
 DB_CONSISTENCY_CHECK_INTERVAL = 300  # 5 minutes
+PORT_GROUPS_MIGRATION_INTERVAL = 600  # 10 minutes
+# Number of inconsistent resources fetched from the database at once
+INCONSISTENCIES_PAGE_SIZE = 500
+# Maximum number of inconsistent resources fixed per periodic run, the
+# remaining ones are fixed in the next runs
+INCONSISTENCIES_FIX_BUDGET = 2000
 
 
 class MaintenanceWorker(worker.BaseWorker):
@@ -82,6 +97,68 @@ class MaintenanceThread(object):
         self._worker = self._thread = None
 
 
+class RepairExecutor(object):
+    """Fix the inconsistent resources of a type on a pool of threads.
+
+    The resources of a given type don't depend on each other, so they can
+    be fixed concurrently. The caller is expected to wait for a type to be
+    completely fixed before moving on to the next one.
+    """
+
+    FIXED = 'fixed'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+
+    def __init__(self, pool_size):
+        self._executor = None
+        if pool_size > 1:
+            self._executor = futurist.ThreadPoolExecutor(
+                max_workers=pool_size)
+        self.stats = collections.OrderedDict()
+
+    def reset(self):
+        self.stats.clear()
+
+    def run(self, resource_type, fix, rows):
+        """Run fix(row) for each row and wait for all of them.
+
+        :param fix: The function fixing a resource. It returns False if
+                    the resource was skipped.
+        """
+        stats = self.stats.setdefault(resource_type, {
+            self.FIXED: 0, self.FAILED: 0, self.SKIPPED: 0, 'time': 0.0})
+        start = time.time()
+        if self._executor is None:
+            results = [self._fix(fix, row) for row in rows]
+        else:
+            futures = [self._executor.submit(self._fix, fix, row)
+                       for row in rows]
+            waiters.wait_for_all(futures)
+            results = [future.result() for future in futures]
+        for result in results:
+            stats[result] += 1
+        stats['time'] += time.time() - start
+
+    def _fix(self, fix, row):
+        try:
+            if fix(row) is False:
+                return self.SKIPPED
+            return self.FIXED
+        except Exception:
+            LOG.exception('Failed to fix resource %(res_uuid)s '
+                          '(type: %(res_type)s)',
+                          {'res_uuid': row.resource_uuid,
+                           'res_type': row.resource_type})
+            return self.FAILED
+
+    def log_summary(self):
+        for resource_type, stats in self.stats.items():
+            LOG.info('Maintenance thread processed the %(res_type)s: '
+                     '%(fixed)d fixed, %(failed)d failed and %(skipped)d '
+                     'skipped (took %(time).2f seconds)',
+                     dict(stats, res_type=resource_type))
+
+
 class DBInconsistenciesPeriodics(object):
 
     def __init__(self, ovn_client):
@@ -93,10 +170,16 @@ class DBInconsistenciesPeriodics(object):
         self._idl = self._nb_idl.idl
         self._idl.set_lock('ovn_db_inconsistencies_periodics')
         self._sync_timer = timeutils.StopWatch()
+        # Where the scan of the inconsistent resources of each type stopped
+        # when the budget of the previous run was exhausted
+        self._inconsistencies_markers = {}
+        self._repair_executor = RepairExecutor(
+            ovn_conf.get_ovn_maintenance_repair_pool_size())
 
         self._resources_func_map = {
             ovn_const.TYPE_NETWORKS: {
                 'neutron_get': self._ovn_client._plugin.get_network,
+                'neutron_list': self._ovn_client._plugin.get_networks,
                 'ovn_get': self._nb_idl.get_lswitch,
                 'ovn_create': self._ovn_client.create_network,
                 'ovn_update': self._ovn_client.update_network,
@@ -104,6 +187,7 @@ class DBInconsistenciesPeriodics(object):
             },
             ovn_const.TYPE_PORTS: {
                 'neutron_get': self._ovn_client._plugin.get_port,
+                'neutron_list': self._ovn_client._plugin.get_ports,
                 'ovn_get': self._nb_idl.get_lswitch_port,
                 'ovn_create': self._ovn_client.create_port,
                 'ovn_update': self._ovn_client.update_port,
@@ -111,6 +195,7 @@ class DBInconsistenciesPeriodics(object):
             },
             ovn_const.TYPE_FLOATINGIPS: {
                 'neutron_get': self._ovn_client._l3_plugin.get_floatingip,
+                'neutron_list': self._ovn_client._l3_plugin.get_floatingips,
                 'ovn_get': self._nb_idl.get_floatingip,
                 'ovn_create': self._ovn_client.create_floatingip,
                 'ovn_update': self._ovn_client.update_floatingip,
@@ -118,6 +203,7 @@ class DBInconsistenciesPeriodics(object):
             },
             ovn_const.TYPE_ROUTERS: {
                 'neutron_get': self._ovn_client._l3_plugin.get_router,
+                'neutron_list': self._ovn_client._l3_plugin.get_routers,
                 'ovn_get': self._nb_idl.get_lrouter,
                 'ovn_create': self._ovn_client.create_router,
                 'ovn_update': self._ovn_client.update_router,
@@ -125,13 +211,16 @@ class DBInconsistenciesPeriodics(object):
             },
             ovn_const.TYPE_SECURITY_GROUPS: {
                 'neutron_get': self._ovn_client._plugin.get_security_group,
-                'ovn_get': self._nb_idl.get_address_set,
+                'neutron_list': self._ovn_client._plugin.get_security_groups,
+                'ovn_get': self._get_security_group,
                 'ovn_create': self._ovn_client.create_security_group,
                 'ovn_delete': self._ovn_client.delete_security_group,
             },
             ovn_const.TYPE_SECURITY_GROUP_RULES: {
                 'neutron_get':
                     self._ovn_client._plugin.get_security_group_rule,
+                'neutron_list':
+                    self._ovn_client._plugin.get_security_group_rules,
                 'ovn_get': self._nb_idl.get_acl_by_id,
                 'ovn_create': self._ovn_client.create_security_group_rule,
                 'ovn_delete': self._ovn_client.delete_security_group_rule,
@@ -139,6 +228,8 @@ class DBInconsistenciesPeriodics(object):
             ovn_const.TYPE_ROUTER_PORTS: {
                 'neutron_get':
                     self._ovn_client._plugin.get_port,
+                'neutron_list':
+                    self._ovn_client._plugin.get_ports,
                 'ovn_get': self._nb_idl.get_lrouter_port,
                 'ovn_create': self._create_lrouter_port,
                 'ovn_update': self._ovn_client.update_router_port,
@@ -150,18 +241,26 @@ class DBInconsistenciesPeriodics(object):
     def has_lock(self):
         return not self._idl.is_lock_contended
 
-    def _fix_create_update(self, row):
+    def _get_security_group(self, sg_id):
+        # With Port_Groups a security group is only complete in OVN if its
+        # port group exists as well as its address sets.
+        if (ovn_acl.is_port_groups_enabled(self._nb_idl) and
+                not self._nb_idl.get_port_group(
+                    utils.ovn_port_group_name(sg_id))):
+            return None
+        return self._nb_idl.get_address_set(sg_id)
+
+    def _fix_create_update(self, row, n_obj=None):
         res_map = self._resources_func_map[row.resource_type]
-        admin_context = n_context.get_admin_context()
-        try:
-            # Get the latest version of the resource in Neutron DB
-            n_obj = res_map['neutron_get'](admin_context, row.resource_uuid)
-        except n_exc.NotFound:
-            LOG.warning('Skip fixing resource %(res_uuid)s (type: '
-                        '%(res_type)s). Resource does not exist in Neutron '
-                        'database anymore', {'res_uuid': row.resource_uuid,
-                                             'res_type': row.resource_type})
-            return
+        if n_obj is None:
+            admin_context = n_context.get_admin_context()
+            try:
+                # Get the latest version of the resource in Neutron DB
+                n_obj = res_map['neutron_get'](admin_context,
+                                               row.resource_uuid)
+            except n_exc.NotFound:
+                self._log_not_found(row)
+                return False
 
         ovn_obj = res_map['ovn_get'](row.resource_uuid)
 
@@ -199,19 +298,163 @@ class DBInconsistenciesPeriodics(object):
         else:
             res_map['ovn_delete'](row.resource_uuid)
 
-    def _fix_create_update_subnet(self, row):
+    def _fix_delete_row(self, row):
+        if row.resource_type == ovn_const.TYPE_SUBNETS:
+            self._ovn_client.delete_subnet(row.resource_uuid)
+        else:
+            self._fix_delete(row)
+
+    def _fix_create_update_subnet(self, row, sn_db_obj=None,
+                                  n_db_obj=None):
         # Get the lasted version of the port in Neutron DB
         admin_context = n_context.get_admin_context()
-        sn_db_obj = self._ovn_client._plugin.get_subnet(
-            admin_context, row.resource_uuid)
-        n_db_obj = self._ovn_client._plugin.get_network(
-            admin_context, sn_db_obj['network_id'])
+        if sn_db_obj is None:
+            sn_db_obj = self._ovn_client._plugin.get_subnet(
+                admin_context, row.resource_uuid)
+        if n_db_obj is None:
+            n_db_obj = self._ovn_client._plugin.get_network(
+                admin_context, sn_db_obj['network_id'])
 
         if row.revision_number == ovn_const.INITIAL_REV_NUM:
             self._ovn_client.create_subnet(sn_db_obj, n_db_obj)
         else:
             self._ovn_client.update_subnet(sn_db_obj, n_db_obj)
 
+    @staticmethod
+    def _log_not_found(row):
+        LOG.warning('Skip fixing resource %(res_uuid)s (type: '
+                    '%(res_type)s). Resource does not exist in Neutron '
+                    'database anymore', {'res_uuid': row.resource_uuid,
+                                         'res_type': row.resource_type})
+
+    def _get_inconsistent_resources(self, resource_type):
+        """Yield the pages of inconsistent resources of a type.
+
+        The scan starts where the previous run stopped and wraps around,
+        so resources that keep failing to be fixed can't starve the others.
+        """
+        start = self._inconsistencies_markers.get(resource_type)
+        passes = [(start, None)]
+        if start is not None:
+            passes.append((None, start))
+        for marker, stop in passes:
+            while True:
+                page = db_maint.get_inconsistent_resources(
+                    resource_type=resource_type, marker=marker,
+                    limit=INCONSISTENCIES_PAGE_SIZE)
+                if stop is not None and page and (
+                        page[-1].resource_uuid > stop):
+                    page = [row for row in page if row.resource_uuid <= stop]
+                    if page:
+                        yield page
+                    return
+                if page:
+                    yield page
+                if len(page) < INCONSISTENCIES_PAGE_SIZE:
+                    break
+                marker = page[-1].resource_uuid
+
+    def _get_neutron_objects(self, resource_type, rows):
+        """Fetch the Neutron objects of a page of inconsistent resources.
+
+        The objects are fetched with a single filtered list call instead
+        of one GET per resource. Subnets also come with their networks.
+
+        :returns: A dict of the objects by ID, the objects missing from
+                  it don't exist in Neutron anymore. For subnets, a tuple
+                  of the subnets and networks dicts. None if the objects
+                  couldn't be fetched, in which case each resource is
+                  fetched on its own.
+        """
+        admin_context = n_context.get_admin_context()
+        filters = {'id': [row.resource_uuid for row in rows]}
+        try:
+            if resource_type == ovn_const.TYPE_SUBNETS:
+                plugin = self._ovn_client._plugin
+                subnets = {sn['id']: sn for sn in plugin.get_subnets(
+                    admin_context, filters=filters)}
+                net_ids = list(set(sn['network_id']
+                                   for sn in subnets.values()))
+                networks = {net['id']: net for net in plugin.get_networks(
+                    admin_context, filters={'id': net_ids})}
+                return subnets, networks
+            res_map = self._resources_func_map[resource_type]
+            return {obj['id']: obj for obj in res_map['neutron_list'](
+                admin_context, filters=filters)}
+        except Exception:
+            LOG.exception('Failed to fetch %(count)d resources of type '
+                          '%(res_type)s from Neutron, fetching them one '
+                          'by one', {'count': len(rows),
+                                     'res_type': resource_type})
+
+    def _fix_create_update_row(self, row, n_objs):
+        """Fix a create/update inconsistency.
+
+        :returns: False if the resource was skipped.
+        """
+        # NOTE(lucasagomes): The way to fix subnets is bit different than
+        # other resources. A subnet in OVN language is just a DHCP rule
+        # but, this rule only exist if the subnet in Neutron has the
+        # "enable_dhcp" attribute set to True. So, it's possible to have a
+        # consistent subnet resource even when it does not exist in the OVN
+        # database.
+        if row.resource_type == ovn_const.TYPE_SUBNETS:
+            if n_objs is None:
+                return self._fix_create_update_subnet(row)
+            subnets, networks = n_objs
+            sn_db_obj = subnets.get(row.resource_uuid)
+            if sn_db_obj is None:
+                self._log_not_found(row)
+                return False
+            return self._fix_create_update_subnet(
+                row, sn_db_obj, networks.get(sn_db_obj['network_id']))
+        elif n_objs is None:
+            return self._fix_create_update(row)
+        elif row.resource_uuid not in n_objs:
+            self._log_not_found(row)
+            return False
+        return self._fix_create_update(row, n_objs[row.resource_uuid])
+
+    def _fix_inconsistencies(self, budget):
+        """Fix the create/update inconsistencies, following the type order.
+
+        :returns: The number of resources processed.
+        """
+        processed = 0
+        for resource_type in sorted(
+                ovn_const.MAINTENANCE_CREATE_UPDATE_TYPE_ORDER,
+                key=ovn_const.MAINTENANCE_CREATE_UPDATE_TYPE_ORDER.get):
+            for page in self._get_inconsistent_resources(resource_type):
+                if processed >= budget:
+                    # Leave the following types for the next run as they
+                    # may depend on the resources not fixed yet
+                    self._budget_reached(budget)
+                    return processed
+                if not processed:
+                    LOG.warning('Inconsistencies found in the database!')
+                rows = page[:budget - processed]
+                n_objs = self._get_neutron_objects(resource_type, rows)
+                self._repair_executor.run(
+                    resource_type,
+                    lambda row: self._fix_create_update_row(row, n_objs),
+                    rows)
+                processed += len(rows)
+                self._inconsistencies_markers[resource_type] = (
+                    rows[-1].resource_uuid)
+                LOG.info('Maintenance thread processed %d inconsistent '
+                         'resources so far', processed)
+                if len(rows) < len(page):
+                    self._budget_reached(budget)
+                    return processed
+            self._inconsistencies_markers.pop(resource_type, None)
+        return processed
+
+    @staticmethod
+    def _budget_reached(budget):
+        LOG.info('Maintenance thread reached its budget of %d fixes, the '
+                 'remaining inconsistencies will be fixed in the next run',
+                 budget)
+
     @periodics.periodic(spacing=DB_CONSISTENCY_CHECK_INTERVAL,
                         run_immediately=True)
     def check_for_inconsistencies(self):
@@ -220,48 +463,58 @@ class DBInconsistenciesPeriodics(object):
         if not self.has_lock:
             return
 
-        create_update_inconsistencies = db_maint.get_inconsistent_resources()
-        delete_inconsistencies = db_maint.get_deleted_resources()
-        if not any([create_update_inconsistencies, delete_inconsistencies]):
-            return
-        LOG.warning('Inconsistencies found in the database!')
         self._sync_timer.restart()
+        self._repair_executor.reset()
 
         # Fix the create/update resources inconsistencies
-        for row in create_update_inconsistencies:
-            try:
-                # NOTE(lucasagomes): The way to fix subnets is bit
-                # different than other resources. A subnet in OVN language
-                # is just a DHCP rule but, this rule only exist if the
-                # subnet in Neutron has the "enable_dhcp" attribute set
-                # to True. So, it's possible to have a consistent subnet
-                # resource even when it does not exist in the OVN database.
-                if row.resource_type == ovn_const.TYPE_SUBNETS:
-                    self._fix_create_update_subnet(row)
-                else:
-                    self._fix_create_update(row)
-            except Exception:
-                LOG.exception('Failed to fix resource %(res_uuid)s '
-                              '(type: %(res_type)s)',
-                              {'res_uuid': row.resource_uuid,
-                               'res_type': row.resource_type})
+        processed = self._fix_inconsistencies(INCONSISTENCIES_FIX_BUDGET)
 
         # Fix the deleted resources inconsistencies
-        for row in delete_inconsistencies:
-            try:
-                if row.resource_type == ovn_const.TYPE_SUBNETS:
-                    self._ovn_client.delete_subnet(row.resource_uuid)
-                else:
-                    self._fix_delete(row)
-            except Exception:
-                LOG.exception('Failed to fix deleted resource %(res_uuid)s '
-                              '(type: %(res_type)s)',
-                              {'res_uuid': row.resource_uuid,
-                               'res_type': row.resource_type})
+        delete_inconsistencies = db_maint.get_deleted_resources()
+        if not processed and not delete_inconsistencies:
+            self._sync_timer.stop()
+            return
+        if delete_inconsistencies and not processed:
+            LOG.warning('Inconsistencies found in the database!')
+        # The rows are sorted in the delete type order, fix them one type
+        # after the other
+        for resource_type, rows in itertools.groupby(
+                delete_inconsistencies, lambda row: row.resource_type):
+            self._repair_executor.run(
+                'deleted %s' % resource_type, self._fix_delete_row,
+                list(rows))
 
         self._sync_timer.stop()
-        LOG.info('Maintenance thread synchronization finished '
-                 '(took %.2f seconds)', self._sync_timer.elapsed())
+        self._repair_executor.log_summary()
+        LOG.info('Maintenance thread synchronization finished, '
+                 '%(processed)d inconsistent and %(deleted)d deleted '
+                 'resources processed (took %(took).2f seconds)',
+                 {'processed': processed,
+                  'deleted': len(delete_inconsistencies),
+                  'took': self._sync_timer.elapsed()})
+
+    @periodics.periodic(spacing=PORT_GROUPS_MIGRATION_INTERVAL,
+                        run_immediately=True)
+    def migrate_to_port_groups(self):
+        """Move the per-port security group ACLs to Port_Groups.
+
+        The migration only has to happen once, after the Port_Group mode
+        is enabled on a deployment that already has per-port ACLs.
+        """
+        if not ovn_acl.is_port_groups_enabled(self._nb_idl):
+            raise periodics.NeverAgain()
+
+        # Only the worker holding a valid lock within OVSDB will run
+        # the migration
+        if not self.has_lock:
+            return
+
+        admin_context = n_context.get_admin_context()
+        nb_sync = ovn_db_sync.OvnNbSynchronizer(
+            self._ovn_client._plugin, self._nb_idl,
+            self._ovn_client._sb_idl, ovn_db_sync.SYNC_MODE_REPAIR, None)
+        nb_sync.migrate_to_port_groups(admin_context)
+        raise periodics.NeverAgain()
 
     def _create_lrouter_port(self, port):
         admin_context = n_context.get_admin_context()
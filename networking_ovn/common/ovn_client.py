@@ -199,8 +199,10 @@ class OVNClient(object):
             external_ids=subnet_dhcp_options['external_ids'])
         return {'cmd': add_dhcp_opts_cmd}
 
-    def _get_port_options(self, port, qos_options=None):
+    def _get_port_options(self, port, qos_options=None, subnet_cache=None):
         #获取port对应的选项信息
+        if subnet_cache is None:
+            subnet_cache = {}
         binding_prof = utils.validate_and_get_data_from_binding_profile(port)
         if qos_options is None:
             qos_options = self._qos_driver.get_qos_options(port)
@@ -224,8 +226,11 @@ class OVNClient(object):
             address = port['mac_address']
             for ip in port.get('fixed_ips', []):
                 address += ' ' + ip['ip_address']
-                subnet = self._plugin.get_subnet(n_context.get_admin_context(),
-                                                 ip['subnet_id'])
+                subnet = subnet_cache.get(ip['subnet_id'])
+                if subnet is None:
+                    subnet = self._plugin.get_subnet(
+                        n_context.get_admin_context(), ip['subnet_id'])
+                    subnet_cache[ip['subnet_id']] = subnet
                 cidrs += ' {}/{}'.format(ip['ip_address'],
                                          subnet['cidr'].split('/')[1])
             port_security, new_macs = \
@@ -247,10 +252,83 @@ class OVNClient(object):
                            cidrs.strip(), device_owner, sg_ids)
 
     def create_port(self, port):
-        if utils.is_lsp_ignored(port):
+        self.create_ports([port])
+
+    def create_ports(self, ports):
+        """Create the OVN Logical_Switch_Ports of a list of Neutron ports.
+
+        All the ports are created in a single Northbound transaction. The
+        security group and subnet lookups are shared between the ports, the
+        Port_Group and Address_Set additions are merged into one update per
+        row and the revision numbers are bumped in one database transaction.
+
+        ML2 runs create_port_postcommit() for each port of a bulk request,
+        so the mechanism driver creates its ports one at a time. The ports
+        missing from OVN are created in batches by the DB sync.
+        """
+        ports = [port for port in ports if not utils.is_lsp_ignored(port)]
+        if not ports:
             return
 
-        port_info = self._get_port_options(port)
+        admin_context = n_context.get_admin_context()
+        sg_cache = {}
+        subnet_cache = {}
+        port_infos = [self._get_port_options(port, subnet_cache=subnet_cache)
+                      for port in ports]
+
+        # It's possible to have a network created on one controller and then a
+        # port created on a different controller quickly enough that the second
+        # controller does not yet see that network in its local cache of the
+        # OVN northbound database.  Check if the logical switch is present
+        # or not in the idl's local copy of the database before creating
+        # the lswitch port.
+        lswitch_names = []
+        for port in ports:
+            lswitch_name = utils.ovn_name(port['network_id'])
+            if lswitch_name not in lswitch_names:
+                lswitch_names.append(lswitch_name)
+                self._nb_idl.check_for_row_by_value_and_retry(
+                    'Logical_Switch', 'name', lswitch_name)
+
+        port_groups_enabled = ovn_acl.is_port_groups_enabled(self._nb_idl)
+        port_group_ports = collections.OrderedDict()
+        address_set_addrs = collections.OrderedDict()
+        with self._nb_idl.transaction(check_error=True) as txn:
+            for port, port_info in zip(ports, port_infos):
+                self._add_create_port_cmds(txn, port, port_info,
+                                           admin_context, sg_cache,
+                                           subnet_cache)
+
+                sg_ids = utils.get_lsp_security_groups(port)
+                if sg_ids and port_groups_enabled:
+                    for pg_name in ([ovn_const.OVN_DROP_PORT_GROUP_NAME] +
+                                    [utils.ovn_port_group_name(sg_id)
+                                     for sg_id in sg_ids]):
+                        port_group_ports.setdefault(pg_name, []).append(
+                            port['id'])
+                if port.get('fixed_ips') and sg_ids:
+                    addresses = ovn_acl.acl_port_ips(port)
+                    for sg_id in sg_ids:
+                        for ip_version in addresses:
+                            if addresses[ip_version]:
+                                address_set_addrs.setdefault(
+                                    utils.ovn_addrset_name(sg_id, ip_version),
+                                    []).extend(addresses[ip_version])
+
+            self._add_ports_to_port_groups(txn, port_group_ports)
+            # NOTE(rtheis): Fail port creation if the address set doesn't
+            # exist. This prevents ports from being created on any security
+            # groups out-of-sync between neutron and OVN.
+            for name, addrs in address_set_addrs.items():
+                #更新address-pair
+                txn.add(self._nb_idl.update_address_set(
+                    name=name, addrs_add=addrs, addrs_remove=None,
+                    if_exists=False))
+
+        db_rev.bump_revisions(ports, ovn_const.TYPE_PORTS)
+
+    def _add_create_port_cmds(self, txn, port, port_info, admin_context,
+                              sg_cache, subnet_cache):
         external_ids = {ovn_const.OVN_PORT_NAME_EXT_ID_KEY: port['name'],#接口名称
                         ovn_const.OVN_DEVID_EXT_ID_KEY: port['device_id'],#接口属于那个设备
                         ovn_const.OVN_PROJID_EXT_ID_KEY: port['project_id'],#接口属于那个project
@@ -265,78 +343,99 @@ class OVNClient(object):
                             utils.get_revision_number(
                                 port, ovn_const.TYPE_PORTS))}
         lswitch_name = utils.ovn_name(port['network_id'])
-        admin_context = n_context.get_admin_context()
-        sg_cache = {}
-        subnet_cache = {}
-
-        # It's possible to have a network created on one controller and then a
-        # port created on a different controller quickly enough that the second
-        # controller does not yet see that network in its local cache of the
-        # OVN northbound database.  Check if the logical switch is present
-        # or not in the idl's local copy of the database before creating
-        # the lswitch port.
-        self._nb_idl.check_for_row_by_value_and_retry(
-            'Logical_Switch', 'name', lswitch_name)
 
-        with self._nb_idl.transaction(check_error=True) as txn:
-            if not port_info.dhcpv4_options:
-                dhcpv4_options = []
-            elif 'cmd' in port_info.dhcpv4_options:
-                dhcpv4_options = txn.add(port_info.dhcpv4_options['cmd'])
-            else:
-                dhcpv4_options = [port_info.dhcpv4_options['uuid']]
-            if not port_info.dhcpv6_options:
-                dhcpv6_options = []
-            elif 'cmd' in port_info.dhcpv6_options:
-                dhcpv6_options = txn.add(port_info.dhcpv6_options['cmd'])
+        if not port_info.dhcpv4_options:
+            dhcpv4_options = []
+        elif 'cmd' in port_info.dhcpv4_options:
+            dhcpv4_options = txn.add(port_info.dhcpv4_options['cmd'])
+        else:
+            dhcpv4_options = [port_info.dhcpv4_options['uuid']]
+        if not port_info.dhcpv6_options:
+            dhcpv6_options = []
+        elif 'cmd' in port_info.dhcpv6_options:
+            dhcpv6_options = txn.add(port_info.dhcpv6_options['cmd'])
+        else:
+            dhcpv6_options = [port_info.dhcpv6_options['uuid']]
+        # The lport_name *must* be neutron port['id'].  It must match the
+        # iface-id set in the Interfaces table of the Open_vSwitch
+        # database which nova sets to be the port ID.
+        # 创建交换机port
+        txn.add(self._nb_idl.create_lswitch_port(
+                lport_name=port['id'],#接口名称
+                lswitch_name=lswitch_name,#交换机名称
+                addresses=port_info.addresses,
+                external_ids=external_ids,
+                parent_name=port_info.parent_name,
+                tag=port_info.tag,
+                enabled=port.get('admin_state_up'),
+                options=port_info.options,
+                type=port_info.type,
+                port_security=port_info.port_security,
+                dhcpv4_options=dhcpv4_options,
+                dhcpv6_options=dhcpv6_options))
+
+        #空的acl
+        acls_new = ovn_acl.add_acls(self._plugin, admin_context,
+                                    port, sg_cache, subnet_cache,
+                                    self._nb_idl)
+        for acl in acls_new:
+            txn.add(self._nb_idl.add_acl(**acl))
+
+        if self.is_dns_required_for_port(port):
+            self.add_txns_to_sync_port_dns_records(txn, port)
+
+    def _add_ports_to_port_groups(self, txn, port_group_ports):
+        # The default drop Port_Group must exist, otherwise the ports would
+        # be left without any ACL at all. A missing security group
+        # Port_Group only leaves the ports with the default drop until the
+        # maintenance task or the sync creates it.
+        for pg_name, port_ids in port_group_ports.items():
+            if pg_name == ovn_const.OVN_DROP_PORT_GROUP_NAME:
+                txn.add(self._nb_idl.update_port_group_ports(
+                    pg_name, ports_add=port_ids, if_exists=False))
             else:
-                dhcpv6_options = [port_info.dhcpv6_options['uuid']]
-            # The lport_name *must* be neutron port['id'].  It must match the
-            # iface-id set in the Interfaces table of the Open_vSwitch
-            # database which nova sets to be the port ID.
-            # 创建交换机port
-            txn.add(self._nb_idl.create_lswitch_port(
-                    lport_name=port['id'],#接口名称
-                    lswitch_name=lswitch_name,#交换机名称
-                    addresses=port_info.addresses,
-                    external_ids=external_ids,
-                    parent_name=port_info.parent_name,
-                    tag=port_info.tag,
-                    enabled=port.get('admin_state_up'),
-                    options=port_info.options,
-                    type=port_info.type,
-                    port_security=port_info.port_security,
-                    dhcpv4_options=dhcpv4_options,
-                    dhcpv6_options=dhcpv6_options))
-
-            #空的acl
-            acls_new = ovn_acl.add_acls(self._plugin, admin_context,
-                                        port, sg_cache, subnet_cache,
-                                        self._nb_idl)
-            for acl in acls_new:
-                txn.add(self._nb_idl.add_acl(**acl))
-
-            sg_ids = utils.get_lsp_security_groups(port)
-            if port.get('fixed_ips') and sg_ids:
-                addresses = ovn_acl.acl_port_ips(port)
-                # NOTE(rtheis): Fail port creation if the address set doesn't
-                # exist. This prevents ports from being created on any security
-                # groups out-of-sync between neutron and OVN.
-                for sg_id in sg_ids:
-                    for ip_version in addresses:
-                        if addresses[ip_version]:
-                            #更新address-pair
-                            txn.add(self._nb_idl.update_address_set(
-                                name=utils.ovn_addrset_name(sg_id,
-                                                            ip_version),
-                                addrs_add=addresses[ip_version],
-                                addrs_remove=None,
-                                if_exists=False))
+                txn.add(self._nb_idl.update_port_group_ports(
+                    pg_name, ports_add=port_ids))
+
+    def _update_port_in_port_groups(self, txn, port_id, attached_sg_ids,
+                                    detached_sg_ids, in_drop_port_group):
+        for sg_id in attached_sg_ids:
+            txn.add(self._nb_idl.update_port_group_ports(
+                utils.ovn_port_group_name(sg_id), ports_add=[port_id]))
+        for sg_id in detached_sg_ids:
+            txn.add(self._nb_idl.update_port_group_ports(
+                utils.ovn_port_group_name(sg_id), ports_remove=[port_id]))
+        if in_drop_port_group:
+            txn.add(self._nb_idl.update_port_group_ports(
+                ovn_const.OVN_DROP_PORT_GROUP_NAME, ports_add=[port_id],
+                if_exists=False))
+        else:
+            txn.add(self._nb_idl.update_port_group_ports(
+                ovn_const.OVN_DROP_PORT_GROUP_NAME, ports_remove=[port_id]))
 
-            if self.is_dns_required_for_port(port):
-                self.add_txns_to_sync_port_dns_records(txn, port)
+    def create_neutron_pg_drop(self):
+        """Create the default drop Port_Group if it doesn't exist yet.
 
-        db_rev.bump_revision(port, ovn_const.TYPE_PORTS)
+        Every worker calls this at start up, so two of them may race to
+        create the group. If the transaction fails but the group is there
+        afterwards, another worker won the race and the error is ignored.
+        """
+        if not ovn_acl.is_port_groups_enabled(self._nb_idl):
+            return
+        pg_name = ovn_const.OVN_DROP_PORT_GROUP_NAME
+        acls = ovn_acl.drop_all_ip_traffic_for_port_group(pg_name)
+        if not ovn_acl._acl_columns_name_severity_supported(self._nb_idl):
+            for acl in acls:
+                acl.pop('name')
+                acl.pop('severity')
+        try:
+            with self._nb_idl.transaction(check_error=True) as txn:
+                txn.add(self._nb_idl.create_port_group(
+                    name=pg_name, may_exist=True, acls=acls))
+        except RuntimeError:
+            with excutils.save_and_reraise_exception() as ctxt:
+                if self._nb_idl.get_port_group(pg_name):
+                    ctxt.reraise = False
 
     # TODO(lucasagomes): Remove this helper method in the Rocky release
     def _get_lsp_backward_compat_sgs(self, ovn_port, port_object=None,
@@ -435,6 +534,14 @@ class OVNClient(object):
             is_allowed_ips_updated = (sorted(old_allowed_address_pairs) !=
                                       sorted(new_allowed_address_pairs))
 
+            # With Port_Groups a security group change is just a change in
+            # the membership of the port groups.
+            if ((detached_sg_ids or attached_sg_ids) and
+                    ovn_acl.is_port_groups_enabled(self._nb_idl)):
+                self._update_port_in_port_groups(
+                    txn, port['id'], attached_sg_ids, detached_sg_ids,
+                    bool(new_sg_ids))
+
             # Refresh ACLs for changed security groups or fixed IPs.
             if detached_sg_ids or attached_sg_ids or is_fixed_ips_updated:
                 # Note that update_acls will compare the port's ACLs to
@@ -513,6 +620,8 @@ class OVNClient(object):
             network_id = port_object['network_id']
 
         with self._nb_idl.transaction(check_error=True) as txn:
+            # NOTE: Port_Group.ports holds weak references, so deleting
+            # the logical switch port also removes it from its port groups.
             txn.add(self._nb_idl.delete_lswitch_port(
                 port_id, network_id))
             txn.add(self._nb_idl.delete_acl(network_id, port_id))
@@ -1456,12 +1565,22 @@ class OVNClient(object):
         db_rev.delete_revision(subnet_id, ovn_const.TYPE_FLOATINGIPS)
 
     def create_security_group(self, security_group):
+        ext_ids = {ovn_const.OVN_SG_EXT_ID_KEY: security_group['id']}
         with self._nb_idl.transaction(check_error=True) as txn:
+            # The Address_Sets are kept with Port_Groups too, they are
+            # what remote group rules match on.
             for ip_version in ('ip4', 'ip6'):
                 name = utils.ovn_addrset_name(security_group['id'], ip_version)
-                ext_ids = {ovn_const.OVN_SG_EXT_ID_KEY: security_group['id']}
                 txn.add(self._nb_idl.create_address_set(
                     name=name, external_ids=ext_ids))
+            if ovn_acl.is_port_groups_enabled(self._nb_idl):
+                # A new security group comes with its default rules, add
+                # them to the Port_Group right away.
+                txn.add(self._nb_idl.create_port_group(
+                    name=utils.ovn_port_group_name(security_group['id']),
+                    external_ids=ext_ids,
+                    acls=ovn_acl.add_acls_for_sg_port_group(
+                        self._nb_idl, security_group)))
         db_rev.bump_revision(security_group, ovn_const.TYPE_SECURITY_GROUPS)
 
     def delete_security_group(self, security_group_id):
@@ -1469,6 +1588,9 @@ class OVNClient(object):
             for ip_version in ('ip4', 'ip6'):
                 name = utils.ovn_addrset_name(security_group_id, ip_version)
                 txn.add(self._nb_idl.delete_address_set(name=name))
+            if ovn_acl.is_port_groups_enabled(self._nb_idl):
+                txn.add(self._nb_idl.delete_port_group(
+                    utils.ovn_port_group_name(security_group_id)))
         db_rev.delete_revision(security_group_id,
                                ovn_const.TYPE_SECURITY_GROUPS)
 
@@ -1533,6 +1655,8 @@ class OVNClient(object):
 
         This function will allocate an IP address for the metadata port of
         the given network in all its IPv4 subnets.
+
+        :returns: True if the metadata port was updated.
         """
         if not config.is_ovn_metadata_enabled():
             return
@@ -1577,6 +1701,7 @@ class OVNClient(object):
                              'fixed_ips': wanted_fixed_ips}}
             self._plugin.update_port(n_context.get_admin_context(),
                                      metadata_port['id'], port)
+            return True
 
     def get_parent_port(self, port_id):
         return self._nb_idl.get_parent_port(port_id)
@@ -80,6 +80,16 @@ def ovn_addrset_name(sg_id, ip_version):
     return ('as-%s-%s' % (ip_version, sg_id)).replace('-', '_')
 
 
+def ovn_port_group_name(sg_id):
+    # The name of the port group for the given security group id. The
+    # format is:
+    #   pg-<security group uuid>
+    # with all '-' replaced with '_', for the same reason as in
+    # ovn_addrset_name(): Port_Group names are referenced from ACL matches
+    # (e.g. "inport == @pg_<uuid>") and must be valid identifiers.
+    return ('pg-%s' % sg_id).replace('-', '_')
+
+
 def is_network_device_port(port):
     return port.get('device_owner', '').startswith(
         const.DEVICE_OWNER_PREFIXES)
@@ -334,3 +344,22 @@ def get_lrouter_non_gw_routes(ovn_router):
 
 def is_ovn_l3(l3_plugin):
     return hasattr(l3_plugin, '_ovn_client_inst')
+
+
+def _freeze_acl_value(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze_acl_value(v))
+                            for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(sorted(_freeze_acl_value(v) for v in value))
+    return value
+
+
+def ovn_acl_key(acl):
+    """Return a hashable key for an ACL given in dictionary format.
+
+    Two ACL dictionaries compare equal if and only if their keys do, which
+    allows ACL lists to be diffed with set operations instead of comparing
+    every pair of dictionaries.
+    """
+    return _freeze_acl_value(acl)
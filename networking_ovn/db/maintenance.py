@@ -21,25 +21,46 @@ from networking_ovn.common import constants as ovn_const
 from networking_ovn.db import models
 
 
-def get_inconsistent_resources():
+def get_inconsistent_resources(resource_type=None, marker=None, limit=None):
     """Get a list of inconsistent resources.
 
+    The resources can be fetched in pages, one resource type at a time,
+    which is backed by the (resource_type, resource_uuid) index of the
+    ovn_revision_numbers table.
+
+    :param resource_type: If given, only return the resources of this type,
+                          sorted by their UUIDs.
+    :param marker: Only return the resources which UUID sorts after this
+                   one. Only used together with ``resource_type``.
+    :param limit: The maximum number of resources to return.
     :returns: A list of objects which the revision number from the
               ovn_revision_number and standardattributes tables differs.
     """
-    sort_order = sa.case(value=models.OVNRevisionNumbers.resource_type,
-                         whens=ovn_const.MAINTENANCE_CREATE_UPDATE_TYPE_ORDER)
     session = db_api.get_reader_session()
     with session.begin():
-        return (session.query(models.OVNRevisionNumbers).
-                join(
-                    standard_attr.StandardAttribute,
-                    models.OVNRevisionNumbers.standard_attr_id ==
-                    standard_attr.StandardAttribute.id).
-                filter(
-                    models.OVNRevisionNumbers.revision_number !=
-                    standard_attr.StandardAttribute.revision_number).
-                order_by(sort_order).all())
+        query = (session.query(models.OVNRevisionNumbers).
+                 join(
+                     standard_attr.StandardAttribute,
+                     models.OVNRevisionNumbers.standard_attr_id ==
+                     standard_attr.StandardAttribute.id).
+                 filter(
+                     models.OVNRevisionNumbers.revision_number !=
+                     standard_attr.StandardAttribute.revision_number))
+        if resource_type is None:
+            query = query.order_by(sa.case(
+                value=models.OVNRevisionNumbers.resource_type,
+                whens=ovn_const.MAINTENANCE_CREATE_UPDATE_TYPE_ORDER))
+        else:
+            query = query.filter(
+                models.OVNRevisionNumbers.resource_type ==
+                resource_type).order_by(
+                    models.OVNRevisionNumbers.resource_uuid)
+            if marker is not None:
+                query = query.filter(
+                    models.OVNRevisionNumbers.resource_uuid > marker)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
 
 
 def get_deleted_resources():
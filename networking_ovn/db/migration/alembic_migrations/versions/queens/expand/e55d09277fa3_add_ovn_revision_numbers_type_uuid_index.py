@@ -0,0 +1,34 @@
+# Copyright 2018 Red Hat, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""add_ovn_revision_numbers_type_uuid_index
+
+Revision ID: e55d09277fa3
+Revises: 5c198d2723b6
+Create Date: 2018-03-05 10:21:43.518634
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'e55d09277fa3'
+down_revision = '5c198d2723b6'
+
+from alembic import op
+
+
+def upgrade():
+    op.create_index('ovn_revision_numbers_resource_type_uuid_idx',
+                    'ovn_revision_numbers',
+                    ['resource_type', 'resource_uuid'])
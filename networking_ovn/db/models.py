@@ -21,6 +21,8 @@ from sqlalchemy.dialects import sqlite
 class OVNRevisionNumbers(model_base.BASEV2):
     __tablename__ = 'ovn_revision_numbers'
     __table_args__ = (
+        sa.Index('ovn_revision_numbers_resource_type_uuid_idx',
+                 'resource_type', 'resource_uuid'),
         model_base.BASEV2.__table_args__
     )
     standard_attr_id = sa.Column(
@@ -13,10 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 from neutron.db import standard_attr
 from neutron_lib.db import api as db_api
 from oslo_db import api as oslo_db_api
 from oslo_log import log
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import exc
 
 from networking_ovn.common import constants as ovn_const
@@ -75,54 +80,148 @@ def delete_revision(resource_id, resource_type):
             session.delete(row)
 
 
-def _ensure_revision_row_exist(session, resource, resource_type):
-    """Ensure the revision row exists.
+def _upsert_revisions_stmt(dialect, revisions, resource_type, std_attr_ids):
+    """Build a statement upserting the revision rows of several resources.
+
+    The existing rows are only updated, including their standard attribute
+    ID and update time, if their revision number doesn't go backwards.
 
-    Ensure the revision row exist before we try to bump its revision
-    number. This method is part of the migration plan to deal with
-    resources that have been created prior to the database sync work
-    getting merged.
+    :param dialect: The name of the database dialect.
+    :param revisions: A dict of resource UUIDs and their revision numbers.
+    :param resource_type: The type of the resources.
+    :param std_attr_ids: A dict of resource UUIDs and their standard
+                         attribute IDs.
+    :returns: The statement or None if the dialect has no upsert.
     """
-    # TODO(lucasagomes): As the docstring says, this method was created to
-    # deal with objects that already existed before the sync work. I believe
-    # that we can remove this method after few development cycles. Or,
-    # if we decide to make a migration script as well.
-    with session.begin(subtransactions=True):
-        try:
-            session.query(models.OVNRevisionNumbers).filter_by(
-                resource_uuid=resource['id'],
-                resource_type=resource_type).one()
-        except exc.NoResultFound:
+    table = models.OVNRevisionNumbers.__table__
+    rows = [{'standard_attr_id': std_attr_ids[res_uuid],
+             'resource_uuid': res_uuid,
+             'resource_type': resource_type,
+             'revision_number': revision_number}
+            for res_uuid, revision_number in revisions.items()]
+
+    if dialect == 'mysql':
+        stmt = mysql.insert(table).values(rows)
+        # MySQL has no WHERE clause for the update, each column is only
+        # changed if the revision number is not older. The condition holds
+        # whether the revision number column is updated first or not. The
+        # inserted revision number is spelled out, stmt.inserted would be
+        # rendered as the VALUES() of the column being updated.
+        inserted_revision_number = sa.literal_column(
+            'VALUES(revision_number)')
+        newer = table.c.revision_number <= inserted_revision_number
+        return stmt.on_duplicate_key_update(
+            standard_attr_id=sa.case(
+                [(newer, stmt.inserted.standard_attr_id)],
+                else_=table.c.standard_attr_id),
+            revision_number=sa.func.greatest(
+                table.c.revision_number, inserted_revision_number),
+            updated_at=sa.case([(newer, sa.func.now())],
+                               else_=table.c.updated_at))
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(table).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.resource_uuid, table.c.resource_type],
+            set_={'standard_attr_id': stmt.excluded.standard_attr_id,
+                  'revision_number': stmt.excluded.revision_number,
+                  'updated_at': sa.func.now()},
+            where=table.c.revision_number <= stmt.excluded.revision_number)
+
+
+def _get_standard_attr_ids(session, revisions, resource_type):
+    """Return the standard attribute IDs of several resources.
+
+    :raises: StandardAttributeIDNotFound if a resource doesn't exist.
+    """
+    model = STD_ATTR_MAP[resource_type]
+    std_attr_ids = dict(session.query(
+        model.id, model.standard_attr_id).filter(
+            model.id.in_(list(revisions))))
+    for res_uuid in revisions:
+        if res_uuid not in std_attr_ids:
+            raise ovn_exc.StandardAttributeIDNotFound(resource_uuid=res_uuid)
+    return std_attr_ids
+
+
+def _bump_revisions_orm(session, revisions, resource_type, std_attr_ids):
+    """Bump the revision numbers without an upsert statement.
+
+    Used with the database backends which don't support one, like SQLite.
+
+    :returns: The list of resource UUIDs which revision was bumped.
+    """
+    rows = {row.resource_uuid: row for row in session.query(
+        models.OVNRevisionNumbers).filter(
+            models.OVNRevisionNumbers.resource_uuid.in_(list(revisions)),
+            models.OVNRevisionNumbers.resource_type == resource_type)}
+    bumped = []
+    for res_uuid, revision_number in revisions.items():
+        row = rows.get(res_uuid)
+        if row is None:
             LOG.warning(
                 'No revision row found for %(res_uuid)s (type: '
                 '%(res_type)s) when bumping the revision number. '
-                'Creating one.', {'res_uuid': resource['id'],
+                'Creating one.', {'res_uuid': res_uuid,
                                   'res_type': resource_type})
-            create_initial_revision(resource['id'], resource_type, session)
+            row = models.OVNRevisionNumbers(
+                resource_uuid=res_uuid, resource_type=resource_type,
+                standard_attr_id=std_attr_ids[res_uuid],
+                revision_number=ovn_const.INITIAL_REV_NUM)
+            session.add(row)
+        elif revision_number < row.revision_number:
+            LOG.debug(
+                'Skip bumping the revision number for %(res_uuid)s '
+                '(type: %(res_type)s) to %(rev_num)d. A higher version '
+                'is already registered in the database (%(new_rev)d)',
+                {'res_type': resource_type, 'res_uuid': res_uuid,
+                 'rev_num': revision_number,
+                 'new_rev': row.revision_number})
+            continue
+        row.revision_number = revision_number
+        bumped.append(res_uuid)
+    return bumped
 
 
-@_wrap_db_retry
 def bump_revision(resource, resource_type):
+    bump_revisions([resource], resource_type)
+
+
+@_wrap_db_retry
+def bump_revisions(resources, resource_type):
+    """Bump the revision numbers of several resources of the same type.
+
+    The standard attribute IDs of the resources are looked up with one
+    query. On MySQL and PostgreSQL the revision rows are then created or
+    updated by a single upsert statement. A revision number is never
+    moved backwards: if a higher one is already registered in the database
+    the row is left as is.
+
+    :raises: StandardAttributeIDNotFound if a resource doesn't exist.
+    """
+    if not resources:
+        return
+    revisions = collections.OrderedDict(
+        (res['id'], utils.get_revision_number(res, resource_type))
+        for res in resources)
     session = db_api.get_writer_session()
-    revision_number = utils.get_revision_number(resource, resource_type)
     with session.begin():
-        _ensure_revision_row_exist(session, resource, resource_type)
-        std_attr_id = _get_standard_attr_id(
-            session, resource['id'], resource_type)
-        row = session.merge(models.OVNRevisionNumbers(
-            standard_attr_id=std_attr_id, resource_uuid=resource['id'],
-            resource_type=resource_type))
-        if revision_number < row.revision_number:
-            LOG.debug(
-                'Skip bumping the revision number for %(res_uuid)s (type: '
-                '%(res_type)s) to %(rev_num)d. A higher version is already '
-                'registered in the database (%(new_rev)d)',
-                {'res_type': resource_type, 'res_uuid': resource['id'],
-                 'rev_num': revision_number, 'new_rev': row.revision_number})
-            return
-        row.revision_number = revision_number
-        session.merge(row)
-    LOG.info('Successfully bumped revision number for resource '
-             '%(res_uuid)s (type: %(res_type)s) to %(rev_num)d',
-             {'res_uuid': resource['id'], 'res_type': resource_type,
-              'rev_num': revision_number})
+        std_attr_ids = _get_standard_attr_ids(session, revisions,
+                                              resource_type)
+        stmt = _upsert_revisions_stmt(session.get_bind().dialect.name,
+                                      revisions, resource_type, std_attr_ids)
+        if stmt is None:
+            bumped = _bump_revisions_orm(session, revisions, resource_type,
+                                         std_attr_ids)
+        else:
+            session.execute(stmt)
+    if stmt is not None:
+        # The statement doesn't tell which revision numbers were bumped
+        LOG.debug('Upserted the revision numbers of %(count)d %(res_type)s '
+                  'resources, the higher ones registered were kept',
+                  {'count': len(revisions), 'res_type': resource_type})
+        return
+    for res_uuid in bumped:
+        LOG.info('Successfully bumped revision number for resource '
+                 '%(res_uuid)s (type: %(res_type)s) to %(rev_num)d',
+                 {'res_uuid': res_uuid, 'res_type': resource_type,
+                  'rev_num': revisions[res_uuid]})
@@ -182,6 +182,10 @@ class OVNMechanismDriver(api.MechanismDriver):
         # Now IDL connections can be safely used.
         self._post_fork_event.set()
 
+        # Ports with security groups are added to the default drop
+        # Port_Group, make sure it exists before any port is created.
+        self._ovn_client.create_neutron_pg_drop()
+
         if trigger.im_class == ovsdb_monitor.OvnWorker:
             # Call the synchronization task if its ovn worker
             # This sync neutron DB to OVN-NB DB only in inconsistent states
@@ -713,8 +717,10 @@ class OVNMechanismDriver(api.MechanismDriver):
         # creation or when OVN reports that the port is down) must be removed.
         LOG.info("OVN reports status up for port: %s", port_id)
 
-        self._wait_for_metadata_provisioned_if_needed(port_id)
+        self._wait_for_metadata_provisioned_if_needed(
+            port_id, self._complete_port_status_up)
 
+    def _complete_port_status_up(self, port_id):
         # If this port is a subport, we need to update the host_id and set it
         # to its parent's. Otherwise, Neutron won't even try to bind it and
         # it will not transition from DOWN to ACTIVE.
@@ -733,6 +739,10 @@ class OVNMechanismDriver(api.MechanismDriver):
         # to prevent another entity from bypassing the block with its own
         # port status update.
         LOG.info("OVN reports status down for port: %s", port_id)
+        metadata_waiters = self._get_metadata_waiters()
+        if metadata_waiters:
+            # The port must not be set up once the metadata service is ready
+            metadata_waiters.cancel(port_id)
         admin_context = n_context.get_admin_context()
         try:
             port = self._plugin.get_port(admin_context, port_id)
@@ -771,37 +781,61 @@ class OVNMechanismDriver(api.MechanismDriver):
                  if phynet in phynets} #取出有此phynet对应的hosts （此segment可在此hosts上调度）
         segment_service_db.map_segment_to_hosts(context, segment.id, hosts)
 
-    def _wait_for_metadata_provisioned_if_needed(self, port_id):
+    def _get_metadata_waiters(self):
+        if not self._sb_ovn or not isinstance(self._sb_ovn.idl,
+                                              ovsdb_monitor.OvnSbIdl):
+            return None
+        return self._sb_ovn.idl.metadata_waiters
+
+    def _wait_for_metadata_provisioned_if_needed(self, port_id, callback):
         """Wait for metadata service to be provisioned.
 
         Wait until metadata service has been setup for this port in the chassis
-        it resides. If metadata is disabled, this function will return right
-        away.
+        it resides, then call back with the port. If metadata is disabled, the
+        callback is called right away. The OvnWorker parks the port until its
+        Chassis is updated, so the events of the other ports are handled
+        meanwhile.
         """
-        if config.is_ovn_metadata_enabled() and self._sb_ovn:
-            # Wait until metadata service has been setup for this port in the
-            # chassis it resides.
-            result = (
-                self._sb_ovn.get_logical_port_chassis_and_datapath(port_id))
-            if not result:
-                LOG.warning("Logical port %s doesn't exist in OVN", port_id)
-                return
-            chassis, datapath = result
-            if not chassis:
-                LOG.warning("Logical port %s is not bound to a "
-                            "chassis", port_id)
-                return
-            try:
-                n_utils.wait_until_true(
-                    lambda: datapath in
-                    self._sb_ovn.get_chassis_metadata_networks(chassis),
-                    timeout=METADATA_READY_WAIT_TIMEOUT,
-                    exception=MetadataServiceReadyWaitTimeoutException)
-            except MetadataServiceReadyWaitTimeoutException:
+        if not (config.is_ovn_metadata_enabled() and self._sb_ovn):
+            callback(port_id)
+            return
+        # Wait until metadata service has been setup for this port in the
+        # chassis it resides.
+        result = self._sb_ovn.get_logical_port_chassis_and_datapath(port_id)
+        if not result:
+            LOG.warning("Logical port %s doesn't exist in OVN", port_id)
+            callback(port_id)
+            return
+        chassis, datapath = result
+        if not chassis:
+            LOG.warning("Logical port %s is not bound to a "
+                        "chassis", port_id)
+            callback(port_id)
+            return
+
+        def metadata_ready(ready):
+            if not ready:
                 # If we reach this point it means that metadata agent didn't
                 # provision the datapath for this port on its chassis. Either
                 # the agent is not running or it crashed. We'll complete the
                 # provisioning block though.
-                LOG.warning("Metadata service is not ready for port %s, check"
-                            " networking-ovn-metadata-agent status/logs.",
-                            port_id)
+                LOG.warning("Metadata service is not ready for port %s, "
+                            "check networking-ovn-metadata-agent "
+                            "status/logs.", port_id)
+            callback(port_id)
+
+        metadata_waiters = self._get_metadata_waiters()
+        if metadata_waiters:
+            metadata_waiters.wait(port_id, chassis, datapath, metadata_ready,
+                                  METADATA_READY_WAIT_TIMEOUT)
+            return
+        try:
+            n_utils.wait_until_true(
+                lambda: datapath in
+                self._sb_ovn.get_chassis_metadata_networks(chassis),
+                timeout=METADATA_READY_WAIT_TIMEOUT,
+                exception=MetadataServiceReadyWaitTimeoutException)
+        except MetadataServiceReadyWaitTimeoutException:
+            metadata_ready(False)
+            return
+        metadata_ready(True)
@@ -11,10 +11,18 @@
 #    under the License.
 
 import abc
+import collections
 from datetime import datetime
+import functools
 import itertools
+import json
+import threading
+import time
+import zlib
 
 from eventlet import greenthread
+import futurist
+from futurist import waiters
 from neutron.services.segments import db as segments_db
 from neutron_lib.api.definitions import l3
 from neutron_lib.api.definitions import provider_net as pnet
@@ -23,7 +31,6 @@ from neutron_lib import context
 from neutron_lib import exceptions as n_exc
 from neutron_lib.plugins import constants as plugin_constants
 from neutron_lib.plugins import directory
-from neutron_lib.utils import helpers
 from oslo_log import log
 import six
 
@@ -39,14 +46,413 @@ SYNC_MODE_OFF = 'off'
 SYNC_MODE_LOG = 'log'
 SYNC_MODE_REPAIR = 'repair'
 
+# Number of Neutron resources fetched at once when loading a sync snapshot
+SNAPSHOT_PAGE_SIZE = 1000
+
+# The stages of the coordinator of a sharded sync
+SHARD_STAGE_SECURITY_GROUPS = 'security-groups'
+SHARD_STAGE_ROUTERS = 'routers'
+
+
+class SyncShard(object):
+    """The part of the networks a sharded NB sync works on.
+
+    The networks are spread over the shards by a hash of their ID. A shard
+    syncs the logical switches, ports, DHCP options, DNS records and ACLs
+    of its networks. The coordinator, which has no index, syncs what is
+    shared by all the networks in two stages. The security groups stage
+    syncs the address sets and port groups the ports of the shards are
+    added to, so it must run before the shards. The routers stage syncs
+    the routers connecting their networks, so it must run once all the
+    shards are synced. A coordinator without a stage runs both.
+    """
+
+    def __init__(self, count, index=None, stage=None):
+        self.count = count
+        self.index = index
+        self.stage = stage
+
+    @property
+    def is_coordinator(self):
+        return self.index is None
+
+    def runs_stage(self, stage):
+        """Whether this is a coordinator running the given stage."""
+        return self.is_coordinator and self.stage in (None, stage)
+
+    def owns(self, network_id):
+        """Whether the given network belongs to this shard.
+
+        The resources left in OVN without a network, like the DHCP
+        options of a deleted subnet, are sharded by their own ID.
+        """
+        if self.is_coordinator:
+            return False
+        key = zlib.crc32(network_id.encode('utf-8')) & 0xffffffff
+        return key % self.count == self.index
+
+    def __str__(self):
+        if self.is_coordinator:
+            if self.stage is not None:
+                return '%s stage of the coordinator of %d shards' % (
+                    self.stage, self.count)
+            return 'coordinator of %d shards' % self.count
+        return 'shard %d of %d' % (self.index, self.count)
+
+
+class SyncSnapshot(object):
+    """The Neutron resources the NB sync works on, loaded once per sync.
+
+    Every phase of the sync used to dump all the networks, ports and
+    security groups again. A snapshot loads each of them the first time
+    a phase needs them, in pages sorted by ID so that a large table isn't
+    fetched by a single query, and shares them with the following phases.
+
+    The phases changing Neutron resources must invalidate them.
+
+    The snapshot of a shard, other than the coordinator, only has the
+    networks of the shard and their ports.
+    """
+
+    def __init__(self, core_plugin, ctx, page_size=SNAPSHOT_PAGE_SIZE,
+                 shard=None):
+        self._core_plugin = core_plugin
+        self._ctx = ctx
+        self._page_size = page_size
+        if shard is not None and shard.is_coordinator:
+            shard = None
+        self._shard = shard
+        self._resources = {}
+        # The phases of a sync may run concurrently
+        self._lock = threading.RLock()
+        self.queries = 0
+
+    def _get_all(self, get, **kwargs):
+        marker = None
+        while True:
+            page = get(self._ctx, sorts=[('id', True)],
+                       limit=self._page_size, marker=marker, **kwargs)
+            self.queries += 1
+            for obj in page:
+                yield obj
+            if len(page) < self._page_size:
+                return
+            marker = page[-1]['id']
+
+    def _load(self, name, load):
+        with self._lock:
+            if name not in self._resources:
+                self._resources[name] = list(load())
+                LOG.debug('Sync snapshot loaded %(count)d %(name)s',
+                          {'count': len(self._resources[name]),
+                           'name': name})
+            return self._resources[name]
+
+    def invalidate(self, name):
+        """Reload the given resources the next time they are needed."""
+        with self._lock:
+            self._resources.pop(name, None)
+
+    def _load_networks(self):
+        for network in self._get_all(self._core_plugin.get_networks):
+            if self._shard is None or self._shard.owns(network['id']):
+                yield network
+
+    def _load_ports(self):
+        if self._shard is None:
+            return self._get_all(self._core_plugin.get_ports)
+        # Only fetch the ports of the networks of the shard
+        network_ids = [network['id'] for network in self.networks]
+        return itertools.chain.from_iterable(
+            self._get_all(self._core_plugin.get_ports, filters={
+                'network_id': network_ids[i:i + self._page_size]})
+            for i in range(0, len(network_ids), self._page_size))
+
+    @property
+    def networks(self):
+        return self._load('networks', self._load_networks)
+
+    @property
+    def ports(self):
+        return self._load('ports', self._load_ports)
+
+    @property
+    def security_groups(self):
+        return self._load('security_groups', functools.partial(
+            self._get_all, self._core_plugin.get_security_groups))
+
+    def get_dhcp_ports(self, network_id):
+        """Return the DHCP ports of a network."""
+        with self._lock:
+            if 'dhcp_ports' not in self._resources:
+                dhcp_ports = {}
+                for port in self.ports:
+                    if port.get('device_owner') == (
+                            constants.DEVICE_OWNER_DHCP):
+                        dhcp_ports.setdefault(port['network_id'],
+                                              []).append(port)
+                self._resources['dhcp_ports'] = dhcp_ports
+            return self._resources['dhcp_ports'].get(network_id, [])
+
+
+class SyncTransaction(object):
+    """The OVN NB transactions repairing a phase of the sync.
+
+    The repair operations are added to a transaction that is committed
+    as soon as it holds max_ops operations, the next operations go to a
+    new transaction. The commands of an operation always go to the same
+    transaction. A transaction failing doesn't undo the ones already
+    committed, its error is raised and the remaining operations of the
+    phase are dropped.
+    """
+
+    def __init__(self, ovn_api, phase, total, max_ops=None):
+        self._ovn_api = ovn_api
+        self.phase = phase
+        self.total = total
+        if max_ops is None:
+            max_ops = config.get_ovn_neutron_sync_txn_max_ops()
+        self.max_ops = max_ops
+        self.done = 0
+        self._txn_context = None
+        self._txn = None
+        self._ops = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.commit()
+        elif self._txn_context is not None:
+            # Drop the uncommitted operations
+            txn_context = self._txn_context
+            self._txn_context = self._txn = None
+            txn_context.__exit__(exc_type, exc_value, tb)
+
+    @property
+    def txn(self):
+        """The transaction the current operation is added to."""
+        if self._txn is None:
+            self._txn_context = self._ovn_api.transaction(check_error=True)
+            self._txn = self._txn_context.__enter__()
+        return self._txn
+
+    def add(self, *commands):
+        """Add the commands of an operation to the transaction."""
+        for command in commands:
+            self.txn.add(command)
+        self.operation_added()
+
+    def operation_added(self):
+        """Account for an operation added directly to self.txn."""
+        self._ops += 1
+        if self.max_ops and self._ops >= self.max_ops:
+            self.commit()
+
+    def commit(self):
+        """Commit the operations added since the last commit."""
+        if self._txn_context is None:
+            return
+        txn_context = self._txn_context
+        self._txn_context = self._txn = None
+        ops, self._ops = self._ops, 0
+        try:
+            txn_context.__exit__(None, None, None)
+        except Exception:
+            LOG.error('%(phase)s: transaction of %(ops)d operations failed, '
+                      '%(done)d/%(total)d operations committed',
+                      {'phase': self.phase, 'ops': ops, 'done': self.done,
+                       'total': self.total})
+            raise
+        self.done += ops
+        LOG.info('%(phase)s: %(done)d/%(total)d operations committed',
+                 {'phase': self.phase, 'done': self.done,
+                  'total': self.total})
+
+
+class SyncPlan(object):
+    """Run the phases of a sync on a pool of threads.
+
+    A phase starts as soon as all the phases it runs after are finished,
+    so the independent phases run concurrently. Each phase is given its
+    own admin context. If a phase fails, no other phase is started and
+    its error is raised once the running ones are finished.
+    """
+
+    def __init__(self, pool_size, report=None):
+        self._pool_size = pool_size
+        self._report = report
+        self._phases = collections.OrderedDict()
+        self.timings = collections.OrderedDict()
+
+    def add(self, name, func, after=()):
+        """Add a phase, run as func(ctx) once the phases after are done.
+
+        The phases must be added after the ones they depend on, which is
+        also the order they run in when the pool has a single thread.
+        """
+        for dependency in after:
+            if dependency not in self._phases:
+                raise ValueError('Unknown sync phase %s' % dependency)
+        self._phases[name] = (func, set(after))
+
+    def _run_phase(self, name):
+        func = self._phases[name][0]
+        if self._report is not None:
+            self._report.start_phase(name)
+        start = time.time()
+        try:
+            func(context.get_admin_context())
+        except Exception:
+            LOG.exception('OVN-NB sync phase %s failed', name)
+            raise
+        finally:
+            self.timings[name] = time.time() - start
+            LOG.info('OVN-NB sync phase %(phase)s took %(time).2f seconds',
+                     {'phase': name, 'time': self.timings[name]})
+            if self._report is not None:
+                self._report.end_phase(name, self.timings[name])
+
+    def run(self):
+        self.timings.clear()
+        if self._pool_size <= 1:
+            for name in self._phases:
+                self._run_phase(name)
+            return
+
+        done = set()
+        pending = collections.OrderedDict(self._phases)
+        running = {}
+        error = None
+        with futurist.ThreadPoolExecutor(
+                max_workers=self._pool_size) as executor:
+            while pending or running:
+                if error is None:
+                    for name in list(pending):
+                        if pending[name][1] <= done:
+                            del pending[name]
+                            running[executor.submit(
+                                self._run_phase, name)] = name
+                if not running:
+                    break
+                finished, _ = waiters.wait_for_any(list(running))
+                for future in finished:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                    else:
+                        done.add(name)
+        if error is not None:
+            raise error
+
+
+class SyncReport(object):
+    """A machine-readable report of the differences found by a sync.
+
+    The differences are recorded per phase and per resource type, as the
+    IDs of the resources to add, delete or update, along with the time
+    each phase took. The nat rules and static routes of a router are
+    recorded with the ID of the router. A synchronizer given a report
+    doesn't log the differences it finds one by one.
+    """
+
+    ADD = 'add'
+    DELETE = 'delete'
+    UPDATE = 'update'
+    ACTIONS = (ADD, DELETE, UPDATE)
+
+    # The phase of the differences found outside of a phase of a sync
+    OTHER_PHASE = 'other'
+
+    def __init__(self, **info):
+        # Extra information about the sync, like its mode
+        self.info = info
+        self._phases = collections.OrderedDict()
+        # The phases of a sync may run concurrently, each in its thread
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _get_phase(self, name):
+        return self._phases.setdefault(name, {
+            'time': None, 'resources': collections.OrderedDict()})
+
+    def start_phase(self, name):
+        """Record the differences found by this thread in the phase."""
+        self._local.phase = name
+        with self._lock:
+            self._get_phase(name)
+
+    def end_phase(self, name, elapsed):
+        """Record the time, in seconds, the phase took."""
+        self._local.phase = None
+        with self._lock:
+            self._get_phase(name)['time'] = elapsed
+
+    def add(self, resource_type, action, resource_id):
+        """Record a resource to add, delete or update."""
+        phase = getattr(self._local, 'phase', None) or self.OTHER_PHASE
+        with self._lock:
+            resources = self._get_phase(phase)['resources']
+            if resource_type not in resources:
+                resources[resource_type] = {action: [] for action in
+                                            self.ACTIONS}
+            resources[resource_type][action].append(resource_id)
+
+    def to_dict(self):
+        """Return the report as a JSON serializable dictionary."""
+        report = dict(self.info)
+        report['phases'] = collections.OrderedDict()
+        report['totals'] = collections.OrderedDict()
+        with self._lock:
+            for name, phase in self._phases.items():
+                resources = collections.OrderedDict()
+                for resource_type, ids in phase['resources'].items():
+                    totals = report['totals'].setdefault(
+                        resource_type, dict.fromkeys(self.ACTIONS, 0))
+                    resources[resource_type] = {}
+                    for action in self.ACTIONS:
+                        resources[resource_type][action] = {
+                            'count': len(ids[action]),
+                            'ids': list(ids[action])}
+                        totals[action] += len(ids[action])
+                report['phases'][name] = {'time': phase['time'],
+                                          'resources': resources}
+        return report
+
+    def write(self, path):
+        """Write the report to the given file, as one JSON document."""
+        with open(path, 'w') as report_file:
+            json.dump(self.to_dict(), report_file, indent=2)
+            report_file.write('\n')
+
 
 @six.add_metaclass(abc.ABCMeta)
 class OvnDbSynchronizer(object):
 
-    def __init__(self, core_plugin, ovn_api, ovn_driver):
+    def __init__(self, core_plugin, ovn_api, ovn_driver, report=None):
         self.ovn_driver = ovn_driver
         self.ovn_api = ovn_api
         self.core_plugin = core_plugin
+        # The SyncReport the differences are recorded in, None to log them
+        self.report = report
+
+    def _report_diff(self, resource_type, action, resource_id, msg=None,
+                     *args):
+        """Report a difference between Neutron and OVN.
+
+        It is recorded in the sync report if there is one, otherwise it
+        is logged as a warning with the given message, if any.
+        """
+        if self.report is not None:
+            self.report.add(resource_type, action, resource_id)
+        elif msg:
+            LOG.warning(msg, *args)
+
+    def _log_diff(self, msg, *args):
+        """Log a difference or its repair, unless there is a report."""
+        if self.report is None:
+            LOG.warning(msg, *args)
 
     def sync(self, delay_seconds=10):
         self._gt = greenthread.spawn_after_local(delay_seconds, self.do_sync)
@@ -66,12 +472,16 @@ class OvnDbSynchronizer(object):
 class OvnNbSynchronizer(OvnDbSynchronizer):
     """Synchronizer class for NB."""
 
-    def __init__(self, core_plugin, ovn_api, sb_ovn, mode, ovn_driver):
+    def __init__(self, core_plugin, ovn_api, sb_ovn, mode, ovn_driver,
+                 shard=None, report=None):
         super(OvnNbSynchronizer, self).__init__(
-            core_plugin, ovn_api, ovn_driver)
+            core_plugin, ovn_api, ovn_driver, report=report)
         self.mode = mode
+        # The SyncShard of a sharded sync, None to sync everything
+        self.shard = shard
         self.l3_plugin = directory.get_plugin(plugin_constants.L3)
         self._ovn_client = ovn_client.OVNClient(ovn_api, sb_ovn)
+        self._snapshot = None
 
     def stop(self):
         if utils.is_ovn_l3(self.l3_plugin):
@@ -79,18 +489,87 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
             self.l3_plugin._sb_ovn.ovsdb_connection.stop()
         super(OvnNbSynchronizer, self).stop()
 
-    def do_sync(self):
+    def do_sync(self, snapshot=None):
+        """Sync the OVN_Northbound DB with the Neutron DB.
+
+        @param snapshot: The Neutron resources to sync from, loaded from
+                         the Neutron DB if not given
+        @type  snapshot: SyncSnapshot
+        """
         if self.mode == SYNC_MODE_OFF:
             LOG.debug("Neutron sync mode is off")
             return
         LOG.debug("Starting OVN-Northbound DB sync process")
 
+        if self.shard is not None:
+            LOG.info('OVN-Northbound DB sync of the %s', self.shard)
+
         ctx = context.get_admin_context()
-        self.sync_address_sets(ctx)
-        self.sync_networks_ports_and_dhcp_opts(ctx)
-        self.sync_port_dns_records(ctx)
-        self.sync_acls(ctx)
-        self.sync_routers_and_rports(ctx)
+        self._snapshot = snapshot or SyncSnapshot(self.core_plugin, ctx,
+                                                  shard=self.shard)
+        plan = self._get_sync_plan()
+        try:
+            plan.run()
+        finally:
+            LOG.debug('OVN-NB sync loaded the Neutron resources with %d '
+                      'queries', self._snapshot.queries)
+            self._snapshot = None
+
+    def _get_sync_plan(self):
+        # The ports are added to the address sets and port groups of their
+        # security groups when they are created in OVN, which fails if the
+        # address sets or the default drop port group are missing, so they
+        # are synced first. The ports are created after their networks,
+        # and the ACLs after the ports.
+        sync_networks = self.shard is None or not self.shard.is_coordinator
+        sync_security_groups = self.shard is None or self.shard.runs_stage(
+            SHARD_STAGE_SECURITY_GROUPS)
+        sync_routers = self.shard is None or self.shard.runs_stage(
+            SHARD_STAGE_ROUTERS)
+        after_networks = []
+        after_security_groups = []
+        plan = SyncPlan(config.get_ovn_neutron_sync_pool_size(),
+                        report=self.report)
+        if sync_security_groups:
+            plan.add('address_sets', self.sync_address_sets)
+            after_security_groups = ['address_sets']
+            if acl_utils.is_port_groups_enabled(self.ovn_api):
+                plan.add('port_groups', self.sync_port_groups,
+                         after=['address_sets'])
+                after_security_groups.append('port_groups')
+        if sync_networks:
+            plan.add('networks_ports_and_dhcp_opts',
+                     self.sync_networks_ports_and_dhcp_opts,
+                     after=after_security_groups)
+            after_networks = ['networks_ports_and_dhcp_opts']
+            plan.add('port_dns_records', self.sync_port_dns_records,
+                     after=after_networks)
+            plan.add('acls', self.sync_acls,
+                     after=after_networks + after_security_groups)
+        if sync_routers:
+            plan.add('routers_and_rports', self.sync_routers_and_rports,
+                     after=after_networks)
+        return plan
+
+    def _get_snapshot(self, ctx):
+        # The phases can also be run on their own, outside of do_sync()
+        return self._snapshot or SyncSnapshot(self.core_plugin, ctx,
+                                              shard=self.shard)
+
+    def _owns_network(self, network_id):
+        return self.shard is None or self.shard.owns(network_id)
+
+    def _filter_dhcp_options(self, ctx, ovn_all_dhcp_options):
+        """Only keep the DHCP options of the networks of the shard."""
+        subnet_networks = {
+            subnet['id']: subnet['network_id'] for subnet in
+            self.core_plugin.get_subnets(ctx, fields=['id', 'network_id'])}
+        for key, dhcp_options in ovn_all_dhcp_options.items():
+            for name, dhcp_opts in list(dhcp_options.items()):
+                subnet_id = dhcp_opts['external_ids']['subnet_id']
+                if not self.shard.owns(
+                        subnet_networks.get(subnet_id, subnet_id)):
+                    del dhcp_options[name]
 
     def _create_port_in_ovn(self, ctx, port):
         # Remove any old ACLs for the port to avoid creating duplicate ACLs.
@@ -102,20 +581,62 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
         # updates as needed.
         self._ovn_client.create_port(port)
 
+    def _create_ports_in_ovn(self, ctx, ports):
+        """Create several ports in OVN, in batches.
+
+        The ports of a batch are created in a single Northbound transaction
+        by OVNClient.create_ports(). If it fails, the ports of the batch are
+        created one by one so a single bad port doesn't fail the others.
+
+        @return: The list of the ports created
+        """
+        created = []
+        batch_size = config.get_ovn_neutron_sync_txn_max_ops()
+        for i in range(0, len(ports), batch_size):
+            batch = ports[i:i + batch_size]
+            # Remove any old ACLs for the ports to avoid creating duplicate
+            # ACLs.
+            with self.ovn_api.transaction(check_error=True) as txn:
+                for port in batch:
+                    txn.add(self.ovn_api.delete_acl(
+                        utils.ovn_name(port['network_id']), port['id']))
+            try:
+                self._ovn_client.create_ports(batch)
+                created.extend(batch)
+                continue
+            except RuntimeError:
+                LOG.warning("Create ports in OVN NB failed for a batch of "
+                            "%d ports, creating them one by one", len(batch))
+            for port in batch:
+                try:
+                    self._ovn_client.create_port(port)
+                    created.append(port)
+                except RuntimeError:
+                    LOG.warning("Create port in OVN NB failed for"
+                                " port %s", port['id'])
+        return created
+
     def remove_common_acls(self, neutron_acls, nb_acls):
         """Take out common acls of the two acl dictionaries.
 
-        @param   neutron_acls: neutron dictionary of port vs acls
+        The acls of a port are compared by their hashable key, see
+        utils.ovn_acl_key().
+
+        @param   neutron_acls: neutron dictionary of port vs dictionary of
+                               acls by acl key
         @type    neutron_acls: {}
-        @param   nb_acls: nb dictionary of port vs acls
+        @param   nb_acls: nb dictionary of port vs dictionary of acls by
+                          acl key
         @type    nb_acls: {}
         @return: Nothing, original dictionary modified
         """
-        for port in neutron_acls.keys():
-            for acl in list(neutron_acls[port]):
-                if port in nb_acls and acl in nb_acls[port]:
-                    neutron_acls[port].remove(acl)
-                    nb_acls[port].remove(acl)
+        for port, port_acls in neutron_acls.items():
+            nb_port_acls = nb_acls.get(port)
+            if not nb_port_acls:
+                continue
+            for acl_key in set(port_acls) & set(nb_port_acls):
+                del port_acls[acl_key]
+                del nb_port_acls[acl_key]
 
     def compute_address_set_difference(self, neutron_sgs, nb_sgs):
         neutron_sgs_name_set = set(neutron_sgs.keys())
@@ -136,29 +657,26 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
         return sgnames_to_add, sgnames_to_delete, sgs_to_update
 
     def get_acls(self, context):
-        """create the list of ACLS in OVN.
+        """create the dictionary of ACLS in OVN.
 
         @param context: neutron_lib.context
         @type  context: object of type neutron_lib.context.Context
         @var   lswitch_names: List of lswitch names
-        @var   acl_list: List of NB acls
-        @var   acl_list_dict: Dictionary of acl-lists based on lport as key
-        @return: acl_list-dict
+        @return: (acl_dict, acl_obj_dict), acl_dict is the dictionary of
+                 lport vs dictionary of its acls by acl key, as returned
+                 by utils.ovn_acl_key(), and acl_obj_dict the lists of
+                 acl idl objects by acl key, more than one if the acl is
+                 duplicated
         """
         lswitch_names = set([])
-        for network in self.core_plugin.get_networks(context):
+        for network in self._get_snapshot(context).networks:
             lswitch_names.add(network['id'])
-        acl_dict, ignore1, ignore2 = \
+        acl_values_dict, acl_obj_dict, ignore = \
             self.ovn_api.get_acls_for_lswitches(lswitch_names)
-        acl_list = list(itertools.chain(*acl_dict.values()))
-        acl_list_dict = {}
-        for acl in acl_list:
-            key = acl['lport']
-            if key in acl_list_dict:
-                acl_list_dict[key].append(acl)
-            else:
-                acl_list_dict[key] = list([acl])
-        return acl_list_dict
+        acl_dict = {}
+        for port_id, acls in acl_values_dict.items():
+            acl_dict[port_id] = {utils.ovn_acl_key(acl): acl for acl in acls}
+        return acl_dict, acl_obj_dict
 
     def get_address_sets(self):
         return self.ovn_api.get_address_sets()
@@ -173,9 +691,9 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
         LOG.debug('Address-Set-SYNC: started @ %s' % str(datetime.now()))
 
         neutron_sgs = {}
-        with ctx.session.begin(subtransactions=True):
-            db_sgs = self.core_plugin.get_security_groups(ctx)
-            db_ports = self.core_plugin.get_ports(ctx)
+        snapshot = self._get_snapshot(ctx)
+        db_sgs = snapshot.security_groups
+        db_ports = snapshot.ports
 
         for sg in db_sgs:
             for ip_version in ['ip4', 'ip6']:
@@ -203,11 +721,20 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                   len(sgnames_to_add), len(sgnames_to_delete),
                   len(sgs_to_update))
 
+        for action, sgnames in ((SyncReport.ADD, sgnames_to_add),
+                                (SyncReport.DELETE, sgnames_to_delete),
+                                (SyncReport.UPDATE, sgs_to_update)):
+            for sgname in sgnames:
+                self._report_diff('address_sets', action, sgname)
+
         if self.mode == SYNC_MODE_REPAIR:
             #仅repair模式时，才向nb库中插入
             LOG.debug('Address-Set-SYNC: transaction started @ %s' %
                       str(datetime.now()))
-            with self.ovn_api.transaction(check_error=True) as txn:
+            total = (len(sgnames_to_add) + len(sgs_to_update) +
+                     len(sgnames_to_delete))
+            with SyncTransaction(self.ovn_api, 'Address-Set-SYNC',
+                                 total) as txn:
                 for sgname in sgnames_to_add:
                     sg = neutron_sgs[sgname]
                     txn.add(self.ovn_api.create_address_set(**sg))
@@ -218,6 +745,168 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
             LOG.debug('Address-Set-SYNC: transaction finished @ %s' %
                       str(datetime.now()))
 
+    def _get_neutron_port_groups(self, ctx, db_ports):
+        """Build the Port_Groups neutron expects in NB.
+
+        @return: dict of port group name (key) and a dict (value) with the
+                 'ports' set, the 'acls' list and the 'external_ids' of the
+                 group
+        """
+        pg_drop = const.OVN_DROP_PORT_GROUP_NAME
+        drop_acls = acl_utils.drop_all_ip_traffic_for_port_group(pg_drop)
+        # Remove ACL log name and severity if not supported
+        if not acl_utils._acl_columns_name_severity_supported(self.ovn_api):
+            for acl in drop_acls:
+                acl.pop('name')
+                acl.pop('severity')
+        neutron_pgs = {pg_drop: {
+            'name': pg_drop, 'ports': set(), 'external_ids': {},
+            'acls': drop_acls}}
+        for sg in self._get_snapshot(ctx).security_groups:
+            name = utils.ovn_port_group_name(sg['id'])
+            neutron_pgs[name] = {
+                'name': name, 'ports': set(),
+                'external_ids': {const.OVN_SG_EXT_ID_KEY: sg['id']},
+                'acls': acl_utils.add_acls_for_sg_port_group(
+                    self.ovn_api, sg)}
+
+        for port in db_ports:
+            if utils.is_lsp_ignored(port):
+                continue
+            sg_ids = utils.get_lsp_security_groups(port)
+            if not sg_ids:
+                continue
+            neutron_pgs[pg_drop]['ports'].add(port['id'])
+            for sg_id in sg_ids:
+                name = utils.ovn_port_group_name(sg_id)
+                if name in neutron_pgs:
+                    neutron_pgs[name]['ports'].add(port['id'])
+        return neutron_pgs
+
+    @staticmethod
+    def _port_group_acl_key(acl):
+        return (acl['direction'], acl['priority'], acl['match'],
+                acl['action'])
+
+    def sync_port_groups(self, ctx, db_ports=None):
+        """Sync the security group Port_Groups between neutron and NB.
+
+        Port group ACLs are compared on their direction, priority, match
+        and action. Port groups are created with all their ACLs and ports,
+        existing ones only get the missing/stale ACLs and members fixed.
+
+        @param ctx: neutron_lib.context
+        @type  ctx: object of type neutron_lib.context.Context
+        @param db_ports: List of ports from neutron DB
+        @return: Nothing
+        """
+        LOG.debug('Port-Group-SYNC: started @ %s', str(datetime.now()))
+        if db_ports is None:
+            db_ports = self._get_snapshot(ctx).ports
+
+        neutron_pgs = self._get_neutron_port_groups(ctx, db_ports)
+        nb_pgs = self.ovn_api.get_port_groups()
+
+        pgs_to_add = [neutron_pgs[name] for name in
+                      set(neutron_pgs) - set(nb_pgs)]
+        pgs_to_delete = list(set(nb_pgs) - set(neutron_pgs))
+        pg_updates = []
+        for name in set(neutron_pgs) & set(nb_pgs):
+            neutron_pg = neutron_pgs[name]
+            nb_pg = nb_pgs[name]
+            nb_ports = set(nb_pg['ports'])
+            nb_acls = {self._port_group_acl_key(acl): acl
+                       for acl in nb_pg['acls']}
+            neutron_acls = {self._port_group_acl_key(acl): acl
+                            for acl in neutron_pg['acls']}
+            update = {
+                'name': name,
+                'ports_add': list(neutron_pg['ports'] - nb_ports),
+                'ports_remove': list(nb_ports - neutron_pg['ports']),
+                'acls_add': [neutron_acls[k] for k in
+                             set(neutron_acls) - set(nb_acls)],
+                'acls_remove': [nb_acls[k] for k in
+                                set(nb_acls) - set(neutron_acls)]}
+            if any(v for k, v in update.items() if k != 'name'):
+                pg_updates.append(update)
+
+        if pgs_to_add or pgs_to_delete or pg_updates:
+            LOG.warning('Port_Groups to be added %(add)d, removed '
+                        '%(remove)d, updated %(update)d',
+                        {'add': len(pgs_to_add),
+                         'remove': len(pgs_to_delete),
+                         'update': len(pg_updates)})
+        for action, names in (
+                (SyncReport.ADD, [pg['name'] for pg in pgs_to_add]),
+                (SyncReport.DELETE, pgs_to_delete),
+                (SyncReport.UPDATE, [update['name'] for update in
+                                     pg_updates])):
+            for name in names:
+                self._report_diff('port_groups', action, name)
+
+        if self.mode == SYNC_MODE_REPAIR:
+            total = len(pgs_to_add) + len(pgs_to_delete) + sum(
+                bool(update['ports_add'] or update['ports_remove']) +
+                len(update['acls_remove']) + len(update['acls_add'])
+                for update in pg_updates)
+            with SyncTransaction(self.ovn_api, 'Port-Group-SYNC',
+                                 total) as txn:
+                for pg in pgs_to_add:
+                    self._log_diff('Port_Group %s found in Neutron but not '
+                                   'in OVN DB', pg['name'])
+                    txn.add(self.ovn_api.create_port_group(
+                        name=pg['name'], external_ids=pg['external_ids'],
+                        acls=pg['acls'], ports=list(pg['ports'])))
+                for update in pg_updates:
+                    self._log_diff('Port_Group %s is out of sync with '
+                                   'Neutron', update['name'])
+                    if update['ports_add'] or update['ports_remove']:
+                        txn.add(self.ovn_api.update_port_group_ports(
+                            update['name'],
+                            ports_add=update['ports_add'],
+                            ports_remove=update['ports_remove']))
+                    for acl in update['acls_remove']:
+                        txn.add(self.ovn_api.delete_port_group_acl(
+                            update['name'], acl['direction'],
+                            acl['priority'], acl['match']))
+                    for acl in update['acls_add']:
+                        txn.add(self.ovn_api.add_port_group_acl(**acl))
+                for name in pgs_to_delete:
+                    self._log_diff('Port_Group %s found in OVN DB but not '
+                                   'in Neutron', name)
+                    txn.add(self.ovn_api.delete_port_group(name))
+
+        LOG.debug('Port-Group-SYNC: finished @ %s', str(datetime.now()))
+
+    def migrate_to_port_groups(self, ctx):
+        """Move the security group ACLs from the ports to Port_Groups.
+
+        The Port_Groups of all security groups are synced first, only then
+        the per-port drop and security group rule ACLs are deleted from the
+        logical switches so ports are never left unprotected. The per-port
+        DHCP ACLs are kept.
+
+        @param ctx: neutron_lib.context
+        @type  ctx: object of type neutron_lib.context.Context
+        @return: True if there were per-port ACLs to migrate
+        """
+        if not acl_utils.is_port_groups_enabled(self.ovn_api):
+            return False
+
+        legacy_acls = self.ovn_api.get_lswitch_port_sg_acls()
+        if not legacy_acls:
+            return False
+
+        LOG.info('Migrating security group ACLs of %d logical switches to '
+                 'Port_Groups', len(legacy_acls))
+        self.sync_port_groups(ctx)
+        with SyncTransaction(self.ovn_api, 'Port-Group-Migration',
+                             len(legacy_acls)) as txn:
+            for lswitch_name, acl_uuids in legacy_acls.items():
+                txn.add(self.ovn_api.delete_acls(lswitch_name, acl_uuids))
+        LOG.info('Security group ACLs migrated to Port_Groups')
+        return True
+
     def sync_acls(self, ctx):
         """Sync ACLs between neutron and NB.
 
@@ -225,9 +914,9 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
         @type  ctx: object of type neutron_lib.context.Context
         @var   db_ports: List of ports from neutron DB
         @var   neutron_acls: neutron dictionary of port
-               vs list-of-acls
+               vs dictionary of acls by acl key
         @var   nb_acls: NB dictionary of port
-               vs list-of-acls
+               vs dictionary of acls by acl key
         @var   subnet_cache: cache for subnets
         @return: Nothing
         """
@@ -235,9 +924,13 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                   str(datetime.now()))
 
         db_ports = {}
-        for port in self.core_plugin.get_ports(ctx):
+        for port in self._get_snapshot(ctx).ports:
             db_ports[port['id']] = port
 
+        # With Port_Groups only the DHCP ACLs are per port, the rest of
+        # the ACLs are synced by the port groups phase. Any per-port
+        # security group ACL left in NB is stale and removed below.
+
         sg_cache = {}
         subnet_cache = {}
         neutron_acls = {}
@@ -249,17 +942,53 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                                               sg_cache,
                                               subnet_cache,
                                               self.ovn_api)
-                if port_id in neutron_acls:
-                    neutron_acls[port_id].extend(acl_list)
-                else:
-                    neutron_acls[port_id] = acl_list
-
-        nb_acls = self.get_acls(ctx)
+                port_acls = neutron_acls.setdefault(port_id, {})
+                for acl in acl_list:
+                    port_acls[utils.ovn_acl_key(acl)] = acl
+
+        nb_acls, nb_acl_objs = self.get_acls(ctx)
+
+        # The ACL rows to remove per port and logical switch. The
+        # duplicates of an ACL have the same key, all the rows of a key
+        # but the first one are removed.
+        nb_stale_acls = {}
+        for port_id, port_acls in nb_acls.items():
+            for acl_key, acl in port_acls.items():
+                for row in nb_acl_objs[acl_key][1:]:
+                    nb_stale_acls.setdefault(
+                        (port_id, acl['lswitch']), []).append(row.uuid)
 
         self.remove_common_acls(neutron_acls, nb_acls)
 
-        num_acls_to_add = len(list(itertools.chain(*neutron_acls.values())))
-        num_acls_to_remove = len(list(itertools.chain(*nb_acls.values())))
+        for port_id, port_acls in nb_acls.items():
+            for acl_key, acl in port_acls.items():
+                nb_stale_acls.setdefault((port_id, acl['lswitch']), []).append(
+                    nb_acl_objs[acl_key][0].uuid)
+
+        # Number of acls to add and to remove per logical switch
+        lswitch_diffs = {}
+        # The ACLs are reported with the ID of their port
+        for port_id, port_acls in neutron_acls.items():
+            for acl in port_acls.values():
+                diff = lswitch_diffs.setdefault(
+                    acl['lswitch'], {'add': 0, 'remove': 0})
+                diff['add'] += 1
+                self._report_diff('acls', SyncReport.ADD, port_id)
+        for (port_id, lswitch_name), acl_uuids in nb_stale_acls.items():
+            diff = lswitch_diffs.setdefault(
+                lswitch_name, {'add': 0, 'remove': 0})
+            diff['remove'] += len(acl_uuids)
+            for acl_uuid in acl_uuids:
+                self._report_diff('acls', SyncReport.DELETE, port_id)
+        for lswitch_name, diff in lswitch_diffs.items():
+            self._log_diff('ACLs-to-be-added %(add)d ACLs-to-be-removed '
+                           '%(remove)d for network %(network)s',
+                           {'add': diff['add'], 'remove': diff['remove'],
+                            'network': lswitch_name.replace('neutron-', '')})
+
+        num_acls_to_add = sum(diff['add'] for diff in lswitch_diffs.values())
+        num_acls_to_remove = sum(diff['remove']
+                                 for diff in lswitch_diffs.values())
         if 0 != num_acls_to_add or 0 != num_acls_to_remove:
             LOG.warning('ACLs-to-be-added %(add)d '
                         'ACLs-to-be-removed %(remove)d',
@@ -268,52 +997,50 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
 
         if self.mode == SYNC_MODE_REPAIR:
             #仅repair模式时才向nb库中插入
-            with self.ovn_api.transaction(check_error=True) as txn:
-                for acla in list(itertools.chain(*neutron_acls.values())):
-                    LOG.warning('ACL found in Neutron but not in '
-                                'OVN DB for port %s', acla['lport'])
-                    txn.add(self.ovn_api.add_acl(**acla))
-
-            with self.ovn_api.transaction(check_error=True) as txn:
-                for aclr in list(itertools.chain(*nb_acls.values())):
-                    # Both lswitch and lport aren't needed within the ACL.
-                    lswitchr = aclr.pop('lswitch').replace('neutron-', '')
-                    lportr = aclr.pop('lport')
-                    aclr_dict = {lportr: aclr}
-                    LOG.warning('ACLs found in OVN DB but not in '
-                                'Neutron for port %s', lportr)
-                    txn.add(self.ovn_api.update_acls(
-                        [lswitchr],
-                        [lportr],
-                        aclr_dict,
-                        need_compare=False,
-                        is_add_acl=False
-                    ))
+            # The stale ACLs of a port are deleted at once, by row
+            with SyncTransaction(self.ovn_api, 'ACL-SYNC',
+                                 num_acls_to_add + len(nb_stale_acls)) as txn:
+                for port_acls in neutron_acls.values():
+                    for acla in port_acls.values():
+                        self._log_diff('ACL found in Neutron but not in '
+                                       'OVN DB for port %s', acla['lport'])
+                        txn.add(self.ovn_api.add_acl(**acla))
+                # The stale ACLs are only removed once all the missing ones
+                # are committed
+                txn.commit()
+
+                for (lportr, lswitchr), acl_uuids in nb_stale_acls.items():
+                    self._log_diff('ACLs found in OVN DB but not in '
+                                   'Neutron for port %s', lportr)
+                    txn.add(self.ovn_api.delete_acls(lswitchr, acl_uuids))
 
         LOG.debug('ACL-SYNC: finished @ %s' %
                   str(datetime.now()))
 
-    def _calculate_fips_differences(self, ovn_fips, db_fips):
-        to_add = []
-        to_remove = []
-        for db_fip in db_fips:
-            for ovn_fip in ovn_fips:
-                if (ovn_fip['logical_ip'] == db_fip['fixed_ip_address'] and
-                   ovn_fip['external_ip'] == db_fip['floating_ip_address']):
-                    break
-            else:
-                to_add.append(db_fip)
-
-        for ovn_fip in ovn_fips:
-            for db_fip in db_fips:
-                if (ovn_fip['logical_ip'] == db_fip['fixed_ip_address'] and
-                   ovn_fip['external_ip'] == db_fip['floating_ip_address']):
-                    break
-            else:
-                to_remove.append(ovn_fip)
+    @staticmethod
+    def _calculate_keyed_differences(ovn_items, db_items):
+        """Diff two dictionaries of items by their keys.
 
+        @return: (to_add, to_remove), the list of db items missing in OVN
+                 and the list of OVN items not in the db
+        """
+        to_add = [item for key, item in db_items.items()
+                  if key not in ovn_items]
+        to_remove = [item for key, item in ovn_items.items()
+                     if key not in db_items]
         return to_add, to_remove
 
+    def _calculate_fips_differences(self, ovn_fips, db_fips):
+        """Diff the floating ips of a router.
+
+        @param ovn_fips: dict of (logical_ip, external_ip) (key) and
+                         dnat_and_snat dict (value)
+        @param db_fips: list of floating ips from neutron DB
+        """
+        db_fips = {(fip['fixed_ip_address'], fip['floating_ip_address']): fip
+                   for fip in db_fips}
+        return self._calculate_keyed_differences(ovn_fips, db_fips)
+
     def sync_routers_and_rports(self, ctx):
         """Sync Routers between neutron and NB.
 
@@ -407,7 +1134,9 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                     db_routes.extend(db_extends[lrouter['name']]['routes'])
 
                 ovn_routes = lrouter['static_routes']
-                add_routes, del_routes = helpers.diff_list_of_dict(
+                db_routes = {(route['destination'], route['nexthop']): route
+                             for route in db_routes}
+                add_routes, del_routes = self._calculate_keyed_differences(
                     ovn_routes, db_routes)
                 update_sroutes_list.append({'id': lrouter['name'],
                                             'add': add_routes,
@@ -421,7 +1150,9 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                                          'del': del_fips})
                 ovn_nats = lrouter['snats']
                 db_snats = db_extends[lrouter['name']]['snats']
-                add_snats, del_snats = helpers.diff_list_of_dict(
+                db_snats = {(nat['logical_ip'], nat['external_ip']): nat
+                            for nat in db_snats}
+                add_snats, del_snats = self._calculate_keyed_differences(
                     ovn_nats, db_snats)
                 update_snats_list.append({'id': lrouter['name'],
                                           'add': add_snats,
@@ -431,12 +1162,13 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                 del_lrouters_list.append(lrouter)
 
         for r_id, router in db_routers.items():
-            LOG.warning("Router found in Neutron but not in "
-                        "OVN DB, router id=%s", router['id'])
+            self._report_diff('routers', SyncReport.ADD, router['id'],
+                              "Router found in Neutron but not in "
+                              "OVN DB, router id=%s", router['id'])
             if self.mode == SYNC_MODE_REPAIR:
                 try:
-                    LOG.warning("Creating the router %s in OVN NB DB",
-                                router['id'])
+                    self._log_diff("Creating the router %s in OVN NB DB",
+                                   router['id'])
                     self._ovn_client.create_router(
                         router, add_external_gateway=False)
                     if 'routes' in router:
@@ -463,12 +1195,13 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                                 router['id'])
 
         for rp_id, rrport in db_router_ports.items():
-            LOG.warning("Router Port found in Neutron but not in OVN "
-                        "DB, router port_id=%s", rrport['id'])
+            self._report_diff('router_ports', SyncReport.ADD, rrport['id'],
+                              "Router Port found in Neutron but not in OVN "
+                              "DB, router port_id=%s", rrport['id'])
             if self.mode == SYNC_MODE_REPAIR:
                 try:
-                    LOG.warning("Creating the router port %s in OVN NB DB",
-                                rrport['id'])
+                    self._log_diff("Creating the router port %s in OVN NB "
+                                   "DB", rrport['id'])
                     self._ovn_client.create_router_port(
                         rrport['device_id'], rrport)
                 except RuntimeError:
@@ -476,12 +1209,12 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                                 "NB failed for router port %s", rrport['id'])
 
         for rport in update_lrport_list:
-            LOG.warning("Router Port port_id=%s needs to be updated "
-                        "for networks changed",
-                        rport['id'])
+            self._report_diff('router_ports', SyncReport.UPDATE, rport['id'],
+                              "Router Port port_id=%s needs to be updated "
+                              "for networks changed", rport['id'])
             if self.mode == SYNC_MODE_REPAIR:
                 try:
-                    LOG.warning(
+                    self._log_diff(
                         "Updating networks on router port %s in OVN NB DB",
                         rport['id'])
                     self._ovn_client.update_router_port(rport)
@@ -489,46 +1222,62 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                     LOG.warning("Update router port networks in OVN "
                                 "NB failed for router port %s", rport['id'])
 
-        with self.ovn_api.transaction(check_error=True) as txn:
+        total = len(del_lrouters_list) + len(del_lrouter_ports_list) + sum(
+            len(update['add']) + len(update['del']) for update in
+            itertools.chain(update_sroutes_list, update_fips_list,
+                            update_snats_list))
+        with SyncTransaction(self.ovn_api, 'Router-SYNC', total) as txn:
             for lrouter in del_lrouters_list:
-                LOG.warning("Router found in OVN but not in "
-                            "Neutron, router id=%s", lrouter['name'])
+                self._report_diff('routers', SyncReport.DELETE,
+                                  lrouter['name'],
+                                  "Router found in OVN but not in "
+                                  "Neutron, router id=%s", lrouter['name'])
                 if self.mode == SYNC_MODE_REPAIR:
-                    LOG.warning("Deleting the router %s from OVN NB DB",
-                                lrouter['name'])
+                    self._log_diff("Deleting the router %s from OVN NB DB",
+                                   lrouter['name'])
                     txn.add(self.ovn_api.delete_lrouter(
                             utils.ovn_name(lrouter['name'])))
 
             for lrport_info in del_lrouter_ports_list:
-                LOG.warning("Router Port found in OVN but not in "
-                            "Neutron, port_id=%s", lrport_info['port'])
+                self._report_diff('router_ports', SyncReport.DELETE,
+                                  lrport_info['port'],
+                                  "Router Port found in OVN but not in "
+                                  "Neutron, port_id=%s", lrport_info['port'])
                 if self.mode == SYNC_MODE_REPAIR:
-                    LOG.warning("Deleting the port %s from OVN NB DB",
-                                lrport_info['port'])
+                    self._log_diff("Deleting the port %s from OVN NB DB",
+                                   lrport_info['port'])
                     txn.add(self.ovn_api.delete_lrouter_port(
                             utils.ovn_lrouter_port_name(lrport_info['port']),
                             utils.ovn_name(lrport_info['lrouter']),
                             if_exists=False))
             for sroute in update_sroutes_list:
                 if sroute['add']:
-                    LOG.warning("Router %(id)s static routes %(route)s "
-                                "found in Neutron but not in OVN",
-                                {'id': sroute['id'], 'route': sroute['add']})
+                    for route in sroute['add']:
+                        self._report_diff('static_routes', SyncReport.ADD,
+                                          sroute['id'])
+                    self._log_diff("Router %(id)s static routes %(route)s "
+                                   "found in Neutron but not in OVN",
+                                   {'id': sroute['id'],
+                                    'route': sroute['add']})
                     if self.mode == SYNC_MODE_REPAIR:
-                        LOG.warning("Add static routes %s to OVN NB DB",
-                                    sroute['add'])
+                        self._log_diff("Add static routes %s to OVN NB DB",
+                                       sroute['add'])
                         for route in sroute['add']:
                             txn.add(self.ovn_api.add_static_route(
                                 utils.ovn_name(sroute['id']),
                                 ip_prefix=route['destination'],
                                 nexthop=route['nexthop']))
                 if sroute['del']:
-                    LOG.warning("Router %(id)s static routes %(route)s "
-                                "found in OVN but not in Neutron",
-                                {'id': sroute['id'], 'route': sroute['del']})
+                    for route in sroute['del']:
+                        self._report_diff('static_routes', SyncReport.DELETE,
+                                          sroute['id'])
+                    self._log_diff("Router %(id)s static routes %(route)s "
+                                   "found in OVN but not in Neutron",
+                                   {'id': sroute['id'],
+                                    'route': sroute['del']})
                     if self.mode == SYNC_MODE_REPAIR:
-                        LOG.warning("Delete static routes %s from OVN NB DB",
-                                    sroute['del'])
+                        self._log_diff("Delete static routes %s from OVN NB "
+                                       "DB", sroute['del'])
                         for route in sroute['del']:
                             txn.add(self.ovn_api.delete_static_route(
                                 utils.ovn_name(sroute['id']),
@@ -536,34 +1285,45 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                                 nexthop=route['nexthop']))
             for fip in update_fips_list:
                 if fip['del']:
-                    LOG.warning("Router %(id)s floating ips %(fip)s "
-                                "found in OVN but not in Neutron",
-                                {'id': fip['id'], 'fip': fip['del']})
+                    for nat in fip['del']:
+                        self._report_diff('dnat_and_snats', SyncReport.DELETE,
+                                          fip['id'])
+                    self._log_diff("Router %(id)s floating ips %(fip)s "
+                                   "found in OVN but not in Neutron",
+                                   {'id': fip['id'], 'fip': fip['del']})
                     if self.mode == SYNC_MODE_REPAIR:
-                        LOG.warning(
+                        self._log_diff(
                             "Delete floating ips %s from OVN NB DB",
                             fip['del'])
                         for nat in fip['del']:
                             self._ovn_client._delete_floatingip(
-                                nat, utils.ovn_name(fip['id']), txn=txn)
+                                nat, utils.ovn_name(fip['id']), txn=txn.txn)
+                            txn.operation_added()
                 if fip['add']:
-                    LOG.warning("Router %(id)s floating ips %(fip)s "
-                                "found in Neutron but not in OVN",
-                                {'id': fip['id'], 'fip': fip['add']})
+                    for nat in fip['add']:
+                        self._report_diff('dnat_and_snats', SyncReport.ADD,
+                                          fip['id'])
+                    self._log_diff("Router %(id)s floating ips %(fip)s "
+                                   "found in Neutron but not in OVN",
+                                   {'id': fip['id'], 'fip': fip['add']})
                     if self.mode == SYNC_MODE_REPAIR:
-                        LOG.warning("Add floating ips %s to OVN NB DB",
-                                    fip['add'])
+                        self._log_diff("Add floating ips %s to OVN NB DB",
+                                       fip['add'])
                         for nat in fip['add']:
                             self._ovn_client._create_or_update_floatingip(
-                                nat, txn=txn)
+                                nat, txn=txn.txn)
+                            txn.operation_added()
             for snat in update_snats_list:
                 if snat['del']:
-                    LOG.warning("Router %(id)s snat %(snat)s "
-                                "found in OVN but not in Neutron",
-                                {'id': snat['id'], 'snat': snat['del']})
+                    for nat in snat['del']:
+                        self._report_diff('snats', SyncReport.DELETE,
+                                          snat['id'])
+                    self._log_diff("Router %(id)s snat %(snat)s "
+                                   "found in OVN but not in Neutron",
+                                   {'id': snat['id'], 'snat': snat['del']})
                     if self.mode == SYNC_MODE_REPAIR:
-                        LOG.warning("Delete snats %s from OVN NB DB",
-                                    snat['del'])
+                        self._log_diff("Delete snats %s from OVN NB DB",
+                                       snat['del'])
                         for nat in snat['del']:
                             txn.add(self.ovn_api.delete_nat_rule_in_lrouter(
                                 utils.ovn_name(snat['id']),
@@ -571,12 +1331,15 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                                 external_ip=nat['external_ip'],
                                 type='snat'))
                 if snat['add']:
-                    LOG.warning("Router %(id)s snat %(snat)s "
-                                "found in Neutron but not in OVN",
-                                {'id': snat['id'], 'snat': snat['add']})
+                    for nat in snat['add']:
+                        self._report_diff('snats', SyncReport.ADD,
+                                          snat['id'])
+                    self._log_diff("Router %(id)s snat %(snat)s "
+                                   "found in Neutron but not in OVN",
+                                   {'id': snat['id'], 'snat': snat['add']})
                     if self.mode == SYNC_MODE_REPAIR:
-                        LOG.warning("Add snats %s to OVN NB DB",
-                                    snat['add'])
+                        self._log_diff("Add snats %s to OVN NB DB",
+                                       snat['add'])
                         for nat in snat['add']:
                             txn.add(self.ovn_api.add_nat_rule_in_lrouter(
                                 utils.ovn_name(snat['id']),
@@ -594,6 +1357,8 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
         db_subnets = {}
         filters = {'enable_dhcp': [1]}
         for subnet in self.core_plugin.get_subnets(ctx, filters=filters):
+            if not self._owns_network(subnet['network_id']):
+                continue
             if subnet['ip_version'] == constants.IP_VERSION_6 and (
                 subnet.get('ipv6_address_mode') == constants.IPV6_SLAAC):
                 continue
@@ -624,8 +1389,13 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                 del_subnet_dhcp_opts_list.append(ovn_dhcp_opts)
 
         for subnet_id, subnet in db_subnets.items():
-            LOG.warning('DHCP options for subnet %s is present in '
-                        'Neutron but out of sync for OVN', subnet_id)
+            if 'ovn_dhcp_options' in subnet:
+                action = SyncReport.UPDATE
+            else:
+                action = SyncReport.ADD
+            self._report_diff('subnet_dhcp_options', action, subnet_id,
+                              'DHCP options for subnet %s is present in '
+                              'Neutron but out of sync for OVN', subnet_id)
             if self.mode == SYNC_MODE_REPAIR:
                 try:
                     LOG.debug('Adding/Updating DHCP options for subnet %s in '
@@ -642,9 +1412,11 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
 
         txn_commands = []
         for dhcp_opt in del_subnet_dhcp_opts_list:
-            LOG.warning('Out of sync subnet DHCP options for subnet %s '
-                        'found in OVN NB DB which needs to be deleted',
-                        dhcp_opt['external_ids']['subnet_id'])
+            self._report_diff('subnet_dhcp_options', SyncReport.DELETE,
+                              dhcp_opt['external_ids']['subnet_id'],
+                              'Out of sync subnet DHCP options for subnet %s '
+                              'found in OVN NB DB which needs to be deleted',
+                              dhcp_opt['external_ids']['subnet_id'])
             if self.mode == SYNC_MODE_REPAIR:
                 LOG.debug('Deleting subnet DHCP options for subnet %s ',
                           dhcp_opt['external_ids']['subnet_id'])
@@ -652,10 +1424,10 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                     dhcp_opt['uuid']))
 
         #自数据库移除
-        if txn_commands:
-            with self.ovn_api.transaction(check_error=True) as txn:
-                for cmd in txn_commands:
-                    txn.add(cmd)
+        with SyncTransaction(self.ovn_api, 'Subnet-DHCP-Options-SYNC',
+                             len(txn_commands)) as txn:
+            for cmd in txn_commands:
+                txn.add(cmd)
         LOG.debug('OVN-NB Sync DHCP options for Neutron subnets finished')
 
     def _sync_port_dhcp_options(self, ctx, ports_need_sync_dhcp_opts,
@@ -672,6 +1444,9 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
             if self.mode == SYNC_MODE_REPAIR:
                 LOG.debug('Updating DHCP options for port %s in OVN NB DB',
                           port['id'])
+                # The port is set to the DHCP options created along with
+                # it, in the same transaction
+                port_commands = []
                 set_lsp = {}
                 for ip_v in [constants.IP_VERSION_4, constants.IP_VERSION_6]:
                     dhcp_opts = (
@@ -692,15 +1467,18 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                         # to add or update port dhcp options.
                         ovn_port_dhcp_opts[ip_v].pop(port['id'], None)
                         dhcp_options = dhcp_opts['cmd']
-                        txn_commands.append(dhcp_options)
+                        port_commands.append(dhcp_options)
                         set_lsp[lsp_dhcp_key[ip_v]] = dhcp_options
                 if set_lsp:
-                    txn_commands.append(self.ovn_api.set_lswitch_port(
+                    port_commands.append(self.ovn_api.set_lswitch_port(
                         lport_name=port['id'], **set_lsp))
+                if port_commands:
+                    txn_commands.append(port_commands)
 
         for ip_v in [constants.IP_VERSION_4, constants.IP_VERSION_6]:
             for port_id, dhcp_opt in ovn_port_dhcp_opts[ip_v].items():
-                LOG.warning(
+                self._report_diff(
+                    'port_dhcp_options', SyncReport.DELETE, port_id,
                     'Out of sync port DHCPv%(ip_version)d options for '
                     '(subnet %(subnet_id)s port %(port_id)s) found in OVN '
                     'NB DB which needs to be deleted',
@@ -712,13 +1490,13 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                     LOG.debug('Deleting port DHCPv%d options for (subnet %s, '
                               'port %s)', ip_v,
                               dhcp_opt['external_ids']['subnet_id'], port_id)
-                    txn_commands.append(self.ovn_api.delete_dhcp_options(
-                        dhcp_opt['uuid']))
+                    txn_commands.append([self.ovn_api.delete_dhcp_options(
+                        dhcp_opt['uuid'])])
 
-        if txn_commands:
-            with self.ovn_api.transaction(check_error=True) as txn:
-                for cmd in txn_commands:
-                    txn.add(cmd)
+        with SyncTransaction(self.ovn_api, 'Port-DHCP-Options-SYNC',
+                             len(txn_commands)) as txn:
+            for commands in txn_commands:
+                txn.add(*commands)
         LOG.debug('OVN-NB Sync DHCP options for Neutron ports with extra '
                   'dhcp options assigned finished')
 
@@ -731,20 +1509,22 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
         if not config.is_ovn_metadata_enabled():
             return
         LOG.debug('OVN sync metadata ports started')
-        for net in self.core_plugin.get_networks(ctx):
-            dhcp_ports = self.core_plugin.get_ports(ctx, filters=dict(
-                network_id=[net['id']],
-                device_owner=[constants.DEVICE_OWNER_DHCP]))
+        snapshot = self._get_snapshot(ctx)
+        ports_changed = False
+        for net in snapshot.networks:
+            dhcp_ports = snapshot.get_dhcp_ports(net['id'])
             if not dhcp_ports:
-                LOG.warning('Missing metadata port found in Neutron for '
-                            'network %s', net['id'])
+                self._report_diff('metadata_ports', SyncReport.ADD, net['id'],
+                                  'Missing metadata port found in Neutron '
+                                  'for network %s', net['id'])
                 if self.mode == SYNC_MODE_REPAIR:
                     try:
                         # Create the missing port in both Neutron and OVN.
-                        LOG.warning('Creating missing metadadata port in '
-                                    'Neutron and OVN for network %s',
-                                    net['id'])
+                        self._log_diff('Creating missing metadadata port in '
+                                       'Neutron and OVN for network %s',
+                                       net['id'])
                         self._ovn_client.create_metadata_port(ctx, net)
+                        ports_changed = True
                     except n_exc.IpAddressGenerationFailure:
                         LOG.error('Could not allocate IP addresses for '
                                   'metadata port in network %s', net['id'])
@@ -753,45 +1533,59 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                 # Delete all but one DHCP ports. Only one is needed for
                 # metadata.
                 for port in dhcp_ports[1:]:
-                    LOG.warning('Unnecessary DHCP port %s for network %s '
-                                'found in Neutron', port['id'], net['id'])
+                    self._report_diff('dhcp_ports', SyncReport.DELETE,
+                                      port['id'],
+                                      'Unnecessary DHCP port %s for network '
+                                      '%s found in Neutron', port['id'],
+                                      net['id'])
                     if self.mode == SYNC_MODE_REPAIR:
-                        LOG.warning('Deleting unnecessary DHCP port %s for '
-                                    'network %s', port['id'], net['id'])
+                        self._log_diff('Deleting unnecessary DHCP port %s '
+                                       'for network %s', port['id'],
+                                       net['id'])
                         self.core_plugin.delete_port(ctx, port['id'])
+                        ports_changed = True
                     db_ports.pop(port['id'], None)
                 port = dhcp_ports[0]
                 if port['id'] in db_ports.keys():
-                    LOG.warning('Metadata port %s for network %s found in '
-                                'Neutron but not in OVN',
-                                port['id'], net['id'])
+                    self._report_diff('ports', SyncReport.ADD, port['id'],
+                                      'Metadata port %s for network %s found '
+                                      'in Neutron but not in OVN',
+                                      port['id'], net['id'])
                     if self.mode == SYNC_MODE_REPAIR:
-                        LOG.warning('Creating metadata port %s for network '
-                                    '%s in OVN',
-                                    port['id'], net['id'])
+                        self._log_diff('Creating metadata port %s for '
+                                       'network %s in OVN',
+                                       port['id'], net['id'])
                         self._create_port_in_ovn(ctx, port)
                     db_ports.pop(port['id'])
 
             if self.mode == SYNC_MODE_REPAIR:
                 # Make sure that this port has an IP address in all the subnets
-                self._ovn_client.update_metadata_port(ctx, net['id'])
+                if self._ovn_client.update_metadata_port(ctx, net['id']):
+                    ports_changed = True
+        if ports_changed:
+            # The following phases must see the metadata ports changes
+            snapshot.invalidate('ports')
+            snapshot.invalidate('dhcp_ports')
         LOG.debug('OVN sync metadata ports finished')
 
     def sync_networks_ports_and_dhcp_opts(self, ctx):
         LOG.debug('OVN-NB Sync networks, ports and DHCP options started')
         db_networks = {}
+        snapshot = self._get_snapshot(ctx)
         #实现network-id与network的映射
-        for net in self.core_plugin.get_networks(ctx):
+        for net in snapshot.networks:
             db_networks[utils.ovn_name(net['id'])] = net
 
         # Ignore the floating ip ports with device_owner set to
         # constants.DEVICE_OWNER_FLOATINGIP
         # 取所有非floating-ip的port
         db_ports = {port['id']: port for port in
-                    self.core_plugin.get_ports(ctx) if not
+                    snapshot.ports if not
                     utils.is_lsp_ignored(port)}
 
         ovn_all_dhcp_options = self.ovn_api.get_all_dhcp_options()
+        if self.shard is not None:
+            self._filter_dhcp_options(ctx, ovn_all_dhcp_options)
         db_network_cache = dict(db_networks)
 
         ports_need_sync_dhcp_opts = [] #需要同步dhcp选项的port
@@ -800,6 +1594,10 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
         del_lports_list = [] #需要删除的lport
         add_provnet_ports_list = [] #需要添加provnet_port
         for lswitch in lswitches:
+            if not self._owns_network(lswitch['name'].replace('neutron-',
+                                                              '')):
+                # The logical switch is synced by another shard
+                continue
             if lswitch['name'] in db_networks:
                 #确定port是否存在
                 for lport in lswitch['ports']:
@@ -829,8 +1627,9 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
 
         #前文已将存在的network自db_networks中移除掉了，故余下的均为需要添加的
         for net_id, network in db_networks.items():
-            LOG.warning("Network found in Neutron but not in "
-                        "OVN DB, network_id=%s", network['id'])
+            self._report_diff('networks', SyncReport.ADD, network['id'],
+                              "Network found in Neutron but not in "
+                              "OVN DB, network_id=%s", network['id'])
             if self.mode == SYNC_MODE_REPAIR:
                 try:
                     LOG.debug('Creating the network %s in OVN NB DB',
@@ -848,32 +1647,35 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
 
         #需要添加的port
         for port_id, port in db_ports.items():
-            LOG.warning("Port found in Neutron but not in OVN "
-                        "DB, port_id=%s", port['id'])
-            if self.mode == SYNC_MODE_REPAIR:
-                try:
-                    LOG.debug('Creating the port %s in OVN NB DB',
-                              port['id'])
-                    self._create_port_in_ovn(ctx, port)
-                    if port_id in ovn_all_dhcp_options['ports_v4']:
-                        _, lsp_opts = utils.get_lsp_dhcp_opts(
-                            port, constants.IP_VERSION_4)
-                        if lsp_opts:
-                            ovn_all_dhcp_options['ports_v4'].pop(port_id)
-                    if port_id in ovn_all_dhcp_options['ports_v6']:
-                        _, lsp_opts = utils.get_lsp_dhcp_opts(
-                            port, constants.IP_VERSION_6)
-                        if lsp_opts:
-                            ovn_all_dhcp_options['ports_v6'].pop(port_id)
-                except RuntimeError:
-                    LOG.warning("Create port in OVN NB failed for"
-                                " port %s", port['id'])
-
-        with self.ovn_api.transaction(check_error=True) as txn:
+            self._report_diff('ports', SyncReport.ADD, port['id'],
+                              "Port found in Neutron but not in OVN "
+                              "DB, port_id=%s", port['id'])
+        if self.mode == SYNC_MODE_REPAIR and db_ports:
+            LOG.debug('Creating %d ports in OVN NB DB', len(db_ports))
+            for port in self._create_ports_in_ovn(ctx,
+                                                  list(db_ports.values())):
+                port_id = port['id']
+                if port_id in ovn_all_dhcp_options['ports_v4']:
+                    _, lsp_opts = utils.get_lsp_dhcp_opts(
+                        port, constants.IP_VERSION_4)
+                    if lsp_opts:
+                        ovn_all_dhcp_options['ports_v4'].pop(port_id)
+                if port_id in ovn_all_dhcp_options['ports_v6']:
+                    _, lsp_opts = utils.get_lsp_dhcp_opts(
+                        port, constants.IP_VERSION_6)
+                    if lsp_opts:
+                        ovn_all_dhcp_options['ports_v6'].pop(port_id)
+
+        total = (len(del_lswitchs_list) + len(add_provnet_ports_list) +
+                 len(del_lports_list))
+        with SyncTransaction(self.ovn_api, 'Network-Port-SYNC',
+                             total) as txn:
             #lswitch移除
             for lswitch in del_lswitchs_list:
-                LOG.warning("Network found in OVN but not in "
-                            "Neutron, network_id=%s", lswitch['name'])
+                self._report_diff('networks', SyncReport.DELETE,
+                                  lswitch['name'].replace('neutron-', ''),
+                                  "Network found in OVN but not in "
+                                  "Neutron, network_id=%s", lswitch['name'])
                 if self.mode == SYNC_MODE_REPAIR:
                     LOG.debug('Deleting the network %s from OVN NB DB',
                               lswitch['name'])
@@ -881,37 +1683,44 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
 
             for provnet_port_info in add_provnet_ports_list:
                 network = provnet_port_info['network']
-                LOG.warning("Provider network found in Neutron but "
-                            "provider network port not found in OVN DB, "
-                            "network_id=%s", provnet_port_info['lswitch'])
+                self._report_diff('provnet_ports', SyncReport.ADD,
+                                  network['id'],
+                                  "Provider network found in Neutron but "
+                                  "provider network port not found in OVN "
+                                  "DB, network_id=%s",
+                                  provnet_port_info['lswitch'])
                 if self.mode == SYNC_MODE_REPAIR:
                     LOG.debug('Creating the provnet port %s in OVN NB DB',
                               utils.ovn_provnet_port_name(network['id']))
                     self._ovn_client._create_provnet_port(
-                        txn, network, network.get(pnet.PHYSICAL_NETWORK),
+                        txn.txn, network, network.get(pnet.PHYSICAL_NETWORK),
                         network.get(pnet.SEGMENTATION_ID))
+                    txn.operation_added()
 
             for lport_info in del_lports_list:
-                LOG.warning("Port found in OVN but not in "
-                            "Neutron, port_id=%s", lport_info['port'])
+                self._report_diff('ports', SyncReport.DELETE,
+                                  lport_info['port'],
+                                  "Port found in OVN but not in "
+                                  "Neutron, port_id=%s", lport_info['port'])
                 if self.mode == SYNC_MODE_REPAIR:
                     LOG.debug('Deleting the port %s from OVN NB DB',
                               lport_info['port'])
-                    txn.add(self.ovn_api.delete_lswitch_port(
+                    commands = [self.ovn_api.delete_lswitch_port(
                         lport_name=lport_info['port'],
-                        lswitch_name=lport_info['lswitch']))
+                        lswitch_name=lport_info['lswitch'])]
                     if lport_info['port'] in ovn_all_dhcp_options['ports_v4']:
                         LOG.debug('Deleting port DHCPv4 options for (port %s)',
                                   lport_info['port'])
-                        txn.add(self.ovn_api.delete_dhcp_options(
-                                ovn_all_dhcp_options['ports_v4'].pop(
-                                    lport_info['port'])['uuid']))
+                        commands.append(self.ovn_api.delete_dhcp_options(
+                            ovn_all_dhcp_options['ports_v4'].pop(
+                                lport_info['port'])['uuid']))
                     if lport_info['port'] in ovn_all_dhcp_options['ports_v6']:
                         LOG.debug('Deleting port DHCPv6 options for (port %s)',
                                   lport_info['port'])
-                        txn.add(self.ovn_api.delete_dhcp_options(
-                                ovn_all_dhcp_options['ports_v6'].pop(
-                                    lport_info['port'])['uuid']))
+                        commands.append(self.ovn_api.delete_dhcp_options(
+                            ovn_all_dhcp_options['ports_v6'].pop(
+                                lport_info['port'])['uuid']))
+                    txn.add(*commands)
 
         self._sync_port_dhcp_options(ctx, ports_need_sync_dhcp_opts,
                                      ovn_all_dhcp_options['ports_v4'],
@@ -925,7 +1734,7 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
         # Ignore the floating ip ports with device_owner set to
         # constants.DEVICE_OWNER_FLOATINGIP
         db_ports = [port for port in
-                    self.core_plugin.get_ports(ctx) if not
+                    self._get_snapshot(ctx).ports if not
                     port.get('device_owner', '').startswith(
                         constants.DEVICE_OWNER_FLOATINGIP)]
         dns_records = {}
@@ -936,29 +1745,31 @@ class OvnNbSynchronizer(OvnDbSynchronizer):
                     dns_records[port['network_id']] = {}
                 dns_records[port['network_id']].update(port_dns_records)
 
-        for network_id, port_dns_records in dns_records.items():
-            self._set_dns_records(network_id, port_dns_records)
+        with SyncTransaction(self.ovn_api, 'DNS-Records-SYNC',
+                             len(dns_records)) as txn:
+            for network_id, port_dns_records in dns_records.items():
+                self._set_dns_records(txn, network_id, port_dns_records)
 
-    def _set_dns_records(self, network_id, dns_records):
+    def _set_dns_records(self, txn, network_id, dns_records):
         lswitch_name = utils.ovn_name(network_id)
         ls, ls_dns_record = self.ovn_api.get_ls_and_dns_record(lswitch_name)
 
-        with self.ovn_api.transaction(check_error=True) as txn:
-            if not ls_dns_record:
-                dns_add_txn = txn.add(self.ovn_api.dns_add(
-                    external_ids={'ls_name': ls.name}, records=dns_records))
-                txn.add(self.ovn_api.ls_set_dns_records(ls.uuid, dns_add_txn))
-            else:
-                txn.add(self.ovn_api.dns_set_records(ls_dns_record.uuid,
-                                                     **dns_records))
+        if not ls_dns_record:
+            dns_add = self.ovn_api.dns_add(
+                external_ids={'ls_name': ls.name}, records=dns_records)
+            txn.add(dns_add, self.ovn_api.ls_set_dns_records(ls.uuid,
+                                                             dns_add))
+        else:
+            txn.add(self.ovn_api.dns_set_records(ls_dns_record.uuid,
+                                                 **dns_records))
 
 
 class OvnSbSynchronizer(OvnDbSynchronizer):
     """Synchronizer class for SB."""
 
-    def __init__(self, core_plugin, ovn_api, ovn_driver):
+    def __init__(self, core_plugin, ovn_api, ovn_driver, report=None):
         super(OvnSbSynchronizer, self).__init__(
-            core_plugin, ovn_api, ovn_driver)
+            core_plugin, ovn_api, ovn_driver, report=report)
         self.l3_plugin = directory.get_plugin(plugin_constants.L3)
 
     def do_sync(self):
@@ -971,7 +1782,15 @@ class OvnSbSynchronizer(OvnDbSynchronizer):
         LOG.debug("Starting OVN-Southbound DB sync process")
 
         ctx = context.get_admin_context()
-        self.sync_hostname_and_physical_networks(ctx)
+        if self.report is not None:
+            self.report.start_phase('hostname_and_physical_networks')
+        start = time.time()
+        try:
+            self.sync_hostname_and_physical_networks(ctx)
+        finally:
+            if self.report is not None:
+                self.report.end_phase('hostname_and_physical_networks',
+                                      time.time() - start)
         if utils.is_ovn_l3(self.l3_plugin):
             self.l3_plugin.schedule_unhosted_gateways()
 
@@ -983,23 +1802,36 @@ class OvnSbSynchronizer(OvnDbSynchronizer):
 
         stale_hosts = previous_hosts - current_hosts
         for host in stale_hosts:
-            LOG.debug('Stale host %s found in Neutron, but not in OVN SB DB. '
-                      'Clear its SegmentHostMapping in Neutron', host)
+            self._report_host(
+                SyncReport.DELETE, host,
+                'Stale host %s found in Neutron, but not in OVN SB DB. '
+                'Clear its SegmentHostMapping in Neutron')
             self.ovn_driver.update_segment_host_mapping(host, [])
 
         new_hosts = current_hosts - previous_hosts
         for host in new_hosts:
-            LOG.debug('New host %s found in OVN SB DB, but not in Neutron. '
-                      'Add its SegmentHostMapping in Neutron', host)
+            self._report_host(
+                SyncReport.ADD, host,
+                'New host %s found in OVN SB DB, but not in Neutron. '
+                'Add its SegmentHostMapping in Neutron')
             self.ovn_driver.update_segment_host_mapping(
                 host, host_phynets_map[host])
 
         for host in current_hosts & previous_hosts:
-            LOG.debug('Host %s found both in OVN SB DB and Neutron. '
-                      'Trigger updating its SegmentHostMapping in Neutron, '
-                      'to keep OVN SB DB and Neutron have consistent data',
-                      host)
+            self._report_host(
+                SyncReport.UPDATE, host,
+                'Host %s found both in OVN SB DB and Neutron. '
+                'Trigger updating its SegmentHostMapping in Neutron, '
+                'to keep OVN SB DB and Neutron have consistent data')
             self.ovn_driver.update_segment_host_mapping(
                 host, host_phynets_map[host])
 
         LOG.debug('OVN-SB Sync hostname and physical networks finished')
+
+    def _report_host(self, action, host, msg):
+        # The host mappings are always synced, they are only logged at the
+        # debug level
+        if self.report is not None:
+            self.report.add('segment_host_mappings', action, host)
+        else:
+            LOG.debug(msg, host)
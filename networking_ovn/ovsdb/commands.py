@@ -17,6 +17,7 @@ from networking_ovn._i18n import _
 from networking_ovn.common import constants as ovn_const
 from networking_ovn.common import exceptions as ovn_exc
 from networking_ovn.common import utils
+from networking_ovn.ovsdb import ovsdb_monitor
 
 RESOURCE_TYPE_MAP = {
     ovn_const.TYPE_NETWORKS: 'Logical_Switch',
@@ -28,6 +29,60 @@ RESOURCE_TYPE_MAP = {
 }
 
 
+def _row_by_name(api, table, name, *default):
+    """Find a row by its name, like idlutils.row_by_value() does.
+
+    The name indexes of the OVN IDL are used when the table has one,
+    instead of walking all the rows of the table.
+
+    @param api:     The ovsdb API the command runs with
+    @type api:      networking_ovn.ovsdb.impl_idl_ovn.Backend
+    @param table:   The name of the table
+    @type table:    string
+    @param name:    The value of the name column of the row
+    @type name:     string
+    @param default: Optional value returned when no row is found
+    @return:        The row, default if given and no row is found
+    @raise:         idlutils.RowNotFound when no row is found and no
+                    default is given
+    """
+    idl = api.idl
+    if (not isinstance(idl, ovsdb_monitor.BaseOvnIdl) or
+            table not in idl.name_indexes):
+        return idlutils.row_by_value(idl, table, 'name', name, *default)
+
+    row = idl.row_by_name(table, name)
+    if row is not None:
+        return row
+    if default:
+        return default[0]
+    raise idlutils.RowNotFound(table=table, col='name', match=name)
+
+
+def _rows_by_external_id(api, table, key, value):
+    """Find the rows having an external_ids key set to a value.
+
+    The external_ids indexes of the OVN IDL are used when the key is
+    indexed, instead of walking all the rows of the table.
+
+    @param api:   The ovsdb API the command runs with
+    @type api:    networking_ovn.ovsdb.impl_idl_ovn.Backend
+    @param table: The name of the table
+    @type table:  string
+    @param key:   The external_ids key
+    @type key:    string
+    @param value: The value of the key
+    @type value:  string
+    @return:      List of rows
+    """
+    idl = api.idl
+    if (isinstance(idl, ovsdb_monitor.BaseOvnIdl) and
+            (table, key) in idl.external_ids_indexes):
+        return idl.rows_by_external_id(table, key, value)
+    return [row for row in api._tables[table].rows.values()
+            if getattr(row, 'external_ids', {}).get(key) == value]
+
+
 def _addvalue_to_list(row, column, new_value):
     row.addvalue(column, new_value)
 
@@ -46,6 +101,11 @@ def _updatevalues_in_list(row, column, new_values=None, old_values=None):
         row.delvalue(column, old_value)
 
 
+def _setkeys_in_map(row, column, values):
+    for key, value in values.items():
+        row.setkey(column, key, value)
+
+
 def get_lsp_dhcp_options_uuids(lsp, lsp_name):
     # Get dhcpv4_options and dhcpv6_options uuids from Logical_Switch_Port,
     # which are references of port dhcp options in DHCP_Options table.
@@ -94,8 +154,7 @@ class LSwitchSetExternalIdsCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lswitch = idlutils.row_by_value(self.api.idl, 'Logical_Switch',
-                                            'name', self.name)
+            lswitch = _row_by_name(self.api, 'Logical_Switch', self.name)
 
         except idlutils.RowNotFound:
             if self.if_exists:
@@ -103,11 +162,9 @@ class LSwitchSetExternalIdsCommand(command.BaseCommand):
             msg = _("Logical Switch %s does not exist") % self.name
             raise RuntimeError(msg)
 
-        lswitch.verify('external_ids')
-        external_ids = getattr(lswitch, 'external_ids', {})
-        for key, value in self.ext_ids.items():
-            external_ids[key] = value
-        lswitch.external_ids = external_ids
+        # Only the given keys are mutated, concurrent changes to the other
+        # keys of the map do not conflict with this transaction.
+        _setkeys_in_map(lswitch, 'external_ids', self.ext_ids)
 
 
 class AddLSwitchPortCommand(command.BaseCommand):
@@ -120,15 +177,13 @@ class AddLSwitchPortCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lswitch = idlutils.row_by_value(self.api.idl, 'Logical_Switch',
-                                            'name', self.lswitch)
+            lswitch = _row_by_name(self.api, 'Logical_Switch', self.lswitch)
         except idlutils.RowNotFound:
             msg = _("Logical Switch %s does not exist") % self.lswitch
             raise RuntimeError(msg)
         if self.may_exist:
-            port = idlutils.row_by_value(self.api.idl,
-                                         'Logical_Switch_Port', 'name',
-                                         self.lport, None)
+            port = _row_by_name(self.api, 'Logical_Switch_Port',
+                                self.lport, None)
             if port:
                 return
 
@@ -163,8 +218,7 @@ class SetLSwitchPortCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            port = idlutils.row_by_value(self.api.idl, 'Logical_Switch_Port',
-                                         'name', self.lport)
+            port = _row_by_name(self.api, 'Logical_Switch_Port', self.lport)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
@@ -215,10 +269,8 @@ class DelLSwitchPortCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lport = idlutils.row_by_value(self.api.idl, 'Logical_Switch_Port',
-                                          'name', self.lport)
-            lswitch = idlutils.row_by_value(self.api.idl, 'Logical_Switch',
-                                            'name', self.lswitch)
+            lport = _row_by_name(self.api, 'Logical_Switch_Port', self.lport)
+            lswitch = _row_by_name(self.api, 'Logical_Switch', self.lswitch)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
@@ -244,8 +296,7 @@ class AddLRouterCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         if self.may_exist:
-            lrouter = idlutils.row_by_value(self.api.idl, 'Logical_Router',
-                                            'name', self.name, None)
+            lrouter = _row_by_name(self.api, 'Logical_Router', self.name, None)
             if lrouter:
                 #已存在此名称的路由器
                 return
@@ -265,8 +316,7 @@ class UpdateLRouterCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lrouter = idlutils.row_by_value(self.api.idl, 'Logical_Router',
-                                            'name', self.name, None)
+            lrouter = _row_by_name(self.api, 'Logical_Router', self.name, None)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
@@ -287,8 +337,7 @@ class DelLRouterCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lrouter = idlutils.row_by_value(self.api.idl, 'Logical_Router',
-                                            'name', self.name)
+            lrouter = _row_by_name(self.api, 'Logical_Router', self.name)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
@@ -309,14 +358,12 @@ class AddLRouterPortCommand(command.BaseCommand):
     def run_idl(self, txn):
 
         try:
-            lrouter = idlutils.row_by_value(self.api.idl, 'Logical_Router',
-                                            'name', self.lrouter)
+            lrouter = _row_by_name(self.api, 'Logical_Router', self.lrouter)
         except idlutils.RowNotFound:
             msg = _("Logical Router %s does not exist") % self.lrouter
             raise RuntimeError(msg)
         try:
-            idlutils.row_by_value(self.api.idl, 'Logical_Router_Port',
-                                  'name', self.name)
+            _row_by_name(self.api, 'Logical_Router_Port', self.name)
             if self.may_exist:
                 return
             # The LRP entry with certain name has already exist, raise an
@@ -346,9 +393,8 @@ class UpdateLRouterPortCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lrouter_port = idlutils.row_by_value(self.api.idl,
-                                                 'Logical_Router_Port',
-                                                 'name', self.name)
+            lrouter_port = _row_by_name(self.api, 'Logical_Router_Port',
+                                        self.name)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
@@ -373,17 +419,15 @@ class DelLRouterPortCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lrouter_port = idlutils.row_by_value(self.api.idl,
-                                                 'Logical_Router_Port',
-                                                 'name', self.name)
+            lrouter_port = _row_by_name(self.api, 'Logical_Router_Port',
+                                        self.name)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
             msg = _("Logical Router Port %s does not exist") % self.name
             raise RuntimeError(msg)
         try:
-            lrouter = idlutils.row_by_value(self.api.idl, 'Logical_Router',
-                                            'name', self.lrouter)
+            lrouter = _row_by_name(self.api, 'Logical_Router', self.lrouter)
         except idlutils.RowNotFound:
             msg = _("Logical Router %s does not exist") % self.lrouter
             raise RuntimeError(msg)
@@ -401,8 +445,8 @@ class SetLRouterPortInLSwitchPortCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            port = idlutils.row_by_value(self.api.idl, 'Logical_Switch_Port',
-                                         'name', self.lswitch_port)
+            port = _row_by_name(self.api, 'Logical_Switch_Port',
+                                self.lswitch_port)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
@@ -427,8 +471,7 @@ class AddACLCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lswitch = idlutils.row_by_value(self.api.idl, 'Logical_Switch',
-                                            'name', self.lswitch)
+            lswitch = _row_by_name(self.api, 'Logical_Switch', self.lswitch)
         except idlutils.RowNotFound:
             msg = _("Logical Switch %s does not exist") % self.lswitch
             raise RuntimeError(msg)
@@ -448,8 +491,7 @@ class DelACLCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lswitch = idlutils.row_by_value(self.api.idl, 'Logical_Switch',
-                                            'name', self.lswitch)
+            lswitch = _row_by_name(self.api, 'Logical_Switch', self.lswitch)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
@@ -495,16 +537,13 @@ class UpdateACLsCommand(command.BaseCommand):
     def _acl_list_sub(self, acl_list1, acl_list2):
         """Compute the elements in acl_list1 but not in acl_list2.
 
-        If acl_list1 and acl_list2 were sets, the result of this routine
-        could be thought of as acl_list1 - acl_list2. Note that acl_list1
-        and acl_list2 cannot actually be sets as they contain dictionary
-        items i.e. set([{'a':1}) doesn't work.
+        The acls are dictionaries and cannot be put in a set, so they are
+        compared by their hashable key, see utils.ovn_acl_key(). The order
+        of acl_list1 is preserved in the result.
         """
-        acl_diff = []
-        for acl in acl_list1:
-            if acl not in acl_list2:
-                acl_diff.append(acl)
-        return acl_diff
+        acl_keys2 = set(utils.ovn_acl_key(acl) for acl in acl_list2)
+        return [acl for acl in acl_list1
+                if utils.ovn_acl_key(acl) not in acl_keys2]
 
     def _compute_acl_differences(self, port_list, acl_old_values_dict,
                                  acl_new_values_dict, acl_obj_dict):
@@ -516,8 +555,9 @@ class UpdateACLsCommand(command.BaseCommand):
                                     by port id
         @param acl_new_values_dict: Dictionary of new acl values indexed
                                     by port id
-        @param acl_obj_dict: Dictionary of acl objects indexed by the acl
-                             value in string format.
+        @param acl_obj_dict: Dictionary of the lists of acl objects indexed
+                             by the acl key, as returned by
+                             utils.ovn_acl_key().
         @var acl_del_objs_dict: Dictionary of acl objects to be deleted
                                 indexed by the lswitch.
         @var acl_add_values_dict: Dictionary of acl values to be added
@@ -532,11 +572,19 @@ class UpdateACLsCommand(command.BaseCommand):
             lswitch_name = port['network_id']
             acls_old = acl_old_values_dict.get(port['id'], [])
             acls_new = acl_new_values_dict.get(port['id'], [])
-            acls_del = self._acl_list_sub(acls_old, acls_new)
             acls_add = self._acl_list_sub(acls_new, acls_old)
             acl_del_objs = acl_del_objs_dict.setdefault(lswitch_name, [])
-            for acl in acls_del:
-                acl_del_objs.append(acl_obj_dict[str(acl)])
+            acl_keys_new = set(utils.ovn_acl_key(acl) for acl in acls_new)
+            acl_keys_old = set()
+            for acl in acls_old:
+                acl_key = utils.ovn_acl_key(acl)
+                if acl_key in acl_keys_old:
+                    continue
+                acl_keys_old.add(acl_key)
+                # The duplicates of the acls kept are deleted too
+                acl_rows = acl_obj_dict[acl_key]
+                acl_del_objs.extend(
+                    acl_rows[1:] if acl_key in acl_keys_new else acl_rows)
             acl_add_values = acl_add_values_dict.setdefault(lswitch_name, [])
             for acl in acls_add:
                 # Remove lport and lswitch columns
@@ -549,8 +597,7 @@ class UpdateACLsCommand(command.BaseCommand):
         lswitch_ovsdb_dict = {}
         for switch_name in self.lswitch_names:
             switch_name = utils.ovn_name(switch_name)
-            lswitch = idlutils.row_by_value(self.api.idl, 'Logical_Switch',
-                                            'name', switch_name)
+            lswitch = _row_by_name(self.api, 'Logical_Switch', switch_name)
             lswitch_ovsdb_dict[switch_name] = lswitch
         if self.is_add_acl:
             acl_add_values_dict = {}
@@ -565,11 +612,32 @@ class UpdateACLsCommand(command.BaseCommand):
         else:
             acl_add_values_dict = {}
             acl_del_objs_dict = {}
+            port_switches = {port['id']: utils.ovn_name(port['network_id'])
+                             for port in self.port_list}
+            rule_acls = {}
             del_acl_extids = []
-            for acl_dict in self.acl_new_values_dict.values():
-                del_acl_extids.append({acl_dict['match']:
-                                       acl_dict['external_ids']})
+            for port_id, acl_dict in self.acl_new_values_dict.items():
+                rule_id = acl_dict['external_ids'].get(
+                    ovn_const.OVN_SG_RULE_EXT_ID_KEY)
+                switch_name = port_switches.get(port_id)
+                if rule_id is None or switch_name is None:
+                    del_acl_extids.append({acl_dict['match']:
+                                           acl_dict['external_ids']})
+                    continue
+                # The ACLs of a security group rule are found through the
+                # rule id index instead of walking the ACLs of the switch.
+                if rule_id not in rule_acls:
+                    rule_acls[rule_id] = self.api.get_acls_by_sg_rule_id(
+                        rule_id)
+                acl_del_objs = acl_del_objs_dict.setdefault(switch_name, [])
+                for acl in rule_acls[rule_id]:
+                    if (acl.external_ids.get('neutron:lport') == port_id and
+                            acl.match == acl_dict['match']):
+                        acl_del_objs.append(acl)
+            # Other ACLs, e.g. the DHCP ones, are matched on the switches.
             for switch_name, lswitch in lswitch_ovsdb_dict.items():
+                if not del_acl_extids:
+                    break
                 if switch_name not in acl_del_objs_dict:
                     acl_del_objs_dict[switch_name] = []
                 acls = getattr(lswitch, 'acls', [])
@@ -583,14 +651,20 @@ class UpdateACLsCommand(command.BaseCommand):
     def run_idl(self, txn):
 
         if self.need_compare:
-            # Get all relevant ACLs in 1 shot
+            # The port list may be an iterator, it is walked twice below.
+            port_list = list(self.port_list)
+
+            # Get all relevant ACLs in 1 shot, only the ACLs of the updated
+            # ports take part in the comparison.
             acl_values_dict, acl_obj_dict, lswitch_ovsdb_dict = \
-                self.api.get_acls_for_lswitches(self.lswitch_names)
+                self.api.get_acls_for_lswitches(
+                    self.lswitch_names,
+                    lports=set(port['id'] for port in port_list))
 
             # Compute the difference between the new and old set of ACLs
             acl_del_objs_dict, acl_add_values_dict = \
                 self._compute_acl_differences(
-                    self.port_list, acl_values_dict,
+                    port_list, acl_values_dict,
                     self.acl_new_values_dict, acl_obj_dict)
         else:
             lswitch_ovsdb_dict, acl_del_objs_dict, acl_add_values_dict = \
@@ -625,6 +699,30 @@ class UpdateACLsCommand(command.BaseCommand):
                                   old_values=acl_del_objs)
 
 
+class DelACLsCommand(command.BaseCommand):
+    def __init__(self, api, lswitch, acl_uuids, if_exists):
+        super(DelACLsCommand, self).__init__(api)
+        self.lswitch = lswitch
+        self.acl_uuids = acl_uuids
+        self.if_exists = if_exists
+
+    def run_idl(self, txn):
+        try:
+            lswitch = _row_by_name(self.api, 'Logical_Switch', self.lswitch)
+        except idlutils.RowNotFound:
+            if self.if_exists:
+                return
+            msg = _("Logical Switch %s does not exist") % self.lswitch
+            raise RuntimeError(msg)
+
+        acl_table = self.api._tables['ACL']
+        acls_to_del = [acl_table.rows[acl_uuid] for acl_uuid in
+                       self.acl_uuids if acl_uuid in acl_table.rows]
+        for acl in acls_to_del:
+            acl.delete()
+        _updatevalues_in_list(lswitch, 'acls', old_values=acls_to_del)
+
+
 class AddStaticRouteCommand(command.BaseCommand):
     def __init__(self, api, lrouter, **columns):
         super(AddStaticRouteCommand, self).__init__(api)
@@ -633,8 +731,7 @@ class AddStaticRouteCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lrouter = idlutils.row_by_value(self.api.idl, 'Logical_Router',
-                                            'name', self.lrouter)
+            lrouter = _row_by_name(self.api, 'Logical_Router', self.lrouter)
         except idlutils.RowNotFound:
             msg = _("Logical Router %s does not exist") % self.lrouter
             raise RuntimeError(msg)
@@ -655,8 +752,7 @@ class DelStaticRouteCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lrouter = idlutils.row_by_value(self.api.idl, 'Logical_Router',
-                                            'name', self.lrouter)
+            lrouter = _row_by_name(self.api, 'Logical_Router', self.lrouter)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
@@ -682,8 +778,7 @@ class AddAddrSetCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         if self.may_exist:
-            addrset = idlutils.row_by_value(self.api.idl, 'Address_Set',
-                                            'name', self.name, None)
+            addrset = _row_by_name(self.api, 'Address_Set', self.name, None)
             if addrset:
                 return
         row = txn.insert(self.api._tables['Address_Set'])
@@ -700,8 +795,7 @@ class DelAddrSetCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            addrset = idlutils.row_by_value(self.api.idl, 'Address_Set',
-                                            'name', self.name)
+            addrset = _row_by_name(self.api, 'Address_Set', self.name)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
@@ -722,8 +816,7 @@ class UpdateAddrSetCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            addrset = idlutils.row_by_value(self.api.idl, 'Address_Set',
-                                            'name', self.name)
+            addrset = _row_by_name(self.api, 'Address_Set', self.name)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
@@ -746,8 +839,7 @@ class UpdateAddrSetExtIdsCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            addrset = idlutils.row_by_value(self.api.idl, 'Address_Set',
-                                            'name', self.name)
+            addrset = _row_by_name(self.api, 'Address_Set', self.name)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
@@ -755,11 +847,164 @@ class UpdateAddrSetExtIdsCommand(command.BaseCommand):
                     "Can't update external IDs") % self.name
             raise RuntimeError(msg)
 
-        addrset.verify('external_ids')
-        addrset_external_ids = getattr(addrset, 'external_ids', {})
-        for ext_id_key, ext_id_value in self.external_ids.items():
-            addrset_external_ids[ext_id_key] = ext_id_value
-        addrset.external_ids = addrset_external_ids
+        _setkeys_in_map(addrset, 'external_ids', self.external_ids)
+
+
+class AddPortGroupCommand(command.BaseCommand):
+    def __init__(self, api, name, may_exist, **columns):
+        super(AddPortGroupCommand, self).__init__(api)
+        self.name = name
+        self.may_exist = may_exist
+        self.columns = columns
+
+    def run_idl(self, txn):
+        if self.may_exist:
+            port_group = idlutils.row_by_value(self.api.idl, 'Port_Group',
+                                               'name', self.name, None)
+            if port_group:
+                return
+
+        row = txn.insert(self.api._tables['Port_Group'])
+        row.name = self.name
+        # ACLs are passed as a list of column dictionaries and the ports as
+        # a list of logical switch port names, the rows are created or
+        # looked up here so the whole group is built in one transaction.
+        acls = self.columns.pop('acls', [])
+        ports = self.columns.pop('ports', [])
+        for col, val in self.columns.items():
+            setattr(row, col, val)
+        for acl in acls:
+            acl_row = txn.insert(self.api._tables['ACL'])
+            for col, val in acl.items():
+                # The ACL dicts built for add_port_group_acl() also carry
+                # the name of the group, which is not an ACL column.
+                if col == 'port_group':
+                    continue
+                setattr(acl_row, col, val)
+            _addvalue_to_list(row, 'acls', acl_row.uuid)
+        for port in ports:
+            lsp = _row_by_name(self.api, 'Logical_Switch_Port', port, None)
+            if lsp:
+                _addvalue_to_list(row, 'ports', lsp.uuid)
+        self.result = row.uuid
+
+    def post_commit(self, txn):
+        self.result = txn.get_insert_uuid(self.result)
+
+
+class DelPortGroupCommand(command.BaseCommand):
+    def __init__(self, api, name, if_exists):
+        super(DelPortGroupCommand, self).__init__(api)
+        self.name = name
+        self.if_exists = if_exists
+
+    def run_idl(self, txn):
+        try:
+            port_group = idlutils.row_by_value(self.api.idl, 'Port_Group',
+                                               'name', self.name)
+        except idlutils.RowNotFound:
+            if self.if_exists:
+                return
+            msg = _("Port group %s does not exist. "
+                    "Can't delete.") % self.name
+            raise RuntimeError(msg)
+
+        # The ACL table is not a root table, the ACLs of the group are
+        # garbage collected once the group referencing them is gone.
+        port_group.delete()
+
+
+class UpdatePortGroupPortsCommand(command.BaseCommand):
+    def __init__(self, api, name, ports_add, ports_remove, if_exists):
+        super(UpdatePortGroupPortsCommand, self).__init__(api)
+        self.name = name
+        self.ports_add = ports_add
+        self.ports_remove = ports_remove
+        self.if_exists = if_exists
+
+    def _get_lsp_uuids(self, ports):
+        # NOTE: A logical switch port inserted earlier in the same
+        # transaction is already visible by name here, so a port can be
+        # created and added to its groups in a single transaction.
+        uuids = []
+        for port in ports or []:
+            lsp = _row_by_name(self.api, 'Logical_Switch_Port', port, None)
+            if lsp:
+                uuids.append(lsp.uuid)
+        return uuids
+
+    def run_idl(self, txn):
+        try:
+            port_group = idlutils.row_by_value(self.api.idl, 'Port_Group',
+                                               'name', self.name)
+        except idlutils.RowNotFound:
+            if self.if_exists:
+                return
+            msg = _("Port group %s does not exist. "
+                    "Can't update ports") % self.name
+            raise RuntimeError(msg)
+
+        _updatevalues_in_list(
+            port_group, 'ports',
+            new_values=self._get_lsp_uuids(self.ports_add),
+            old_values=self._get_lsp_uuids(self.ports_remove))
+
+
+class AddPortGroupACLCommand(command.BaseCommand):
+    def __init__(self, api, port_group, may_exist, **columns):
+        super(AddPortGroupACLCommand, self).__init__(api)
+        self.port_group = port_group
+        self.may_exist = may_exist
+        self.columns = columns
+
+    def run_idl(self, txn):
+        try:
+            port_group = idlutils.row_by_value(self.api.idl, 'Port_Group',
+                                               'name', self.port_group)
+        except idlutils.RowNotFound:
+            msg = _("Port group %s does not exist") % self.port_group
+            raise RuntimeError(msg)
+
+        if self.may_exist:
+            for acl in getattr(port_group, 'acls', []):
+                if (acl.direction == self.columns['direction'] and
+                        acl.priority == self.columns['priority'] and
+                        acl.match == self.columns['match']):
+                    return
+
+        row = txn.insert(self.api._tables['ACL'])
+        for col, val in self.columns.items():
+            setattr(row, col, val)
+        _addvalue_to_list(port_group, 'acls', row.uuid)
+
+
+class DelPortGroupACLCommand(command.BaseCommand):
+    def __init__(self, api, port_group, direction, priority, match,
+                 if_exists):
+        super(DelPortGroupACLCommand, self).__init__(api)
+        self.port_group = port_group
+        self.direction = direction
+        self.priority = priority
+        self.match = match
+        self.if_exists = if_exists
+
+    def run_idl(self, txn):
+        try:
+            port_group = idlutils.row_by_value(self.api.idl, 'Port_Group',
+                                               'name', self.port_group)
+        except idlutils.RowNotFound:
+            if self.if_exists:
+                return
+            msg = _("Port group %s does not exist") % self.port_group
+            raise RuntimeError(msg)
+
+        for acl in getattr(port_group, 'acls', []):
+            if (acl.direction == self.direction and
+                    acl.priority == self.priority and
+                    acl.match == self.match):
+                _delvalue_from_list(port_group, 'acls', acl)
+                acl.delete()
+                break
 
 
 class UpdateChassisExtIdsCommand(command.BaseCommand):
@@ -780,11 +1025,38 @@ class UpdateChassisExtIdsCommand(command.BaseCommand):
                     "Can't update external IDs") % self.name
             raise RuntimeError(msg)
 
-        chassis.verify('external_ids')
-        chassis_external_ids = getattr(chassis, 'external_ids', {})
-        for ext_id_key, ext_id_value in self.external_ids.items():
-            chassis_external_ids[ext_id_key] = ext_id_value
-        chassis.external_ids = chassis_external_ids
+        _setkeys_in_map(chassis, 'external_ids', self.external_ids)
+
+
+class SetPortBindingConditionCommand(command.BaseCommand):
+    """Monitor the Port_Bindings of a chassis and of some datapaths only.
+
+    The condition is sent to the ovsdb-server when the IDL runs, the
+    Port_Binding rows then show up in (or go away from) the IDL as row
+    create (or delete) notifications. The result is the condition
+    sequence number of the IDL at which they have been received.
+    """
+
+    def __init__(self, api, chassis, datapaths):
+        super(SetPortBindingConditionCommand, self).__init__(api)
+        self.chassis = chassis
+        self.datapaths = datapaths
+
+    def run_idl(self, txn):
+        condition = [['datapath', '==', ['uuid', datapath]]
+                     for datapath in sorted(self.datapaths)]
+        try:
+            chassis = idlutils.row_by_value(self.api.idl, 'Chassis',
+                                            'name', self.chassis)
+            condition.append(['chassis', '==', ['uuid', str(chassis.uuid)]])
+        except idlutils.RowNotFound:
+            # The chassis is not registered yet, the condition must be set
+            # again once it is.
+            pass
+        # The sequence number the IDL condition seqno reaches once the
+        # ovsdb-server has sent the rows matching the condition, None if
+        # python-ovs doesn't track it.
+        self.result = self.api.idl.cond_change('Port_Binding', condition)
 
 
 class UpdatePortBindingExtIdsCommand(command.BaseCommand):
@@ -805,11 +1077,7 @@ class UpdatePortBindingExtIdsCommand(command.BaseCommand):
                     "Can't update external IDs") % self.name
             raise RuntimeError(msg)
 
-        port.verify('external_ids')
-        port_external_ids = getattr(port, 'external_ids', {})
-        for ext_id_key, ext_id_value in self.external_ids.items():
-            port_external_ids[ext_id_key] = ext_id_value
-        port.external_ids = port_external_ids
+        _setkeys_in_map(port, 'external_ids', self.external_ids)
 
 
 class AddDHCPOptionsCommand(command.BaseCommand):
@@ -823,7 +1091,13 @@ class AddDHCPOptionsCommand(command.BaseCommand):
         self.new_insert = False
 
     def _get_dhcp_options_row(self):
-        for row in self.api._tables['DHCP_Options'].rows.values():
+        if self.port_id:
+            rows = _rows_by_external_id(self.api, 'DHCP_Options', 'port_id',
+                                        self.port_id)
+        else:
+            rows = _rows_by_external_id(self.api, 'DHCP_Options',
+                                        'subnet_id', self.subnet_id)
+        for row in rows:
             external_ids = getattr(row, 'external_ids', {})
             port_id = external_ids.get('port_id')
             if self.subnet_id == external_ids.get('subnet_id'):
@@ -874,8 +1148,7 @@ class AddNATRuleInLRouterCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lrouter = idlutils.row_by_value(self.api.idl, 'Logical_Router',
-                                            'name', self.lrouter)
+            lrouter = _row_by_name(self.api, 'Logical_Router', self.lrouter)
         except idlutils.RowNotFound:
             msg = _("Logical Router %s does not exist") % self.lrouter
             raise RuntimeError(msg)
@@ -903,8 +1176,7 @@ class DeleteNATRuleInLRouterCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lrouter = idlutils.row_by_value(self.api.idl, 'Logical_Router',
-                                            'name', self.lrouter)
+            lrouter = _row_by_name(self.api, 'Logical_Router', self.lrouter)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
@@ -936,8 +1208,7 @@ class SetNATRuleInLRouterCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lrouter = idlutils.row_by_value(self.api.idl, 'Logical_Router',
-                                            'name', self.lrouter)
+            lrouter = _row_by_name(self.api, 'Logical_Router', self.lrouter)
         except idlutils.RowNotFound:
             msg = _("Logical Router %s does not exist") % self.lrouter
             raise RuntimeError(msg)
@@ -960,8 +1231,7 @@ class AddNatIpToLRPortPeerOptionsCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lport = idlutils.row_by_value(self.api.idl, 'Logical_Switch_Port',
-                                          'name', self.lport)
+            lport = _row_by_name(self.api, 'Logical_Switch_Port', self.lport)
         except idlutils.RowNotFound:
             msg = _("Logical Switch Port %s does not exist") % self.lport
             raise RuntimeError(msg)
@@ -992,8 +1262,7 @@ class DeleteNatIpFromLRPortPeerOptionsCommand(command.BaseCommand):
 
     def run_idl(self, txn):
         try:
-            lport = idlutils.row_by_value(self.api.idl, 'Logical_Switch_Port',
-                                          'name', self.lport)
+            lport = _row_by_name(self.api, 'Logical_Switch_Port', self.lport)
 
         except idlutils.RowNotFound:
             msg = _("Logical Switch Port %s does not exist") % self.lport
@@ -1031,23 +1300,20 @@ class CheckRevisionNumberCommand(command.BaseCommand):
         # 1. Enhance it to look into maps or, 2. Add a new ``name`` column
         # to the NAT table so that we can use lookup() just like we do
         # for other resources
-        for nat in self.api._tables['NAT'].rows.values():
-            if nat.type != 'dnat_and_snat':
-                continue
-            ext_ids = getattr(nat, 'external_ids', {})
-            if ext_ids.get(ovn_const.OVN_FIP_EXT_ID_KEY) == self.name:
+        for nat in _rows_by_external_id(self.api, 'NAT',
+                                        ovn_const.OVN_FIP_EXT_ID_KEY,
+                                        self.name):
+            if nat.type == 'dnat_and_snat':
                 return nat
 
         raise idlutils.RowNotFound(
             table='NAT', col='external_ids', match=self.name)
 
     def _get_subnet(self):
-        for dhcp in self.api._tables['DHCP_Options'].rows.values():
-            ext_ids = getattr(dhcp, 'external_ids', {})
+        for dhcp in _rows_by_external_id(self.api, 'DHCP_Options',
+                                         'subnet_id', self.name):
             # Ignore ports DHCP Options
-            if ext_ids.get('port_id'):
-                continue
-            if ext_ids.get('subnet_id') == self.name:
+            if not dhcp.external_ids.get('port_id'):
                 return dhcp
 
         raise idlutils.RowNotFound(
@@ -1085,6 +1351,12 @@ class CheckRevisionNumberCommand(command.BaseCommand):
             raise ovn_exc.RevisionConflict(
                 resource_id=self.name, resource_type=self.resource_type)
 
+        # NOTE: The check above runs against the IDL replica, the
+        # ovsdb-server must also check that the revision didn't change
+        # before the transaction commits, or a stale update committed last
+        # would overwrite a newer one. The Python IDL can only verify whole
+        # columns, so external_ids is verified here, the other commands
+        # only mutate their keys.
         ovn_resource.verify('external_ids')
         ovn_resource.setkey('external_ids', ovn_const.OVN_REV_NUM_EXT_ID_KEY,
                             str(neutron_revision))
@@ -1109,8 +1381,7 @@ class DeleteLRouterExtGwCommand(command.BaseCommand):
             return
 
         try:
-            lrouter = idlutils.row_by_value(self.api.idl, 'Logical_Router',
-                                            'name', self.lrouter)
+            lrouter = _row_by_name(self.api, 'Logical_Router', self.lrouter)
         except idlutils.RowNotFound:
             if self.if_exists:
                 return
@@ -1140,8 +1411,8 @@ class DeleteLRouterExtGwCommand(command.BaseCommand):
             return
 
         try:
-            lrouter_port = idlutils.row_by_value(
-                self.api.idl, 'Logical_Router_Port', 'name',
+            lrouter_port = _row_by_name(
+                self.api, 'Logical_Router_Port',
                 utils.ovn_lrouter_port_name(gw_port_id))
         except idlutils.RowNotFound:
             return
@@ -11,6 +11,9 @@
 #    under the License.
 
 import contextlib
+import threading
+import time
+import traceback
 import uuid
 
 from neutron_lib import exceptions as n_exc
@@ -19,12 +22,14 @@ import tenacity
 
 from neutron_lib.utils import helpers
 from oslo_utils import uuidutils
+from ovs.db import idl as ovs_db_idl
 from ovsdbapp.backend.ovs_idl import connection
 from ovsdbapp.backend.ovs_idl import idlutils
 from ovsdbapp.backend.ovs_idl import transaction as idl_trans
 from ovsdbapp.backend.ovs_idl import vlog
 from ovsdbapp.schema.ovn_northbound import impl_idl as nb_impl_idl
 from ovsdbapp.schema.ovn_southbound import impl_idl as sb_impl_idl
+from six.moves import queue
 
 from networking_ovn._i18n import _
 from networking_ovn.common import config as cfg
@@ -49,6 +54,18 @@ class Backend(ovs_idl.Backend):
         self.ovsdb_connection = connection
         super(Backend, self).__init__(connection)
 
+    def _lookup(self, table, record):
+        # The rows of the name indexed tables are looked up in the indexes
+        # of the OVN IDL, the parent class walks the whole table.
+        if (table not in ovsdb_monitor.NAME_INDEXED_TABLES or
+                isinstance(record, uuid.UUID)):
+            return super(Backend, self)._lookup(table, record)
+        if uuidutils.is_uuid_like(record):
+            row = self.tables[table].rows.get(uuid.UUID(record))
+            if row is not None:
+                return row
+        return cmd._row_by_name(self, table, record)
+
     def start_connection(self, connection):
         try:
             self.ovsdb_connection.start()
@@ -106,6 +123,128 @@ class OvsdbConnectionUnavailable(n_exc.ServiceUnavailable):
                 "'ovn_sb_connection' configuration options are correct.")
 
 
+class TransactionCoalescer(object):
+    """Commit the transactions of concurrent callers as a single one.
+
+    The transactions are handed to the coalescer instead of the connection.
+    The first transaction of a batch waits up to the coalescing window, or
+    until the batch is full, before the batch is queued to the connection.
+    """
+
+    def __init__(self, api, window, max_batch):
+        self.api = api
+        self.connection = api.ovsdb_connection
+        self.timeout = self.connection.timeout
+        self.window = window
+        self.max_batch = max_batch
+        # Number of transactions committed as part of a bigger one
+        self.merged_txns = 0
+        self._lock = threading.Lock()
+        self._batch = None
+
+    def queue_txn(self, txn):
+        with self._lock:
+            batch = self._batch
+            first = batch is None
+            if first:
+                batch = self._batch = TransactionBatch(self)
+            batch.txns.append(txn)
+            if len(batch.txns) >= self.max_batch:
+                self._batch = None
+                batch.full.set()
+        if not first:
+            return
+        batch.full.wait(self.window)
+        with self._lock:
+            if self._batch is batch:
+                self._batch = None
+        self.connection.queue_txn(batch)
+
+
+class TransactionBatch(object):
+    """The transactions coalesced into a single OVSDB transaction.
+
+    It is run by the connection thread, which puts the results of the
+    transactions in their own queues. A batch that fails is split in two
+    halves that are committed one after the other, down to the failing
+    transaction that is then committed on its own.
+    """
+
+    def __init__(self, coalescer):
+        self.coalescer = coalescer
+        self.txns = []
+        self.full = threading.Event()
+        self.results = queue.Queue(1)
+
+    def __str__(self):
+        return "; ".join(str(txn) for txn in self.txns)
+
+    def do_commit(self):
+        self._commit(self.txns)
+
+    def _commit(self, txns):
+        if len(txns) == 1:
+            txn = txns[0]
+            try:
+                result = txn.do_commit()
+            except Exception as e:
+                result = idlutils.ExceptionResult(
+                    ex=e, tb=traceback.format_exc())
+            txn.results.put(result)
+            return
+
+        results = self._commit_merged(txns)
+        if results is None:
+            middle = len(txns) // 2
+            self._commit(txns[:middle])
+            self._commit(txns[middle:])
+            return
+
+        self.coalescer.merged_txns += len(txns)
+        LOG.debug("Committed %d transactions as one", len(txns))
+        for txn, result in zip(txns, results):
+            txn.results.put(result)
+
+    def _commit_merged(self, txns):
+        """Commit the commands of all the transactions in one transaction
+
+        @param txns: The transactions to commit
+        @type txns:  list of ovsdbapp transactions
+        @return:     The results of the commands by transaction, or None if
+                     a command or the OVSDB transaction failed
+        """
+        api = self.coalescer.api
+        start_time = time.time()
+        while True:
+            ovsdb_txn = ovs_db_idl.Transaction(api.idl)
+            try:
+                for txn in txns:
+                    txn.pre_commit(ovsdb_txn)
+                    for command in txn.commands:
+                        command.run_idl(ovsdb_txn)
+            except Exception as e:
+                ovsdb_txn.abort()
+                LOG.debug("Splitting coalesced transaction, a command "
+                          "failed: %s", e)
+                return
+            status = ovsdb_txn.commit_block()
+            if status == ovsdb_txn.TRY_AGAIN:
+                if time.time() - start_time > self.coalescer.timeout:
+                    return
+                # See ovsdbapp's Transaction.do_commit()
+                api.idl.run()
+                continue
+            if status == ovsdb_txn.SUCCESS:
+                for txn in txns:
+                    txn.post_commit(ovsdb_txn)
+            elif status != ovsdb_txn.UNCHANGED:
+                LOG.debug("Splitting coalesced transaction, status: %s",
+                          status)
+                return
+            return [[command.result for command in txn.commands]
+                    for txn in txns]
+
+
 # Retry forever to get the OVN NB and SB IDLs. Wait 2^x * 1 seconds between
 # each retry, up to 180 seconds, then 180 seconds afterwards.
 def get_ovn_idls(driver, trigger):
@@ -150,6 +289,22 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
         super(OvsdbNbOvnIdl, self).__init__(connection)
         self.idl._session.reconnect.set_probe_interval(
             cfg.get_ovn_ovsdb_probe_interval())
+        self.txn_coalescer = None
+        window = cfg.get_ovn_ovsdb_txn_coalesce_window()
+        if window:
+            self.txn_coalescer = TransactionCoalescer(
+                self, window / 1000.0,
+                cfg.get_ovn_ovsdb_txn_coalesce_max_batch())
+
+    def create_transaction(self, check_error=False, log_errors=True):
+        if not self.txn_coalescer:
+            return super(OvsdbNbOvnIdl, self).create_transaction(
+                check_error, log_errors)
+        # The transaction is committed through the coalescer, which queues
+        # it to the connection together with the concurrent ones.
+        return idl_trans.Transaction(
+            self, self.txn_coalescer, self.ovsdb_connection.timeout,
+            check_error, log_errors)
 
     @contextlib.contextmanager
     def transaction(self, *args, **kwargs):
@@ -211,11 +366,14 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
 
         @return: list of dict, each dict has key-value:
                  - 'name': string router_id in neutron.
-                 - 'static_routes': list of static routes dict.
+                 - 'static_routes': dict of (destination, nexthop) (key)
+                                    and static route dict (value).
                  - 'ports': dict of port_id in neutron (key) and networks on
                             port (value).
-                 - 'snats': list of snats dict
-                 - 'dnat_and_snats': list of dnat_and_snats dict
+                 - 'snats': dict of (logical_ip, external_ip) (key) and
+                            snat dict (value).
+                 - 'dnat_and_snats': dict of (logical_ip, external_ip) (key)
+                                     and dnat_and_snat dict (value).
         """
         result = []
         for lrouter in self._tables['Logical_Router'].rows.values():
@@ -224,12 +382,13 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
                 continue
             lrports = {lrport.name.replace('lrp-', ''): lrport.networks
                        for lrport in getattr(lrouter, 'ports', [])}
-            sroutes = [{'destination': sroute.ip_prefix,
-                        'nexthop': sroute.nexthop}
-                       for sroute in getattr(lrouter, 'static_routes', [])]
+            sroutes = {(sroute.ip_prefix, sroute.nexthop): {
+                       'destination': sroute.ip_prefix,
+                       'nexthop': sroute.nexthop}
+                       for sroute in getattr(lrouter, 'static_routes', [])}
 
-            dnat_and_snats = []
-            snat = []
+            dnat_and_snats = {}
+            snat = {}
             for nat in getattr(lrouter, 'nat', []):
                 columns = {'logical_ip': nat.logical_ip,
                            'external_ip': nat.external_ip,
@@ -239,9 +398,10 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
                         columns['external_mac'] = nat.external_mac[0]
                     if nat.logical_port:
                         columns['logical_port'] = nat.logical_port[0]
-                    dnat_and_snats.append(columns)
+                    dnat_and_snats[(nat.logical_ip, nat.external_ip)] = (
+                        columns)
                 elif nat.type == 'snat':
-                    snat.append(columns)
+                    snat[(nat.logical_ip, nat.external_ip)] = columns
 
             result.append({'name': lrouter.name.replace('neutron-', ''),
                            'static_routes': sroutes,
@@ -250,22 +410,37 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
                            'dnat_and_snats': dnat_and_snats})
         return result
 
+    def get_acls_by_sg_rule_id(self, rule_id):
+        """Get the ACLs created for a Neutron security group rule
+
+        @param rule_id: The Neutron security group rule id
+        @type rule_id: string
+        @return: List of ACL idl objects
+        """
+        return cmd._rows_by_external_id(
+            self, 'ACL', ovn_const.OVN_SG_RULE_EXT_ID_KEY, rule_id)
+
     def get_acl_by_id(self, acl_id):
-        try:
-            return self.lookup('ACL', uuid.UUID(acl_id))
-        except idlutils.RowNotFound:
-            return
+        # The ACLs are identified by the Neutron security group rule they
+        # were created for, any of them tells the rule exists in OVN.
+        acls = self.get_acls_by_sg_rule_id(acl_id)
+        if acls:
+            return acls[0]
 
-    def get_acls_for_lswitches(self, lswitch_names):
+    def get_acls_for_lswitches(self, lswitch_names, lports=None):
         """Get the existing set of acls that belong to the logical switches
 
         @param lswitch_names: List of logical switch names
         @type lswitch_names: []
+        @param lports: If given, only the acls of these ports are returned
+        @type lports: set
         @var acl_values_dict: A dictionary indexed by port_id containing the
-                              list of acl values in string format that belong
-                              to that port
-        @var acl_obj_dict: A dictionary indexed by acl value containing the
-                           corresponding acl idl object.
+                              list of acl values in dictionary format that
+                              belong to that port
+        @var acl_obj_dict: A dictionary indexed by the acl key, as returned
+                           by utils.ovn_acl_key(), containing the list
+                           of corresponding acl idl objects, more than
+                           one if the acl is duplicated.
         @var lswitch_ovsdb_dict: A dictionary mapping from logical switch
                                  name to lswitch idl object
         @return: (acl_values_dict, acl_obj_dict, lswitch_ovsdb_dict)
@@ -275,16 +450,22 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
         lswitch_ovsdb_dict = {}
         for lswitch_name in lswitch_names:
             try:
-                lswitch = idlutils.row_by_value(self.idl,
-                                                'Logical_Switch',
-                                                'name',
-                                                utils.ovn_name(lswitch_name))
+                lswitch = self.lookup('Logical_Switch',
+                                      utils.ovn_name(lswitch_name))
             except idlutils.RowNotFound:
                 # It is possible for the logical switch to be deleted
                 # while we are searching for it by name in idl.
                 continue
             lswitch_ovsdb_dict[lswitch_name] = lswitch
             acls = getattr(lswitch, 'acls', [])
+            if lports is not None:
+                # Only the acls of the ports are looked up, by their index,
+                # instead of reading the acls of all the switch ports.
+                lswitch_acls = set(acls)
+                acls = [acl for port_id in lports
+                        for acl in cmd._rows_by_external_id(
+                            self, 'ACL', 'neutron:lport', port_id)
+                        if acl in lswitch_acls]
 
             # Iterate over each acl in a lswitch and store the acl in
             # a key:value representation for e.g. acl_string. This
@@ -301,10 +482,35 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
                         acl_string[acl_key] = getattr(acl, acl_key)
                     except AttributeError:
                         pass
-                acl_obj_dict[str(acl_string)] = acl
+                acl_obj_dict.setdefault(
+                    utils.ovn_acl_key(acl_string), []).append(acl)
                 acl_list.append(acl_string)
         return acl_values_dict, acl_obj_dict, lswitch_ovsdb_dict
 
+    def get_lswitch_port_sg_acls(self):
+        """Get the per-port security group ACLs of the logical switches
+
+        Those are the default drop and the security group rule ACLs created
+        for each port when security groups are not modelled as Port_Groups.
+        The per-port DHCP ACLs are not included.
+
+        @return: dict of logical switch name (key) and list of ACL row
+                 uuids (value)
+        """
+        result = {}
+        for lswitch in self._tables['Logical_Switch'].rows.values():
+            acl_uuids = []
+            for acl in getattr(lswitch, 'acls', []):
+                ext_ids = getattr(acl, 'external_ids', {})
+                if 'neutron:lport' not in ext_ids:
+                    continue
+                if (ovn_const.OVN_SG_RULE_EXT_ID_KEY in ext_ids or
+                        acl.priority == ovn_const.ACL_PRIORITY_DROP):
+                    acl_uuids.append(acl.uuid)
+            if acl_uuids:
+                result[lswitch.name] = acl_uuids
+        return result
+
     def create_lrouter(self, name, may_exist=True, **columns):
         return cmd.AddLRouterCommand(self, name,
                                      may_exist, **columns)
@@ -347,6 +553,9 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
                                      need_compare=need_compare,
                                      is_add_acl=is_add_acl)
 
+    def delete_acls(self, lswitch, acl_uuids, if_exists=True):
+        return cmd.DelACLsCommand(self, lswitch, acl_uuids, if_exists)
+
     def add_static_route(self, lrouter, **columns):
         return cmd.AddStaticRouteCommand(self, lrouter, **columns)
 
@@ -369,6 +578,29 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
         return cmd.UpdateAddrSetExtIdsCommand(self, name, external_ids,
                                               if_exists)
 
+    def is_port_groups_supported(self):
+        return self.is_table_present('Port_Group')
+
+    def create_port_group(self, name, may_exist=True, **columns):
+        return cmd.AddPortGroupCommand(self, name, may_exist, **columns)
+
+    def delete_port_group(self, name, if_exists=True):
+        return cmd.DelPortGroupCommand(self, name, if_exists)
+
+    def update_port_group_ports(self, name, ports_add=None, ports_remove=None,
+                                if_exists=True):
+        return cmd.UpdatePortGroupPortsCommand(self, name, ports_add,
+                                               ports_remove, if_exists)
+
+    def add_port_group_acl(self, port_group, may_exist=True, **columns):
+        return cmd.AddPortGroupACLCommand(self, port_group, may_exist,
+                                          **columns)
+
+    def delete_port_group_acl(self, port_group, direction, priority, match,
+                              if_exists=True):
+        return cmd.DelPortGroupACLCommand(self, port_group, direction,
+                                          priority, match, if_exists)
+
     def _get_logical_router_port_gateway_chassis(self, lrp):
         # Try retrieving gateway_chassis with new schema. If new schema is not
         # supported or user is using old schema, then use old schema for
@@ -408,8 +640,7 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
 
     def get_gateway_chassis_binding(self, gateway_name):
         try:
-            lrp = idlutils.row_by_value(
-                self.idl, 'Logical_Router_Port', 'name', gateway_name)
+            lrp = self.lookup('Logical_Router_Port', gateway_name)
             return self._get_logical_router_port_gateway_chassis(lrp)
         except idlutils.RowNotFound:
             return []
@@ -451,26 +682,24 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
     def get_subnet_dhcp_options(self, subnet_id, with_ports=False):
         subnet = None
         ports = []
-        for row in self._tables['DHCP_Options'].rows.values():
-            external_ids = getattr(row, 'external_ids', {})
-            if subnet_id == external_ids.get('subnet_id'):
-                port_id = external_ids.get('port_id')
-                if with_ports and port_id:
-                    ports.append(self._format_dhcp_row(row))
-                elif not port_id:
-                    subnet = self._format_dhcp_row(row)
-                    if not with_ports:
-                        break
+        for row in cmd._rows_by_external_id(self, 'DHCP_Options',
+                                            'subnet_id', subnet_id):
+            port_id = row.external_ids.get('port_id')
+            if with_ports and port_id:
+                ports.append(self._format_dhcp_row(row))
+            elif not port_id:
+                subnet = self._format_dhcp_row(row)
+                if not with_ports:
+                    break
         return {'subnet': subnet, 'ports': ports}
 
     def get_subnets_dhcp_options(self, subnet_ids):
         ret_opts = []
-        for row in self._tables['DHCP_Options'].rows.values():
-            external_ids = getattr(row, 'external_ids', {})
-            if (external_ids.get('subnet_id') in subnet_ids
-                    and not external_ids.get('port_id')):
-                ret_opts.append(self._format_dhcp_row(row))
-                if len(ret_opts) == len(subnet_ids):
+        for subnet_id in set(subnet_ids):
+            for row in cmd._rows_by_external_id(self, 'DHCP_Options',
+                                                'subnet_id', subnet_id):
+                if not row.external_ids.get('port_id'):
+                    ret_opts.append(self._format_dhcp_row(row))
                     break
         return ret_opts
 
@@ -508,10 +737,48 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
             address_sets[name] = data
         return address_sets
 
+    def get_port_group(self, pg_name):
+        if not self.is_port_groups_supported():
+            return None
+        try:
+            return idlutils.row_by_value(self.idl, 'Port_Group',
+                                         'name', pg_name)
+        except idlutils.RowNotFound:
+            return None
+
+    def get_port_groups(self):
+        """Get the Port_Groups created for neutron security groups
+
+        @return: dict of port group name (key) and a dict (value) with:
+                 - 'name': string port group name.
+                 - 'ports': list of logical switch port names.
+                 - 'acls': list of ACL dicts, each with the 'uuid' of the
+                           ACL row plus its columns.
+                 - 'external_ids': dict of the port group external ids.
+        """
+        port_groups = {}
+        if not self.is_port_groups_supported():
+            return port_groups
+        for row in self._tables['Port_Group'].rows.values():
+            if not (ovn_const.OVN_SG_EXT_ID_KEY in row.external_ids or
+                    row.name == ovn_const.OVN_DROP_PORT_GROUP_NAME):
+                continue
+            acls = []
+            for acl in getattr(row, 'acls', []):
+                acl_dict = {'uuid': acl.uuid}
+                for acl_key in getattr(acl, "_data", {}):
+                    acl_dict[acl_key] = getattr(acl, acl_key)
+                acls.append(acl_dict)
+            port_groups[row.name] = {
+                'name': row.name,
+                'ports': [lsp.name for lsp in getattr(row, 'ports', [])],
+                'acls': acls,
+                'external_ids': dict(row.external_ids)}
+        return port_groups
+
     def get_router_port_options(self, lsp_name):
         try:
-            lsp = idlutils.row_by_value(self.idl, 'Logical_Switch_Port',
-                                        'name', lsp_name)
+            lsp = self.lookup('Logical_Switch_Port', lsp_name)
             options = getattr(lsp, 'options')
             for key in list(options.keys()):
                 if key not in ovn_const.OVN_ROUTER_PORT_OPTION_KEYS:
@@ -532,8 +799,7 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
     def get_lrouter_nat_rules(self, lrouter_name):
         #取此路由器对应的所有nat规则
         try:
-            lrouter = idlutils.row_by_value(self.idl, 'Logical_Router',
-                                            'name', lrouter_name)
+            lrouter = self.lookup('Logical_Router', lrouter_name)
         except idlutils.RowNotFound:
             msg = _("Logical Router %s does not exist") % lrouter_name
             raise RuntimeError(msg)
@@ -607,10 +873,14 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
         if not self.is_col_present('NAT', 'external_ids'):
             return
 
-        fip = self.db_find('NAT', ('external_ids', '=',
-                                   {ovn_const.OVN_FIP_EXT_ID_KEY: fip_id}))
-        result = fip.execute(check_error=True)
-        return result[0] if result else None
+        fips = cmd._rows_by_external_id(
+            self, 'NAT', ovn_const.OVN_FIP_EXT_ID_KEY, fip_id)
+        if not fips:
+            return
+        # Return the columns like db_find() does
+        columns = list(self._tables['NAT'].columns) + ['_uuid']
+        return dict((column, idlutils.get_column_value(fips[0], column))
+                    for column in columns)
 
     def get_floatingip_by_ips(self, router_id, logical_ip, external_ip):
         if not all([router_id, logical_ip, external_ip]):
@@ -625,8 +895,7 @@ class OvsdbNbOvnIdl(nb_impl_idl.OvnNbApiIdlImpl, Backend):
     def get_address_set(self, addrset_id, ip_version='ip4'):
         addr_name = utils.ovn_addrset_name(addrset_id, ip_version)
         try:
-            return idlutils.row_by_value(self.idl, 'Address_Set',
-                                         'name', addr_name)
+            return self.lookup('Address_Set', addr_name)
         except idlutils.RowNotFound:
             return None
 
@@ -665,6 +934,11 @@ class OvsdbSbOvnIdl(sb_impl_idl.OvnSbApiIdlImpl, Backend):
         self.idl._session.reconnect.set_probe_interval(
             cfg.get_ovn_ovsdb_probe_interval())
 
+    def _get_port_binding_index(self, name):
+        # The Port_Binding indexes are kept by the OVN IDLs only
+        if isinstance(self.idl, ovsdb_monitor.BaseOvnIdl):
+            return self.idl.port_binding_indexes[name]
+
     def _get_chassis_physnets(self, chassis):
         #给出某个chassis上bridge的物理接口映射配置
         #例如：phys-net1:br-eth0,physnet2:br-eth1
@@ -743,6 +1017,10 @@ class OvsdbSbOvnIdl(sb_impl_idl.OvnSbApiIdlImpl, Backend):
             if_exists=True)
 
     def get_network_port_bindings_by_ip(self, network, ip_address):
+        index = self._get_port_binding_index('datapath_ip')
+        if index is not None:
+            return self.idl.get_indexed_rows(index, (network, ip_address))
+
         rows = self.db_list_rows('Port_Binding').execute(check_error=True)
         # TODO(twilson) It would be useful to have a db_find that takes a
         # comparison function
@@ -750,6 +1028,9 @@ class OvsdbSbOvnIdl(sb_impl_idl.OvnSbApiIdlImpl, Backend):
                 if (r.mac and str(r.datapath.uuid) == network) and
                 ip_address in r.mac[0].split(' ')]
 
+    def set_port_binding_condition(self, chassis, datapaths):
+        return cmd.SetPortBindingConditionCommand(self, chassis, datapaths)
+
     def set_port_cidrs(self, name, cidrs):
         # TODO(twilson) add if_exists to db commands
         return self.db_set('Port_Binding', name, 'external_ids',
@@ -758,11 +1039,19 @@ class OvsdbSbOvnIdl(sb_impl_idl.OvnSbApiIdlImpl, Backend):
     def get_ports_on_chassis(self, chassis):
         # TODO(twilson) Some day it would be nice to stop passing names around
         # and just start using chassis objects so db_find_rows could be used
+        index = self._get_port_binding_index('chassis')
+        if index is not None:
+            return self.idl.get_indexed_rows(index, chassis)
+
         rows = self.db_list_rows('Port_Binding').execute(check_error=True)
         return [r for r in rows if r.chassis and r.chassis[0].name == chassis]
 
     def get_logical_port_chassis_and_datapath(self, name):
-        rows = self.db_list_rows('Port_Binding').execute(check_error=True)
+        index = self._get_port_binding_index('logical_port')
+        if index is not None:
+            rows = self.idl.get_indexed_rows(index, name)
+        else:
+            rows = self.db_list_rows('Port_Binding').execute(check_error=True)
         for port in rows:
             if port.logical_port == name:
                 datapath = str(port.datapath.uuid)
@@ -229,13 +229,22 @@ class API(api.API):
 
     @abc.abstractmethod
     def get_acl_by_id(self, acl_id):
-        """Get an ACL by its ID.
+        """Get an ACL by the ID of its Neutron security group rule.
 
-        :param acl_id:                ID of the ACL to lookup
+        :param acl_id:                ID of the security group rule
         :type acl_id:                 string
         :returns                      The ACL row or None:
         """
 
+    @abc.abstractmethod
+    def get_acls_by_sg_rule_id(self, rule_id):
+        """Get all the ACLs of a Neutron security group rule.
+
+        :param rule_id:               ID of the security group rule
+        :type rule_id:                string
+        :returns:                     List of ACL rows
+        """
+
     @abc.abstractmethod
     def add_static_route(self, lrouter, **columns):
         """Add static route to logical router.
@@ -605,6 +614,126 @@ class API(api.API):
         :returns: The Address Set row or None
         """
 
+    @abc.abstractmethod
+    def delete_acls(self, lswitch, acl_uuids, if_exists=True):
+        """Delete the given ACL rows from a logical switch.
+
+        :param lswitch:      The logical switch the ACLs belong to.
+        :type lswitch:       string
+        :param acl_uuids:    The UUIDs of the ACL rows to delete
+        :type acl_uuids:     list
+        :param if_exists:    Do not fail if the logical switch does not exist
+        :type if_exists:     bool
+        :returns:            :class:`Command` with no result
+        """
+
+    @abc.abstractmethod
+    def get_lswitch_port_sg_acls(self):
+        """Get the per-port security group ACLs of all logical switches.
+
+        :returns: Dictionary of logical switch names and the list of UUIDs
+                  of their per-port drop and security group rule ACLs
+        """
+
+    @abc.abstractmethod
+    def is_port_groups_supported(self):
+        """Whether the Northbound schema has the Port_Group table.
+
+        :returns: True if Port_Groups are supported, False otherwise
+        """
+
+    @abc.abstractmethod
+    def create_port_group(self, name, may_exist=True, **columns):
+        """Create a command to add a Port Group
+
+        :param name:         The name of the port group
+        :type name:          string
+        :param may_exist:    Do not fail if the port group already exists
+        :type may_exist:     bool
+        :param columns:      Dictionary of port group columns. 'acls' is a
+                             list of ACL column dictionaries and 'ports' a
+                             list of logical switch port names
+        :type columns:       dictionary
+        :returns:            :class:`Command` with no result
+        """
+
+    @abc.abstractmethod
+    def delete_port_group(self, name, if_exists=True):
+        """Create a command to delete a Port Group and its ACLs
+
+        :param name:         The name of the port group
+        :type name:          string
+        :param if_exists:    Do not fail if the port group does not exist
+        :type if_exists:     bool
+        :returns:            :class:`Command` with no result
+        """
+
+    @abc.abstractmethod
+    def update_port_group_ports(self, name, ports_add=None, ports_remove=None,
+                                if_exists=True):
+        """Create a command to update the members of a Port Group
+
+        :param name:         The name of the port group
+        :type name:          string
+        :param ports_add:    The logical switch port names to add
+        :type ports_add:     list
+        :param ports_remove: The logical switch port names to remove
+        :type ports_remove:  list
+        :param if_exists:    Do not fail if the port group does not exist
+        :type if_exists:     bool
+        :returns:            :class:`Command` with no result
+        """
+
+    @abc.abstractmethod
+    def add_port_group_acl(self, port_group, may_exist=True, **columns):
+        """Create a command to add an ACL to a Port Group
+
+        :param port_group:   The name of the port group
+        :type port_group:    string
+        :param may_exist:    Do not fail if an ACL with the same direction,
+                             priority and match already exists
+        :type may_exist:     bool
+        :param columns:      Dictionary of ACL columns
+                             Supported columns: see ACL table in OVN_Northbound
+        :type columns:       dictionary
+        :returns:            :class:`Command` with no result
+        """
+
+    @abc.abstractmethod
+    def delete_port_group_acl(self, port_group, direction, priority, match,
+                              if_exists=True):
+        """Create a command to delete an ACL from a Port Group
+
+        :param port_group:   The name of the port group
+        :type port_group:    string
+        :param direction:    The direction of the ACL
+        :type direction:     string
+        :param priority:     The priority of the ACL
+        :type priority:      int
+        :param match:        The match of the ACL
+        :type match:         string
+        :param if_exists:    Do not fail if the port group does not exist
+        :type if_exists:     bool
+        :returns:            :class:`Command` with no result
+        """
+
+    @abc.abstractmethod
+    def get_port_group(self, pg_name):
+        """Get a Port Group by its name.
+
+        :param pg_name: The Port Group name
+        :type pg_name: string
+        :returns: The Port Group row or None
+        """
+
+    @abc.abstractmethod
+    def get_port_groups(self):
+        """Get the Port Groups created for neutron security groups.
+
+        :returns: Dictionary of port group names and their ports, ACLs and
+                  external ids
+        """
+
 
 @six.add_metaclass(abc.ABCMeta)
 class SbAPI(api.API):
@@ -12,6 +12,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import heapq
+import itertools
+import threading
+import time
+
+import futurist
 from neutron.common import config
 from neutron_lib.plugins import constants
 from neutron_lib.plugins import directory
@@ -23,12 +30,168 @@ from ovsdbapp.backend.ovs_idl import connection
 from ovsdbapp.backend.ovs_idl import event as row_event
 from ovsdbapp.backend.ovs_idl import idlutils
 from ovsdbapp import event
+from six.moves import queue
 
 from networking_ovn.common import config as ovn_config
+from networking_ovn.common import constants as ovn_const
 from networking_ovn.common import utils
 
 LOG = log.getLogger(__name__)
 
+# Time in seconds after which an event waiting to run is logged
+EVENT_LATENCY_WARNING = 10
+
+# Time in seconds between two logs of the stats of the events run
+EVENT_STATS_INTERVAL = 300
+
+# Maximum number of threads calling back the ports done waiting for their
+# metadata service
+METADATA_WAITERS_MAX_WORKERS = 8
+
+# The Northbound tables the commands look up by their name column
+NAME_INDEXED_TABLES = ('Logical_Switch', 'Logical_Switch_Port',
+                       'Logical_Router', 'Logical_Router_Port',
+                       'Address_Set')
+
+# The Northbound (table, external_ids key) the Neutron resources are looked
+# up by
+EXTERNAL_IDS_INDEXES = (
+    ('ACL', ovn_const.OVN_SG_RULE_EXT_ID_KEY),
+    ('ACL', 'neutron:lport'),
+    ('DHCP_Options', 'subnet_id'),
+    ('DHCP_Options', 'port_id'),
+    ('NAT', ovn_const.OVN_FIP_EXT_ID_KEY),
+)
+
+# The Northbound tables and columns read or written by the Neutron workers,
+# None stands for all the columns of the table. The load balancer, QoS and
+# ACL logging (name, severity, meter) data is not managed by Neutron, so it
+# is not replicated by the workers. Tables and columns missing from the
+# schema of the server are skipped.
+OVN_NB_TABLES = {
+    'Logical_Switch': ('name', 'ports', 'acls', 'dns_records',
+                       'other_config', 'external_ids'),
+    'Logical_Switch_Port': None,
+    'Logical_Router': ('name', 'ports', 'static_routes', 'nat', 'enabled',
+                       'options', 'external_ids'),
+    'Logical_Router_Port': None,
+    'Logical_Router_Static_Route': None,
+    'Gateway_Chassis': None,
+    'NAT': None,
+    'ACL': ('priority', 'direction', 'match', 'action', 'log',
+            'external_ids'),
+    'Address_Set': None,
+    'Port_Group': None,
+    'DHCP_Options': None,
+    'DNS': None,
+}
+
+# The Southbound tables and columns read by the API workers, they only
+# look up the chassis when binding ports and scheduling gateways
+OVN_SB_TABLES = {
+    'Chassis': ('name', 'hostname', 'external_ids'),
+}
+
+# The Southbound tables and columns read by the OvnWorker, which handles
+# the chassis and port binding events
+OVN_SB_WORKER_TABLES = {
+    'Chassis': None,
+    'Encap': None,
+    'Port_Binding': None,
+    'Datapath_Binding': None,
+}
+
+
+class EventDebouncer(object):
+    """Collapse the bursts of calls made for a key into the last one.
+
+    A call runs once no other call was scheduled for its key during the
+    window. The calls that settled are handed, in the order their keys
+    settled, to the executor: a callable taking the key, the function and
+    its arguments. Without an executor they run in the thread of the
+    debouncer.
+    """
+
+    def __init__(self, window, executor=None):
+        self.window = window
+        self._executor = executor or self._run_inline
+        # Number of calls replaced by a later call for the same key
+        self.collapsed = 0
+        self._lock = threading.Lock()
+        # key -> (time, func, args), ordered by time
+        self._pending = collections.OrderedDict()
+        self._thread = None
+
+    def schedule(self, key, func, *args):
+        with self._lock:
+            if self._pending.pop(key, None):
+                self.collapsed += 1
+            self._pending[key] = (time.time(), func, args)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_loop)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _pop_settled(self):
+        """Return the calls that settled and the time until the next one"""
+        settled = []
+        settle_time = time.time() - self.window
+        with self._lock:
+            while self._pending:
+                key, (scheduled_at, func, args) = next(
+                    iter(self._pending.items()))
+                if scheduled_at > settle_time:
+                    return settled, scheduled_at - settle_time
+                del self._pending[key]
+                settled.append((key, func, args))
+        return settled, self.window
+
+    @staticmethod
+    def _run_inline(key, func, *args):
+        func(*args)
+
+    @staticmethod
+    def _run(key, func, args):
+        try:
+            func(*args)
+        except Exception:
+            LOG.exception("Unexpected exception running the debounced "
+                          "call for %s", key)
+
+    def flush(self):
+        settled, next_flush = self._pop_settled()
+        if settled:
+            LOG.debug("Running %(settled)d debounced calls, %(collapsed)d "
+                      "calls collapsed so far",
+                      {'settled': len(settled), 'collapsed': self.collapsed})
+        for key, func, args in settled:
+            self._executor(key, self._run, key, func, args)
+        return next_flush
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush())
+
+
+class DebouncedPortStatusDriver(object):
+    """Debounce the port status updates of the mechanism driver.
+
+    The up and down reports of a port share its key, so a port flapping
+    within the window is only set to its final status.
+    """
+
+    def __init__(self, driver, debouncer):
+        self.driver = driver
+        self.debouncer = debouncer
+
+    def set_port_status_up(self, port_id):
+        self.debouncer.schedule(port_id, self.driver.set_port_status_up,
+                                port_id)
+
+    def set_port_status_down(self, port_id):
+        self.debouncer.schedule(port_id, self.driver.set_port_status_down,
+                                port_id)
+
 
 class ChassisEvent(row_event.RowEvent):
     """Chassis create update delete event."""
@@ -64,8 +227,9 @@ class PortBindingChassisEvent(row_event.RowEvent):
     host_id to find the location of master HA router.
     """
 
-    def __init__(self, driver):
+    def __init__(self, driver, debouncer=None):
         self.driver = driver
+        self.debouncer = debouncer
         self.l3_plugin = directory.get_plugin(constants.L3)
         table = 'Port_Binding'
         events = (self.ROW_UPDATE)
@@ -81,7 +245,15 @@ class PortBindingChassisEvent(row_event.RowEvent):
             host = chassis[0].hostname
             LOG.info("Router %(router)s is bound to host %(host)s",
                      {'router': router, 'host': host})
-            if ovn_config.is_ovn_l3():
+            if not ovn_config.is_ovn_l3():
+                return
+            if self.debouncer:
+                # Only the last chassis of a flapping gateway is bound
+                self.debouncer.schedule(
+                    ('gateway', router),
+                    self.l3_plugin.update_router_gateway_port_bindings,
+                    router, host)
+            else:
                 self.l3_plugin.update_router_gateway_port_bindings(
                     router, host)
 
@@ -165,32 +337,578 @@ class LogicalSwitchPortUpdateDownEvent(row_event.RowEvent):
         self.driver.set_port_status_down(row.name)
 
 
+class _EventWorker(object):
+    """A thread running the calls dispatched to it in order."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.notifications = queue.Queue()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while True:
+            notification = self.notifications.get()
+            if notification is None:
+                self.notifications.task_done()
+                break
+            func, args = notification
+            func(*args)
+            self.notifications.task_done()
+
+
 class OvnDbNotifyHandler(event.RowEventHandler):
+    """Run the matching events on a pool of threads.
+
+    The events of a row are dispatched to the same thread, so they still
+    run in the order they were received. With a pool of one thread the
+    events run in the notify loop, one at a time. The debounced calls are
+    run by the same threads, see run_call().
+    """
+
     def __init__(self, driver):
+        # The notify loop is started by the parent class
+        self.pool_size = ovn_config.get_ovn_ovsdb_event_pool_size()
+        self._workers = None
+        self._workers_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.events_run = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._stats_logged_at = time.time()
         super(OvnDbNotifyHandler, self).__init__()
         self.driver = driver
 
+    def notify(self, event, row, updates=None):
+        queued_at = time.time()
+        for match in self.matching_events(event, row, updates):
+            self.notifications.put((match, event, row, updates, queued_at))
+
+    def notify_loop(self):
+        while True:
+            notification = self.notifications.get()
+            if notification == event.STOP_EVENT:
+                self._stop_workers()
+                self.notifications.task_done()
+                break
+            try:
+                self._dispatch(*notification)
+            except Exception:
+                # If any unexpected exception happens we don't want the
+                # notify_loop to exit.
+                LOG.exception('Unexpected exception in notify_loop')
+            self.notifications.task_done()
+            self._log_stats()
+
+    def _dispatch(self, match, event, row, updates, queued_at):
+        if self.pool_size <= 1:
+            self.run_event(match, event, row, updates, queued_at)
+            return
+        self._get_worker(row.uuid).notifications.put(
+            (self.run_event, (match, event, row, updates, queued_at)))
+
+    def run_call(self, key, func, *args):
+        """Run a call in the worker of its key.
+
+        The calls made for a key run in order, on the same thread as the
+        other calls and events hashed to it. With a pool of one thread the
+        call runs in the calling thread.
+        """
+        if self.pool_size <= 1:
+            func(*args)
+            return
+        self._get_worker(key).notifications.put((func, args))
+
+    def _get_worker(self, key):
+        # The debounced calls are dispatched outside of the notify loop
+        with self._workers_lock:
+            if self._workers is None:
+                self._workers = [_EventWorker(self)
+                                 for i in range(self.pool_size)]
+            return self._workers[hash(key) % self.pool_size]
+
+    def _stop_workers(self):
+        # The events already dispatched still run before the loop exits
+        with self._workers_lock:
+            workers, self._workers = self._workers, None
+        for event_worker in workers or []:
+            event_worker.notifications.put(None)
+            event_worker.thread.join()
+
+    def run_event(self, match, event, row, updates, queued_at):
+        latency = time.time() - queued_at
+        with self._stats_lock:
+            self.events_run += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+        if latency > EVENT_LATENCY_WARNING:
+            LOG.warning("%(event)s for row %(row)s waited %(latency).2f "
+                        "seconds to run, %(queued)d events are queued",
+                        {'event': match.event_name, 'row': row.uuid,
+                         'latency': latency, 'queued': self.queue_depth})
+        try:
+            match.run(event, row, updates)
+        except Exception:
+            LOG.exception('Unexpected exception running %s',
+                          match.event_name)
+        if match.ONETIME:
+            self.unwatch_event(match)
+
+    @property
+    def queue_depth(self):
+        """The number of events waiting to run"""
+        return self.notifications.qsize() + sum(
+            event_worker.notifications.qsize()
+            for event_worker in self._workers or [])
+
+    def get_stats(self):
+        """Return the queue depth and the latency of the events
+
+        @return: A dict with the number of events queued and run, and
+                 the average and maximum time in seconds they waited
+        """
+        with self._stats_lock:
+            events_run = self.events_run
+            total_latency = self.total_latency
+            max_latency = self.max_latency
+        avg_latency = total_latency / events_run if events_run else 0
+        return {'queue_depth': self.queue_depth,
+                'events_run': events_run,
+                'avg_latency': avg_latency,
+                'max_latency': max_latency}
+
+    def _log_stats(self):
+        now = time.time()
+        if now - self._stats_logged_at < EVENT_STATS_INTERVAL:
+            return
+        self._stats_logged_at = now
+        LOG.info('%(events_run)d OVSDB events run, they waited '
+                 '%(avg_latency).2f seconds on average and '
+                 '%(max_latency).2f seconds at most, %(queue_depth)d '
+                 'events are queued', self.get_stats())
+
+
+class _MetadataWaiter(object):
+
+    def __init__(self, port, chassis, datapath, callback):
+        self.port = port
+        self.key = (chassis, datapath)
+        self.callback = callback
+
+
+class MetadataWaiters(object):
+    """Ports waiting for the metadata service of their chassis.
+
+    The metadata agent lists the datapaths it has provisioned in the
+    external_ids of its Chassis. The ports are parked here until an update
+    of their Chassis lists their datapath, or until they time out, instead
+    of polling the Chassis while the other events wait.
+
+    A single thread times the waiters out and the callbacks run on a
+    bounded pool of threads, so a burst of ports does not start a thread
+    per port.
+    """
+
+    def __init__(self, idl):
+        self.idl = idl
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        # port -> waiter
+        self._waiters = {}
+        # (chassis, datapath) -> ports
+        self._ports = {}
+        # Heap of (deadline, sequence, waiter), the waiters done before
+        # their deadline are skipped when it expires
+        self._deadlines = []
+        self._sequence = itertools.count()
+        self._timer_thread = None
+        self._executor = futurist.ThreadPoolExecutor(
+            max_workers=METADATA_WAITERS_MAX_WORKERS)
+
+    @staticmethod
+    def _metadata_networks(chassis):
+        networks = chassis.external_ids.get(
+            'neutron-metadata-proxy-networks', None)
+        return set(networks.split(',')) if networks else set()
+
+    def wait(self, port, chassis, datapath, callback, timeout):
+        """Call back once the metadata service of a port is ready
+
+        The callback is called right away if the datapath is already
+        provisioned, otherwise from another thread.
+
+        @param port:     The port waiting, it replaces its former waiter
+        @type port:      string
+        @param chassis:  The name of the chassis the port is bound to
+        @type chassis:   string
+        @param datapath: The datapath of the port
+        @type datapath:  string
+        @param callback: Called with True when the datapath is provisioned
+                         or with False when the timeout expires
+        @type callback:  callable
+        @param timeout:  The timeout in seconds
+        @type timeout:   int
+        """
+        waiter = _MetadataWaiter(port, chassis, datapath, callback)
+        with self._lock:
+            self._remove(self._waiters.get(port))
+            self._waiters[port] = waiter
+            self._ports.setdefault(waiter.key, set()).add(port)
+            heapq.heappush(self._deadlines, (time.time() + timeout,
+                                             next(self._sequence), waiter))
+            if self._timer_thread is None:
+                self._timer_thread = threading.Thread(target=self._timer_loop)
+                self._timer_thread.daemon = True
+                self._timer_thread.start()
+            elif self._deadlines[0][2] is waiter:
+                # Wake the timer up for the new earliest deadline
+                self._condition.notify()
+
+        # The datapath may have been provisioned before the waiter was added
+        row = idlutils.row_by_value(self.idl, 'Chassis', 'name', chassis,
+                                    None)
+        if row and datapath in self._metadata_networks(row):
+            self._done(waiter, True)
+
+    def cancel(self, port):
+        with self._lock:
+            self._remove(self._waiters.get(port))
+
+    def chassis_updated(self, row):
+        if not self._waiters:
+            return
+        networks = self._metadata_networks(row)
+        with self._lock:
+            waiters = [self._waiters[port]
+                       for (chassis, datapath), ports in self._ports.items()
+                       if chassis == row.name and datapath in networks
+                       for port in ports]
+        # Called from the IDL, the callbacks must not hold it up
+        for waiter in waiters:
+            self._executor.submit(self._done, waiter, True)
+
+    def _remove(self, waiter):
+        # Must be called with the lock held
+        if waiter is None or self._waiters.get(waiter.port) is not waiter:
+            return False
+        del self._waiters[waiter.port]
+        ports = self._ports[waiter.key]
+        ports.discard(waiter.port)
+        if not ports:
+            del self._ports[waiter.key]
+        return True
+
+    def _done(self, waiter, ready):
+        with self._lock:
+            if not self._remove(waiter):
+                return
+        self._callback(waiter, ready)
+
+    @staticmethod
+    def _callback(waiter, ready):
+        try:
+            waiter.callback(ready)
+        except Exception:
+            LOG.exception("Failed to handle port %s after waiting for its "
+                          "metadata service", waiter.port)
+
+    def _expire(self):
+        """Time out the waiters past their deadline
+
+        Must be called with the lock held.
+
+        @return: The time in seconds until the next deadline, None if no
+                 waiter is left
+        """
+        now = time.time()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            waiter = heapq.heappop(self._deadlines)[2]
+            if self._remove(waiter):
+                self._executor.submit(self._callback, waiter, False)
+        return self._deadlines[0][0] - now if self._deadlines else None
+
+    def _timer_loop(self):
+        with self._condition:
+            while True:
+                self._condition.wait(self._expire())
+
+
+class RowIndex(object):
+    """In-memory index of the rows of a table by a value of each row.
+
+    The index is kept up to date from the IDL notifications, so it is
+    maintained whether or not the notify events are handled by this
+    process. Only row uuids are stored, the callers resolve them against
+    the IDL table and must expect uuids of rows that are gone, e.g. after
+    a reconnection to the ovsdb-server.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._lock = threading.Lock()
+        self._uuids = {}
+        self._values = {}
+
+    def _get_value(self, row):
+        """Return the value the row is indexed by, None to not index it."""
+        raise NotImplementedError()
+
+    def _get_values(self, row):
+        """Return the values the row is indexed by."""
+        value = self._get_value(row)
+        return [] if value is None else [value]
+
+    def notify(self, event, row, updates=None):
+        table = getattr(row, '_table', None)
+        if table is None or table.name != self.table:
+            return
+
+        if event == row_event.RowEvent.ROW_DELETE:
+            values = frozenset()
+        else:
+            values = frozenset(self._get_values(row))
+
+        with self._lock:
+            for old_value in self._values.pop(row.uuid, ()):
+                uuids = self._uuids.get(old_value, set())
+                uuids.discard(row.uuid)
+                if not uuids:
+                    self._uuids.pop(old_value, None)
+            if values:
+                self._values[row.uuid] = values
+            for value in values:
+                self._uuids.setdefault(value, set()).add(row.uuid)
+
+    def get(self, value):
+        with self._lock:
+            return list(self._uuids.get(value, []))
+
+    def matches(self, row, value):
+        """Whether the current content of the row is indexed by value."""
+        return value in self._get_values(row)
+
+
+class ExternalIdsIndex(RowIndex):
+    """In-memory index of the rows of a table by an external_ids key."""
+
+    def __init__(self, table, key):
+        super(ExternalIdsIndex, self).__init__(table)
+        self.key = key
+
+    def _get_value(self, row):
+        return row.external_ids.get(self.key)
+
+
+class ColumnIndex(RowIndex):
+    """In-memory index of the rows of a table by a (string) column."""
+
+    def __init__(self, table, column):
+        super(ColumnIndex, self).__init__(table)
+        self.column = column
+
+    def _get_value(self, row):
+        return getattr(row, self.column, None)
+
+
+class PortBindingChassisIndex(RowIndex):
+    """In-memory index of the Port_Binding rows by their chassis name."""
+
+    def __init__(self):
+        super(PortBindingChassisIndex, self).__init__('Port_Binding')
+
+    def _get_value(self, row):
+        chassis = getattr(row, 'chassis', [])
+        return chassis[0].name if chassis else None
+
+
+class PortBindingIpIndex(RowIndex):
+    """In-memory index of the Port_Binding rows by (datapath, IP address).
+
+    The datapath is the string of its uuid, the IP addresses are the ones
+    following the MAC address in the first entry of the mac column.
+    """
+
+    def __init__(self):
+        super(PortBindingIpIndex, self).__init__('Port_Binding')
+
+    def _get_values(self, row):
+        mac = getattr(row, 'mac', [])
+        if not mac:
+            return []
+        datapath = str(row.datapath.uuid)
+        return [(datapath, ip) for ip in mac[0].split(' ')[1:]]
+
+
+class _PendingRowIndex(RowIndex):
+    """In-memory index of the rows written by a transaction."""
+
+    def __init__(self, index):
+        super(_PendingRowIndex, self).__init__(index.table)
+        self._index = index
+
+    def _get_values(self, row):
+        return self._index._get_values(row)
+
+
+class _TxnRows(dict):
+    """The rows inserted or modified by a transaction being built.
+
+    It replaces the _txn_rows dict of the python-ovs transaction, which
+    stores a row again each time it is written. The rows stored since the
+    last lookup of an index are (re)indexed by the next one, so a lookup
+    doesn't go through all the rows of the transaction.
+    """
+
+    def __init__(self, rows):
+        super(_TxnRows, self).__init__(rows)
+        self._indexes = {}
+
+    def __setitem__(self, row_uuid, row):
+        super(_TxnRows, self).__setitem__(row_uuid, row)
+        for pending_index, unindexed in self._indexes.values():
+            unindexed.add(row_uuid)
+
+    def lookup(self, index, value, table_rows):
+        """Return the uuids of the rows of the transaction indexed by value.
+
+        The uuids of rows deleted since they were indexed may be returned.
+        """
+        if index not in self._indexes:
+            self._indexes[index] = (_PendingRowIndex(index), set(self))
+        pending_index, unindexed = self._indexes[index]
+        while unindexed:
+            row = dict.get(self, unindexed.pop())
+            # The deleted rows are not in their table anymore
+            if row is not None and table_rows.get(row.uuid) is row:
+                pending_index.notify(row_event.RowEvent.ROW_UPDATE, row)
+        return pending_index.get(value)
+
 
 class BaseOvnIdl(connection.OvsdbIdl):
+
+    def __init__(self, remote, schema):
+        self.txn = None
+        super(BaseOvnIdl, self).__init__(remote, schema)
+        # Index the tables the commands look their rows up by name in.
+        self.name_indexes = dict(
+            (table, ColumnIndex(table, 'name'))
+            for table in NAME_INDEXED_TABLES)
+        # Index the rows the Neutron resources are looked up by external
+        # id for, e.g. the ACLs by the security group rule they implement.
+        self.external_ids_indexes = dict(
+            ((table, key), ExternalIdsIndex(table, key))
+            for table, key in EXTERNAL_IDS_INDEXES)
+        self.acl_rule_index = self.external_ids_indexes[
+            ('ACL', ovn_const.OVN_SG_RULE_EXT_ID_KEY)]
+        # Index the Southbound Port_Bindings, looked up for each port status
+        # change, metadata port binding event and metadata request.
+        self.port_binding_indexes = {
+            'logical_port': ColumnIndex('Port_Binding', 'logical_port'),
+            'chassis': PortBindingChassisIndex(),
+            'datapath_ip': PortBindingIpIndex(),
+        }
+
+        self._table_indexes = {}
+        for index in (list(self.name_indexes.values()) +
+                      list(self.external_ids_indexes.values()) +
+                      list(self.port_binding_indexes.values())):
+            self._table_indexes.setdefault(index.table, []).append(index)
+
+    @property
+    def txn(self):
+        return self._txn
+
+    @txn.setter
+    def txn(self, txn):
+        # Set by python-ovs when a transaction is started and done, the
+        # commands of the transaction run in the thread starting it.
+        self._txn = txn
+        self._txn_thread = threading.current_thread() if txn else None
+
+    def notify(self, event, row, updates=None):
+        table = getattr(row, '_table', None)
+        if table is None:
+            return
+        for index in self._table_indexes.get(table.name, []):
+            index.notify(event, row, updates)
+
+    def get_indexed_rows(self, index, value):
+        """Find the rows indexed by a value.
+
+        @param index: One of the indexes of this IDL
+        @type index:  RowIndex
+        @param value: The value to look up
+        @return:      List of rows
+        """
+        # The index may still hold rows that are gone and a row may have
+        # been updated after it was indexed, check them against the table.
+        rows = self.tables[index.table].rows
+        result = []
+        for row_uuid in index.get(value):
+            row = rows.get(row_uuid)
+            if row is not None and index.matches(row, value):
+                result.append(row)
+
+        txn = self.txn
+        if txn is not None and self._txn_thread is threading.current_thread():
+            # Rows inserted or modified by the transaction being built are
+            # not notified (so not indexed) before it is committed, they
+            # are indexed apart. The other threads don't see them, their
+            # _txn_rows dict is only replaced by the thread writing them.
+            txn_rows = txn._txn_rows
+            if not isinstance(txn_rows, _TxnRows):
+                txn_rows = txn._txn_rows = _TxnRows(txn_rows)
+            found = set(row.uuid for row in result)
+            for row_uuid in txn_rows.lookup(index, value, rows):
+                row = rows.get(row_uuid)
+                if (row is not None and row_uuid not in found and
+                        index.matches(row, value)):
+                    result.append(row)
+        return result
+
+    def row_by_name(self, table, name):
+        """Find a row by its name using the name index of its table.
+
+        @param table: The name of an indexed table, see NAME_INDEXED_TABLES
+        @type table:  string
+        @param name:  The name of the row
+        @type name:   string
+        @return:      The row or None if not found
+        """
+        rows = self.get_indexed_rows(self.name_indexes[table], name)
+        return rows[0] if rows else None
+
+    def rows_by_external_id(self, table, key, value):
+        """Find the rows having an external_ids key set to a value.
+
+        @param table: The name of the table
+        @type table:  string
+        @param key:   The external_ids key, see EXTERNAL_IDS_INDEXES
+        @type key:    string
+        @param value: The value of the key
+        @type value:  string
+        @return:      List of rows
+        """
+        return self.get_indexed_rows(self.external_ids_indexes[(table, key)],
+                                     value)
+
     @classmethod
     def from_server(cls, connection_string, schema_name):
         #connection_string 连接到ovsdb服务器地址
         #连接的库名称
         _check_and_set_ssl_files(schema_name)
         helper = idlutils.get_schema_helper(connection_string, schema_name)
-        helper.register_all()
+        _register_tables(helper, OVN_NB_TABLES)
         return cls(connection_string, helper)
 
 
-class BaseOvnSbIdl(connection.OvsdbIdl):
+class BaseOvnSbIdl(BaseOvnIdl):
     @classmethod
     def from_server(cls, connection_string, schema_name):
         _check_and_set_ssl_files(schema_name)
         helper = idlutils.get_schema_helper(connection_string, schema_name)
-        helper.register_table('Chassis')
-        helper.register_table('Encap')
-        helper.register_table('Port_Binding')
-        helper.register_table('Datapath_Binding')
+        _register_tables(helper, OVN_SB_TABLES)
         return cls(connection_string, helper)
 
 
@@ -200,6 +918,13 @@ class OvnIdl(BaseOvnIdl):
         super(OvnIdl, self).__init__(remote, schema)
         self.driver = driver
         self.notify_handler = OvnDbNotifyHandler(driver)
+        self.event_debouncer = None
+        debounce_window = ovn_config.get_ovn_ovsdb_event_debounce_window()
+        if debounce_window:
+            # The settled calls run on the workers of the events
+            self.event_debouncer = EventDebouncer(
+                debounce_window / 1000.0,
+                executor=self.notify_handler.run_call)
         # ovsdb lock name to acquire.
         # This event lock is used to handle the notify events sent by idl.Idl
         # idl.Idl will call notify function for the "update" rpc method it
@@ -220,6 +945,8 @@ class OvnIdl(BaseOvnIdl):
         self.event_lock_name = "neutron_ovn_event_lock"
 
     def notify(self, event, row, updates=None):
+        # The indexes are kept up to date no matter who owns the lock.
+        super(OvnIdl, self).notify(event, row, updates)
         # Do not handle the notification if the event lock is requested,
         # but not granted by the ovsdb-server.
         if self.is_lock_contended:
@@ -235,6 +962,8 @@ class OvnNbIdl(OvnIdl):
 
     def __init__(self, driver, remote, schema):
         super(OvnNbIdl, self).__init__(driver, remote, schema)
+        if self.event_debouncer:
+            driver = DebouncedPortStatusDriver(driver, self.event_debouncer)
         self._lsp_update_up_event = LogicalSwitchPortUpdateUpEvent(driver)
         self._lsp_update_down_event = LogicalSwitchPortUpdateDownEvent(driver)
         self._lsp_create_up_event = LogicalSwitchPortCreateUpEvent(driver)
@@ -250,7 +979,7 @@ class OvnNbIdl(OvnIdl):
 
         _check_and_set_ssl_files(schema_name)
         helper = idlutils.get_schema_helper(connection_string, schema_name)
-        helper.register_all()
+        _register_tables(helper, OVN_NB_TABLES)
         _idl = cls(driver, connection_string, helper)
         _idl.set_lock(_idl.event_lock_name)
         return _idl
@@ -275,14 +1004,22 @@ class OvnNbIdl(OvnIdl):
 
 class OvnSbIdl(OvnIdl):
 
+    def __init__(self, driver, remote, schema):
+        super(OvnSbIdl, self).__init__(driver, remote, schema)
+        self.metadata_waiters = MetadataWaiters(self)
+
+    def notify(self, event, row, updates=None):
+        # The ports are woken up no matter who owns the Southbound lock, the
+        # port events are handled by the owner of the Northbound one.
+        if row._table.name == 'Chassis' and event != 'delete':
+            self.metadata_waiters.chassis_updated(row)
+        super(OvnSbIdl, self).notify(event, row, updates)
+
     @classmethod
     def from_server(cls, connection_string, schema_name, driver):
         _check_and_set_ssl_files(schema_name)
         helper = idlutils.get_schema_helper(connection_string, schema_name)
-        helper.register_table('Chassis')
-        helper.register_table('Encap')
-        helper.register_table('Port_Binding')
-        helper.register_table('Datapath_Binding')
+        _register_tables(helper, OVN_SB_WORKER_TABLES)
         _idl = cls(driver, connection_string, helper)
         _idl.set_lock(_idl.event_lock_name)
         return _idl
@@ -296,11 +1033,33 @@ class OvnSbIdl(OvnIdl):
         the events to make notify work.
         """
         self._chassis_event = ChassisEvent(self.driver)
-        self._portbinding_event = PortBindingChassisEvent(self.driver)
+        self._portbinding_event = PortBindingChassisEvent(
+            self.driver, self.event_debouncer)
         self.notify_handler.watch_events([self._chassis_event,
                                           self._portbinding_event])
 
 
+def _register_tables(helper, tables):
+    """Register the tables and columns found in the schema of the server
+
+    @param helper: The schema helper of the database
+    @type helper:  ovs.db.idl.SchemaHelper
+    @param tables: The columns to register by table name, None registers
+                   all the columns of the table
+    @type tables:  dict
+    """
+    schema_tables = helper.schema_json['tables']
+    for table, columns in tables.items():
+        if table not in schema_tables:
+            continue
+        if columns is None:
+            helper.register_table(table)
+            continue
+        schema_columns = schema_tables[table]['columns']
+        helper.register_columns(
+            table, [column for column in columns if column in schema_columns])
+
+
 def _check_and_set_ssl_files(schema_name):
     if schema_name == 'OVN_Southbound':
         #如果模式名称为南向库
@@ -0,0 +1,102 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import mock
+
+from neutron.db import models_v2
+from neutron.tests.unit import testlib_api
+from neutron_lib.db import api as db_api
+from oslo_utils import uuidutils
+
+from networking_ovn.common import constants as ovn_const
+from networking_ovn.common import exceptions as ovn_exc
+from networking_ovn.db import models
+from networking_ovn.db import revision as db_rev
+
+
+class _TestBumpRevisionsUpsert(object):
+    """Run the revision number upsert statement on a real backend."""
+
+    def setUp(self):
+        super(_TestBumpRevisionsUpsert, self).setUp()
+        self.session = db_api.get_writer_session()
+        self.net_ids = [self._create_network(), self._create_network()]
+        # The upsert is used instead of the ORM
+        self.bump_orm = mock.patch.object(
+            db_rev, '_bump_revisions_orm').start()
+
+    def _create_network(self):
+        net_id = uuidutils.generate_uuid()
+        with self.session.begin():
+            self.session.add(models_v2.Network(id=net_id, name='net'))
+        return net_id
+
+    def _bump_revisions(self, revisions):
+        db_rev.bump_revisions(
+            [{'id': net_id, 'revision_number': revision_number}
+             for net_id, revision_number in revisions],
+            ovn_const.TYPE_NETWORKS)
+
+    def _get_revision_numbers(self):
+        self.session.expire_all()
+        with self.session.begin():
+            return {row.resource_uuid: row.revision_number
+                    for row in self.session.query(models.OVNRevisionNumbers)}
+
+    def test_bump_revisions(self):
+        net1, net2 = self.net_ids
+        self._bump_revisions([(net1, 3)])
+        self.assertEqual({net1: 3}, self._get_revision_numbers())
+
+        # The missing row is created and the existing one updated
+        self._bump_revisions([(net1, 5), (net2, 2)])
+        self.assertEqual({net1: 5, net2: 2}, self._get_revision_numbers())
+        self.assertFalse(self.bump_orm.called)
+
+    def test_bump_older_revisions(self):
+        net1, net2 = self.net_ids
+        self._bump_revisions([(net1, 5), (net2, 2)])
+        updated_at = datetime.datetime(2000, 1, 1)
+        with self.session.begin():
+            self.session.query(models.OVNRevisionNumbers).update(
+                {'updated_at': updated_at})
+        # The higher revision number registered is kept and its row is
+        # left as is
+        self._bump_revisions([(net1, 4), (net2, 3)])
+        self.assertEqual({net1: 5, net2: 3}, self._get_revision_numbers())
+        with self.session.begin():
+            rows = {row.resource_uuid: row.updated_at for row in
+                    self.session.query(models.OVNRevisionNumbers)}
+        self.assertEqual(updated_at, rows[net1])
+        self.assertNotEqual(updated_at, rows[net2])
+
+    def test_bump_revisions_not_found(self):
+        net1 = self.net_ids[0]
+        self.assertRaises(ovn_exc.StandardAttributeIDNotFound,
+                          self._bump_revisions,
+                          [(net1, 3), (uuidutils.generate_uuid(), 3)])
+        # Nothing is written
+        self.assertEqual({}, self._get_revision_numbers())
+
+
+class TestBumpRevisionsUpsertMysql(testlib_api.MySQLTestCaseMixin,
+                                   _TestBumpRevisionsUpsert,
+                                   testlib_api.SqlTestCase):
+    pass
+
+
+class TestBumpRevisionsUpsertPostgresql(testlib_api.PostgreSQLTestCaseMixin,
+                                        _TestBumpRevisionsUpsert,
+                                        testlib_api.SqlTestCase):
+    pass
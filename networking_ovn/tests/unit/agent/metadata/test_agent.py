@@ -62,6 +62,10 @@ class TestMetadataAgent(base.BaseTestCase):
         self.log = self.log_p.start()
         self.agent = agent.MetadataAgent(self.fake_conf)
         self.agent.sb_idl = mock.Mock()
+        # The condition changes are acked by the ovsdb-server right away
+        self.agent.sb_idl.set_port_binding_condition.return_value.\
+            execute.return_value = 1
+        self.agent.sb_idl.idl.cond_seqno = 1
         self.agent.ovs_idl = mock.Mock()
         self.agent.chassis = 'chassis'
 
@@ -99,6 +103,55 @@ class TestMetadataAgent(base.BaseTestCase):
             gns.assert_called_once()
             tdp.assert_called_once_with('3')
 
+    def test_sync_fresh_idl(self):
+        """Test that sync waits for the Port_Bindings of a new IDL.
+
+        The IDL has just been started with no Port_Binding, the existing
+        namespace of datapath '1' must be kept.
+        """
+        sb_idl = self.agent.sb_idl
+        sb_idl.idl.cond_seqno = 0
+        ports = [makePort(datapath=DatapathInfo(uuid='1'))]
+        sb_idl.get_ports_on_chassis.side_effect = (
+            lambda chassis: ports if sb_idl.idl.cond_seqno else [])
+
+        def ack_condition(interval):
+            # The ovsdb-server sends the rows then acks the condition
+            sb_idl.idl.cond_seqno = 1
+
+        with mock.patch.object(agent.time, 'sleep',
+                               side_effect=ack_condition),\
+                mock.patch.object(ip_wrap, 'get_namespaces',
+                                  return_value=['ovnmeta-1']),\
+                mock.patch.object(self.agent, 'provision_datapath',
+                                  return_value='ovnmeta-1') as pdp,\
+                mock.patch.object(self.agent, 'teardown_datapath') as tdp:
+            self.agent.sync()
+
+        pdp.assert_called_once_with('1', teardown=True)
+        tdp.assert_not_called()
+        self.assertEqual({'1'}, self.agent.monitored_datapaths)
+        sb_idl.set_port_binding_condition.assert_has_calls([
+            mock.call('chassis', frozenset()),
+            mock.call('chassis', frozenset(['1']))], any_order=True)
+
+    def test_sync_condition_not_acked(self):
+        """Test that sync keeps the namespaces if the rows may be missing."""
+        self.agent.sb_idl.set_port_binding_condition.return_value.\
+            execute.return_value = None
+        with mock.patch.object(
+                self.agent, 'ensure_all_networks_provisioned') as enp,\
+                mock.patch.object(
+                    ip_wrap, 'get_namespaces') as gns,\
+                mock.patch.object(
+                    self.agent, 'teardown_datapath') as tdp:
+            enp.return_value = ['ovnmeta-1']
+            gns.return_value = ['ovnmeta-1', 'ovnmeta-2']
+
+            self.agent.sync()
+
+            tdp.assert_not_called()
+
     def test_ensure_all_networks_provisioned(self):
         """Test networks are provisioned.
 
@@ -124,10 +177,40 @@ class TestMetadataAgent(base.BaseTestCase):
                                   return_value=ports):
             self.agent.ensure_all_networks_provisioned()
 
-            expected_calls = [mock.call(str(i)) for i in range(0, 3)]
+            expected_calls = [mock.call(str(i), teardown=True)
+                              for i in range(0, 3)]
             self.assertEqual(sorted(expected_calls),
                              sorted(pdp.call_args_list))
 
+    def test_sync_no_condition_acks(self):
+        """Test sync with a python-ovs not tracking the condition acks.
+
+        The datapaths known are provisioned but their metadata port may
+        be missing, nothing is torn down.
+        """
+        self.agent.sb_idl.idl = mock.Mock(spec=[])
+        ports = [makePort(datapath=DatapathInfo(uuid='1'))]
+        self.agent.sb_idl.get_ports_on_chassis.return_value = ports
+        self.agent.sb_idl.get_metadata_port_network.return_value = None
+        with mock.patch.object(ip_wrap, 'get_namespaces',
+                               return_value=['ovnmeta-1', 'ovnmeta-2']),\
+                mock.patch.object(self.agent, 'provision_datapath',
+                                  wraps=self.agent.provision_datapath) as pdp,\
+                mock.patch.object(self.agent, 'teardown_datapath') as tdp:
+            self.agent.sync()
+
+        pdp.assert_called_once_with('1', teardown=False)
+        tdp.assert_not_called()
+
+    def test_provision_datapath_port_not_received(self):
+        self.agent.sb_idl.get_metadata_port_network.return_value = None
+        with mock.patch.object(self.agent, 'teardown_datapath') as tdp:
+            self.assertIsNone(
+                self.agent.provision_datapath('1', teardown=False))
+            tdp.assert_not_called()
+            self.agent.provision_datapath('1')
+            tdp.assert_called_once_with('1')
+
     def test_update_datapath_provision(self):
         ports = []
         for i in range(0, 3):
@@ -141,6 +224,9 @@ class TestMetadataAgent(base.BaseTestCase):
             self.agent.update_datapath('1')
             pdp.assert_called_once_with('1')
             tdp.assert_not_called()
+            self.assertEqual({'1'}, self.agent.monitored_datapaths)
+            set_cond = self.agent.sb_idl.set_port_binding_condition
+            set_cond.assert_called_once_with('chassis', frozenset(['1']))
 
     def test_update_datapath_teardown(self):
         ports = []
@@ -156,6 +242,44 @@ class TestMetadataAgent(base.BaseTestCase):
             tdp.assert_called_once_with('5')
             pdp.assert_not_called()
 
+    def test_update_port_binding_condition(self):
+        self.agent.monitored_datapaths = {'1', '2'}
+        self.agent.update_port_binding_condition()
+        self.agent.update_port_binding_condition()
+        self.agent.sb_idl.set_port_binding_condition.assert_called_once_with(
+            'chassis', frozenset(['1', '2']))
+
+        self.agent.update_port_binding_condition(force=True)
+        self.assertEqual(
+            2, self.agent.sb_idl.set_port_binding_condition.call_count)
+
+    def _test_port_binding_chassis_event(self, event, row, old=None):
+        with mock.patch.object(self.agent, 'update_datapath') as udp:
+            agent.PortBindingChassisEvent(self.agent).run(event, row, old)
+        return udp
+
+    def _make_chassis(self, name):
+        chassis = mock.Mock()
+        chassis.name = name
+        return chassis
+
+    def test_port_binding_chassis_event_bound(self):
+        row = mock.Mock(type='', chassis=[self._make_chassis('chassis')])
+        row.datapath.uuid = 'dp'
+        udp = self._test_port_binding_chassis_event('create', row)
+        udp.assert_called_once_with('dp')
+
+    def test_port_binding_chassis_event_deleted(self):
+        row = mock.Mock(type='', chassis=[self._make_chassis('chassis')])
+        row.datapath.uuid = 'dp'
+        udp = self._test_port_binding_chassis_event('delete', row)
+        udp.assert_called_once_with('dp')
+
+    def test_port_binding_chassis_event_other_chassis(self):
+        row = mock.Mock(type='', chassis=[self._make_chassis('other')])
+        udp = self._test_port_binding_chassis_event('delete', row)
+        udp.assert_not_called()
+
     def test_teardown_datapath(self):
         """Test teardown datapath.
 
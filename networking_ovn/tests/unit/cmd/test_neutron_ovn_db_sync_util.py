@@ -33,6 +33,10 @@ class TestNeutronOVNDBSyncUtil(base.TestCase):
         mock_cfg.ovn.neutron_sync_mode = 'log'
         mock_cfg.core_plugin = 'neutron.plugins.ml2.plugin.Ml2Plugin'
         mock_cfg.ml2.mechanism_drivers = ['ovn']
+        mock_cfg.shards = 1
+        mock_cfg.shard_index = None
+        mock_cfg.shard_coordinator = None
+        mock_cfg.report_file = None
 
     # Test that the configuration can be loaded successfully.
     def test_setup_conf(self):
@@ -114,16 +118,166 @@ class TestNeutronOVNDBSyncUtil(base.TestCase):
         self.cmd_log.error.assert_called_once_with(
             'No "ovn" mechanism driver found : "%s".', ['foo'])
 
-    def _test_main_sync(self):
+    def _test_main_sync(self, **cfg_values):
         with mock.patch('networking_ovn.ovn_db_sync.OvnNbSynchronizer',
-                        return_value=self.cmd_sync), \
+                        return_value=self.cmd_sync) as mock_nb_sync, \
                 mock.patch('networking_ovn.ovn_db_sync.OvnSbSynchronizer',
                            return_value=self.cmd_sb_sync), \
                 mock.patch('oslo_config.cfg.CONF') as mock_cfg:
             self._setup_default_mock_cfg(mock_cfg)
+            for name, value in cfg_values.items():
+                setattr(mock_cfg, name, value)
             self._test_main()
+        return mock_nb_sync
 
     def test_main_sync_success(self):
+        mock_nb_sync = self._test_main_sync()
+        self.assertIsNone(mock_nb_sync.call_args[1]['shard'])
+        self.assertIsNone(mock_nb_sync.call_args[1]['report'])
+        self.cmd_sync.do_sync.assert_called_once_with(snapshot=mock.ANY)
+        self.cmd_sb_sync.do_sync.assert_called_once_with()
+
+    @mock.patch('networking_ovn.ovn_db_sync.SyncSnapshot')
+    def test_main_sync_snapshot(self, mock_snapshot):
         self._test_main_sync()
-        self.cmd_sync.do_sync.assert_called_once_with()
+        # The Neutron resources are loaded once for all the NB sync phases
+        mock_snapshot.assert_called_once_with(mock.ANY, mock.ANY, shard=None)
+        self.cmd_sync.do_sync.assert_called_once_with(
+            snapshot=mock_snapshot.return_value)
+
+    @mock.patch('networking_ovn.ovn_db_sync.SyncReport.write')
+    def test_main_sync_report(self, mock_write):
+        mock_nb_sync = self._test_main_sync(report_file='/tmp/report.json')
+        report = mock_nb_sync.call_args[1]['report']
+        self.assertEqual({'mode': 'log', 'shard': None}, report.info)
+        self.cmd_sync.do_sync.assert_called_once_with(snapshot=mock.ANY)
+        self.cmd_sb_sync.do_sync.assert_called_once_with()
+        mock_write.assert_called_once_with('/tmp/report.json')
+
+    @mock.patch('networking_ovn.ovn_db_sync.SyncReport.write')
+    def test_main_sync_report_failed(self, mock_write):
+        self.cmd_sync.do_sync.side_effect = RuntimeError
+        self.assertRaises(RuntimeError, self._test_main_sync,
+                          report_file='/tmp/report.json')
+        # The report of the phases done is still written
+        mock_write.assert_called_once_with('/tmp/report.json')
+
+    def test_main_invalid_shard_index(self):
+        self._test_main_sync(shards=2, shard_index=2)
+        self.cmd_log.error.assert_called_once_with(
+            'Invalid shard index : %(index)d. Should be lower than '
+            'the number of shards : %(shards)d.', {'index': 2, 'shards': 2})
+        self.assertFalse(self.cmd_sync.do_sync.called)
+
+    def test_main_sync_shard(self):
+        mock_nb_sync = self._test_main_sync(shards=4, shard_index=1)
+        shard = mock_nb_sync.call_args[1]['shard']
+        self.assertEqual((4, 1), (shard.count, shard.index))
+        self.cmd_sync.do_sync.assert_called_once_with(snapshot=mock.ANY)
+        # The Southbound db is synced by the coordinator
+        self.assertFalse(self.cmd_sb_sync.do_sync.called)
+
+    @mock.patch('oslo_log.log.setup')
+    @mock.patch('networking_ovn.cmd.neutron_ovn_db_sync_util.setup_conf')
+    @mock.patch('networking_ovn.ovsdb.impl_idl_ovn.get_connection')
+    def test_main_sync_shard_invalid_nb_idl(self, mock_con, mock_conf,
+                                            mock_log_setup):
+        with mock.patch('oslo_config.cfg.CONF') as mock_cfg, \
+                mock.patch('networking_ovn.ovsdb.impl_idl_ovn.OvsdbNbOvnIdl',
+                           side_effect=RuntimeError):
+            self._setup_default_mock_cfg(mock_cfg)
+            mock_cfg.shards = 4
+            mock_cfg.shard_index = 1
+            # The process of the shard fails for sync_shards()
+            self.assertRaises(SystemExit, cmd.main)
+
+    def _test_main_sync_shard_coordinator(self, stage):
+        with mock.patch.object(cmd, 'sync_shards') as mock_sync_shards:
+            mock_nb_sync = self._test_main_sync(shards=4,
+                                                shard_coordinator=stage)
+        self.assertFalse(mock_sync_shards.called)
+        shard = mock_nb_sync.call_args[1]['shard']
+        self.assertTrue(shard.is_coordinator)
+        self.assertEqual(stage, shard.stage)
+        self.cmd_sync.do_sync.assert_called_once_with(snapshot=mock.ANY)
+
+    def test_main_sync_shard_coordinator_security_groups(self):
+        self._test_main_sync_shard_coordinator('security-groups')
+        # The Southbound db is synced by the routers stage
+        self.assertFalse(self.cmd_sb_sync.do_sync.called)
+
+    def test_main_sync_shard_coordinator_routers(self):
+        self._test_main_sync_shard_coordinator('routers')
         self.cmd_sb_sync.do_sync.assert_called_once_with()
+
+    def test_main_sync_all_shards(self):
+        calls = []
+
+        def sync_shards(*args):
+            calls.append('shards')
+            return True
+
+        self.cmd_sync.do_sync.side_effect = lambda snapshot: calls.append(
+            'nb')
+        self.cmd_sb_sync.do_sync.side_effect = lambda: calls.append('sb')
+        with mock.patch.object(cmd, 'sync_shards',
+                               side_effect=sync_shards) as mock_sync_shards:
+            mock_nb_sync = self._test_main_sync(shards=4)
+        mock_sync_shards.assert_called_once_with('log', 4, None)
+        # The address sets and port groups are synced before the shards,
+        # the routers and the Southbound db after them
+        self.assertEqual(['nb', 'shards', 'nb', 'sb'], calls)
+        self.assertEqual(
+            ['security-groups', 'routers'],
+            [call[1]['shard'].stage for call in mock_nb_sync.call_args_list])
+
+    @mock.patch('networking_ovn.ovn_db_sync.SyncReport.write')
+    def test_main_sync_all_shards_report(self, mock_write):
+        with mock.patch.object(cmd, 'sync_shards',
+                               return_value=True) as mock_sync_shards:
+            self._test_main_sync(shards=4, report_file='/tmp/report.json')
+        mock_sync_shards.assert_called_once_with('log', 4, '/tmp/report.json')
+        self.assertEqual(
+            [mock.call('/tmp/report.json.security-groups'),
+             mock.call('/tmp/report.json')], mock_write.call_args_list)
+
+    def test_main_sync_all_shards_failed(self):
+        with mock.patch.object(cmd, 'sync_shards', return_value=False):
+            mock_nb_sync = self._test_main_sync(shards=4)
+        # The routers are not synced if a shard failed
+        self.assertEqual('security-groups',
+                         mock_nb_sync.call_args[1]['shard'].stage)
+        self.cmd_sync.do_sync.assert_called_once_with(snapshot=mock.ANY)
+        self.assertFalse(self.cmd_sb_sync.do_sync.called)
+
+    @mock.patch('subprocess.Popen')
+    def test_sync_shards(self, mock_popen):
+        processes = [mock.Mock(), mock.Mock()]
+        processes[0].wait.return_value = 0
+        processes[1].wait.return_value = 1
+        mock_popen.side_effect = processes
+        with mock.patch.object(cmd.sys, 'argv',
+                               ['neutron-ovn-db-sync-util', '--config-file',
+                                'neutron.conf']):
+            self.assertFalse(cmd.sync_shards('repair', 2))
+        # The shards are synced by new processes of the utility
+        for index, process in enumerate(processes):
+            self.assertEqual(
+                [cmd.sys.executable, '-m',
+                 'networking_ovn.cmd.neutron_ovn_db_sync_util',
+                 '--config-file', 'neutron.conf',
+                 '--ovn-neutron_sync_mode', 'repair',
+                 '--shard-index', str(index)],
+                mock_popen.call_args_list[index][0][0])
+            process.wait.assert_called_once_with()
+        self.cmd_log.error.assert_called_once_with(
+            'Sync failed for the shards %s.', [1])
+
+    @mock.patch('subprocess.Popen')
+    def test_sync_shards_report(self, mock_popen):
+        mock_popen.return_value.wait.return_value = 0
+        self.assertTrue(cmd.sync_shards('log', 2, '/tmp/report.json'))
+        self.assertEqual(
+            [['--report-file', '/tmp/report.json.shard-0'],
+             ['--report-file', '/tmp/report.json.shard-1']],
+            [call[0][0][-2:] for call in mock_popen.call_args_list])
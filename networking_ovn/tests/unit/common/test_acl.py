@@ -126,11 +126,13 @@ class TestACLs(base.TestCase):
                           'match': match,
                           'external_ids': {
                               'neutron:lport': 'port-id',
+                              'neutron:security_group_id': 'sg_id',
                               'neutron:security_group_rule_id': 'sgr_id'}},
                          acl)
 
     def test_add_sg_rule_acl_for_port_remote_ip_prefix(self):
         sg_rule = {'id': 'sgr_id',
+                   'security_group_id': 'sg_id',
                    'direction': 'ingress',
                    'ethertype': 'IPv4',
                    'remote_group_id': None,
@@ -148,6 +150,7 @@ class TestACLs(base.TestCase):
 
     def test_add_sg_rule_acl_for_port_remote_group(self):
         sg_rule = {'id': 'sgr_id',
+                   'security_group_id': 'sg_id',
                    'direction': 'ingress',
                    'ethertype': 'IPv4',
                    'remote_group_id': 'sg1',
@@ -212,12 +215,12 @@ class TestACLs(base.TestCase):
         port2_acls_old = [aclport2_old1, aclport2_old2, aclport2_old3]
         acls_old_dict = {'%s' % (port1['id']): port1_acls_old,
                          '%s' % (port2['id']): port2_acls_old}
-        acl_obj_dict = {str(aclport1_old1): 'row1',
-                        str(aclport1_old2): 'row2',
-                        str(aclport1_old3): 'row3',
-                        str(aclport2_old1): 'row4',
-                        str(aclport2_old2): 'row5',
-                        str(aclport2_old3): 'row6'}
+        acl_obj_dict = {ovn_utils.ovn_acl_key(aclport1_old1): ['row1'],
+                        ovn_utils.ovn_acl_key(aclport1_old2): ['row2'],
+                        ovn_utils.ovn_acl_key(aclport1_old3): ['row3'],
+                        ovn_utils.ovn_acl_key(aclport2_old1): ['row4'],
+                        ovn_utils.ovn_acl_key(aclport2_old2): ['row5'],
+                        ovn_utils.ovn_acl_key(aclport2_old3): ['row6']}
         # NEW ACLs, allow IPv6 communication
         aclport1_new1 = {'priority': 1002, 'direction': 'from-lport',
                          'lport': port1['id'], 'lswitch': lswitch_name,
@@ -657,3 +660,95 @@ class TestACLs(base.TestCase):
 
             addresses = ovn_acl.acl_port_ips(port)
             self.assertEqual({'ip4': [], 'ip6': []}, addresses)
+
+    def test_drop_all_ip_traffic_for_port_group(self):
+        acls = ovn_acl.drop_all_ip_traffic_for_port_group()
+        pg_name = ovn_const.OVN_DROP_PORT_GROUP_NAME
+        self.assertEqual(
+            [{'port_group': pg_name, 'priority': 1001, 'action': 'drop',
+              'log': False, 'name': [], 'severity': [],
+              'direction': 'from-lport',
+              'match': 'inport == @%s && ip' % pg_name},
+             {'port_group': pg_name, 'priority': 1001, 'action': 'drop',
+              'log': False, 'name': [], 'severity': [],
+              'direction': 'to-lport',
+              'match': 'outport == @%s && ip' % pg_name}],
+            acls)
+
+    def test_add_acls_for_sg_port_group(self):
+        sg = fakes.FakeSecurityGroup.create_one_security_group().info()
+        sg_rule = fakes.FakeSecurityGroupRule.create_one_security_group_rule({
+            'security_group_id': sg['id'],
+            'direction': 'ingress',
+            'ethertype': 'IPv4',
+            'remote_ip_prefix': '1.1.1.0/24',
+            'protocol': None}).info()
+        sg['security_group_rules'] = [sg_rule]
+        pg_name = ovn_utils.ovn_port_group_name(sg['id'])
+
+        acls = ovn_acl.add_acls_for_sg_port_group(self.driver._nb_ovn, sg)
+
+        self.assertEqual(
+            [{'port_group': pg_name,
+              'priority': ovn_const.ACL_PRIORITY_ALLOW,
+              'action': ovn_const.ACL_ACTION_ALLOW_RELATED,
+              'log': False, 'name': [], 'severity': [],
+              'direction': 'to-lport',
+              'match': 'outport == @%s && ip4 && ip4.src == 1.1.1.0/24' %
+                       pg_name,
+              'external_ids': {ovn_const.OVN_SG_EXT_ID_KEY: sg['id'],
+                               ovn_const.OVN_SG_RULE_EXT_ID_KEY:
+                               sg_rule['id']}}],
+            acls)
+
+    def test_add_acls_port_groups_enabled(self):
+        sg = fakes.FakeSecurityGroup.create_one_security_group().info()
+        port = fakes.FakePort.create_one_port({
+            'network_id': 'network_id1',
+            'security_groups': [sg['id']],
+            'fixed_ips': [{'subnet_id': 'subnet_id1',
+                           'ip_address': '1.1.1.1'}],
+        }).info()
+        subnet_cache = {'subnet_id1': self.fake_subnet}
+        with mock.patch.object(ovn_acl, 'is_port_groups_enabled',
+                               return_value=True):
+            acl_list = ovn_acl.add_acls(self.plugin, self.admin_context,
+                                        port, {}, subnet_cache,
+                                        self.driver._nb_ovn)
+        # Only the DHCP ACL is left per port, the default drop and the
+        # security group rules are on the port groups.
+        self.assertEqual(ovn_acl.add_acl_dhcp(port, self.fake_subnet),
+                         acl_list)
+
+    def _test_update_acls_for_security_group_port_groups(self, is_add_acl):
+        sg = fakes.FakeSecurityGroup.create_one_security_group().info()
+        sg_rule = fakes.FakeSecurityGroupRule.create_one_security_group_rule({
+            'security_group_id': sg['id']}).info()
+        nb_ovn = self.driver._nb_ovn
+        expected_acl = ovn_acl._add_sg_rule_acl_for_port_group(
+            ovn_utils.ovn_port_group_name(sg['id']), sg_rule)
+
+        with mock.patch.object(ovn_acl, 'is_port_groups_enabled',
+                               return_value=True):
+            ovn_acl.update_acls_for_security_group(
+                self.plugin, self.admin_context, nb_ovn, sg['id'], sg_rule,
+                is_add_acl=is_add_acl)
+
+        if is_add_acl:
+            nb_ovn.add_port_group_acl.assert_called_once_with(**expected_acl)
+            nb_ovn.delete_port_group_acl.assert_not_called()
+        else:
+            nb_ovn.delete_port_group_acl.assert_called_once_with(
+                expected_acl['port_group'], expected_acl['direction'],
+                expected_acl['priority'], expected_acl['match'])
+            nb_ovn.add_port_group_acl.assert_not_called()
+        # Neither the ports of the security group nor the per-port ACLs
+        # are touched.
+        self.plugin.get_ports.assert_not_called()
+        nb_ovn.update_acls.assert_not_called()
+
+    def test_update_acls_for_security_group_port_groups_add(self):
+        self._test_update_acls_for_security_group_port_groups(True)
+
+    def test_update_acls_for_security_group_port_groups_delete(self):
+        self._test_update_acls_for_security_group_port_groups(False)
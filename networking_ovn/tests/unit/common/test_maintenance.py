@@ -13,16 +13,20 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from futurist import periodics
 import mock
 
+from neutron.tests import base
 from neutron.tests.unit.plugins.ml2 import test_security_group as test_sg
 from neutron_lib.db import api as db_api
 
+from networking_ovn.common import acl as ovn_acl
 from networking_ovn.common import constants
 from networking_ovn.common import maintenance
 from networking_ovn.common import utils
 from networking_ovn.db import maintenance as db_maint
 from networking_ovn.db import revision as db_rev
+from networking_ovn import ovn_db_sync
 from networking_ovn.tests.unit.db import base as db_base
 
 
@@ -46,10 +50,77 @@ class TestDBInconsistenciesPeriodics(db_base.DBTestCase,
                        '_fix_create_update')
     @mock.patch.object(db_maint, 'get_inconsistent_resources')
     def test_check_for_inconsistencies(self, mock_get_incon_res, mock_fix_net):
-        fake_row = mock.Mock(resource_type=constants.TYPE_NETWORKS)
-        mock_get_incon_res.return_value = [fake_row, ]
+        fake_row = mock.Mock(resource_type=constants.TYPE_NETWORKS,
+                             resource_uuid='net-id')
+        mock_get_incon_res.side_effect = lambda resource_type, **kw: (
+            [fake_row] if resource_type == constants.TYPE_NETWORKS and
+            kw['marker'] is None else [])
+        fake_net = {'id': 'net-id'}
+        self.fake_ovn_client._plugin.get_networks.return_value = [fake_net]
         self.periodic.check_for_inconsistencies()
-        mock_fix_net.assert_called_once_with(fake_row)
+        # The network is fetched along with the others of the same page
+        self.fake_ovn_client._plugin.get_networks.assert_called_once_with(
+            mock.ANY, filters={'id': ['net-id']})
+        mock_fix_net.assert_called_once_with(fake_row, fake_net)
+
+    @mock.patch.object(maintenance.DBInconsistenciesPeriodics,
+                       '_fix_create_update')
+    @mock.patch.object(db_maint, 'get_inconsistent_resources')
+    def test_check_for_inconsistencies_deleted_in_neutron(
+            self, mock_get_incon_res, mock_fix_net):
+        fake_row = mock.Mock(resource_type=constants.TYPE_NETWORKS,
+                             resource_uuid='net-id')
+        mock_get_incon_res.side_effect = lambda resource_type, **kw: (
+            [fake_row] if resource_type == constants.TYPE_NETWORKS and
+            kw['marker'] is None else [])
+        self.fake_ovn_client._plugin.get_networks.return_value = []
+        self.periodic.check_for_inconsistencies()
+        mock_fix_net.assert_not_called()
+
+    @mock.patch.object(maintenance, 'INCONSISTENCIES_PAGE_SIZE', 2)
+    @mock.patch.object(maintenance.DBInconsistenciesPeriodics,
+                       '_fix_create_update')
+    @mock.patch.object(db_maint, 'get_inconsistent_resources')
+    def test__fix_inconsistencies_budget(self, mock_get_incon_res,
+                                         mock_fix):
+        rows = [mock.Mock(resource_type=constants.TYPE_NETWORKS,
+                          resource_uuid=uuid) for uuid in ('a', 'b', 'c')]
+        port_row = mock.Mock(resource_type=constants.TYPE_PORTS,
+                             resource_uuid='d')
+
+        def get_inconsistent_resources(resource_type, marker, limit):
+            if resource_type == constants.TYPE_PORTS:
+                return [port_row]
+            if resource_type != constants.TYPE_NETWORKS:
+                return []
+            return [r for r in rows
+                    if marker is None or r.resource_uuid > marker][:limit]
+
+        mock_get_incon_res.side_effect = get_inconsistent_resources
+        self.fake_ovn_client._plugin.get_networks.side_effect = (
+            lambda ctx, filters: [{'id': uuid} for uuid in filters['id']])
+        self.fake_ovn_client._plugin.get_ports.return_value = [{'id': 'd'}]
+
+        def fixed(*rows_fixed):
+            return [mock.call(row, {'id': row.resource_uuid})
+                    for row in rows_fixed]
+
+        # The budget is reached before fixing the ports
+        self.assertEqual(2, self.periodic._fix_inconsistencies(2))
+        self.assertEqual(fixed(rows[0], rows[1]), mock_fix.call_args_list)
+
+        # The next run starts where the previous one stopped and wraps
+        # around, as the rows above weren't really fixed
+        mock_fix.reset_mock()
+        self.assertEqual(2, self.periodic._fix_inconsistencies(2))
+        self.assertEqual(fixed(rows[2], rows[0]), mock_fix.call_args_list)
+
+        # A large enough budget covers all the types
+        mock_fix.reset_mock()
+        self.assertEqual(4, self.periodic._fix_inconsistencies(10))
+        self.assertEqual(fixed(rows[1], rows[2], rows[0], port_row),
+                         mock_fix.call_args_list)
+        self.assertEqual({}, self.periodic._inconsistencies_markers)
 
     def _test_fix_create_update_network(self, ovn_rev, neutron_rev):
         self.net['revision_number'] = neutron_rev
@@ -168,6 +239,51 @@ class TestDBInconsistenciesPeriodics(db_base.DBTestCase,
     def test_fix_security_group_create_version_mismatch(self):
         self._test_fix_security_group_create(revision_number=2)
 
+    @mock.patch.object(ovn_acl, 'is_port_groups_enabled', return_value=True)
+    def test_fix_security_group_create_no_port_group(self, mock_pg_enabled):
+        sg = self._make_security_group(self.fmt, 'sg1', '')['security_group']
+        db_rev.create_initial_revision(
+            sg['id'], constants.TYPE_SECURITY_GROUPS, self.session)
+        row = self.get_revision_row(sg['id'])
+        nb_idl = self.fake_ovn_client._nb_idl
+        nb_idl.get_address_set.return_value = mock.sentinel.AddressSet
+        nb_idl.get_port_group.return_value = None
+        self.fake_ovn_client._plugin.get_security_group.return_value = sg
+        self.periodic._fix_create_update(row)
+        # The security group is created again if its port group is missing
+        nb_idl.get_port_group.assert_called_once_with(
+            utils.ovn_port_group_name(sg['id']))
+        self.fake_ovn_client.create_security_group.assert_called_once_with(sg)
+
+    @mock.patch.object(ovn_db_sync, 'OvnNbSynchronizer')
+    @mock.patch.object(ovn_acl, 'is_port_groups_enabled', return_value=True)
+    def test_migrate_to_port_groups(self, mock_pg_enabled, mock_nb_sync):
+        self.assertRaises(periodics.NeverAgain,
+                          self.periodic.migrate_to_port_groups)
+        mock_nb_sync.assert_called_once_with(
+            self.fake_ovn_client._plugin, self.fake_ovn_client._nb_idl,
+            self.fake_ovn_client._sb_idl, ovn_db_sync.SYNC_MODE_REPAIR, None)
+        mock_nb_sync.return_value.migrate_to_port_groups.\
+            assert_called_once_with(mock.ANY)
+
+    @mock.patch.object(ovn_db_sync, 'OvnNbSynchronizer')
+    @mock.patch.object(ovn_acl, 'is_port_groups_enabled', return_value=False)
+    def test_migrate_to_port_groups_not_enabled(self, mock_pg_enabled,
+                                                mock_nb_sync):
+        self.assertRaises(periodics.NeverAgain,
+                          self.periodic.migrate_to_port_groups)
+        self.assertFalse(mock_nb_sync.called)
+
+    @mock.patch.object(maintenance.DBInconsistenciesPeriodics, 'has_lock',
+                       new_callable=mock.PropertyMock, return_value=False)
+    @mock.patch.object(ovn_db_sync, 'OvnNbSynchronizer')
+    @mock.patch.object(ovn_acl, 'is_port_groups_enabled', return_value=True)
+    def test_migrate_to_port_groups_no_lock(self, mock_pg_enabled,
+                                            mock_nb_sync, mock_has_lock):
+        # The migration is retried by the worker holding the lock
+        self.assertIsNone(self.periodic.migrate_to_port_groups())
+        self.assertFalse(mock_nb_sync.called)
+
     def test__create_lrouter_port(self):
         port = {'id': 'port-id',
                 'device_id': 'router-id'}
@@ -175,3 +291,31 @@ class TestDBInconsistenciesPeriodics(db_base.DBTestCase,
         l3_mock = self.periodic._ovn_client._l3_plugin
         l3_mock.add_router_interface.assert_called_once_with(
             mock.ANY, port['device_id'], {'port_id': port['id']})
+
+
+class TestRepairExecutor(base.BaseTestCase):
+
+    def _test_run(self, pool_size):
+        executor = maintenance.RepairExecutor(pool_size)
+        rows = [mock.Mock(resource_type=constants.TYPE_PORTS,
+                          resource_uuid=uuid) for uuid in ('a', 'b', 'c')]
+
+        def fix(row):
+            if row.resource_uuid == 'a':
+                raise RuntimeError()
+            return row.resource_uuid != 'b'
+
+        executor.run(constants.TYPE_PORTS, fix, rows)
+        executor.run(constants.TYPE_PORTS, fix, rows[2:])
+        stats = executor.stats[constants.TYPE_PORTS]
+        self.assertEqual((2, 1, 1), (stats['fixed'], stats['failed'],
+                                     stats['skipped']))
+
+        executor.reset()
+        self.assertEqual({}, executor.stats)
+
+    def test_run(self):
+        self._test_run(1)
+
+    def test_run_concurrent(self):
+        self._test_run(4)
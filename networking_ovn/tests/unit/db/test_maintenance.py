@@ -80,6 +80,26 @@ class TestMaintenance(test_securitygroup.SecurityGroupsTestCase,
         # Assert nothing is inconsistent
         self.assertEqual([], res)
 
+    def test_get_inconsistent_resources_paginated(self):
+        nets = [self.net] + [
+            self._make_network(self.fmt, 'net%d' % i, True)['network']
+            for i in (2, 3)]
+        for net in nets:
+            db_rev.create_initial_revision(
+                net['id'], constants.TYPE_NETWORKS, self.session,
+                revision_number=-1)
+        net_ids = sorted(net['id'] for net in nets)
+
+        res = db_maint.get_inconsistent_resources(
+            resource_type=constants.TYPE_NETWORKS, limit=2)
+        self.assertEqual(net_ids[:2], [r.resource_uuid for r in res])
+        res = db_maint.get_inconsistent_resources(
+            resource_type=constants.TYPE_NETWORKS,
+            marker=res[-1].resource_uuid, limit=2)
+        self.assertEqual(net_ids[2:], [r.resource_uuid for r in res])
+        self.assertEqual([], db_maint.get_inconsistent_resources(
+            resource_type=constants.TYPE_PORTS))
+
     def test_get_deleted_resources(self):
         db_rev.create_initial_revision(
             self.net['id'], constants.TYPE_NETWORKS, self.session,
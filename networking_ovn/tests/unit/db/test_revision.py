@@ -17,8 +17,11 @@ import mock
 
 from neutron.tests.unit.plugins.ml2 import test_plugin
 from neutron_lib.db import api as db_api
+from sqlalchemy.dialects import mysql
+from sqlalchemy.dialects import postgresql
 
 from networking_ovn.common import constants
+from networking_ovn.common import exceptions as ovn_exc
 from networking_ovn.db import revision as db_rev
 from networking_ovn.tests.unit.db import base as db_base
 
@@ -58,6 +61,83 @@ class TestRevisionNumber(db_base.DBTestCase, test_plugin.Ml2PluginV2TestCase):
         self.assertEqual(123, row.revision_number)
         self.assertIn('No revision row found for', mock_log.call_args[0][0])
 
+    def test_bump_revisions(self):
+        res = self._create_network(fmt=self.fmt, name='net2',
+                                   admin_state_up=True)
+        net2 = self.deserialize(self.fmt, res)['network']
+        db_rev.create_initial_revision(self.net['id'], constants.TYPE_NETWORKS,
+                                       self.session, revision_number=123)
+        self.net['revision_number'] = 1
+        net2['revision_number'] = 7
+        db_rev.bump_revisions([self.net, net2], constants.TYPE_NETWORKS)
+        # The older revision isn't bumped and the missing row is created
+        self.assertEqual(123, self.get_revision_row(
+            self.net['id']).revision_number)
+        self.assertEqual(7, self.get_revision_row(
+            net2['id']).revision_number)
+
+    def test_bump_revisions_not_found(self):
+        self.net['revision_number'] = 7
+        missing = {'id': 'missing', 'revision_number': 7}
+        self.assertRaises(ovn_exc.StandardAttributeIDNotFound,
+                          db_rev.bump_revisions, [self.net, missing],
+                          constants.TYPE_NETWORKS)
+        self.assertIsNone(self.get_revision_row(self.net['id']))
+
+    @mock.patch.object(db_rev, 'LOG')
+    @mock.patch.object(db_rev, '_get_standard_attr_ids')
+    def test_bump_revisions_upsert(self, mock_get_ids, mock_log):
+        self.net['revision_number'] = 7
+        mock_get_ids.return_value = {self.net['id']: 1}
+        session = mock.MagicMock()
+        session.get_bind.return_value.dialect.name = 'mysql'
+        with mock.patch.object(db_api, 'get_writer_session',
+                               return_value=session):
+            db_rev.bump_revisions([self.net], constants.TYPE_NETWORKS)
+        # The resources are checked like with the ORM
+        mock_get_ids.assert_called_once_with(
+            session, {self.net['id']: 7}, constants.TYPE_NETWORKS)
+        session.execute.assert_called_once_with(mock.ANY)
+        # Only the number of resources is logged, at debug level
+        self.assertFalse(mock_log.info.called)
+        mock_log.debug.assert_called_once_with(
+            mock.ANY, {'count': 1, 'res_type': constants.TYPE_NETWORKS})
+
+    def _test_upsert_revisions_stmt(self, dialect, expected):
+        stmt = db_rev._upsert_revisions_stmt(
+            dialect.name, {self.net['id']: 7}, constants.TYPE_NETWORKS,
+            {self.net['id']: 1})
+        sql = str(stmt.compile(dialect=dialect))
+        self.assertIn('INSERT INTO ovn_revision_numbers', sql)
+        # The standard attribute IDs already fetched are inserted
+        self.assertNotIn('SELECT', sql)
+        for clause in expected:
+            self.assertIn(clause, sql)
+
+    def test_upsert_revisions_stmt_mysql(self):
+        self._test_upsert_revisions_stmt(
+            mysql.dialect(),
+            ['ON DUPLICATE KEY UPDATE',
+             'greatest(ovn_revision_numbers.revision_number, '
+             'VALUES(revision_number))',
+             # The row is left as is if the revision number is older
+             'CASE WHEN (ovn_revision_numbers.revision_number <= '
+             'VALUES(revision_number)) THEN VALUES(standard_attr_id)',
+             'ELSE ovn_revision_numbers.standard_attr_id',
+             'ELSE ovn_revision_numbers.updated_at'])
+
+    def test_upsert_revisions_stmt_postgresql(self):
+        self._test_upsert_revisions_stmt(
+            postgresql.dialect(),
+            ['ON CONFLICT (resource_uuid, resource_type) DO UPDATE',
+             'WHERE ovn_revision_numbers.revision_number <= '
+             'excluded.revision_number'])
+
+    def test_upsert_revisions_stmt_sqlite(self):
+        self.assertIsNone(db_rev._upsert_revisions_stmt(
+            'sqlite', {self.net['id']: 7}, constants.TYPE_NETWORKS,
+            {self.net['id']: 1}))
+
     def test_delete_revision(self):
         db_rev.create_initial_revision(self.net['id'], constants.TYPE_NETWORKS,
                                        self.session)
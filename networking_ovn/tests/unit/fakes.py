@@ -36,6 +36,7 @@ class FakeOvsdbNbOvnIdl(object):
         self.acl_table = FakeOvsdbTable.create_one_ovsdb_table()
         self.dhcp_options_table = FakeOvsdbTable.create_one_ovsdb_table()
         self.nat_table = FakeOvsdbTable.create_one_ovsdb_table()
+        self.port_group_table = FakeOvsdbTable.create_one_ovsdb_table()
         self._tables = {}
         self._tables['Logical_Switch'] = self.lswitch_table
         self._tables['Logical_Switch_Port'] = self.lsp_table
@@ -47,6 +48,7 @@ class FakeOvsdbNbOvnIdl(object):
         self._tables['Address_Set'] = self.addrset_table
         self._tables['DHCP_Options'] = self.dhcp_options_table
         self._tables['NAT'] = self.nat_table
+        self._tables['Port_Group'] = self.port_group_table
         self.transaction = mock.MagicMock()
         self.ls_add = mock.Mock()
         self.set_lswitch_ext_ids = mock.Mock()
@@ -66,6 +68,7 @@ class FakeOvsdbNbOvnIdl(object):
         self.add_acl = mock.Mock()
         self.delete_acl = mock.Mock()
         self.update_acls = mock.Mock()
+        self.delete_acls = mock.Mock()
         self.idl = mock.Mock()
         self.add_static_route = mock.Mock()
         self.delete_static_route = mock.Mock()
@@ -118,11 +121,29 @@ class FakeOvsdbNbOvnIdl(object):
         self.get_lrouter.return_value = None
         self.delete_lrouter_ext_gw = mock.Mock()
         self.delete_lrouter_ext_gw.return_value = None
+        self.is_port_groups_supported = mock.Mock()
+        self.is_port_groups_supported.return_value = False
+        self.create_port_group = mock.Mock()
+        self.delete_port_group = mock.Mock()
+        self.update_port_group_ports = mock.Mock()
+        self.add_port_group_acl = mock.Mock()
+        self.delete_port_group_acl = mock.Mock()
+        self.get_port_group = mock.Mock()
+        self.get_port_group.return_value = None
+        self.get_port_groups = mock.Mock()
+        self.get_port_groups.return_value = {}
+        self.get_lswitch_port_sg_acls = mock.Mock()
+        self.get_lswitch_port_sg_acls.return_value = {}
+        self.get_acl_by_id = mock.Mock()
+        self.get_acl_by_id.return_value = None
+        self.get_acls_by_sg_rule_id = mock.Mock()
+        self.get_acls_by_sg_rule_id.return_value = []
 
 
 class FakeOvsdbSbOvnIdl(object):
 
     def __init__(self, **kwargs):
+        self.idl = mock.Mock()
         self.chassis_exists = mock.Mock()
         self.chassis_exists.return_value = True
         self.get_chassis_hostname_and_physnets = mock.Mock()
@@ -316,7 +337,9 @@ class FakeOvsdbRow(FakeResource):
         ovsdb_row_methods = {
             'addvalue': None,
             'delete': None,
+            'delkey': None,
             'delvalue': None,
+            'setkey': None,
             'verify': None,
         }
 
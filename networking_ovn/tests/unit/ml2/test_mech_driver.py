@@ -96,6 +96,9 @@ class TestOVNMechanismDriver(test_plugin.Ml2PluginV2TestCase):
         p = mock.patch.object(db_rev, 'bump_revision')
         p.start()
         self.addCleanup(p.stop)
+        p = mock.patch.object(db_rev, 'bump_revisions')
+        p.start()
+        self.addCleanup(p.stop)
 
     @mock.patch.object(db_rev, 'bump_revision')
     def test__create_security_group(self, mock_bump):
@@ -161,6 +164,76 @@ class TestOVNMechanismDriver(test_plugin.Ml2PluginV2TestCase):
                 mock_delrev.assert_called_once_with(
                     rule['id'], ovn_const.TYPE_SECURITY_GROUP_RULES)
 
+    def _enable_port_groups(self):
+        ovn_config.cfg.CONF.set_override('enable_sg_port_groups', True,
+                                         group='ovn')
+        self.nb_ovn.is_port_groups_supported.return_value = True
+
+    @mock.patch.object(db_rev, 'bump_revision')
+    def test__create_security_group_port_groups(self, mock_bump):
+        self._enable_port_groups()
+        self.mech_driver._create_security_group(
+            resources.SECURITY_GROUP, events.AFTER_CREATE, {},
+            security_group=self.fake_sg)
+        external_ids = {ovn_const.OVN_SG_EXT_ID_KEY: self.fake_sg['id']}
+        pg_name = ovn_utils.ovn_port_group_name(self.fake_sg['id'])
+        # The rule of the group is an ACL of its port group
+        acls = [ovn_acl._add_sg_rule_acl_for_port_group(
+            pg_name, self.fake_sg_rule)]
+        self.nb_ovn.create_port_group.assert_called_once_with(
+            name=pg_name, external_ids=external_ids, acls=acls)
+        # The address sets are still created for the remote group rules
+        self.assertEqual(2, self.nb_ovn.create_address_set.call_count)
+        mock_bump.assert_called_once_with(
+            self.fake_sg, ovn_const.TYPE_SECURITY_GROUPS)
+
+    def test__delete_security_group_port_groups(self):
+        self._enable_port_groups()
+        self.mech_driver._delete_security_group(
+            resources.SECURITY_GROUP, events.AFTER_CREATE, {},
+            security_group_id=self.fake_sg['id'])
+        self.nb_ovn.delete_port_group.assert_called_once_with(
+            ovn_utils.ovn_port_group_name(self.fake_sg['id']))
+        self.assertEqual(2, self.nb_ovn.delete_address_set.call_count)
+
+    @mock.patch.object(db_rev, 'bump_revision')
+    def test__process_sg_rule_notifications_sgr_create_port_groups(
+            self, mock_bump):
+        self._enable_port_groups()
+        rule = dict(self.fake_sg_rule, security_group_id=self.fake_sg['id'])
+        self.mech_driver._process_sg_rule_notification(
+            resources.SECURITY_GROUP_RULE, events.AFTER_CREATE, {},
+            security_group_rule=rule)
+        # A single ACL is added to the port group, whatever its ports
+        self.nb_ovn.add_port_group_acl.assert_called_once_with(
+            **ovn_acl._add_sg_rule_acl_for_port_group(
+                ovn_utils.ovn_port_group_name(self.fake_sg['id']), rule))
+        self.nb_ovn.update_acls.assert_not_called()
+        mock_bump.assert_called_once_with(
+            rule, ovn_const.TYPE_SECURITY_GROUP_RULES)
+
+    @mock.patch.object(db_rev, 'delete_revision')
+    def test__process_sg_rule_notifications_sgr_delete_port_groups(
+            self, mock_delrev):
+        self._enable_port_groups()
+        rule = dict(self.fake_sg_rule, security_group_id=self.fake_sg['id'])
+        with mock.patch(
+            'neutron.db.securitygroups_db.'
+            'SecurityGroupDbMixin.get_security_group_rule',
+            return_value=rule
+        ):
+            self.mech_driver._process_sg_rule_notification(
+                resources.SECURITY_GROUP_RULE, events.BEFORE_DELETE, {},
+                security_group_rule=rule)
+        acl = ovn_acl._add_sg_rule_acl_for_port_group(
+            ovn_utils.ovn_port_group_name(self.fake_sg['id']), rule)
+        self.nb_ovn.delete_port_group_acl.assert_called_once_with(
+            acl['port_group'], acl['direction'], acl['priority'],
+            acl['match'])
+        self.nb_ovn.update_acls.assert_not_called()
+        mock_delrev.assert_called_once_with(
+            rule['id'], ovn_const.TYPE_SECURITY_GROUP_RULES)
+
     def test_add_acls_no_sec_group(self):
         acls = ovn_acl.add_acls(self.mech_driver._plugin,
                                 mock.Mock(),
@@ -547,6 +620,39 @@ class TestOVNMechanismDriver(test_plugin.Ml2PluginV2TestCase):
     def test_create_port_with_security_groups_native_dhcp_enabled(self):
         self._test_create_port_with_security_groups_helper(7)
 
+    @mock.patch.object(db_rev, 'bump_revisions')
+    def test_create_ports(self, mock_bump):
+        with self.network(set_context=True, tenant_id='test') as net1:
+            with self.subnet(network=net1) as subnet1:
+                with self.port(subnet=subnet1, set_context=True,
+                               tenant_id='test') as port1, \
+                        self.port(subnet=subnet1, set_context=True,
+                                  tenant_id='test') as port2:
+                    ports = [port1['port'], port2['port']]
+                    self.nb_ovn.create_lswitch_port.reset_mock()
+                    self.nb_ovn.check_for_row_by_value_and_retry.reset_mock()
+                    self.nb_ovn.update_address_set.reset_mock()
+                    mock_bump.reset_mock()
+                    self.mech_driver._ovn_client.create_ports(ports)
+
+                    self.assertEqual(
+                        2, self.nb_ovn.create_lswitch_port.call_count)
+                    self.nb_ovn.check_for_row_by_value_and_retry.\
+                        assert_called_once_with(
+                            'Logical_Switch', 'name',
+                            ovn_utils.ovn_name(net1['network']['id']))
+                    # The addresses of both ports are added to the address
+                    # set of their security group at once.
+                    self.nb_ovn.update_address_set.assert_called_once_with(
+                        name=ovn_utils.ovn_addrset_name(
+                            port1['port']['security_groups'][0], 'ip4'),
+                        addrs_add=[
+                            port1['port']['fixed_ips'][0]['ip_address'],
+                            port2['port']['fixed_ips'][0]['ip_address']],
+                        addrs_remove=None, if_exists=False)
+                    mock_bump.assert_called_once_with(
+                        ports, ovn_const.TYPE_PORTS)
+
     def test_update_port_changed_security_groups(self):
         with self.network(set_context=True, tenant_id='test') as net1:
             with self.subnet(network=net1) as subnet1:
@@ -661,6 +767,110 @@ class TestOVNMechanismDriver(test_plugin.Ml2PluginV2TestCase):
                     self.assertEqual(
                         1, self.nb_ovn.update_address_set.call_count)
 
+    def test_create_port_port_groups(self):
+        self._enable_port_groups()
+        with self.network(set_context=True, tenant_id='test') as net1:
+            with self.subnet(network=net1) as subnet1:
+                with self.port(subnet=subnet1,
+                               set_context=True, tenant_id='test') as port1:
+                    port_id = port1['port']['id']
+                    sg_id = port1['port']['security_groups'][0]
+                    # The port is added to the default drop port group,
+                    # which must exist, and to its security group's one
+                    self.nb_ovn.update_port_group_ports.assert_has_calls([
+                        mock.call(ovn_const.OVN_DROP_PORT_GROUP_NAME,
+                                  ports_add=[port_id], if_exists=False),
+                        mock.call(ovn_utils.ovn_port_group_name(sg_id),
+                                  ports_add=[port_id])])
+                    self.assertEqual(
+                        2, self.nb_ovn.update_port_group_ports.call_count)
+                    # Only the DHCP ACL is specific to the port, the drop
+                    # and security group rule ACLs are the port groups'
+                    self.assertEqual(1, self.nb_ovn.add_acl.call_count)
+
+    def test_create_port_without_security_groups_port_groups(self):
+        self._enable_port_groups()
+        kwargs = {'security_groups': []}
+        with self.network(set_context=True, tenant_id='test') as net1:
+            with self.subnet(network=net1) as subnet1:
+                with self.port(subnet=subnet1,
+                               arg_list=('security_groups',),
+                               set_context=True, tenant_id='test',
+                               **kwargs):
+                    self.nb_ovn.update_port_group_ports.assert_not_called()
+
+    def test_update_port_changed_security_groups_port_groups(self):
+        self._enable_port_groups()
+        with self.network(set_context=True, tenant_id='test') as net1:
+            with self.subnet(network=net1) as subnet1:
+                with self.port(subnet=subnet1,
+                               set_context=True, tenant_id='test') as port1:
+                    port_id = port1['port']['id']
+                    pg_name = ovn_utils.ovn_port_group_name(
+                        port1['port']['security_groups'][0])
+                    fake_lsp = (
+                        fakes.FakeOVNPort.from_neutron_port(
+                            port1['port']))
+                    self.nb_ovn.lookup.return_value = fake_lsp
+
+                    # Remove the default security group, the port leaves
+                    # the drop port group too.
+                    self.nb_ovn.update_port_group_ports.reset_mock()
+                    data = {'port': {'security_groups': []}}
+                    self._update('ports', port_id, data)
+                    self.nb_ovn.update_port_group_ports.assert_has_calls([
+                        mock.call(pg_name, ports_remove=[port_id]),
+                        mock.call(ovn_const.OVN_DROP_PORT_GROUP_NAME,
+                                  ports_remove=[port_id])])
+                    self.assertEqual(
+                        2, self.nb_ovn.update_port_group_ports.call_count)
+
+                    # Add the default security group back.
+                    self.nb_ovn.update_port_group_ports.reset_mock()
+                    fake_lsp.external_ids.pop(ovn_const.OVN_SG_IDS_EXT_ID_KEY)
+                    data = {'port': {'security_groups': [
+                        port1['port']['security_groups'][0]]}}
+                    self._update('ports', port_id, data)
+                    self.nb_ovn.update_port_group_ports.assert_has_calls([
+                        mock.call(pg_name, ports_add=[port_id]),
+                        mock.call(ovn_const.OVN_DROP_PORT_GROUP_NAME,
+                                  ports_add=[port_id], if_exists=False)])
+                    self.assertEqual(
+                        2, self.nb_ovn.update_port_group_ports.call_count)
+
+    def test_update_port_unchanged_security_groups_port_groups(self):
+        self._enable_port_groups()
+        with self.network(set_context=True, tenant_id='test') as net1:
+            with self.subnet(network=net1) as subnet1:
+                with self.port(subnet=subnet1,
+                               set_context=True, tenant_id='test') as port1:
+                    fake_lsp = (
+                        fakes.FakeOVNPort.from_neutron_port(
+                            port1['port']))
+                    self.nb_ovn.lookup.return_value = fake_lsp
+                    self.nb_ovn.update_port_group_ports.reset_mock()
+                    data = {'port': {'name': 'rtheis'}}
+                    self._update('ports', port1['port']['id'], data)
+                    self.nb_ovn.update_port_group_ports.assert_not_called()
+
+    def test_delete_port_with_security_groups_port_groups(self):
+        self._enable_port_groups()
+        with self.network(set_context=True, tenant_id='test') as net1:
+            with self.subnet(network=net1) as subnet1:
+                with self.port(subnet=subnet1,
+                               set_context=True, tenant_id='test') as port1:
+                    fake_lsp = (
+                        fakes.FakeOVNPort.from_neutron_port(
+                            port1['port']))
+                    self.nb_ovn.lookup.return_value = fake_lsp
+                    self.nb_ovn.update_port_group_ports.reset_mock()
+                    self._delete('ports', port1['port']['id'])
+                    self.assertEqual(
+                        1, self.nb_ovn.delete_lswitch_port.call_count)
+                    # Deleting the logical switch port removes it from its
+                    # port groups
+                    self.nb_ovn.update_port_group_ports.assert_not_called()
+
     def test_set_port_status_up(self):
         with self.network(set_context=True, tenant_id='test') as net1, \
             self.subnet(network=net1) as subnet1, \
@@ -700,6 +910,33 @@ class TestOVNMechanismDriver(test_plugin.Ml2PluginV2TestCase):
             self.mech_driver.set_port_status_down('foo')
             apc.assert_not_called()
 
+    def test_set_port_status_up_wait_for_metadata(self):
+        ovn_config.cfg.CONF.set_override('ovn_metadata_enabled', True,
+                                         group='ovn')
+        self.sb_ovn.get_logical_port_chassis_and_datapath = mock.Mock(
+            return_value=('chassis1', 'dp1'))
+        metadata_waiters = mock.Mock()
+        with mock.patch.object(self.mech_driver, '_get_metadata_waiters',
+                               return_value=metadata_waiters), \
+                mock.patch.object(self.mech_driver,
+                                  '_complete_port_status_up') as complete:
+            self.mech_driver.set_port_status_up('port1')
+            # The port is parked until the metadata service is ready
+            metadata_waiters.wait.assert_called_once_with(
+                'port1', 'chassis1', 'dp1', mock.ANY,
+                mech_driver.METADATA_READY_WAIT_TIMEOUT)
+            self.assertFalse(complete.called)
+
+            metadata_waiters.wait.call_args[0][3](True)
+            complete.assert_called_once_with('port1')
+
+    def test_set_port_status_down_cancel_metadata_wait(self):
+        metadata_waiters = mock.Mock()
+        with mock.patch.object(self.mech_driver, '_get_metadata_waiters',
+                               return_value=metadata_waiters):
+            self.mech_driver.set_port_status_down('foo')
+        metadata_waiters.cancel.assert_called_once_with('foo')
+
     def test_set_port_status_concurrent_delete(self):
         exc = os_db_exc.DBReferenceError('', '', '', '')
         with self.network(set_context=True, tenant_id='test') as net1, \
@@ -18,8 +18,10 @@ from ovsdbapp.backend.ovs_idl import idlutils
 
 from networking_ovn.common import acl as ovn_acl
 from networking_ovn.common import constants as ovn_const
+from networking_ovn.common import exceptions as ovn_exc
 from networking_ovn.common import utils as ovn_utils
 from networking_ovn.ovsdb import commands
+from networking_ovn.ovsdb import ovsdb_monitor
 from networking_ovn.tests import base
 from networking_ovn.tests.unit import fakes
 
@@ -78,6 +80,63 @@ class TestBaseCommandHelpers(base.TestCase):
         fake_row_mutate.verify.assert_not_called()
 
 
+class TestIndexedLookups(base.TestCase):
+
+    def setUp(self):
+        super(TestIndexedLookups, self).setUp()
+        self.idl = mock.Mock(spec=ovsdb_monitor.BaseOvnIdl)
+        self.idl.name_indexes = {'Logical_Switch': mock.Mock()}
+        self.api = mock.Mock(idl=self.idl)
+
+    def test_indexed(self):
+        fake_row = mock.Mock()
+        self.idl.row_by_name.return_value = fake_row
+        with mock.patch.object(idlutils, 'row_by_value') as rbv:
+            self.assertEqual(fake_row, commands._row_by_name(
+                self.api, 'Logical_Switch', 'ls-1'))
+            rbv.assert_not_called()
+        self.idl.row_by_name.assert_called_once_with('Logical_Switch', 'ls-1')
+
+    def test_indexed_not_found(self):
+        self.idl.row_by_name.return_value = None
+        self.assertIsNone(commands._row_by_name(
+            self.api, 'Logical_Switch', 'ls-1', None))
+        self.assertRaises(idlutils.RowNotFound, commands._row_by_name,
+                          self.api, 'Logical_Switch', 'ls-1')
+
+    def test_not_indexed(self):
+        fake_row = mock.Mock()
+        with mock.patch.object(idlutils, 'row_by_value',
+                               return_value=fake_row) as rbv:
+            self.assertEqual(fake_row, commands._row_by_name(
+                self.api, 'Port_Group', 'pg-1', None))
+            rbv.assert_called_once_with(
+                self.idl, 'Port_Group', 'name', 'pg-1', None)
+        self.idl.row_by_name.assert_not_called()
+
+    def test_rows_by_external_id(self):
+        self.idl.external_ids_indexes = {('NAT', 'fake-key'): mock.Mock()}
+        fake_rows = [mock.Mock()]
+        self.idl.rows_by_external_id.return_value = fake_rows
+        self.assertEqual(fake_rows, commands._rows_by_external_id(
+            self.api, 'NAT', 'fake-key', 'fake-value'))
+        self.idl.rows_by_external_id.assert_called_once_with(
+            'NAT', 'fake-key', 'fake-value')
+
+    def test_rows_by_external_id_not_indexed(self):
+        self.idl.external_ids_indexes = {}
+        fake_row = fakes.FakeOvsdbRow.create_one_ovsdb_row(
+            attrs={'external_ids': {'fake-key': 'fake-value'}})
+        other_row = fakes.FakeOvsdbRow.create_one_ovsdb_row(
+            attrs={'external_ids': {}})
+        fake_table = fakes.FakeOvsdbTable.create_one_ovsdb_table()
+        fake_table.rows = {fake_row.uuid: fake_row, other_row.uuid: other_row}
+        self.api._tables = {'NAT': fake_table}
+        self.assertEqual([fake_row], commands._rows_by_external_id(
+            self.api, 'NAT', 'fake-key', 'fake-value'))
+        self.idl.rows_by_external_id.assert_not_called()
+
+
 class TestBaseCommand(base.TestCase):
     def setUp(self):
         super(TestBaseCommand, self).setUp()
@@ -110,7 +169,6 @@ class TestLSwitchSetExternalIdsCommand(TestBaseCommand):
         network_name = 'private'
         new_network_name = 'private-new'
         ext_ids = {ovn_const.OVN_NETWORK_NAME_EXT_ID_KEY: network_name}
-        new_ext_ids = {ovn_const.OVN_NETWORK_NAME_EXT_ID_KEY: new_network_name}
         fake_lswitch = fakes.FakeOvsdbRow.create_one_ovsdb_row(
             attrs={'external_ids': ext_ids})
         with mock.patch.object(idlutils, 'row_by_value',
@@ -120,7 +178,11 @@ class TestLSwitchSetExternalIdsCommand(TestBaseCommand):
                 {ovn_const.OVN_NETWORK_NAME_EXT_ID_KEY: new_network_name},
                 if_exists=True)
             cmd.run_idl(self.transaction)
-            self.assertEqual(new_ext_ids, fake_lswitch.external_ids)
+            fake_lswitch.setkey.assert_called_once_with(
+                'external_ids', ovn_const.OVN_NETWORK_NAME_EXT_ID_KEY,
+                new_network_name)
+            fake_lswitch.verify.assert_not_called()
+            self.assertEqual(ext_ids, fake_lswitch.external_ids)
 
 
 class TestAddLSwitchPortCommand(TestBaseCommand):
@@ -820,19 +882,53 @@ class TestUpdateACLsCommand(TestBaseCommand):
                    'acls': []})
         add_acl = ovn_acl.add_sg_rule_acl_for_port(
             fake_port, fake_sg_rule, 'add_acl')
+        del_acl = ovn_acl.add_sg_rule_acl_for_port(
+            fake_port, fake_sg_rule, 'del_acl')
         self.ovn_api.get_acls_for_lswitches.return_value = (
-            {fake_port['id']: [fake_del_acl.match]},
-            {fake_del_acl.match: fake_del_acl},
+            {fake_port['id']: [del_acl]},
+            {ovn_utils.ovn_acl_key(del_acl): [fake_del_acl]},
             {fake_lswitch.name.replace('neutron-', ''): fake_lswitch})
         cmd = commands.UpdateACLsCommand(
             self.ovn_api, [fake_port['network_id']],
-            [fake_port], {fake_port['id']: [add_acl]},
+            iter([fake_port]), {fake_port['id']: [add_acl]},
             need_compare=True)
         self.transaction.insert.return_value = fake_add_acl
         cmd.run_idl(self.transaction)
+        self.ovn_api.get_acls_for_lswitches.assert_called_once_with(
+            [fake_port['network_id']], lports={fake_port['id']})
         self.transaction.insert.assert_called_once_with(
             self.ovn_api._tables['ACL'])
         fake_lswitch.addvalue.assert_called_with('acls', fake_add_acl.uuid)
+        fake_lswitch.delvalue.assert_called_with('acls', fake_del_acl)
+        fake_del_acl.delete.assert_called_once_with()
+
+    def test_acl_update_compare_duplicate_acls(self):
+        fake_sg_rule = \
+            fakes.FakeSecurityGroupRule.create_one_security_group_rule().info()
+        fake_port = fakes.FakePort.create_one_port().info()
+        fake_acl = fakes.FakeOvsdbRow.create_one_ovsdb_row(
+            attrs={'match': 'acl'})
+        fake_dup_acl = fakes.FakeOvsdbRow.create_one_ovsdb_row(
+            attrs={'match': 'acl'})
+        fake_lswitch = fakes.FakeOvsdbRow.create_one_ovsdb_row(
+            attrs={'name': ovn_utils.ovn_name(fake_port['network_id']),
+                   'acls': []})
+        acl = ovn_acl.add_sg_rule_acl_for_port(
+            fake_port, fake_sg_rule, 'acl')
+        self.ovn_api.get_acls_for_lswitches.return_value = (
+            {fake_port['id']: [acl, dict(acl)]},
+            {ovn_utils.ovn_acl_key(acl): [fake_acl, fake_dup_acl]},
+            {fake_lswitch.name.replace('neutron-', ''): fake_lswitch})
+        cmd = commands.UpdateACLsCommand(
+            self.ovn_api, [fake_port['network_id']],
+            iter([fake_port]), {fake_port['id']: [dict(acl)]},
+            need_compare=True)
+        cmd.run_idl(self.transaction)
+        # Only the duplicate of the acl is deleted
+        self.transaction.insert.assert_not_called()
+        fake_dup_acl.delete.assert_called_once_with()
+        fake_acl.delete.assert_not_called()
+        fake_lswitch.delvalue.assert_called_once_with('acls', fake_dup_acl)
 
     def test_acl_update_no_compare_add_acls(self):
         fake_sg_rule = \
@@ -871,6 +967,7 @@ class TestUpdateACLsCommand(TestBaseCommand):
                    'acls': [fake_acl]})
         del_acl = ovn_acl.add_sg_rule_acl_for_port(
             fake_port, fake_sg_rule, '*')
+        self.ovn_api.get_acls_by_sg_rule_id.return_value = [fake_acl]
         with mock.patch.object(idlutils, 'row_by_value',
                                return_value=fake_lswitch):
             cmd = commands.UpdateACLsCommand(
@@ -881,6 +978,70 @@ class TestUpdateACLsCommand(TestBaseCommand):
             cmd.run_idl(self.transaction)
             self.transaction.insert.assert_not_called()
             fake_lswitch.delvalue.assert_called_with('acls', mock.ANY)
+        self.ovn_api.get_acls_by_sg_rule_id.assert_called_once_with(
+            fake_sg_rule['id'])
+
+    def test_acl_update_no_compare_del_acls_other_port(self):
+        fake_sg_rule = \
+            fakes.FakeSecurityGroupRule.create_one_security_group_rule().info()
+        fake_port = fakes.FakePort.create_one_port().info()
+        fake_acl = fakes.FakeOvsdbRow.create_one_ovsdb_row(
+            attrs={'match': '*', 'external_ids':
+                   {'neutron:lport': 'other-port-id',
+                    'neutron:security_group_rule_id': fake_sg_rule['id']}})
+        fake_lswitch = fakes.FakeOvsdbRow.create_one_ovsdb_row(
+            attrs={'name': ovn_utils.ovn_name(fake_port['network_id'])})
+        del_acl = ovn_acl.add_sg_rule_acl_for_port(
+            fake_port, fake_sg_rule, '*')
+        self.ovn_api.get_acls_by_sg_rule_id.return_value = [fake_acl]
+        with mock.patch.object(idlutils, 'row_by_value',
+                               return_value=fake_lswitch):
+            cmd = commands.UpdateACLsCommand(
+                self.ovn_api, [fake_port['network_id']],
+                [fake_port], {fake_port['id']: del_acl},
+                need_compare=False,
+                is_add_acl=False)
+            cmd.run_idl(self.transaction)
+            fake_acl.delete.assert_not_called()
+            fake_lswitch.delvalue.assert_not_called()
+
+
+class TestDelACLsCommand(TestBaseCommand):
+
+    def _test_lswitch_no_exist(self, if_exists=True):
+        with mock.patch.object(idlutils, 'row_by_value',
+                               side_effect=idlutils.RowNotFound):
+            cmd = commands.DelACLsCommand(
+                self.ovn_api, 'fake-lswitch', ['fake-acl-uuid'],
+                if_exists=if_exists)
+            if if_exists:
+                cmd.run_idl(self.transaction)
+            else:
+                self.assertRaises(RuntimeError, cmd.run_idl, self.transaction)
+
+    def test_lswitch_no_exist_ignore(self):
+        self._test_lswitch_no_exist(if_exists=True)
+
+    def test_lswitch_no_exist_fail(self):
+        self._test_lswitch_no_exist(if_exists=False)
+
+    def test_acls_del(self):
+        fake_acl_del = fakes.FakeOvsdbRow.create_one_ovsdb_row()
+        fake_acl_save = fakes.FakeOvsdbRow.create_one_ovsdb_row()
+        for acl in (fake_acl_del, fake_acl_save):
+            self.ovn_api._tables['ACL'].rows[acl.uuid] = acl
+        fake_lswitch = fakes.FakeOvsdbRow.create_one_ovsdb_row()
+        fake_lswitch.acls = [fake_acl_del, fake_acl_save]
+        with mock.patch.object(idlutils, 'row_by_value',
+                               return_value=fake_lswitch):
+            cmd = commands.DelACLsCommand(
+                self.ovn_api, fake_lswitch.name,
+                [fake_acl_del.uuid, 'unknown-acl-uuid'], if_exists=True)
+            cmd.run_idl(self.transaction)
+            fake_acl_del.delete.assert_called_once_with()
+            fake_acl_save.delete.assert_not_called()
+            fake_lswitch.delvalue.assert_called_once_with(
+                'acls', fake_acl_del)
 
 
 class TestAddStaticRouteCommand(TestBaseCommand):
@@ -1126,7 +1287,180 @@ class TestUpdateAddrSetExtIdsCommand(TestBaseCommand):
                 self.ovn_api, fake_addrset.name,
                 new_ext_ids, if_exists=True)
             cmd.run_idl(self.transaction)
-            self.assertEqual(new_ext_ids, fake_addrset.external_ids)
+            fake_addrset.setkey.assert_called_once_with(
+                'external_ids', ovn_const.OVN_SG_EXT_ID_KEY, 'default-new')
+            fake_addrset.verify.assert_not_called()
+
+
+class TestAddPortGroupCommand(TestBaseCommand):
+
+    def test_port_group_exists(self):
+        with mock.patch.object(idlutils, 'row_by_value',
+                               return_value=mock.ANY):
+            cmd = commands.AddPortGroupCommand(
+                self.ovn_api, 'fake_pg', may_exist=True)
+            cmd.run_idl(self.transaction)
+            self.transaction.insert.assert_not_called()
+
+    def test_port_group_add(self):
+        fake_pg = fakes.FakeOvsdbRow.create_one_ovsdb_row()
+        fake_acl = fakes.FakeOvsdbRow.create_one_ovsdb_row(
+            attrs={'match': ''})
+        fake_lsp = fakes.FakeOvsdbRow.create_one_ovsdb_row()
+        self.transaction.insert.side_effect = [fake_pg, fake_acl]
+        ext_ids = {ovn_const.OVN_SG_EXT_ID_KEY: 'fake-sg-id'}
+        with mock.patch.object(idlutils, 'row_by_value',
+                               side_effect=[None, fake_lsp]):
+            cmd = commands.AddPortGroupCommand(
+                self.ovn_api, 'fake_pg', may_exist=True,
+                external_ids=ext_ids,
+                acls=[{'port_group': 'fake_pg', 'match': 'fake-match'}],
+                ports=[fake_lsp.name])
+            cmd.run_idl(self.transaction)
+        self.transaction.insert.assert_has_calls([
+            mock.call(self.ovn_api._tables['Port_Group']),
+            mock.call(self.ovn_api._tables['ACL'])])
+        self.assertEqual('fake_pg', fake_pg.name)
+        self.assertEqual(ext_ids, fake_pg.external_ids)
+        self.assertEqual('fake-match', fake_acl.match)
+        self.assertFalse(hasattr(fake_acl, 'port_group'))
+        fake_pg.addvalue.assert_has_calls([
+            mock.call('acls', fake_acl.uuid),
+            mock.call('ports', fake_lsp.uuid)])
+
+
+class TestDelPortGroupCommand(TestBaseCommand):
+
+    def _test_port_group_del_no_exist(self, if_exists=True):
+        with mock.patch.object(idlutils, 'row_by_value',
+                               side_effect=idlutils.RowNotFound):
+            cmd = commands.DelPortGroupCommand(
+                self.ovn_api, 'fake_pg', if_exists=if_exists)
+            if if_exists:
+                cmd.run_idl(self.transaction)
+            else:
+                self.assertRaises(RuntimeError, cmd.run_idl, self.transaction)
+
+    def test_port_group_no_exist_ignore(self):
+        self._test_port_group_del_no_exist(if_exists=True)
+
+    def test_port_group_no_exist_fail(self):
+        self._test_port_group_del_no_exist(if_exists=False)
+
+    def test_port_group_del(self):
+        fake_pg = fakes.FakeOvsdbRow.create_one_ovsdb_row()
+        with mock.patch.object(idlutils, 'row_by_value',
+                               return_value=fake_pg):
+            cmd = commands.DelPortGroupCommand(
+                self.ovn_api, fake_pg.name, if_exists=True)
+            cmd.run_idl(self.transaction)
+            fake_pg.delete.assert_called_once_with()
+
+
+class TestUpdatePortGroupPortsCommand(TestBaseCommand):
+
+    def _test_port_group_update_no_exist(self, if_exists=True):
+        with mock.patch.object(idlutils, 'row_by_value',
+                               side_effect=idlutils.RowNotFound):
+            cmd = commands.UpdatePortGroupPortsCommand(
+                self.ovn_api, 'fake_pg', ['fake-lsp'], None,
+                if_exists=if_exists)
+            if if_exists:
+                cmd.run_idl(self.transaction)
+            else:
+                self.assertRaises(RuntimeError, cmd.run_idl, self.transaction)
+
+    def test_port_group_no_exist_ignore(self):
+        self._test_port_group_update_no_exist(if_exists=True)
+
+    def test_port_group_no_exist_fail(self):
+        self._test_port_group_update_no_exist(if_exists=False)
+
+    def test_port_group_update_ports(self):
+        fake_pg = fakes.FakeOvsdbRow.create_one_ovsdb_row()
+        fake_lsp_add = fakes.FakeOvsdbRow.create_one_ovsdb_row()
+        fake_lsp_remove = fakes.FakeOvsdbRow.create_one_ovsdb_row()
+        with mock.patch.object(idlutils, 'row_by_value',
+                               side_effect=[fake_pg, fake_lsp_add, None,
+                                            fake_lsp_remove]):
+            cmd = commands.UpdatePortGroupPortsCommand(
+                self.ovn_api, fake_pg.name,
+                [fake_lsp_add.name, 'unknown-lsp'], [fake_lsp_remove.name],
+                if_exists=True)
+            cmd.run_idl(self.transaction)
+        fake_pg.addvalue.assert_called_once_with('ports', fake_lsp_add.uuid)
+        fake_pg.delvalue.assert_called_once_with('ports',
+                                                 fake_lsp_remove.uuid)
+
+
+class TestAddPortGroupACLCommand(TestBaseCommand):
+
+    def setUp(self):
+        super(TestAddPortGroupACLCommand, self).setUp()
+        self.acl = {'direction': 'from-lport', 'priority': 1002,
+                    'match': 'inport == @fake_pg && ip4'}
+
+    def test_port_group_no_exist(self):
+        with mock.patch.object(idlutils, 'row_by_value',
+                               side_effect=idlutils.RowNotFound):
+            cmd = commands.AddPortGroupACLCommand(
+                self.ovn_api, 'fake_pg', may_exist=True, **self.acl)
+            self.assertRaises(RuntimeError, cmd.run_idl, self.transaction)
+
+    def test_acl_exists(self):
+        fake_acl = fakes.FakeOvsdbRow.create_one_ovsdb_row(attrs=self.acl)
+        fake_pg = fakes.FakeOvsdbRow.create_one_ovsdb_row(
+            attrs={'acls': [fake_acl]})
+        with mock.patch.object(idlutils, 'row_by_value',
+                               return_value=fake_pg):
+            cmd = commands.AddPortGroupACLCommand(
+                self.ovn_api, fake_pg.name, may_exist=True, **self.acl)
+            cmd.run_idl(self.transaction)
+        self.transaction.insert.assert_not_called()
+
+    def test_acl_add(self):
+        fake_acl = fakes.FakeOvsdbRow.create_one_ovsdb_row()
+        self.transaction.insert.return_value = fake_acl
+        fake_pg = fakes.FakeOvsdbRow.create_one_ovsdb_row(attrs={'acls': []})
+        with mock.patch.object(idlutils, 'row_by_value',
+                               return_value=fake_pg):
+            cmd = commands.AddPortGroupACLCommand(
+                self.ovn_api, fake_pg.name, may_exist=True, **self.acl)
+            cmd.run_idl(self.transaction)
+        self.transaction.insert.assert_called_once_with(
+            self.ovn_api._tables['ACL'])
+        self.assertEqual(self.acl['match'], fake_acl.match)
+        fake_pg.addvalue.assert_called_once_with('acls', fake_acl.uuid)
+
+
+class TestDelPortGroupACLCommand(TestBaseCommand):
+
+    def test_port_group_no_exist_ignore(self):
+        with mock.patch.object(idlutils, 'row_by_value',
+                               side_effect=idlutils.RowNotFound):
+            cmd = commands.DelPortGroupACLCommand(
+                self.ovn_api, 'fake_pg', 'from-lport', 1002, 'fake-match',
+                if_exists=True)
+            cmd.run_idl(self.transaction)
+
+    def test_acl_del(self):
+        fake_acl_del = fakes.FakeOvsdbRow.create_one_ovsdb_row(
+            attrs={'direction': 'from-lport', 'priority': 1002,
+                   'match': 'fake-match'})
+        fake_acl_save = fakes.FakeOvsdbRow.create_one_ovsdb_row(
+            attrs={'direction': 'to-lport', 'priority': 1002,
+                   'match': 'fake-match'})
+        fake_pg = fakes.FakeOvsdbRow.create_one_ovsdb_row()
+        fake_pg.acls = [fake_acl_save, fake_acl_del]
+        with mock.patch.object(idlutils, 'row_by_value',
+                               return_value=fake_pg):
+            cmd = commands.DelPortGroupACLCommand(
+                self.ovn_api, fake_pg.name, 'from-lport', 1002, 'fake-match',
+                if_exists=True)
+            cmd.run_idl(self.transaction)
+        fake_pg.delvalue.assert_called_once_with('acls', fake_acl_del)
+        fake_acl_del.delete.assert_called_once_with()
+        fake_acl_save.delete.assert_not_called()
 
 
 class TestAddDHCPOptionsCommand(TestBaseCommand):
@@ -1257,3 +1591,69 @@ class TestSetNATRuleInLRouterCommand(TestBaseCommand):
             cmd.run_idl(self.transaction)
             self.assertEqual('10.0.0.10', fake_nat_rule_1.logical_ip)
             self.assertEqual('10.0.0.5', fake_nat_rule_2.logical_ip)
+
+
+class TestCheckRevisionNumberCommand(TestBaseCommand):
+
+    def setUp(self):
+        super(TestCheckRevisionNumberCommand, self).setUp()
+        self.ovn_api.is_col_present = mock.Mock(return_value=True)
+        self.fake_network = fakes.FakeNetwork.create_one_network(
+            attrs={'revision_number': 5}).info()
+
+    def _test_check_revision_number(self, ovn_revision):
+        fake_lswitch = fakes.FakeOvsdbRow.create_one_ovsdb_row(
+            attrs={'external_ids': {
+                ovn_const.OVN_NETWORK_NAME_EXT_ID_KEY: 'fake-name',
+                ovn_const.OVN_REV_NUM_EXT_ID_KEY: str(ovn_revision)}})
+        self.ovn_api.lookup = mock.Mock(return_value=fake_lswitch)
+        cmd = commands.CheckRevisionNumberCommand(
+            self.ovn_api, fake_lswitch.name, self.fake_network,
+            ovn_const.TYPE_NETWORKS, if_exists=True)
+        cmd.run_idl(self.transaction)
+        return fake_lswitch
+
+    def test_check_revision_number(self):
+        fake_lswitch = self._test_check_revision_number(ovn_revision=4)
+        fake_lswitch.setkey.assert_called_once_with(
+            'external_ids', ovn_const.OVN_REV_NUM_EXT_ID_KEY, '5')
+        # The ovsdb-server checks the revision didn't change meanwhile
+        fake_lswitch.verify.assert_called_once_with('external_ids')
+
+    def test_check_revision_number_conflict(self):
+        self.assertRaises(ovn_exc.RevisionConflict,
+                          self._test_check_revision_number, ovn_revision=6)
+
+    def test_check_revision_number_no_exist(self):
+        self.ovn_api.lookup = mock.Mock(side_effect=idlutils.RowNotFound)
+        cmd = commands.CheckRevisionNumberCommand(
+            self.ovn_api, 'fake-lswitch', self.fake_network,
+            ovn_const.TYPE_NETWORKS, if_exists=False)
+        self.assertRaises(RuntimeError, cmd.run_idl, self.transaction)
+
+
+class TestSetPortBindingConditionCommand(TestBaseCommand):
+
+    def test_set_condition(self):
+        fake_chassis = fakes.FakeOvsdbRow.create_one_ovsdb_row()
+        self.ovn_api.idl.cond_change.return_value = 3
+        with mock.patch.object(idlutils, 'row_by_value',
+                               return_value=fake_chassis):
+            cmd = commands.SetPortBindingConditionCommand(
+                self.ovn_api, 'fake-chassis', {'dp-2', 'dp-1'})
+            cmd.run_idl(self.transaction)
+        self.assertEqual(3, cmd.result)
+        self.ovn_api.idl.cond_change.assert_called_once_with(
+            'Port_Binding',
+            [['datapath', '==', ['uuid', 'dp-1']],
+             ['datapath', '==', ['uuid', 'dp-2']],
+             ['chassis', '==', ['uuid', str(fake_chassis.uuid)]]])
+
+    def test_set_condition_no_chassis(self):
+        with mock.patch.object(idlutils, 'row_by_value',
+                               side_effect=idlutils.RowNotFound):
+            cmd = commands.SetPortBindingConditionCommand(
+                self.ovn_api, 'fake-chassis', set())
+            cmd.run_idl(self.transaction)
+        self.ovn_api.idl.cond_change.assert_called_once_with(
+            'Port_Binding', [])
@@ -19,6 +19,7 @@ import mock
 from networking_ovn.common import config
 from networking_ovn.common import constants as ovn_const
 from networking_ovn.common import utils
+from networking_ovn.ovsdb import commands as cmd
 from networking_ovn.ovsdb import impl_idl_ovn
 from networking_ovn.tests import base
 from networking_ovn.tests.unit import fakes
@@ -444,34 +445,43 @@ class TestNBImplIdlOvn(TestDBImplIdlOvn):
                      'ports': {'orp-id-a1': ['10.0.1.0/24'],
                                'orp-id-a2': ['10.0.2.0/24'],
                                'orp-id-a3': ['10.0.3.0/24']},
-                     'static_routes': [{'destination': '20.0.0.0/16',
-                                        'nexthop': '10.0.3.253'}],
-                     'snats': [{'external_ip': '10.0.3.1',
-                                'logical_ip': '20.0.0.0/16',
-                                'type': 'snat'}],
-                     'dnat_and_snats': []},
+                     'static_routes': {
+                         ('20.0.0.0/16', '10.0.3.253'): {
+                             'destination': '20.0.0.0/16',
+                             'nexthop': '10.0.3.253'}},
+                     'snats': {('20.0.0.0/16', '10.0.3.1'): {
+                         'external_ip': '10.0.3.1',
+                         'logical_ip': '20.0.0.0/16',
+                         'type': 'snat'}},
+                     'dnat_and_snats': {}},
                     {'name': 'lr-id-b',
                      'ports': {'xrp-id-b1': ['20.0.1.0/24'],
                                'orp-id-b2': ['20.0.2.0/24']},
-                     'static_routes': [{'destination': '10.0.0.0/16',
-                                        'nexthop': '20.0.2.253'}],
-                     'snats': [{'external_ip': '20.0.2.1',
-                                'logical_ip': '10.0.0.0/24',
-                                'type': 'snat'}],
-                     'dnat_and_snats': [{'external_ip': '20.0.2.4',
-                                         'logical_ip': '10.0.0.4',
-                                         'type': 'dnat_and_snat'},
-                                        {'external_ip': '20.0.2.5',
-                                         'logical_ip': '10.0.0.5',
-                                         'type': 'dnat_and_snat',
-                                         'external_mac': '00:01:02:03:04:05',
-                                         'logical_port': 'lsp-id-001'}]},
-                    {'name': 'lr-id-c', 'ports': {}, 'static_routes': [],
-                     'snats': [], 'dnat_and_snats': []},
-                    {'name': 'lr-id-d', 'ports': {}, 'static_routes': [],
-                     'snats': [], 'dnat_and_snats': []},
-                    {'name': 'lr-id-e', 'ports': {}, 'static_routes': [],
-                     'snats': [], 'dnat_and_snats': []}]
+                     'static_routes': {
+                         ('10.0.0.0/16', '20.0.2.253'): {
+                             'destination': '10.0.0.0/16',
+                             'nexthop': '20.0.2.253'}},
+                     'snats': {('10.0.0.0/24', '20.0.2.1'): {
+                         'external_ip': '20.0.2.1',
+                         'logical_ip': '10.0.0.0/24',
+                         'type': 'snat'}},
+                     'dnat_and_snats': {
+                         ('10.0.0.4', '20.0.2.4'): {
+                             'external_ip': '20.0.2.4',
+                             'logical_ip': '10.0.0.4',
+                             'type': 'dnat_and_snat'},
+                         ('10.0.0.5', '20.0.2.5'): {
+                             'external_ip': '20.0.2.5',
+                             'logical_ip': '10.0.0.5',
+                             'type': 'dnat_and_snat',
+                             'external_mac': '00:01:02:03:04:05',
+                             'logical_port': 'lsp-id-001'}}},
+                    {'name': 'lr-id-c', 'ports': {}, 'static_routes': {},
+                     'snats': {}, 'dnat_and_snats': {}},
+                    {'name': 'lr-id-d', 'ports': {}, 'static_routes': {},
+                     'snats': {}, 'dnat_and_snats': {}},
+                    {'name': 'lr-id-e', 'ports': {}, 'static_routes': {},
+                     'snats': {}, 'dnat_and_snats': {}}]
         self.assertItemsEqual(mapping, expected)
 
     def test_get_acls_for_lswitches(self):
@@ -541,6 +551,39 @@ class TestNBImplIdlOvn(TestDBImplIdlOvn):
         self.assertEqual(len(acl_objs), 0)
         self.assertEqual(len(lswitch_ovsdb_dict), 0)
 
+    def test_get_acls_for_lswitches_lports(self):
+        self._load_nb_db()
+        lswitches = ['ls-id-1', 'ls-id-2']
+        with mock.patch.object(
+                cmd, '_rows_by_external_id',
+                wraps=cmd._rows_by_external_id) as rows_by_external_id:
+            acl_values, acl_objs, lswitch_ovsdb_dict = \
+                self.nb_ovn_idl.get_acls_for_lswitches(
+                    lswitches, lports={'lsp-id-12'})
+        # The acls of the port are looked up by their external id
+        rows_by_external_id.assert_called_with(
+            self.nb_ovn_idl, 'ACL', 'neutron:lport', 'lsp-id-12')
+        self.assertEqual(['lsp-id-12'], list(acl_values))
+        self.assertEqual(2, len(acl_objs))
+        for acl in acl_values['lsp-id-12']:
+            self.assertIn(utils.ovn_acl_key(acl), acl_objs)
+        self.assertEqual(len(lswitch_ovsdb_dict), len(lswitches))
+
+    def test_get_acls_by_sg_rule_id(self):
+        rule_key = ovn_const.OVN_SG_RULE_EXT_ID_KEY
+        self._load_ovsdb_fake_rows(self.acl_table, [
+            {'match': 'match-1', 'external_ids': {rule_key: 'rule-1'}},
+            {'match': 'match-2', 'external_ids': {rule_key: 'rule-1'}},
+            {'match': 'match-3', 'external_ids': {rule_key: 'rule-2'}}])
+
+        acls = self.nb_ovn_idl.get_acls_by_sg_rule_id('rule-1')
+        self.assertItemsEqual(['match-1', 'match-2'],
+                              [acl.match for acl in acls])
+        self.assertEqual([], self.nb_ovn_idl.get_acls_by_sg_rule_id('rule-3'))
+        self.assertEqual('match-3',
+                         self.nb_ovn_idl.get_acl_by_id('rule-2').match)
+        self.assertIsNone(self.nb_ovn_idl.get_acl_by_id('rule-3'))
+
     def test_get_all_chassis_gateway_bindings(self):
         self._load_nb_db()
         bindings = self.nb_ovn_idl.get_all_chassis_gateway_bindings()
@@ -745,3 +788,94 @@ class TestSBImplIdlOvn(TestDBImplIdlOvn):
         mock_get_probe_interval.return_value = 5000
         inst = impl_idl_ovn.OvsdbSbOvnIdl(mock.Mock())
         inst.idl._session.reconnect.set_probe_interval.assert_called_with(5000)
+
+
+class TestTransactionCoalescer(base.TestCase):
+
+    def setUp(self):
+        super(TestTransactionCoalescer, self).setUp()
+        self.api = mock.Mock()
+        self.api.ovsdb_connection.timeout = 10
+        self.coalescer = impl_idl_ovn.TransactionCoalescer(
+            self.api, 0.01, 2)
+        self.ovsdb_txn = mock.Mock(SUCCESS='success', UNCHANGED='unchanged',
+                                   TRY_AGAIN='try_again', ERROR='error')
+        self.ovsdb_txn.commit_block.return_value = 'success'
+        mock.patch.object(impl_idl_ovn.ovs_db_idl, 'Transaction',
+                          return_value=self.ovsdb_txn).start()
+
+    def _create_txn(self, name, fail=False):
+        txn = mock.Mock()
+        command = mock.Mock(result=name)
+        if fail:
+            command.run_idl.side_effect = RuntimeError(name)
+        txn.commands = [command]
+        txn.do_commit.return_value = ['alone-' + name]
+        return txn
+
+    def _create_batch(self, txns):
+        batch = impl_idl_ovn.TransactionBatch(self.coalescer)
+        batch.txns.extend(txns)
+        return batch
+
+    def test_queue_txn_window(self):
+        txn = self._create_txn('txn')
+        self.coalescer.queue_txn(txn)
+        batch = self.api.ovsdb_connection.queue_txn.call_args[0][0]
+        self.assertEqual([txn], batch.txns)
+        self.assertIsNone(self.coalescer._batch)
+
+    def test_queue_txn_full_batch(self):
+        txns = [self._create_txn('txn-1'), self._create_txn('txn-2')]
+        batch = self.coalescer._batch = impl_idl_ovn.TransactionBatch(
+            self.coalescer)
+        for txn in txns:
+            self.coalescer.queue_txn(txn)
+        # The batch is only queued by its first transaction
+        self.assertFalse(self.api.ovsdb_connection.queue_txn.called)
+        self.assertTrue(batch.full.is_set())
+        self.assertEqual(txns, batch.txns)
+        self.assertIsNone(self.coalescer._batch)
+
+    def test_do_commit_merged(self):
+        txns = [self._create_txn('txn-1'), self._create_txn('txn-2')]
+        self._create_batch(txns).do_commit()
+        self.ovsdb_txn.commit_block.assert_called_once_with()
+        for txn in txns:
+            txn.post_commit.assert_called_once_with(self.ovsdb_txn)
+            self.assertFalse(txn.do_commit.called)
+        txns[0].results.put.assert_called_once_with(['txn-1'])
+        txns[1].results.put.assert_called_once_with(['txn-2'])
+        self.assertEqual(2, self.coalescer.merged_txns)
+
+    def test_do_commit_split_on_failure(self):
+        txns = [self._create_txn('txn-1'), self._create_txn('txn-2'),
+                self._create_txn('txn-3'),
+                self._create_txn('txn-4', fail=True)]
+        self._create_batch(txns).do_commit()
+        self.assertEqual(2, self.ovsdb_txn.abort.call_count)
+        # The first half is still committed as a single transaction, the
+        # second one is split again down to the failing transaction.
+        txns[0].results.put.assert_called_once_with(['txn-1'])
+        txns[1].results.put.assert_called_once_with(['txn-2'])
+        txns[2].results.put.assert_called_once_with(['alone-txn-3'])
+        txns[3].results.put.assert_called_once_with(['alone-txn-4'])
+        self.assertFalse(txns[0].do_commit.called)
+        self.assertEqual(2, self.coalescer.merged_txns)
+
+    def test_do_commit_split_on_error(self):
+        self.ovsdb_txn.commit_block.return_value = 'error'
+        txns = [self._create_txn('txn-1'), self._create_txn('txn-2')]
+        self._create_batch(txns).do_commit()
+        for txn in txns:
+            txn.do_commit.assert_called_once_with()
+        txns[0].results.put.assert_called_once_with(['alone-txn-1'])
+        txns[1].results.put.assert_called_once_with(['alone-txn-2'])
+        self.assertEqual(0, self.coalescer.merged_txns)
+
+    def test_do_commit_alone_exception(self):
+        txn = self._create_txn('txn')
+        txn.do_commit.side_effect = RuntimeError('txn')
+        self._create_batch([txn]).do_commit()
+        result = txn.results.put.call_args[0][0]
+        self.assertIsInstance(result, impl_idl_ovn.idlutils.ExceptionResult)
@@ -14,6 +14,7 @@
 
 import copy
 import os
+import threading
 
 import mock
 from neutron_lib.plugins import constants
@@ -184,6 +185,24 @@ class TestOvnNbIdlNotifyHandler(test_mech_driver.OVNMechanismDriverTestCase):
         self.assertFalse(self.driver.set_port_status_up.called)
         self.assertFalse(self.driver.set_port_status_down.called)
 
+    def test_rows_by_external_id(self):
+        row1 = self._create_row('ls-1')
+        row1.external_ids = {'subnet_id': 'subnet-1'}
+        row1._table.name = 'DHCP_Options'
+        row2 = self._create_row('ls-2')
+        row2.external_ids = {'subnet_id': 'subnet-1', 'port_id': 'port-1'}
+        row2._table.name = 'DHCP_Options'
+        self.idl.tables['DHCP_Options'] = mock.Mock(
+            rows={row1.uuid: row1, row2.uuid: row2})
+        self.idl.notify('create', row1)
+        self.idl.notify('create', row2)
+        self.assertItemsEqual([row1, row2], self.idl.rows_by_external_id(
+            'DHCP_Options', 'subnet_id', 'subnet-1'))
+        self.assertEqual([row2], self.idl.rows_by_external_id(
+            'DHCP_Options', 'port_id', 'port-1'))
+        self.assertEqual([], self.idl.rows_by_external_id(
+            'DHCP_Options', 'subnet_id', 'subnet-2'))
+
     def test_notify_other_table(self):
         new_row_json = {"name": "foo-name"}
         self._test_lsp_helper('create', new_row_json,
@@ -204,6 +223,366 @@ class TestOvnNbIdlNotifyHandler(test_mech_driver.OVNMechanismDriverTestCase):
         self.assertTrue(self.idl.notify_handler.notify.called)
 
 
+class TestExternalIdsIndex(base.TestCase):
+
+    def setUp(self):
+        super(TestExternalIdsIndex, self).setUp()
+        self.index = ovsdb_monitor.ExternalIdsIndex('ACL', 'fake-key')
+
+    def _create_row(self, value, table='ACL'):
+        row = mock.Mock(uuid=uuidutils.generate_uuid(),
+                        external_ids={'fake-key': value})
+        row._table.name = table
+        return row
+
+    def test_create_and_delete(self):
+        row1 = self._create_row('value-1')
+        row2 = self._create_row('value-1')
+        self.index.notify('create', row1)
+        self.index.notify('create', row2)
+        self.assertItemsEqual([row1.uuid, row2.uuid],
+                              self.index.get('value-1'))
+
+        self.index.notify('delete', row1)
+        self.assertEqual([row2.uuid], self.index.get('value-1'))
+        self.index.notify('delete', row2)
+        self.assertEqual([], self.index.get('value-1'))
+
+    def test_update(self):
+        row = self._create_row('value-1')
+        self.index.notify('create', row)
+        row.external_ids = {'fake-key': 'value-2'}
+        self.index.notify('update', row)
+        self.assertEqual([], self.index.get('value-1'))
+        self.assertEqual([row.uuid], self.index.get('value-2'))
+
+        row.external_ids = {}
+        self.index.notify('update', row)
+        self.assertEqual([], self.index.get('value-2'))
+
+    def test_other_table(self):
+        self.index.notify('create', self._create_row('value-1', 'NAT'))
+        self.assertEqual([], self.index.get('value-1'))
+
+    def test_nb_idl_notify_no_ovsdb_lock(self):
+        helper = ovs_idl.SchemaHelper(schema_json=OVN_NB_SCHEMA)
+        helper.register_all()
+        idl = ovsdb_monitor.OvnNbIdl(mock.Mock(), "remote", helper)
+        idl.is_lock_contended = True
+        row = self._create_row('value-1')
+        idl.notify('create', row)
+        self.assertEqual([row.uuid], idl.acl_rule_index.get('value-1'))
+
+
+class TestPortBindingIndexes(base.TestCase):
+
+    def _create_row(self, chassis=None, mac=None):
+        row = mock.Mock(uuid=uuidutils.generate_uuid(),
+                        chassis=[chassis] if chassis else [],
+                        mac=[mac] if mac else [])
+        row.datapath.uuid = 'dp-uuid'
+        row._table.name = 'Port_Binding'
+        return row
+
+    def test_chassis_index(self):
+        index = ovsdb_monitor.PortBindingChassisIndex()
+        chassis = mock.Mock()
+        chassis.name = 'chassis-1'
+        row1 = self._create_row(chassis=chassis)
+        row2 = self._create_row()
+        index.notify('create', row1)
+        index.notify('create', row2)
+        self.assertEqual([row1.uuid], index.get('chassis-1'))
+
+        row1.chassis = []
+        index.notify('update', row1)
+        self.assertEqual([], index.get('chassis-1'))
+
+    def test_ip_index(self):
+        index = ovsdb_monitor.PortBindingIpIndex()
+        row = self._create_row(mac='fa:16:3e:00:00:01 10.0.0.2 fd00::2')
+        index.notify('create', row)
+        self.assertEqual([row.uuid], index.get(('dp-uuid', '10.0.0.2')))
+        self.assertEqual([row.uuid], index.get(('dp-uuid', 'fd00::2')))
+        self.assertEqual([], index.get(('dp-uuid', 'fa:16:3e:00:00:01')))
+        self.assertEqual([], index.get(('other-dp-uuid', '10.0.0.2')))
+
+        row.mac = ['fa:16:3e:00:00:01 10.0.0.3']
+        index.notify('update', row)
+        self.assertEqual([], index.get(('dp-uuid', '10.0.0.2')))
+        self.assertEqual([row.uuid], index.get(('dp-uuid', '10.0.0.3')))
+        self.assertTrue(index.matches(row, ('dp-uuid', '10.0.0.3')))
+
+        index.notify('delete', row)
+        self.assertEqual([], index.get(('dp-uuid', '10.0.0.3')))
+
+
+class TestNameIndexes(base.TestCase):
+
+    def setUp(self):
+        super(TestNameIndexes, self).setUp()
+        helper = ovs_idl.SchemaHelper(schema_json=OVN_NB_SCHEMA)
+        helper.register_all()
+        self.idl = ovsdb_monitor.OvnNbIdl(mock.Mock(), "remote", helper)
+        self.idl.is_lock_contended = True
+
+    def _create_row(self, name, table='Logical_Switch'):
+        row = mock.Mock(uuid=uuidutils.generate_uuid(), external_ids={})
+        row.name = name
+        row._table.name = table
+        self.idl.tables[table].rows[row.uuid] = row
+        return row
+
+    def test_column_index_update(self):
+        index = ovsdb_monitor.ColumnIndex('Logical_Switch', 'name')
+        row = self._create_row('ls-1')
+        index.notify('create', row)
+        self.assertEqual([row.uuid], index.get('ls-1'))
+        row.name = 'ls-2'
+        index.notify('update', row)
+        self.assertEqual([], index.get('ls-1'))
+        self.assertEqual([row.uuid], index.get('ls-2'))
+
+    def test_row_by_name(self):
+        row = self._create_row('ls-1')
+        self.idl.notify('create', row)
+        self.assertEqual(row, self.idl.row_by_name('Logical_Switch', 'ls-1'))
+        self.assertIsNone(self.idl.row_by_name('Logical_Switch', 'ls-2'))
+
+    def test_row_by_name_row_gone(self):
+        row = self._create_row('ls-1')
+        self.idl.notify('create', row)
+        # Rows are dropped without notifications on reconnections
+        del self.idl.tables['Logical_Switch'].rows[row.uuid]
+        self.assertIsNone(self.idl.row_by_name('Logical_Switch', 'ls-1'))
+
+    def test_row_by_name_inserted_by_txn(self):
+        row = self._create_row('ls-1')
+        self.idl.txn = mock.Mock(_txn_rows={row.uuid: row})
+        self.assertEqual(row, self.idl.row_by_name('Logical_Switch', 'ls-1'))
+
+    def test_row_by_name_written_by_txn(self):
+        row = self._create_row('ls-1')
+        self.idl.txn = mock.Mock(_txn_rows={row.uuid: row})
+        self.assertEqual(row, self.idl.row_by_name('Logical_Switch', 'ls-1'))
+        # python-ovs stores the rows in _txn_rows each time they are
+        # written, they are indexed again by the next lookup
+        row.name = 'ls-2'
+        self.idl.txn._txn_rows[row.uuid] = row
+        new_row = self._create_row('ls-3')
+        self.idl.txn._txn_rows[new_row.uuid] = new_row
+        self.assertIsNone(self.idl.row_by_name('Logical_Switch', 'ls-1'))
+        self.assertEqual(row, self.idl.row_by_name('Logical_Switch', 'ls-2'))
+        self.assertEqual(
+            new_row, self.idl.row_by_name('Logical_Switch', 'ls-3'))
+        # A row deleted by the transaction is not in its table anymore
+        del self.idl.tables['Logical_Switch'].rows[new_row.uuid]
+        self.idl.txn._txn_rows[new_row.uuid] = new_row
+        self.assertIsNone(self.idl.row_by_name('Logical_Switch', 'ls-3'))
+
+    def test_row_by_name_txn_other_thread(self):
+        row = self._create_row('ls-1')
+        txn = mock.Mock(_txn_rows={row.uuid: row})
+        thread = threading.Thread(target=setattr,
+                                  args=(self.idl, 'txn', txn))
+        thread.start()
+        thread.join()
+        # The rows of a transaction are only seen by the thread building it
+        self.assertIsNone(self.idl.row_by_name('Logical_Switch', 'ls-1'))
+        self.assertEqual({row.uuid: row}, txn._txn_rows)
+
+    def test_notify_other_table(self):
+        row = self._create_row('lsp-1', table='Logical_Switch_Port')
+        self.idl.notify('create', row)
+        self.assertIsNone(self.idl.row_by_name('Logical_Switch', 'lsp-1'))
+        self.assertEqual(
+            row, self.idl.row_by_name('Logical_Switch_Port', 'lsp-1'))
+
+
+class TestEventDebouncer(base.TestCase):
+
+    def setUp(self):
+        super(TestEventDebouncer, self).setUp()
+        self.time = mock.patch.object(ovsdb_monitor.time, 'time',
+                                      return_value=100).start()
+        self.thread = mock.patch.object(ovsdb_monitor.threading,
+                                        'Thread').start()
+        self.debouncer = ovsdb_monitor.EventDebouncer(2)
+        self.driver = mock.Mock()
+        self.port_driver = ovsdb_monitor.DebouncedPortStatusDriver(
+            self.driver, self.debouncer)
+
+    def test_flush_collapses_flaps(self):
+        self.port_driver.set_port_status_down('port1')
+        self.port_driver.set_port_status_up('port2')
+        self.time.return_value = 101
+        self.port_driver.set_port_status_up('port1')
+        self.thread.return_value.start.assert_called_once_with()
+
+        # port2 settles first, port1 was reported again after it
+        self.time.return_value = 102
+        self.assertEqual(1, self.debouncer.flush())
+        self.driver.set_port_status_up.assert_called_once_with('port2')
+        self.assertFalse(self.driver.set_port_status_down.called)
+
+        self.time.return_value = 103
+        self.assertEqual(2, self.debouncer.flush())
+        self.driver.set_port_status_up.assert_has_calls(
+            [mock.call('port2'), mock.call('port1')])
+        self.assertFalse(self.driver.set_port_status_down.called)
+        self.assertEqual(1, self.debouncer.collapsed)
+
+    def test_flush_failure(self):
+        self.driver.set_port_status_down.side_effect = RuntimeError
+        self.port_driver.set_port_status_down('port1')
+        self.port_driver.set_port_status_up('port2')
+        self.time.return_value = 102
+        self.debouncer.flush()
+        self.driver.set_port_status_down.assert_called_once_with('port1')
+        self.driver.set_port_status_up.assert_called_once_with('port2')
+
+    def test_flush_executor(self):
+        executor = mock.Mock()
+        debouncer = ovsdb_monitor.EventDebouncer(2, executor=executor)
+        port_driver = ovsdb_monitor.DebouncedPortStatusDriver(
+            self.driver, debouncer)
+        port_driver.set_port_status_up('port1')
+        self.time.return_value = 102
+        debouncer.flush()
+        # The settled call is handed to the executor with its key
+        self.assertFalse(self.driver.set_port_status_up.called)
+        executor.assert_called_once_with('port1', mock.ANY, 'port1',
+                                         self.driver.set_port_status_up,
+                                         ('port1',))
+        run_call = executor.call_args[0][1]
+        run_call(*executor.call_args[0][2:])
+        self.driver.set_port_status_up.assert_called_once_with('port1')
+
+    def test_port_binding_chassis_event(self):
+        l3_plugin = mock.Mock()
+        with mock.patch.object(directory, 'get_plugin',
+                               return_value=l3_plugin):
+            event = ovsdb_monitor.PortBindingChassisEvent(
+                self.driver, self.debouncer)
+        row = mock.Mock(chassis=[mock.Mock(hostname='host1')])
+        row.datapath.external_ids = {'name': 'neutron-router1'}
+        event.run('update', row, None)
+        row.chassis[0].hostname = 'host2'
+        event.run('update', row, None)
+        self.assertFalse(l3_plugin.update_router_gateway_port_bindings.called)
+
+        self.time.return_value = 102
+        self.debouncer.flush()
+        l3_plugin.update_router_gateway_port_bindings.assert_called_once_with(
+            'router1', 'host2')
+
+
+class TestMetadataWaiters(base.TestCase):
+
+    def setUp(self):
+        super(TestMetadataWaiters, self).setUp()
+        self.chassis = mock.Mock(external_ids={})
+        self.chassis.name = 'chassis1'
+        self.row_by_value = mock.patch.object(
+            idlutils, 'row_by_value', return_value=self.chassis).start()
+        self.time = mock.patch.object(ovsdb_monitor.time, 'time',
+                                      return_value=100).start()
+        # The timer loop is run by the tests
+        self.thread = mock.patch.object(ovsdb_monitor.threading,
+                                        'Thread').start()
+        # Run the callbacks right away
+        executor = mock.patch.object(ovsdb_monitor.futurist,
+                                     'ThreadPoolExecutor').start()
+        executor.return_value.submit.side_effect = (
+            lambda func, *args: func(*args))
+        self.waiters = ovsdb_monitor.MetadataWaiters(mock.Mock())
+        executor.assert_called_once_with(
+            max_workers=ovsdb_monitor.METADATA_WAITERS_MAX_WORKERS)
+        self.callback = mock.Mock()
+
+    def _set_metadata_networks(self, networks):
+        self.chassis.external_ids = {
+            'neutron-metadata-proxy-networks': ','.join(networks)}
+
+    def _expire(self, now):
+        self.time.return_value = now
+        with self.waiters._lock:
+            return self.waiters._expire()
+
+    def test_wait_already_provisioned(self):
+        self._set_metadata_networks(['dp0', 'dp1'])
+        self.waiters.wait('port1', 'chassis1', 'dp1', self.callback, 15)
+        self.callback.assert_called_once_with(True)
+        self.assertEqual({}, self.waiters._waiters)
+        self.assertIsNone(self._expire(115))
+        self.callback.assert_called_once_with(True)
+
+    def test_wait_chassis_updated(self):
+        self.waiters.wait('port1', 'chassis1', 'dp1', self.callback, 15)
+        self.assertFalse(self.callback.called)
+
+        self._set_metadata_networks(['dp0'])
+        self.waiters.chassis_updated(self.chassis)
+        self.assertFalse(self.callback.called)
+
+        self._set_metadata_networks(['dp0', 'dp1'])
+        self.waiters.chassis_updated(self.chassis)
+        self.callback.assert_called_once_with(True)
+        self.assertEqual({}, self.waiters._ports)
+
+    def test_wait_other_chassis_updated(self):
+        self.waiters.wait('port1', 'chassis2', 'dp1', self.callback, 15)
+        self._set_metadata_networks(['dp1'])
+        self.waiters.chassis_updated(self.chassis)
+        self.assertFalse(self.callback.called)
+
+    def test_wait_timeout(self):
+        self.waiters.wait('port1', 'chassis1', 'dp1', self.callback, 15)
+        self.assertEqual(5, self._expire(110))
+        self.assertFalse(self.callback.called)
+        self.assertIsNone(self._expire(115))
+        self.callback.assert_called_once_with(False)
+
+        # The datapath showing up later does not call back again
+        self._set_metadata_networks(['dp1'])
+        self.waiters.chassis_updated(self.chassis)
+        self.callback.assert_called_once_with(False)
+
+    def test_wait_single_timer_thread(self):
+        callbacks = [mock.Mock() for i in range(3)]
+        for i, callback in enumerate(callbacks):
+            self.waiters.wait('port%d' % i, 'chassis1', 'dp1', callback,
+                              30 - i * 10)
+        self.thread.assert_called_once_with(target=self.waiters._timer_loop)
+        self.thread.return_value.start.assert_called_once_with()
+
+        # The ports time out in the order of their deadlines
+        self.assertEqual(10, self._expire(110))
+        self.assertFalse(callbacks[0].called)
+        self.assertFalse(callbacks[1].called)
+        callbacks[2].assert_called_once_with(False)
+        self.assertIsNone(self._expire(130))
+        callbacks[0].assert_called_once_with(False)
+        callbacks[1].assert_called_once_with(False)
+
+    def test_wait_replaced(self):
+        self.waiters.wait('port1', 'chassis1', 'dp1', self.callback, 15)
+        callback = mock.Mock()
+        self.waiters.wait('port1', 'chassis1', 'dp1', callback, 30)
+        self.assertEqual(15, self._expire(115))
+        self.assertIsNone(self._expire(130))
+        self.assertFalse(self.callback.called)
+        callback.assert_called_once_with(False)
+
+    def test_cancel(self):
+        self.waiters.wait('port1', 'chassis1', 'dp1', self.callback, 15)
+        self.waiters.cancel('port1')
+        self._set_metadata_networks(['dp1'])
+        self.waiters.chassis_updated(self.chassis)
+        self._expire(115)
+        self.assertFalse(self.callback.called)
+
+
 class TestOvnSbIdlNotifyHandler(test_mech_driver.OVNMechanismDriverTestCase):
 
     l3_plugin = 'networking_ovn.l3.l3_ovn.OVNL3RouterPlugin'
@@ -303,6 +682,89 @@ class TestOvnDbNotifyHandler(base.TestCase):
         self.handler.shutdown()
 
 
+class TestOvnDbNotifyHandlerDispatch(base.TestCase):
+
+    def setUp(self):
+        super(TestOvnDbNotifyHandlerDispatch, self).setUp()
+        # The notify loop is run by the tests
+        with mock.patch('threading.Thread'):
+            self.handler = ovsdb_monitor.OvnDbNotifyHandler(mock.ANY)
+        self.runs = []
+        self.match = mock.Mock(ONETIME=False, event_name='FakeEvent')
+        self.match.matches.return_value = True
+        self.match.run.side_effect = (
+            lambda event, row, old: self.runs.append((row.uuid, event)))
+        self.handler.watch_event(self.match)
+
+    def _notify(self, events):
+        for row_uuid, event in events:
+            self.handler.notify(event, mock.Mock(uuid=row_uuid))
+        self.handler.shutdown()
+        self.handler.notify_loop()
+
+    def test_notify_loop(self):
+        events = [('row1', 'create'), ('row2', 'create'), ('row1', 'update')]
+        self._notify(events)
+        self.assertEqual(events, self.runs)
+        stats = self.handler.get_stats()
+        self.assertEqual(3, stats['events_run'])
+        self.assertEqual(0, stats['queue_depth'])
+
+    def test_notify_loop_pool(self):
+        self.handler.pool_size = 3
+        events = [(row_uuid, event) for event in ('create', 'update',
+                                                  'delete')
+                  for row_uuid in ('row1', 'row2', 'row3', 'row4')]
+        self._notify(events)
+        self.assertItemsEqual(events, self.runs)
+        # The events of a row ran in order
+        for row_uuid in ('row1', 'row2', 'row3', 'row4'):
+            self.assertEqual(
+                ['create', 'update', 'delete'],
+                [event for uuid, event in self.runs if uuid == row_uuid])
+        self.assertIsNone(self.handler._workers)
+        self.assertEqual(12, self.handler.get_stats()['events_run'])
+
+    @mock.patch.object(ovsdb_monitor, 'LOG')
+    def test_notify_loop_log_stats(self, mock_log):
+        self.handler._stats_logged_at -= ovsdb_monitor.EVENT_STATS_INTERVAL
+        self._notify([('row1', 'create'), ('row1', 'update')])
+        # The stats are logged once per interval
+        mock_log.info.assert_called_once_with(mock.ANY, mock.ANY)
+        self.assertEqual(1, mock_log.info.call_args[0][1]['events_run'])
+
+    def test_run_call(self):
+        func = mock.Mock()
+        self.handler.run_call('port1', func, 'port1')
+        func.assert_called_once_with('port1')
+        self.assertIsNone(self.handler._workers)
+
+    def test_run_call_pool(self):
+        self.handler.pool_size = 3
+        func = mock.Mock()
+        with mock.patch.object(ovsdb_monitor, '_EventWorker',
+                               side_effect=lambda handler: mock.Mock()):
+            for port_id in ('port1', 'port2', 'port1'):
+                self.handler.run_call(port_id, func, port_id)
+        self.assertFalse(func.called)
+        # The calls of a port go to the same worker, in order
+        for port_id, count in (('port1', 2), ('port2', 1)):
+            event_worker = self.handler._workers[hash(port_id) % 3]
+            self.assertEqual(
+                count, event_worker.notifications.put.call_args_list.count(
+                    mock.call((func, (port_id,)))))
+
+    def test_notify_loop_event_failure(self):
+        self.match.run.side_effect = RuntimeError
+        self._notify([('row1', 'create'), ('row1', 'update')])
+        self.assertEqual(2, self.match.run.call_count)
+
+    def test_notify_loop_onetime(self):
+        self.match.ONETIME = True
+        self._notify([('row1', 'create')])
+        self.assertEqual(
+            (), self.handler.matching_events('create', mock.Mock(), None))
+
 # class TestOvnBaseConnection(base.TestCase):
 #
 # Each test is being deleted, but for reviewers sake I wanted to exaplain why:
@@ -329,6 +791,46 @@ class TestOvnDbNotifyHandler(base.TestCase):
 #    there is almost nothing to test in those except maybe SSL being set up
 #    but that was done below.
 
+
+class TestRegisterTables(base.TestCase):
+
+    def _get_idl_schema(self, schema, tables):
+        helper = ovs_idl.SchemaHelper(location=schema_files[schema])
+        ovsdb_monitor._register_tables(helper, tables)
+        return helper.get_idl_schema()
+
+    def test_register_nb_tables(self):
+        idl_schema = self._get_idl_schema('OVN_Northbound',
+                                          ovsdb_monitor.OVN_NB_TABLES)
+        # Port_Group, DNS and Gateway_Chassis are not part of the test
+        # schema
+        self.assertItemsEqual(
+            ['Logical_Switch', 'Logical_Switch_Port', 'Logical_Router',
+             'Logical_Router_Port', 'Logical_Router_Static_Route', 'NAT',
+             'ACL', 'Address_Set', 'DHCP_Options'],
+            idl_schema.tables)
+        self.assertItemsEqual(
+            ['name', 'ports', 'acls', 'other_config', 'external_ids'],
+            idl_schema.tables['Logical_Switch'].columns)
+        self.assertNotIn('load_balancer',
+                         idl_schema.tables['Logical_Router'].columns)
+
+    def test_register_sb_tables(self):
+        idl_schema = self._get_idl_schema('OVN_Southbound',
+                                          ovsdb_monitor.OVN_SB_TABLES)
+        self.assertEqual(['Chassis'], list(idl_schema.tables))
+        self.assertItemsEqual(['name', 'hostname', 'external_ids'],
+                              idl_schema.tables['Chassis'].columns)
+
+    def test_register_all_columns(self):
+        idl_schema = self._get_idl_schema(
+            'OVN_Southbound', ovsdb_monitor.OVN_SB_WORKER_TABLES)
+        self.assertItemsEqual(
+            ['Chassis', 'Encap', 'Port_Binding', 'Datapath_Binding'],
+            idl_schema.tables)
+        self.assertIn('encaps', idl_schema.tables['Chassis'].columns)
+
+
 class TestOvnConnection(base.TestCase):
 
     def setUp(self):
@@ -12,11 +12,20 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import json
+import os
+import time
+
+import fixtures
 import mock
 
+from networking_ovn.common import acl as acl_utils
 from networking_ovn.common import constants as ovn_const
 from networking_ovn.common import ovn_client
+from networking_ovn.common import utils
 from networking_ovn import ovn_db_sync
+from networking_ovn.tests import base
+from networking_ovn.tests.unit import fakes
 from networking_ovn.tests.unit.ml2 import test_mech_driver
 
 
@@ -253,42 +262,50 @@ class TestOvnNbSyncML2(test_mech_driver.OVNMechanismDriverTestCase):
 
         self.lrouters_with_rports = [{'name': 'r3',
                                       'ports': {'p1r3': ['fake']},
-                                      'static_routes': [],
-                                      'snats': [],
-                                      'dnat_and_snats': []},
+                                      'static_routes': {},
+                                      'snats': {},
+                                      'dnat_and_snats': {}},
                                      {'name': 'r4',
                                       'ports': {'p1r4':
                                                 ['fdad:123:456::1/64',
                                                  'fdad:789:abc::1/64']},
-                                      'static_routes': [],
-                                      'snats': [],
-                                      'dnat_and_snats': []},
+                                      'static_routes': {},
+                                      'snats': {},
+                                      'dnat_and_snats': {}},
                                      {'name': 'r1',
                                       'ports': {'p3r1': ['fake']},
-                                      'static_routes':
-                                      [{'nexthop': '20.0.0.100',
-                                        'destination': '11.0.0.0/24'},
-                                       {'nexthop': '20.0.0.100',
-                                        'destination': '10.0.0.0/24'}],
-                                      'snats':
-                                      [{'logical_ip': '172.16.0.0/24',
-                                        'external_ip': '90.0.0.2',
-                                        'type': 'snat'},
-                                       {'logical_ip': '172.16.1.0/24',
-                                        'external_ip': '90.0.0.2',
-                                        'type': 'snat'}],
-                                      'dnat_and_snats':
-                                      [{'logical_ip': '172.16.0.10',
-                                        'external_ip': '90.0.0.10',
-                                        'type': 'dnat_and_snat'},
-                                       {'logical_ip': '172.16.1.11',
-                                        'external_ip': '90.0.0.11',
-                                        'type': 'dnat_and_snat'},
-                                       {'logical_ip': '192.168.2.11',
-                                        'external_ip': '100.0.0.11',
-                                        'type': 'dnat_and_snat',
-                                        'external_mac': '01:02:03:04:05:06',
-                                        'logical_port': 'vm1'}]}]
+                                      'static_routes': {
+                                          ('11.0.0.0/24', '20.0.0.100'):
+                                          {'nexthop': '20.0.0.100',
+                                           'destination': '11.0.0.0/24'},
+                                          ('10.0.0.0/24', '20.0.0.100'):
+                                          {'nexthop': '20.0.0.100',
+                                           'destination': '10.0.0.0/24'}},
+                                      'snats': {
+                                          ('172.16.0.0/24', '90.0.0.2'):
+                                          {'logical_ip': '172.16.0.0/24',
+                                           'external_ip': '90.0.0.2',
+                                           'type': 'snat'},
+                                          ('172.16.1.0/24', '90.0.0.2'):
+                                          {'logical_ip': '172.16.1.0/24',
+                                           'external_ip': '90.0.0.2',
+                                           'type': 'snat'}},
+                                      'dnat_and_snats': {
+                                          ('172.16.0.10', '90.0.0.10'):
+                                          {'logical_ip': '172.16.0.10',
+                                           'external_ip': '90.0.0.10',
+                                           'type': 'dnat_and_snat'},
+                                          ('172.16.1.11', '90.0.0.11'):
+                                          {'logical_ip': '172.16.1.11',
+                                           'external_ip': '90.0.0.11',
+                                           'type': 'dnat_and_snat'},
+                                          ('192.168.2.11', '100.0.0.11'):
+                                          {'logical_ip': '192.168.2.11',
+                                           'external_ip': '100.0.0.11',
+                                           'type': 'dnat_and_snat',
+                                           'external_mac':
+                                           '01:02:03:04:05:06',
+                                           'logical_port': 'vm1'}}}]
 
         self.lswitches_with_ports = [{'name': 'neutron-n1',
                                       'ports': ['p1n1', 'p3n1'],
@@ -357,7 +374,15 @@ class TestOvnNbSyncML2(test_mech_driver.OVNMechanismDriverTestCase):
         core_plugin.get_security_group = mock.MagicMock(
             side_effect=self.security_groups)
         ovn_nb_synchronizer.get_acls = mock.Mock()
-        ovn_nb_synchronizer.get_acls.return_value = self.acls_ovn
+        nb_acls = {}
+        nb_acl_objs = {}
+        for port_id, acls in self.acls_ovn.items():
+            nb_acls[port_id] = {}
+            for acl in acls:
+                acl_key = utils.ovn_acl_key(acl)
+                nb_acls[port_id][acl_key] = acl
+                nb_acl_objs[acl_key] = [mock.Mock(uuid=acl['id'])]
+        ovn_nb_synchronizer.get_acls.return_value = (nb_acls, nb_acl_objs)
         core_plugin.get_security_groups = mock.MagicMock(
             return_value=self.security_groups)
         ovn_nb_synchronizer.get_address_sets = mock.Mock()
@@ -409,6 +434,7 @@ class TestOvnNbSyncML2(test_mech_driver.OVNMechanismDriverTestCase):
         ovn_driver.validate_and_get_data_from_binding_profile = mock.Mock()
         ovn_nb_synchronizer._ovn_client.create_port = mock.Mock()
         ovn_nb_synchronizer._ovn_client.create_port.return_value = mock.ANY
+        ovn_nb_synchronizer._ovn_client.create_ports = mock.Mock()
         ovn_nb_synchronizer._ovn_client._create_provnet_port = mock.Mock()
         ovn_api.ls_del = mock.Mock()
         ovn_api.delete_lswitch_port = mock.Mock()
@@ -519,12 +545,14 @@ class TestOvnNbSyncML2(test_mech_driver.OVNMechanismDriverTestCase):
         ovn_nb_synchronizer._ovn_client.create_network.assert_has_calls(
             create_network_calls, any_order=True)
 
-        self.assertEqual(
-            len(create_port_list),
-            ovn_nb_synchronizer._ovn_client.create_port.call_count)
-        create_port_calls = [mock.call(port) for port in create_port_list]
-        ovn_nb_synchronizer._ovn_client.create_port.assert_has_calls(
-            create_port_calls, any_order=True)
+        # The metadata ports are created alone, the other ones in batches
+        ovn_client = ovn_nb_synchronizer._ovn_client
+        created_ports = [
+            call[0][0] for call in ovn_client.create_port.call_args_list]
+        created_ports += [
+            port for call in ovn_client.create_ports.call_args_list
+            for port in call[0][0]]
+        self.assertItemsEqual(create_port_list, created_ports)
 
         create_provnet_port_calls = [
             mock.call(mock.ANY, mock.ANY,
@@ -802,6 +830,14 @@ class TestOvnNbSyncML2(test_mech_driver.OVNMechanismDriverTestCase):
                                       add_subnet_dhcp_options_list,
                                       delete_dhcp_options_list)
 
+        # The stale ACLs are deleted by row, per port
+        ovn_api = ovn_nb_synchronizer.ovn_api
+        self.assertEqual(2, ovn_api.delete_acls.call_count)
+        ovn_api.delete_acls.assert_has_calls(
+            [mock.call('lswitch1', ['acl1']), mock.call('lswitch2', ['acl2'])],
+            any_order=True)
+        self.assertFalse(ovn_api.update_acls.called)
+
     def test_ovn_nb_sync_mode_log(self):
         create_network_list = []
         create_port_list = []
@@ -885,3 +921,554 @@ class TestOvnSbSyncML2(test_mech_driver.OVNMechanismDriverTestCase):
                 hosts_in_neutron - set(hostname_with_physnets.keys())]
             ovn_driver.update_segment_host_mapping.assert_has_calls(
                 update_segment_host_mapping_calls, any_order=True)
+
+    def test_ovn_sb_sync_report(self):
+        report = ovn_db_sync.SyncReport()
+        ovn_sb_synchronizer = ovn_db_sync.OvnSbSynchronizer(
+            self.plugin,
+            self.mech_driver._sb_ovn,
+            self.mech_driver,
+            report=report)
+        ovn_sb_synchronizer.ovn_api.get_chassis_hostname_and_physnets.\
+            return_value = {'hostname1': ['physnet1'],
+                            'hostname2': ['physnet1']}
+        ovn_sb_synchronizer.ovn_driver.update_segment_host_mapping = (
+            mock.Mock())
+
+        with mock.patch.object(ovn_db_sync.segments_db,
+                               'get_hosts_mapped_with_segments',
+                               return_value={'hostname2', 'hostname3'}), \
+                mock.patch.object(ovn_db_sync.utils, 'is_ovn_l3',
+                                  return_value=False):
+            ovn_sb_synchronizer.do_sync()
+        phase = report.to_dict()['phases']['hostname_and_physical_networks']
+        self.assertIsNotNone(phase['time'])
+        hosts = phase['resources']['segment_host_mappings']
+        self.assertEqual(['hostname1'], hosts['add']['ids'])
+        self.assertEqual(['hostname3'], hosts['delete']['ids'])
+        self.assertEqual(['hostname2'], hosts['update']['ids'])
+
+
+class TestOvnNbSynchronizerDiffs(base.TestCase):
+
+    def setUp(self):
+        super(TestOvnNbSynchronizerDiffs, self).setUp()
+        self.synchronizer = ovn_db_sync.OvnNbSynchronizer.__new__(
+            ovn_db_sync.OvnNbSynchronizer)
+
+    def test_calculate_fips_differences(self):
+        ovn_fips = {('10.0.0.1', '172.24.4.1'): {'logical_ip': '10.0.0.1',
+                                                 'external_ip': '172.24.4.1'},
+                    ('10.0.0.2', '172.24.4.2'): {'logical_ip': '10.0.0.2',
+                                                 'external_ip': '172.24.4.2'}}
+        db_fips = [{'id': 'fip1', 'fixed_ip_address': '10.0.0.1',
+                    'floating_ip_address': '172.24.4.1'},
+                   {'id': 'fip3', 'fixed_ip_address': '10.0.0.3',
+                    'floating_ip_address': '172.24.4.3'}]
+        to_add, to_remove = self.synchronizer._calculate_fips_differences(
+            ovn_fips, db_fips)
+        self.assertEqual([db_fips[1]], to_add)
+        self.assertEqual([ovn_fips[('10.0.0.2', '172.24.4.2')]], to_remove)
+
+    def test_remove_common_acls(self):
+        synchronizer = self.synchronizer
+        acl1 = {'lport': 'p1', 'priority': 1001, 'match': 'ip4'}
+        acl2 = {'lport': 'p1', 'priority': 1002, 'match': 'ip6'}
+        acl3 = {'lport': 'p1', 'priority': 1003, 'match': 'udp'}
+        acl4 = {'lport': 'p2', 'priority': 1001, 'match': 'ip4'}
+
+        def by_key(*acls):
+            # A copy of each ACL, so the dicts are only equal by value
+            return {utils.ovn_acl_key(acl): dict(acl) for acl in acls}
+
+        neutron_acls = {'p1': by_key(acl1, acl2), 'p2': by_key(acl4)}
+        nb_acls = {'p1': by_key(acl2, acl3)}
+        synchronizer.remove_common_acls(neutron_acls, nb_acls)
+        self.assertEqual(
+            {'p1': by_key(acl1), 'p2': by_key(acl4)}, neutron_acls)
+        self.assertEqual({'p1': by_key(acl3)}, nb_acls)
+
+    def test_get_neutron_port_groups_no_acl_name_severity(self):
+        self.synchronizer.ovn_api = mock.Mock()
+        self.synchronizer.ovn_api._tables = {'ACL': mock.Mock(
+            columns={'priority': None, 'match': None, 'action': None,
+                     'direction': None, 'log': None})}
+        self.synchronizer._snapshot = mock.Mock(security_groups=[])
+        pgs = self.synchronizer._get_neutron_port_groups(mock.ANY, [])
+        drop_acls = pgs[ovn_const.OVN_DROP_PORT_GROUP_NAME]['acls']
+        self.assertEqual(2, len(drop_acls))
+        for acl in drop_acls:
+            self.assertNotIn('name', acl)
+            self.assertNotIn('severity', acl)
+
+    def test_sync_acls_duplicates(self):
+        synchronizer = self.synchronizer
+        synchronizer.mode = ovn_db_sync.SYNC_MODE_REPAIR
+        synchronizer.report = None
+        synchronizer.core_plugin = mock.Mock()
+        synchronizer.ovn_api = mock.MagicMock()
+        synchronizer._snapshot = mock.Mock(ports=[
+            {'id': 'p1', 'security_groups': ['sg1']}])
+        acl1 = {'lport': 'p1', 'lswitch': 'neutron-n1', 'priority': 1001,
+                'match': 'ip4'}
+        acl2 = {'lport': 'p1', 'lswitch': 'neutron-n1', 'priority': 1002,
+                'match': 'ip6'}
+        mock.patch.object(ovn_db_sync.acl_utils, 'add_acls',
+                          return_value=[dict(acl1)]).start()
+        key1 = utils.ovn_acl_key(acl1)
+        key2 = utils.ovn_acl_key(acl2)
+        synchronizer.get_acls = mock.Mock(return_value=(
+            {'p1': {key1: acl1, key2: acl2}},
+            {key1: [mock.Mock(uuid='acl1'), mock.Mock(uuid='acl1-dup')],
+             key2: [mock.Mock(uuid='acl2'), mock.Mock(uuid='acl2-dup')]}))
+
+        synchronizer.sync_acls(mock.sentinel.ctx)
+
+        # The duplicates of the ACL kept and all the rows of the stale ACL
+        # are deleted
+        synchronizer.ovn_api.add_acl.assert_not_called()
+        synchronizer.ovn_api.delete_acls.assert_called_once_with(
+            'neutron-n1', mock.ANY)
+        self.assertItemsEqual(
+            ['acl1-dup', 'acl2', 'acl2-dup'],
+            synchronizer.ovn_api.delete_acls.call_args[0][1])
+
+    @mock.patch.object(ovn_db_sync.config,
+                       'get_ovn_neutron_sync_txn_max_ops', return_value=2)
+    def test_create_ports_in_ovn(self, mock_max_ops):
+        synchronizer = self.synchronizer
+        synchronizer.ovn_api = mock.MagicMock()
+        synchronizer._ovn_client = mock.Mock()
+        ports = [{'id': 'p%d' % i, 'network_id': 'n1'} for i in range(5)]
+
+        def create_ports(batch):
+            if ports[2] in batch:
+                raise RuntimeError()
+        synchronizer._ovn_client.create_ports.side_effect = create_ports
+        synchronizer._ovn_client.create_port.side_effect = [
+            RuntimeError(), None]
+
+        created = synchronizer._create_ports_in_ovn(mock.sentinel.ctx, ports)
+
+        # The ports are created in batches, the ports of the failed batch
+        # are created one by one
+        synchronizer._ovn_client.create_ports.assert_has_calls([
+            mock.call(ports[0:2]), mock.call(ports[2:4]),
+            mock.call(ports[4:])])
+        synchronizer._ovn_client.create_port.assert_has_calls([
+            mock.call(ports[2]), mock.call(ports[3])])
+        self.assertEqual([ports[0], ports[1], ports[3], ports[4]], created)
+        # The old ACLs of the ports are deleted in a transaction per batch
+        self.assertEqual(3, synchronizer.ovn_api.transaction.call_count)
+        self.assertEqual(5, synchronizer.ovn_api.delete_acl.call_count)
+        synchronizer.ovn_api.delete_acl.assert_any_call('neutron-n1', 'p0')
+
+    def _setup_port_groups_sync(self):
+        synchronizer = self.synchronizer
+        synchronizer.mode = ovn_db_sync.SYNC_MODE_REPAIR
+        synchronizer.report = None
+        synchronizer.ovn_api = mock.MagicMock()
+        synchronizer.ovn_api._tables = {'ACL': mock.Mock(
+            columns={'priority': None, 'match': None, 'action': None,
+                     'direction': None, 'log': None, 'name': None,
+                     'severity': None})}
+        mock.patch.object(ovn_db_sync.acl_utils, 'is_port_groups_enabled',
+                          return_value=True).start()
+        return synchronizer
+
+    def test_sync_port_groups(self):
+        synchronizer = self._setup_port_groups_sync()
+        rule = fakes.FakeSecurityGroupRule.create_one_security_group_rule(
+            attrs={'security_group_id': 'sg1'}).info()
+        sgs = [{'id': 'sg1', 'security_group_rules': [rule]},
+               {'id': 'sg2', 'security_group_rules': []}]
+        synchronizer._snapshot = mock.Mock(security_groups=sgs)
+        ports = [{'id': 'p1', 'security_groups': ['sg1']},
+                 {'id': 'p2', 'security_groups': ['sg2']},
+                 {'id': 'p3', 'security_groups': []}]
+        pg_drop = ovn_const.OVN_DROP_PORT_GROUP_NAME
+        pg1 = utils.ovn_port_group_name('sg1')
+        pg2 = utils.ovn_port_group_name('sg2')
+        stale_acl = {'port_group': pg2, 'direction': 'to-lport',
+                     'priority': 1002, 'match': 'outport == @%s' % pg2,
+                     'action': 'allow-related'}
+        synchronizer.ovn_api.get_port_groups.return_value = {
+            pg_drop: {'name': pg_drop, 'ports': ['p1', 'p4'],
+                      'acls': acl_utils.drop_all_ip_traffic_for_port_group(
+                          pg_drop)},
+            pg2: {'name': pg2, 'ports': ['p2'], 'acls': [stale_acl]},
+            'pg_stale': {'name': 'pg_stale', 'ports': [], 'acls': []}}
+
+        synchronizer.sync_port_groups(mock.sentinel.ctx, ports)
+
+        ovn_api = synchronizer.ovn_api
+        ovn_api.create_port_group.assert_called_once_with(
+            name=pg1, external_ids={ovn_const.OVN_SG_EXT_ID_KEY: 'sg1'},
+            acls=[acl_utils._add_sg_rule_acl_for_port_group(pg1, rule)],
+            ports=['p1'])
+        ovn_api.update_port_group_ports.assert_called_once_with(
+            pg_drop, ports_add=['p2'], ports_remove=['p4'])
+        ovn_api.delete_port_group_acl.assert_called_once_with(
+            pg2, stale_acl['direction'], stale_acl['priority'],
+            stale_acl['match'])
+        ovn_api.add_port_group_acl.assert_not_called()
+        ovn_api.delete_port_group.assert_called_once_with('pg_stale')
+
+    def test_sync_port_groups_log_mode(self):
+        synchronizer = self._setup_port_groups_sync()
+        synchronizer.mode = ovn_db_sync.SYNC_MODE_LOG
+        synchronizer._snapshot = mock.Mock(security_groups=[])
+        synchronizer.ovn_api.get_port_groups.return_value = {}
+        synchronizer.sync_port_groups(mock.sentinel.ctx, [])
+        synchronizer.ovn_api.create_port_group.assert_not_called()
+        synchronizer.ovn_api.transaction.assert_not_called()
+
+    def test_migrate_to_port_groups(self):
+        synchronizer = self._setup_port_groups_sync()
+        ovn_api = synchronizer.ovn_api
+        ovn_api.get_lswitch_port_sg_acls.return_value = {
+            'neutron-n1': ['acl1', 'acl2']}
+        calls = mock.Mock()
+        synchronizer.sync_port_groups = calls.sync_port_groups
+        ovn_api.delete_acls.side_effect = calls.delete_acls
+        self.assertTrue(synchronizer.migrate_to_port_groups(
+            mock.sentinel.ctx))
+        # The port groups are synced before the per-port ACLs are deleted,
+        # the ports are never left without ACLs
+        self.assertEqual(
+            [mock.call.sync_port_groups(mock.sentinel.ctx),
+             mock.call.delete_acls('neutron-n1', ['acl1', 'acl2'])],
+            calls.mock_calls)
+
+    def test_migrate_to_port_groups_nothing_to_migrate(self):
+        synchronizer = self._setup_port_groups_sync()
+        synchronizer.ovn_api.get_lswitch_port_sg_acls.return_value = {}
+        synchronizer.sync_port_groups = mock.Mock()
+        self.assertFalse(synchronizer.migrate_to_port_groups(
+            mock.sentinel.ctx))
+        synchronizer.sync_port_groups.assert_not_called()
+        synchronizer.ovn_api.delete_acls.assert_not_called()
+
+    def test_migrate_to_port_groups_not_enabled(self):
+        synchronizer = self._setup_port_groups_sync()
+        ovn_db_sync.acl_utils.is_port_groups_enabled.return_value = False
+        self.assertFalse(synchronizer.migrate_to_port_groups(
+            mock.sentinel.ctx))
+        synchronizer.ovn_api.get_lswitch_port_sg_acls.assert_not_called()
+
+    @mock.patch.object(ovn_db_sync, 'LOG')
+    def test_report_diff(self, mock_log):
+        self.synchronizer.report = None
+        self.synchronizer._report_diff('ports', ovn_db_sync.SyncReport.ADD,
+                                       'p1', 'Port %s not in OVN', 'p1')
+        mock_log.warning.assert_called_once_with('Port %s not in OVN', 'p1')
+
+        mock_log.reset_mock()
+        self.synchronizer.report = ovn_db_sync.SyncReport()
+        self.synchronizer._report_diff('ports', ovn_db_sync.SyncReport.ADD,
+                                       'p1', 'Port %s not in OVN', 'p1')
+        self.synchronizer._log_diff('Creating port %s in OVN', 'p1')
+        # The differences are only in the report
+        self.assertFalse(mock_log.warning.called)
+        self.assertEqual(
+            {'count': 1, 'ids': ['p1']},
+            self.synchronizer.report.to_dict()['phases'][
+                ovn_db_sync.SyncReport.OTHER_PHASE]['resources']['ports'][
+                'add'])
+
+
+class TestSyncSnapshot(base.TestCase):
+
+    def setUp(self):
+        super(TestSyncSnapshot, self).setUp()
+        self.core_plugin = mock.Mock()
+        self.ports = [{'id': 'p%d' % i, 'network_id': 'n1',
+                       'device_owner': 'compute:nova'} for i in range(5)]
+        self.ports[3]['device_owner'] = 'network:dhcp'
+
+        def fake_get_ports(ctx, sorts=None, limit=None, marker=None):
+            start = 0
+            if marker:
+                start = [p['id'] for p in self.ports].index(marker) + 1
+            return self.ports[start:start + limit]
+
+        self.core_plugin.get_ports.side_effect = fake_get_ports
+        self.snapshot = ovn_db_sync.SyncSnapshot(
+            self.core_plugin, mock.sentinel.ctx, page_size=2)
+
+    def test_ports_loaded_in_pages_once(self):
+        self.assertEqual(self.ports, self.snapshot.ports)
+        self.assertEqual(self.ports, self.snapshot.ports)
+        self.assertEqual(3, self.snapshot.queries)
+        self.core_plugin.get_ports.assert_has_calls([
+            mock.call(mock.sentinel.ctx, sorts=[('id', True)], limit=2,
+                      marker=None),
+            mock.call(mock.sentinel.ctx, sorts=[('id', True)], limit=2,
+                      marker='p1'),
+            mock.call(mock.sentinel.ctx, sorts=[('id', True)], limit=2,
+                      marker='p3')])
+
+    def test_invalidate(self):
+        self.snapshot.ports
+        self.snapshot.invalidate('ports')
+        self.snapshot.ports
+        self.assertEqual(6, self.snapshot.queries)
+
+    def test_get_dhcp_ports(self):
+        self.assertEqual([self.ports[3]], self.snapshot.get_dhcp_ports('n1'))
+        self.assertEqual([], self.snapshot.get_dhcp_ports('n2'))
+        self.assertEqual(3, self.snapshot.queries)
+
+
+class TestSyncTransaction(base.TestCase):
+
+    def setUp(self):
+        super(TestSyncTransaction, self).setUp()
+        self.ovn_api = mock.Mock()
+        self.txns = []
+
+        def fake_transaction(check_error=False):
+            txn = mock.MagicMock()
+            txn.__enter__.return_value = txn
+            self.txns.append(txn)
+            return txn
+
+        self.ovn_api.transaction.side_effect = fake_transaction
+
+    def test_operations_committed_in_chunks(self):
+        with ovn_db_sync.SyncTransaction(self.ovn_api, 'TEST', 5,
+                                         max_ops=2) as txn:
+            for i in range(4):
+                txn.add('cmd%d' % i)
+            txn.add('cmd4', 'cmd5')
+        self.assertEqual(5, txn.done)
+        self.assertEqual(3, len(self.txns))
+        self.assertEqual([mock.call('cmd0'), mock.call('cmd1')],
+                         self.txns[0].add.call_args_list)
+        self.assertEqual([mock.call('cmd4'), mock.call('cmd5')],
+                         self.txns[2].add.call_args_list)
+        for t in self.txns:
+            t.__exit__.assert_called_once_with(None, None, None)
+
+    def test_no_limit(self):
+        with ovn_db_sync.SyncTransaction(self.ovn_api, 'TEST', 5,
+                                         max_ops=0) as txn:
+            for i in range(5):
+                txn.add('cmd%d' % i)
+        self.assertEqual(1, len(self.txns))
+        self.assertEqual(5, txn.done)
+
+    def test_no_operations(self):
+        with ovn_db_sync.SyncTransaction(self.ovn_api, 'TEST', 0,
+                                         max_ops=2):
+            pass
+        self.assertFalse(self.ovn_api.transaction.called)
+
+    def test_failed_chunk_keeps_committed_chunks(self):
+        txn = ovn_db_sync.SyncTransaction(self.ovn_api, 'TEST', 6,
+                                          max_ops=2)
+        with txn:
+            txn.add('cmd0')
+            txn.add('cmd1')
+            txn.add('cmd2')
+            self.txns[1].__exit__.side_effect = RuntimeError
+            self.assertRaises(RuntimeError, txn.add, 'cmd3')
+        self.assertEqual(2, txn.done)
+        self.assertEqual(2, len(self.txns))
+        self.txns[0].__exit__.assert_called_once_with(None, None, None)
+
+
+class TestSyncPlan(base.TestCase):
+
+    def setUp(self):
+        super(TestSyncPlan, self).setUp()
+        self.order = []
+
+    def _phase(self, name, error=None):
+        def run(ctx):
+            self.order.append(name)
+            if error:
+                raise error
+        return run
+
+    def _plan(self, pool_size, error=None):
+        plan = ovn_db_sync.SyncPlan(pool_size)
+        plan.add('address_sets', self._phase('address_sets'))
+        plan.add('networks', self._phase('networks', error))
+        plan.add('acls', self._phase('acls'),
+                 after=['address_sets', 'networks'])
+        return plan
+
+    def test_run_sequential(self):
+        plan = self._plan(1)
+        plan.run()
+        self.assertEqual(['address_sets', 'networks', 'acls'], self.order)
+        self.assertEqual(['address_sets', 'networks', 'acls'],
+                         list(plan.timings))
+
+    def test_run_concurrent(self):
+        plan = self._plan(2)
+        plan.run()
+        self.assertEqual({'address_sets', 'networks'}, set(self.order[:2]))
+        self.assertEqual('acls', self.order[2])
+        self.assertEqual({'address_sets', 'networks', 'acls'},
+                         set(plan.timings))
+
+    def test_run_concurrent_phase_failed(self):
+        plan = self._plan(2, error=RuntimeError)
+        self.assertRaises(RuntimeError, plan.run)
+        self.assertNotIn('acls', self.order)
+
+    def test_run_report(self):
+        report = ovn_db_sync.SyncReport()
+        plan = ovn_db_sync.SyncPlan(1, report=report)
+        plan.add('networks', lambda ctx: report.add(
+            'networks', report.ADD, 'n1'))
+        plan.run()
+        phase = report.to_dict()['phases']['networks']
+        self.assertEqual(plan.timings['networks'], phase['time'])
+        self.assertEqual(['n1'], phase['resources']['networks']['add']['ids'])
+
+    def test_run_sync_plan_order(self):
+        synchronizer = ovn_db_sync.OvnNbSynchronizer.__new__(
+            ovn_db_sync.OvnNbSynchronizer)
+        synchronizer.shard = None
+        synchronizer.report = None
+        synchronizer.ovn_api = mock.Mock()
+        finished = []
+
+        def phase(name, delay=0):
+            def run(ctx):
+                time.sleep(delay)
+                finished.append(name)
+            return run
+
+        # The security groups are the slowest to sync, the ports must
+        # still wait for them
+        synchronizer.sync_address_sets = phase('address_sets', delay=0.2)
+        synchronizer.sync_port_groups = phase('port_groups', delay=0.1)
+        synchronizer.sync_networks_ports_and_dhcp_opts = phase(
+            'networks_ports_and_dhcp_opts')
+        synchronizer.sync_port_dns_records = phase('port_dns_records')
+        synchronizer.sync_acls = phase('acls')
+        synchronizer.sync_routers_and_rports = phase('routers_and_rports')
+        mock.patch.object(ovn_db_sync.acl_utils, 'is_port_groups_enabled',
+                          return_value=True).start()
+        mock.patch.object(ovn_db_sync.config,
+                          'get_ovn_neutron_sync_pool_size',
+                          return_value=4).start()
+        plan = synchronizer._get_sync_plan()
+        plan.run()
+        self.assertEqual(['address_sets', 'port_groups',
+                          'networks_ports_and_dhcp_opts'], finished[:3])
+        self.assertEqual(set(plan.timings), set(finished))
+
+    def test_add_unknown_dependency(self):
+        plan = ovn_db_sync.SyncPlan(1)
+        self.assertRaises(ValueError, plan.add, 'acls',
+                          self._phase('acls'), after=['networks'])
+
+
+class TestSyncShard(base.TestCase):
+
+    def test_owns(self):
+        network_ids = ['n%d' % i for i in range(20)]
+        shards = [ovn_db_sync.SyncShard(3, index) for index in range(3)]
+        for network_id in network_ids:
+            self.assertEqual(1, sum(shard.owns(network_id)
+                                    for shard in shards))
+        coordinator = ovn_db_sync.SyncShard(3)
+        self.assertTrue(coordinator.is_coordinator)
+        self.assertFalse(any(coordinator.owns(network_id)
+                             for network_id in network_ids))
+
+    def test_sharded_snapshot(self):
+        shard = ovn_db_sync.SyncShard(2, 0)
+        networks = [{'id': 'n%d' % i} for i in range(10)]
+        owned_ids = [net['id'] for net in networks if shard.owns(net['id'])]
+        core_plugin = mock.Mock()
+        core_plugin.get_networks.return_value = networks
+        core_plugin.get_ports.return_value = [mock.sentinel.port]
+        snapshot = ovn_db_sync.SyncSnapshot(core_plugin, mock.sentinel.ctx,
+                                            shard=shard)
+        self.assertEqual(owned_ids, [net['id'] for net in snapshot.networks])
+        self.assertEqual([mock.sentinel.port], snapshot.ports)
+        core_plugin.get_ports.assert_called_once_with(
+            mock.sentinel.ctx, sorts=[('id', True)],
+            limit=ovn_db_sync.SNAPSHOT_PAGE_SIZE, marker=None,
+            filters={'network_id': owned_ids})
+
+    def _get_plan_phases(self, shard):
+        synchronizer = ovn_db_sync.OvnNbSynchronizer.__new__(
+            ovn_db_sync.OvnNbSynchronizer)
+        synchronizer.shard = shard
+        synchronizer.report = None
+        synchronizer.ovn_api = mock.Mock()
+        with mock.patch.object(ovn_db_sync.acl_utils,
+                               'is_port_groups_enabled', return_value=True):
+            plan = synchronizer._get_sync_plan()
+        return list(plan._phases)
+
+    def test_sync_plan(self):
+        self.assertEqual(
+            ['address_sets', 'port_groups', 'networks_ports_and_dhcp_opts',
+             'port_dns_records', 'acls', 'routers_and_rports'],
+            self._get_plan_phases(None))
+        self.assertEqual(
+            ['networks_ports_and_dhcp_opts', 'port_dns_records', 'acls'],
+            self._get_plan_phases(ovn_db_sync.SyncShard(2, 1)))
+        self.assertEqual(
+            ['address_sets', 'port_groups', 'routers_and_rports'],
+            self._get_plan_phases(ovn_db_sync.SyncShard(2)))
+        self.assertEqual(
+            ['address_sets', 'port_groups'],
+            self._get_plan_phases(ovn_db_sync.SyncShard(
+                2, stage=ovn_db_sync.SHARD_STAGE_SECURITY_GROUPS)))
+        self.assertEqual(
+            ['routers_and_rports'],
+            self._get_plan_phases(ovn_db_sync.SyncShard(
+                2, stage=ovn_db_sync.SHARD_STAGE_ROUTERS)))
+
+
+class TestSyncReport(base.TestCase):
+
+    def setUp(self):
+        super(TestSyncReport, self).setUp()
+        self.report = ovn_db_sync.SyncReport(mode='log')
+        self.report.start_phase('networks')
+        self.report.add('networks', self.report.ADD, 'n1')
+        self.report.add('ports', self.report.ADD, 'p1')
+        self.report.add('ports', self.report.DELETE, 'p2')
+        self.report.end_phase('networks', 1.5)
+        self.report.start_phase('acls')
+        self.report.add('acls', self.report.DELETE, 'p1')
+        self.report.add('acls', self.report.DELETE, 'p1')
+        self.report.end_phase('acls', 0.5)
+        self.report.add('ports', self.report.UPDATE, 'p3')
+
+    def test_to_dict(self):
+        report = self.report.to_dict()
+        self.assertEqual('log', report['mode'])
+        self.assertEqual(['networks', 'acls', self.report.OTHER_PHASE],
+                         list(report['phases']))
+        networks = report['phases']['networks']
+        self.assertEqual(1.5, networks['time'])
+        self.assertEqual({'add': {'count': 1, 'ids': ['p1']},
+                          'delete': {'count': 1, 'ids': ['p2']},
+                          'update': {'count': 0, 'ids': []}},
+                         networks['resources']['ports'])
+        self.assertEqual({'count': 2, 'ids': ['p1', 'p1']},
+                         report['phases']['acls']['resources']['acls'][
+                             'delete'])
+        self.assertIsNone(report['phases'][self.report.OTHER_PHASE]['time'])
+        self.assertEqual({'networks': {'add': 1, 'delete': 0, 'update': 0},
+                          'ports': {'add': 1, 'delete': 1, 'update': 1},
+                          'acls': {'add': 0, 'delete': 2, 'update': 0}},
+                         report['totals'])
+
+    def test_write(self):
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                            'report.json')
+        self.report.write(path)
+        with open(path) as report_file:
+            self.assertEqual(self.report.to_dict(), json.load(report_file))
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Count the OVSDB "try again" retries of concurrent revision updates.
+
+Several workers, each one with its own IDL connection like the Neutron API
+workers, keep updating the same Logical_Switch in the OVN Northbound
+database. Every transaction runs the revision number check followed by an
+external_ids update, as done by OVNClient.update_network().
+
+Two modes are compared:
+
+  verify  - the external_ids update verifies the whole column, as the
+            external_ids update commands used to do.
+  mutate  - the external_ids update only mutates its keys.
+
+The revision check verifies the external_ids column in both modes, the
+ovsdb-server must refuse a stale revision.
+
+Example, against the NB database of a devstack or an ovn sandbox:
+
+  python tools/ovsdb_revision_benchmark.py --connection tcp:127.0.0.1:6641
+"""
+
+import argparse
+import itertools
+import threading
+import time
+
+from ovs.db import idl as ovs_idl
+from ovsdbapp.backend.ovs_idl import idlutils
+
+from networking_ovn.common import constants as ovn_const
+from networking_ovn.common import exceptions as ovn_exc
+from networking_ovn.ovsdb import commands
+
+LSWITCH_NAME = 'neutron-revision-benchmark'
+MODES = ('verify', 'mutate')
+
+
+class _Api(object):
+    """The bits of the NB API used by the commands run by this tool."""
+
+    def __init__(self, idl):
+        self.idl = idl
+
+    @property
+    def _tables(self):
+        return self.idl.tables
+
+    def is_col_present(self, table_name, col_name):
+        return col_name in self.idl.tables[table_name].columns
+
+    def lookup(self, table, name):
+        return idlutils.row_by_value(self.idl, table, 'name', name)
+
+
+class _Stats(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commits = 0
+        self.retries = 0
+        self.conflicts = 0
+
+    def add(self, commits=0, retries=0, conflicts=0):
+        with self.lock:
+            self.commits += commits
+            self.retries += retries
+            self.conflicts += conflicts
+
+
+def _connect(connection, timeout):
+    helper = idlutils.get_schema_helper(connection, 'OVN_Northbound')
+    helper.register_table('Logical_Switch')
+    idl = ovs_idl.Idl(connection, helper)
+    while not idl.has_ever_connected():
+        idlutils.wait_for_change(idl, timeout)
+    return idl
+
+
+def _commit(idl, timeout, build_txn):
+    """Commit a transaction, retrying it like ovsdbapp does.
+
+    :returns: the number of retries
+    """
+    retries = 0
+    while True:
+        seqno = idl.change_seqno
+        txn = ovs_idl.Transaction(idl)
+        try:
+            build_txn(txn)
+        except Exception:
+            txn.abort()
+            raise
+        status = txn.commit_block()
+        if status == txn.TRY_AGAIN:
+            retries += 1
+            idlutils.wait_for_change(idl, timeout, seqno)
+            continue
+        if status not in (txn.SUCCESS, txn.UNCHANGED):
+            raise RuntimeError(txn.get_error())
+        return retries
+
+
+def _worker(args, worker_id, mode, revisions, stats):
+    idl = _connect(args.connection, args.timeout)
+    api = _Api(idl)
+    ext_id_key = 'neutron:benchmark-worker-%d' % worker_id
+
+    for i in range(args.iterations):
+        network = {'id': LSWITCH_NAME, 'revision_number': next(revisions)}
+
+        def build_txn(txn):
+            commands.CheckRevisionNumberCommand(
+                api, LSWITCH_NAME, network, ovn_const.TYPE_NETWORKS,
+                if_exists=False).run_idl(txn)
+            if mode == 'verify':
+                api.lookup('Logical_Switch', LSWITCH_NAME).verify(
+                    'external_ids')
+            commands.LSwitchSetExternalIdsCommand(
+                api, LSWITCH_NAME, {ext_id_key: str(i)},
+                if_exists=False).run_idl(txn)
+
+        try:
+            stats.add(commits=1, retries=_commit(idl, args.timeout,
+                                                 build_txn))
+        except ovn_exc.RevisionConflict:
+            # A newer revision was written first, Neutron drops the update
+            stats.add(conflicts=1)
+
+    idl.close()
+
+
+def _set_lswitch(idl, timeout, present):
+    def build_txn(txn):
+        for row in list(idl.tables['Logical_Switch'].rows.values()):
+            if row.name == LSWITCH_NAME:
+                row.delete()
+        if present:
+            row = txn.insert(idl.tables['Logical_Switch'])
+            row.name = LSWITCH_NAME
+            row.external_ids = {ovn_const.OVN_REV_NUM_EXT_ID_KEY: '-1'}
+
+    _commit(idl, timeout, build_txn)
+
+
+def run(args, mode):
+    admin_idl = _connect(args.connection, args.timeout)
+    _set_lswitch(admin_idl, args.timeout, present=True)
+
+    revisions = itertools.count()
+    stats = _Stats()
+    workers = [threading.Thread(target=_worker,
+                                args=(args, i, mode, revisions, stats))
+               for i in range(args.workers)]
+    start = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.time() - start
+
+    _set_lswitch(admin_idl, args.timeout, present=False)
+    admin_idl.close()
+
+    print('%-7s workers=%d transactions=%d committed=%d retries=%d '
+          'revision-conflicts=%d elapsed=%.2fs' % (
+              mode, args.workers, args.workers * args.iterations,
+              stats.commits, stats.retries, stats.conflicts, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--connection', default='tcp:127.0.0.1:6641',
+                        help='OVN Northbound OVSDB connection string')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Number of concurrent workers')
+    parser.add_argument('--iterations', type=int, default=100,
+                        help='Number of updates per worker')
+    parser.add_argument('--timeout', type=int, default=30,
+                        help='OVSDB timeout in seconds')
+    parser.add_argument('--mode', choices=MODES + ('both',), default='both')
+    args = parser.parse_args()
+
+    for mode in MODES if args.mode == 'both' else (args.mode,):
+        run(args, mode)
+
+
+if __name__ == '__main__':
+    main()